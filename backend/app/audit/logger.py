@@ -145,6 +145,33 @@ class AuditLogger:
         if not success and error_message:
             print(f"        Error: {error_message}")
 
+    @classmethod
+    async def log_email_queue(
+        cls,
+        user_email: str,
+        user_role: str,
+        to_emails: list[str],
+        subject: str,
+        email_id: Optional[str] = None,
+        has_attachments: bool = False,
+        request: Optional[Request] = None,
+    ):
+        """이메일 전송 대기열 등록 로그 (실제 전송/실패는 전송 워커가 log_email_send로 기록)"""
+        await cls.log(
+            event_type=AuditEventType.EMAIL_QUEUE,
+            user_email=user_email,
+            user_role=user_role,
+            action=f"이메일 전송 대기열 등록: {subject}",
+            resource_type="email",
+            resource_id=email_id,
+            details={
+                "to": to_emails,
+                "subject": subject,
+                "has_attachments": has_attachments,
+            },
+            request=request,
+        )
+
     @classmethod
     async def log_email_send(
         cls,
@@ -155,14 +182,19 @@ class AuditLogger:
         has_attachments: bool = False,
         masked_count: int = 0,
         request: Optional[Request] = None,
+        email_id: Optional[str] = None,
+        success: bool = True,
+        error_message: Optional[str] = None,
     ):
         """이메일 전송 로그"""
         await cls.log(
             event_type=AuditEventType.EMAIL_SEND,
             user_email=user_email,
             user_role=user_role,
-            action=f"이메일 전송: {subject}",
+            action=f"이메일 전송: {subject}" if success else f"이메일 전송 실패: {subject}",
+            severity=AuditSeverity.INFO if success else AuditSeverity.ERROR,
             resource_type="email",
+            resource_id=email_id,
             details={
                 "to": to_emails,
                 "subject": subject,
@@ -170,6 +202,8 @@ class AuditLogger:
                 "masked_count": masked_count,
             },
             request=request,
+            success=success,
+            error_message=error_message,
         )
 
     @classmethod
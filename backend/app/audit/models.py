@@ -11,6 +11,7 @@ class AuditEventType(str, Enum):
     """감사 이벤트 타입"""
     # 메일 관련
     EMAIL_COMPOSE = "email_compose"
+    EMAIL_QUEUE = "email_queue"
     EMAIL_SEND = "email_send"
     EMAIL_READ = "email_read"
     EMAIL_DELETE = "email_delete"
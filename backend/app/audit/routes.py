@@ -132,6 +132,7 @@ async def get_audit_logs(
             # 일반 사용자는 본인 메일 관련 로그만
             query["user_email"] = user_email
             query["event_type"] = {"$in": [
+                AuditEventType.EMAIL_QUEUE,
                 AuditEventType.EMAIL_SEND,
                 AuditEventType.EMAIL_READ,
                 AuditEventType.EMAIL_COMPOSE,
@@ -42,11 +42,20 @@ from app.api import settings as settings_routes
 
 # SMTP 서버 및 라우터
 from app.smtp_server.handler import start_smtp_server
+from app.smtp_server.ingest import ingest_queue
+from app.smtp_server.analysis import analysis_pipeline
+from app.smtp_server.delivery import delivery_service
 from app.smtp_server import routes as smtp_routes
 
 # Database
 from app.database.mongodb import connect_to_mongo, close_mongo_connection
 
+# 첨부파일 마스킹 프로세스 풀
+from app.utils.masking_pool import shutdown_masking_executor
+
+# embedded: 이 프로세스에서 SMTP 수신 / external: 별도 수신 워커(app.smtp_server.worker)가 수신
+SMTP_INGEST_MODE = os.getenv("SMTP_INGEST_MODE", "embedded").lower()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """앱 생명주기 관리"""
@@ -59,20 +68,40 @@ async def lifespan(app: FastAPI):
     await connect_to_mongo()
     print("[App] ✅ MongoDB 연결 완료\n")
 
-    # SMTP 서버 시작
-    smtp_task = asyncio.create_task(start_smtp_server())
-    await asyncio.sleep(1)
-    print("[App] ✅ SMTP 서버 시작 완료\n")
+    # 수신 메일 자동 DLP 분석 파이프라인 + 저장 큐 (SMTP 서버보다 먼저 시작)
+    # 저장된 메일은 바로 분석 대기열로 들어감
+    await analysis_pipeline.start()
+    if SMTP_INGEST_MODE == "embedded":
+        await ingest_queue.start(on_written=analysis_pipeline.enqueue_many)
+
+    # 발신 메일 전송 큐 (SMTP 연결 풀 재사용)
+    await delivery_service.start()
+
+    # SMTP 서버 시작 (external이면 app.smtp_server.worker 프로세스들이 수신, 분석은 sweeper가 가져감)
+    smtp_task = None
+    if SMTP_INGEST_MODE == "embedded":
+        smtp_task = asyncio.create_task(start_smtp_server())
+        await asyncio.sleep(1)
+        print("[App] ✅ SMTP 서버 시작 완료\n")
+    else:
+        print("[App] ℹ️ SMTP_INGEST_MODE=external: 내장 SMTP 서버를 띄우지 않음 (python -m app.smtp_server.worker)\n")
 
     yield
 
     # 종료 시
     print("\n[App] 종료 중...")
-    smtp_task.cancel()
-    try:
-        await smtp_task
-    except asyncio.CancelledError:
-        pass
+    if smtp_task is not None:
+        smtp_task.cancel()
+        try:
+            await smtp_task
+        except asyncio.CancelledError:
+            pass
+    await ingest_queue.stop()
+    await analysis_pipeline.stop()
+    await delivery_service.stop()
+    await asyncio.to_thread(shutdown_masking_executor)
+    # 가이드 변경 로그의 미반영 변경을 JSONL에 반영 (빌드 스크립트가 바로 읽을 수 있게)
+    vectordb_routes.guide_store.compact()
     await close_mongo_connection()
     print("[App] ✅ 종료 완료")
 
@@ -2,7 +2,7 @@
 이메일 데이터 모델
 """
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime,timedelta
 from app.utils.datetime_utils import get_kst_now
 
@@ -11,7 +11,11 @@ class AttachmentData(BaseModel):
     filename: str
     content_type: str
     size: int
-    data: str  # Base64 encoded file content
+    data: Optional[str] = None  # Base64 encoded file content (구버전 문서)
+    file_id: Optional[str] = None  # GridFS file id
+    sha256: Optional[str] = None
+    archive: Optional[Dict[str, Any]] = None  # 압축 파일 멤버 목록·한도 위반 (inspect_archive 결과)
+    content_id: Optional[str] = None  # 본문에서 cid:로 참조하는 인라인 이미지 파트
 
 
 class OriginalEmailData(BaseModel):
@@ -59,6 +63,7 @@ class MaskedEmailData(BaseModel):
     to_emails: List[str] = Field(description="수신자 이메일 리스트")
     subject: str = Field(description="이메일 제목")
     masked_body: str = Field(description="마스킹된 본문")
+    masked_body_patches: List[List[Any]] = Field(default=[], description="원본 본문 기준 마스킹 패치 [[start, end, replacement], ...]")
     masked_attachments: List[AttachmentData] = Field(default=[], description="마스킹된 첨부파일 리스트")
     masking_decisions: dict = Field(default={}, description="마스킹 결정 정보")
     pii_masked_count: int = Field(default=0, description="마스킹된 PII 개수")
@@ -77,7 +82,8 @@ class MaskedEmailData(BaseModel):
                         "filename": "masked_document.pdf",
                         "content_type": "application/pdf",
                         "size": 102400,
-                        "data": "base64_encoded_string..."
+                        "file_id": "6790a1b2c3d4e5f601234567",
+                        "sha256": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08"
                     }
                 ],
                 "masking_decisions": {},
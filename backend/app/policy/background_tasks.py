@@ -9,8 +9,10 @@ import asyncio
 from typing import Dict, Optional
 from datetime import datetime,timedelta
 from pathlib import Path
+import importlib.util
 import json
 import os
+import sys
 from dotenv import load_dotenv
 def get_kst_now():
     """한국 표준시(KST) 반환"""
@@ -22,13 +24,18 @@ try:
 except ImportError:
     OPENAI_AVAILABLE = False
 
-# ChromaDB imports
-try:
-    import chromadb
-    from sentence_transformers import SentenceTransformer
-    CHROMADB_AVAILABLE = True
-except ImportError:
-    CHROMADB_AVAILABLE = False
+# ChromaDB imports (임베딩 모델·클라이언트는 RAG 모듈의 공용 레지스트리에서 공유)
+CHROMADB_AVAILABLE = all(importlib.util.find_spec(name) is not None
+                         for name in ("chromadb", "sentence_transformers"))
+if CHROMADB_AVAILABLE:
+    try:
+        RAG_DIR = str(Path(__file__).resolve().parent.parent / "rag")
+        if RAG_DIR not in sys.path:
+            sys.path.insert(0, RAG_DIR)
+        from agent.model_registry import model_registry
+        from agent.retrieval_cache import retrieval_cache
+    except ImportError:
+        CHROMADB_AVAILABLE = False
 
 load_dotenv()
 
@@ -244,7 +251,7 @@ class VectorDBManager:
             return
 
         try:
-            self.client = chromadb.PersistentClient(path=str(CHROMA_DB_DIR))
+            self.client = model_registry.chroma_client(str(CHROMA_DB_DIR))
 
             # 컬렉션 가져오기 또는 생성
             try:
@@ -255,9 +262,9 @@ class VectorDBManager:
                     metadata={"hnsw:space": "cosine"}
                 )
 
-            # 임베딩 모델 로드
+            # 임베딩 모델 (작업마다 새로 로드하지 않고 프로세스 공용 인스턴스 사용)
             model_name = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
-            self.model = SentenceTransformer(model_name)
+            self.model = model_registry.embedding_model(model_name)
 
         except Exception as e:
             print(f"VectorDB 초기화 실패: {e}")
@@ -316,6 +323,7 @@ class VectorDBManager:
                 metadatas=metadatas,
                 ids=ids
             )
+            retrieval_cache.invalidate("application_guides 컬렉션 추가")
 
             return True
 
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from datetime import datetime,timedelta
 from enum import Enum
 def get_kst_now():
@@ -181,6 +181,12 @@ class EmailRecord(BaseModel):
     dlp_verified_at: Optional[datetime] = None
     dlp_policy_violation: Optional[str] = None  # DLP 정책 위반 사항
 
+    # 자동 DLP 분석 (app/smtp_server/analysis.py, 승인 상태와 별개)
+    analysis_status: Optional[str] = None  # queued / analyzing / analyzed / failed
+    analysis_summary: Optional[Dict[str, Any]] = None  # PII 개수·유형, 마스킹 권고 수
+    pii_count: Optional[int] = None
+    analyzed_at: Optional[datetime] = None
+
     # 승인/반려
     reviewed_at: Optional[datetime] = None
     reviewed_by: Optional[str] = None
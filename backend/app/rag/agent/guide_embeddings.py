@@ -0,0 +1,135 @@
+"""
+애플리케이션 가이드 임베딩 저장소
+- 가이드 검색 텍스트를 한 번만 임베딩해 application_guides.jsonl 옆에 .npy로 저장
+- 검색 시에는 memory-mapped 행렬 × 쿼리 벡터 한 번으로 코사인 유사도 계산 (L2 정규화 저장)
+- 매니페스트(텍스트별 SHA-256)로 바뀐 가이드만 다시 임베딩
+
+파일 구성 (application_guides.jsonl 기준):
+    application_guides.embeddings.json              매니페스트 (모델, 차원, 텍스트 해시 목록, 행렬 파일명)
+    application_guides.embeddings.<digest>.npy      float32 [가이드 수 × 차원]
+
+행렬 파일명에 내용 해시를 넣어 새 파일을 쓴 뒤 매니페스트를 바꾸므로, 다른 프로세스가
+이전 행렬을 mmap으로 열고 있어도 덮어쓰지 않습니다 (Windows에서도 안전).
+"""
+import hashlib
+import json
+import os
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+
+MANIFEST_VERSION = 1
+_ENCODE_BATCH_SIZE = 32
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def write_atomic(path: str, write):
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class GuideEmbeddingStore:
+    """가이드 임베딩 행렬 로드·증분 갱신"""
+
+    def __init__(self, guides_path: str, get_model: Callable[[], Any], model_name: str):
+        self.base_path = os.path.splitext(guides_path)[0]
+        self.manifest_path = f"{self.base_path}.embeddings.json"
+        # 임베딩할 가이드가 있을 때만 모델을 로드하도록 지연 호출
+        self.get_model = get_model
+        self.model_name = model_name
+
+    def _read_manifest(self) -> Optional[dict]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != MANIFEST_VERSION or manifest.get("model") != self.model_name:
+            return None
+        return manifest
+
+    def _matrix_path(self, filename: str) -> str:
+        return os.path.join(os.path.dirname(self.manifest_path), filename)
+
+    def _open_matrix(self, manifest: dict) -> Optional[np.ndarray]:
+        try:
+            matrix = np.load(self._matrix_path(manifest["matrix"]), mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            return None
+        if matrix.shape != (len(manifest["hashes"]), manifest["dim"]):
+            return None
+        return matrix
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        vectors = self.get_model().encode(texts, batch_size=_ENCODE_BATCH_SIZE, normalize_embeddings=True,
+                                          convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def load(self, corpus: List[str]) -> Optional[np.ndarray]:
+        """
+        corpus(가이드 검색 텍스트, 가이드 순서) 임베딩 행렬 반환 [len(corpus) × dim], 행은 L2 정규화.
+        저장된 행렬과 텍스트가 같으면 mmap으로 바로 열고, 달라진 텍스트만 새로 임베딩합니다.
+        """
+        if not corpus:
+            return None
+
+        hashes = [text_hash(text) for text in corpus]
+        manifest = self._read_manifest()
+        previous = self._open_matrix(manifest) if manifest else None
+        if previous is not None and manifest["hashes"] == hashes:
+            print(f"   - 가이드 임베딩 {len(hashes)}개 로드 (mmap: {manifest['matrix']})")
+            return previous
+
+        # 이전 행렬에서 같은 텍스트의 행을 재사용하고 나머지만 임베딩
+        reusable = {}
+        if previous is not None:
+            for row, digest in enumerate(manifest["hashes"]):
+                reusable.setdefault(digest, row)
+        missing = [i for i, digest in enumerate(hashes) if digest not in reusable]
+        fresh = self._encode([corpus[i] for i in missing]) if missing else None
+        dim = fresh.shape[1] if fresh is not None else previous.shape[1]
+
+        matrix = np.empty((len(corpus), dim), dtype=np.float32)
+        for i, digest in enumerate(hashes):
+            if digest in reusable:
+                matrix[i] = previous[reusable[digest]]
+        if missing:
+            matrix[missing] = fresh
+        print(f"   - 가이드 임베딩 갱신: 재사용 {len(corpus) - len(missing)}개, 새로 임베딩 {len(missing)}개")
+
+        return self._save(matrix, hashes, old_matrix=manifest.get("matrix") if manifest else None)
+
+    def _save(self, matrix: np.ndarray, hashes: List[str], old_matrix: Optional[str]) -> np.ndarray:
+        digest = hashlib.sha256(("\n".join([self.model_name] + hashes)).encode("utf-8")).hexdigest()[:16]
+        filename = f"{os.path.basename(self.base_path)}.embeddings.{digest}.npy"
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "model": self.model_name,
+            "dim": int(matrix.shape[1]),
+            "count": len(hashes),
+            "matrix": filename,
+            "hashes": hashes,
+        }
+        try:
+            write_atomic(self._matrix_path(filename), lambda f: np.save(f, matrix))
+            write_atomic(self.manifest_path,
+                          lambda f: f.write(json.dumps(manifest, ensure_ascii=False).encode("utf-8")))
+        except OSError as e:
+            print(f"   - ⚠️ 가이드 임베딩 저장 실패 (메모리에서만 사용): {e}")
+            return matrix
+
+        if old_matrix and old_matrix != filename:
+            try:
+                os.remove(self._matrix_path(old_matrix))
+            except OSError:
+                pass  # 다른 프로세스가 아직 열고 있으면 다음 갱신 때 정리
+        return np.load(self._matrix_path(filename), mmap_mode="r")
@@ -0,0 +1,85 @@
+"""
+애플리케이션 가이드 벡터 인덱스
+- 가이드 임베딩 행렬(guide_embeddings.py) 위의 인메모리 top-k 인덱스
+- sender_type / receiver_type 메타데이터를 역색인으로 두고 필터(where)된 행만 점수 계산
+- 후보 선택·정렬은 argpartition으로 k개만 부분 정렬
+
+가이드는 수백~수천 개 규모라 HNSW 그래프보다 정규화된 행렬 × 쿼리 벡터 한 번(정확 검색)이 빠르고,
+임베딩을 Chroma에 한 벌 더 저장할 필요도 없습니다. 규모가 커져 근사 검색이 필요하면
+search()만 교체하면 됩니다.
+"""
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+FILTER_FIELDS = ('sender_type', 'receiver_type')
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """점수 상위 k개 위치 (내림차순). 전체 정렬 대신 argpartition 후 k개만 정렬"""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < scores.size:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(scores.size)
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+class GuideIndex:
+    """가이드 임베딩 + 메타데이터 필터 인덱스"""
+
+    def __init__(self, guides: List[Dict[str, Any]], embeddings: np.ndarray):
+        self.embeddings = embeddings
+        self.size = len(guides)
+        self.metadata = {field: [] for field in FILTER_FIELDS}
+        postings = {field: defaultdict(list) for field in FILTER_FIELDS}
+        for row, guide in enumerate(guides):
+            guide_context = guide.get('context') or {}
+            for field in FILTER_FIELDS:
+                value = guide_context.get(field)
+                self.metadata[field].append(value)
+                postings[field][value].append(row)
+        self._postings = {
+            field: {value: np.asarray(rows, dtype=np.intp) for value, rows in values.items()}
+            for field, values in postings.items()
+        }
+
+    def rows_where(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """메타데이터 조건(AND)에 맞는 행 번호. 조건이 없으면 None (전체)"""
+        if not where:
+            return None
+        rows = None
+        for field, value in where.items():
+            matched = self._postings[field].get(value)
+            if matched is None:
+                return np.empty(0, dtype=np.intp)
+            rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+        return rows
+
+    def score(self, query_embedding: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """정규화된 쿼리 벡터와의 코사인 유사도 (rows가 없으면 전체)"""
+        if rows is None:
+            return self.embeddings @ query_embedding
+        return self.embeddings[rows] @ query_embedding
+
+    def search(self, query_embedding: np.ndarray, k: int, where: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        """벡터 유사도 상위 k개 행 번호 (where로 먼저 필터링)"""
+        rows = self.rows_where(where)
+        if rows is not None and rows.size == 0:
+            return rows
+        top = top_k_indices(self.score(query_embedding, rows), k)
+        return top if rows is None else rows[top]
+
+    def context_multiplier(self, rows: np.ndarray, context: Optional[Dict[str, Any]],
+                           bonus: float = 1.2) -> np.ndarray:
+        """발신자/수신자 타입이 context와 일치하는 행마다 bonus배"""
+        multiplier = np.ones(rows.size, dtype=np.float32)
+        if not context:
+            return multiplier
+        for field in FILTER_FIELDS:
+            matched = self._postings[field].get(context.get(field))
+            if matched is not None:
+                multiplier[np.isin(rows, matched, assume_unique=True)] *= bonus
+        return multiplier
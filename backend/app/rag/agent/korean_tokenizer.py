@@ -0,0 +1,177 @@
+"""
+한국어 토크나이저 백엔드
+- KOREAN_TOKENIZER=okt    : konlpy Okt 형태소 분석 (기본, JVM 필요)
+- KOREAN_TOKENIZER=simple : 순수 파이썬 규칙 기반 분리 (JVM 없이 1초 안팎으로 기동)
+  어절을 한글/영문/숫자 단위로 나누고, 끝의 조사·어미를 떼어 별도 토큰으로 냅니다.
+  BM25 검색용으로 Okt morphs와 비슷한 입자 크기를 목표로 하며 품사 분석은 하지 않습니다.
+- CachedTokenizer: 쿼리 토큰화 결과를 LRU로 기억 (검색 쿼리는 반복이 많음)
+- TokenizedCorpusStore: 가이드 말뭉치 토큰을 텍스트 해시와 함께 저장해 기동 시 재사용
+
+말뭉치와 쿼리는 같은 백엔드로 토큰화해야 합니다. 가이드 토큰 파일에는 백엔드 이름이 들어 있어
+백엔드가 바뀌면 다시 토큰화하고, A_cases 인덱스는 같은 KOREAN_TOKENIZER로
+scripts/hybrid/build_bm25.py를 다시 실행해야 합니다 (인덱스에 기록된 백엔드와 다르면 로드하지 않음).
+"""
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from agent.guide_embeddings import text_hash, write_atomic
+
+KOREAN_TOKENIZER = os.getenv("KOREAN_TOKENIZER", "okt").lower()
+QUERY_TOKEN_CACHE_SIZE = int(os.getenv("QUERY_TOKEN_CACHE_SIZE", "2048"))
+# simple 백엔드 규칙이 바뀌면 올림 (저장된 말뭉치 토큰을 다시 만듦)
+CORPUS_TOKENS_VERSION = 2
+
+# 한글 / 영문 / 숫자 / 그 밖의 기호(한 글자씩)
+_TOKEN_PATTERN = re.compile(r"[가-힣]+|[A-Za-z]+|[0-9]+|[^\s가-힣A-Za-z0-9]")
+
+# 어절 끝에서 떼어낼 조사·어미 (긴 것부터 검사)
+_SUFFIXES = sorted({
+    # 조사
+    "이", "가", "은", "는", "을", "를", "의", "에", "에서", "에게", "께", "한테", "로", "으로", "와", "과",
+    "도", "만", "까지", "부터", "처럼", "보다", "이나", "나", "이란", "란", "라도", "마다", "에는", "에서는",
+    "으로는", "로는", "과의", "와의", "에의", "으로서", "로서", "으로써", "로써", "이며", "며",
+    # 서술·관형 어미 (명사 + 하다/되다 활용)
+    "하다", "한다", "하는", "한", "할", "하여", "해", "해야", "했다", "합니다", "하고", "하며", "하면", "하지",
+    "된", "되는", "될", "되어", "돼", "됩니다", "되며", "되고", "되면", "시", "적", "적인", "적으로",
+    "입니다", "이다", "인", "일", "이고",
+}, key=len, reverse=True)
+
+# 떼어낸 뒤 남는 어간이 이보다 짧으면 떼지 않음 (예: "나이" → "나" + "이" 방지)
+_MIN_STEM = 2
+
+# 한 글자 조사·어미와 끝 글자가 같은 명사: 이 끝말로 끝나는 어절은 한 글자 끝말을 떼지 않음
+# (예: "이메일" → "이메" + "일", "접근권한" → "접근권" + "한", "전문가" → "전문" + "가" 방지)
+_NOUN_ENDINGS = (
+    "메일", "파일", "생일", "휴일", "요일", "월일", "업일", "념일",
+    "개인", "본인", "타인", "법인", "리인", "청인", "증인", "국인", "임인",
+    "국적", "실적", "목적", "지적", "누적",
+    "표시", "일시", "동시", "즉시", "임시", "수시", "당시", "도시", "역시", "별시", "울시", "명시", "게시", "제시", "지시",
+    "권한", "기한", "제한",
+    "평가", "국가", "문가", "단가", "원가", "대가", "휴가", "증가", "추가", "참가", "부가",
+)
+
+
+class SimpleKoreanTokenizer:
+    """순수 파이썬 규칙 기반 토크나이저 (Okt.morphs 대체)"""
+
+    name = "simple"
+
+    def morphs(self, text: str) -> List[str]:
+        tokens = []
+        for token in _TOKEN_PATTERN.findall(text or ""):
+            if "가" <= token[0] <= "힣" and len(token) > _MIN_STEM:
+                for suffix in _SUFFIXES:
+                    if len(suffix) == 1 and token.endswith(_NOUN_ENDINGS):
+                        continue
+                    if token.endswith(suffix) and len(token) - len(suffix) >= _MIN_STEM:
+                        tokens.append(token[:-len(suffix)])
+                        tokens.append(suffix)
+                        break
+                else:
+                    tokens.append(token)
+            else:
+                tokens.append(token)
+        return tokens
+
+
+class OktTokenizer:
+    """konlpy Okt 래퍼. JVM은 처음 토큰화할 때 기동 (저장된 토큰만 쓰는 기동에서는 띄우지 않음)"""
+
+    name = "okt"
+
+    def __init__(self):
+        self._okt = None
+        self._lock = threading.Lock()
+
+    def morphs(self, text: str) -> List[str]:
+        if self._okt is None:
+            with self._lock:
+                if self._okt is None:
+                    from konlpy.tag import Okt
+                    self._okt = Okt()
+        return self._okt.morphs(text)
+
+
+def create_tokenizer(backend: Optional[str] = None):
+    """backend(기본: KOREAN_TOKENIZER) 이름으로 토크나이저 생성"""
+    backend = (backend or KOREAN_TOKENIZER).lower()
+    if backend == "simple":
+        return SimpleKoreanTokenizer()
+    if backend == "okt":
+        return OktTokenizer()
+    raise ValueError(f"알 수 없는 KOREAN_TOKENIZER: {backend} (okt 또는 simple)")
+
+
+class CachedTokenizer:
+    """쿼리 토큰화 결과를 LRU로 기억하는 래퍼 (스레드 안전). 말뭉치는 morphs_uncached로"""
+
+    def __init__(self, backend, maxsize: int = QUERY_TOKEN_CACHE_SIZE):
+        self.backend = backend
+        self.name = backend.name
+        self.maxsize = maxsize
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def morphs(self, text: str) -> List[str]:
+        with self._lock:
+            tokens = self._cache.get(text)
+            if tokens is not None:
+                self._cache.move_to_end(text)
+                return list(tokens)
+        tokens = tuple(self.backend.morphs(text))
+        if self.maxsize > 0:
+            with self._lock:
+                self._cache[text] = tokens
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+        return list(tokens)
+
+    def morphs_uncached(self, text: str) -> List[str]:
+        return self.backend.morphs(text)
+
+
+class TokenizedCorpusStore:
+    """
+    말뭉치 토큰 저장소: <jsonl 이름>.tokens.json
+        {"version", "tokenizer", "hashes": [텍스트 SHA-256], "tokens": [[토큰...]]}
+    텍스트가 같은 항목은 저장된 토큰을 재사용하고, 바뀐 텍스트만 토큰화합니다.
+    """
+
+    def __init__(self, source_path: str, tokenizer):
+        self.path = f"{os.path.splitext(source_path)[0]}.tokens.json"
+        self.tokenizer = tokenizer
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != CORPUS_TOKENS_VERSION or data.get("tokenizer") != self.tokenizer.name:
+            return {}
+        return data
+
+    def load(self, corpus: List[str]) -> List[List[str]]:
+        hashes = [text_hash(text) for text in corpus]
+        saved = self._read()
+        if saved.get("hashes") == hashes:
+            print(f"   - 토큰화된 말뭉치 {len(hashes)}개 로드 ({os.path.basename(self.path)})")
+            return saved["tokens"]
+
+        reusable = dict(zip(saved.get("hashes", []), saved.get("tokens", [])))
+        tokenize = getattr(self.tokenizer, "morphs_uncached", self.tokenizer.morphs)
+        tokens = [reusable[digest] if digest in reusable else tokenize(text)
+                  for digest, text in zip(hashes, corpus)]
+        reused = sum(1 for digest in hashes if digest in reusable)
+        print(f"   - 말뭉치 토큰화 ({self.tokenizer.name}): 재사용 {reused}개, 새로 토큰화 {len(corpus) - reused}개")
+
+        data = {"version": CORPUS_TOKENS_VERSION, "tokenizer": self.tokenizer.name, "hashes": hashes, "tokens": tokens}
+        try:
+            write_atomic(self.path, lambda f: f.write(json.dumps(data, ensure_ascii=False).encode("utf-8")))
+        except OSError as e:
+            print(f"   - ⚠️ 토큰화된 말뭉치 저장 실패: {e}")
+        return tokens
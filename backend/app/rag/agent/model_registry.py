@@ -0,0 +1,193 @@
+"""
+프로세스 공용 모델 레지스트리
+- 임베딩 모델(SentenceTransformer), 한국어 토크나이저(Okt 등), ChromaDB 클라이언트를 키별로 한 번만 로드해 공유
+- 처음 요청될 때 로드 (키별 잠금으로 동시 요청에도 한 번만 로드)
+- 모델별 메모리(파라미터·버퍼 바이트) 보고: model_registry.snapshot()
+- MODEL_IDLE_SECONDS 동안 쓰이지 않은 임베딩 모델은 내려서 메모리 반환 (다음 요청 때 다시 로드)
+  Okt(JVM)와 ChromaDB 클라이언트는 내려도 메모리가 돌아오지 않으므로 고정
+
+이 모듈은 항상 `agent.model_registry`로 import 합니다 (app/rag를 sys.path에 넣고).
+`app.rag.agent.model_registry`로 import 하면 별도 모듈이 되어 레지스트리가 둘로 나뉩니다.
+"""
+import gc
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# 0이면 내리지 않음
+MODEL_IDLE_SECONDS = int(os.getenv("MODEL_IDLE_SECONDS", "1800"))
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "")  # 비우면 cuda 사용 가능 시 cuda
+
+
+def _model_memory_bytes(value: Any) -> Optional[int]:
+    """torch 모듈이면 파라미터·버퍼 바이트 합, 아니면 None"""
+    if not hasattr(value, "parameters"):
+        return None
+    try:
+        total = sum(p.numel() * p.element_size() for p in value.parameters())
+        total += sum(b.numel() * b.element_size() for b in value.buffers())
+        return total
+    except Exception:
+        return None
+
+
+class _Entry:
+    def __init__(self, key: str, kind: str, value: Any, pinned: bool, load_seconds: float):
+        self.key = key
+        self.kind = kind
+        self.value = value
+        self.pinned = pinned
+        self.load_seconds = load_seconds
+        self.memory_bytes = _model_memory_bytes(value)
+        self.loaded_at = time.time()
+        self.last_used = time.monotonic()
+        self.uses = 0
+
+
+class ModelRegistry:
+    """키별 공유 인스턴스 저장소 (스레드 안전)"""
+
+    def __init__(self, idle_seconds: int = MODEL_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._sweeper: Optional[threading.Thread] = None
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, key: str, loader: Callable[[], Any], kind: str = "model", pinned: bool = False) -> Any:
+        """key의 공유 인스턴스 반환. 없으면 loader()로 한 번만 로드"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.last_used = time.monotonic()
+                entry.uses += 1
+                return entry.value
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # 로드는 전역 잠금 밖에서 (다른 모델 조회를 막지 않도록), 같은 키는 한 스레드만
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.last_used = time.monotonic()
+                    entry.uses += 1
+                    return entry.value
+
+            start = time.monotonic()
+            value = loader()
+            entry = _Entry(key, kind, value, pinned, time.monotonic() - start)
+            entry.uses = 1
+            with self._lock:
+                self._entries[key] = entry
+                self.loads += 1
+            memory = f", {entry.memory_bytes / 1024 / 1024:.1f}MB" if entry.memory_bytes is not None else ""
+            print(f"[Model Registry] ✅ 로드: {key} ({entry.load_seconds:.1f}초{memory})")
+            if not pinned:
+                self._ensure_sweeper()
+            return value
+
+    def embedding_model(self, model_name: str, device: Optional[str] = None):
+        """SentenceTransformer 공유 인스턴스"""
+        def load():
+            import torch
+            from sentence_transformers import SentenceTransformer
+            target = device or EMBEDDING_DEVICE or ("cuda" if torch.cuda.is_available() else "cpu")
+            return SentenceTransformer(model_name, device=target)
+
+        return self.get(f"embedding:{model_name}:{device or EMBEDDING_DEVICE or 'auto'}", load, kind="embedding")
+
+    def tokenizer(self, backend: Optional[str] = None):
+        """
+        한국어 토크나이저 공유 인스턴스 (KOREAN_TOKENIZER: okt | simple), 쿼리 토큰화는 LRU 캐시.
+        Okt는 JVM을 쓰므로 내리지 않음
+        """
+        from agent.korean_tokenizer import KOREAN_TOKENIZER, CachedTokenizer, create_tokenizer
+
+        backend = (backend or KOREAN_TOKENIZER).lower()
+        return self.get(f"tokenizer:{backend}", lambda: CachedTokenizer(create_tokenizer(backend)),
+                        kind="tokenizer", pinned=True)
+
+    def chroma_client(self, path: str):
+        """경로별 ChromaDB PersistentClient 공유 인스턴스"""
+        def load():
+            import chromadb
+            from chromadb.config import Settings
+            return chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+
+        return self.get(f"chroma:{os.path.abspath(path)}", load, kind="chroma", pinned=True)
+
+    def evict(self, key: str) -> bool:
+        """key 인스턴스를 레지스트리에서 내림. 사용 중인 호출은 자기 참조로 끝까지 실행됨"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return False
+            self.evictions += 1
+        del entry
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except Exception:
+            pass
+        print(f"[Model Registry] 🧹 유휴 모델 해제: {key}")
+        return True
+
+    def evict_idle(self, now: Optional[float] = None) -> List[str]:
+        """idle_seconds 이상 쓰이지 않은 (고정되지 않은) 인스턴스 해제"""
+        if self.idle_seconds <= 0:
+            return []
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = [key for key, entry in self._entries.items()
+                    if not entry.pinned and now - entry.last_used >= self.idle_seconds]
+        return [key for key in idle if self.evict(key)]
+
+    def _ensure_sweeper(self):
+        if self.idle_seconds <= 0:
+            return
+        with self._lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return
+            self._sweeper = threading.Thread(target=self._sweep, name="model-registry-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _sweep(self):
+        interval = max(5, min(60, self.idle_seconds // 4))
+        while True:
+            time.sleep(interval)
+            self.evict_idle()
+            with self._lock:
+                if not any(not entry.pinned for entry in self._entries.values()):
+                    self._sweeper = None
+                    return
+
+    def snapshot(self) -> Dict[str, Any]:
+        """로드된 인스턴스별 메모리·사용 현황"""
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._entries.values())
+        models = [{
+            "key": entry.key,
+            "kind": entry.kind,
+            "memory_mb": round(entry.memory_bytes / 1024 / 1024, 1) if entry.memory_bytes is not None else None,
+            "load_seconds": round(entry.load_seconds, 2),
+            "uses": entry.uses,
+            "idle_seconds": round(now - entry.last_used, 1),
+            "pinned": entry.pinned,
+        } for entry in entries]
+        return {
+            "idle_eviction_seconds": self.idle_seconds,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "total_memory_mb": round(sum(model["memory_mb"] or 0 for model in models), 1),
+            "models": models,
+        }
+
+
+# 전역 레지스트리
+model_registry = ModelRegistry()
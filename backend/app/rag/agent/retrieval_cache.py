@@ -0,0 +1,151 @@
+"""
+RAG 쿼리 임베딩·검색 결과 캐시
+- 마스킹 결정 경로의 검색 쿼리는 종류가 적고 반복됨 (수신자 유형별·PII 타입별 고정 문장)
+- 쿼리 임베딩: (모델, 정규화된 쿼리) → 벡터. 모델이 같으면 항상 같은 값이라 TTL 없이 LRU만
+- 검색 결과: (검색 종류, 정규화된 쿼리, context, top_k, 인덱스 버전) → 결과 목록. LRU + TTL
+- 가이드·컬렉션이 다시 만들어지면 invalidate()로 세대(generation)를 올려 결과 캐시를 비움
+  (인덱스 버전에 세대가 들어가므로 진행 중이던 검색 결과도 이전 키로만 저장됨)
+"""
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+RAG_CACHE_SIZE = int(os.getenv("RAG_CACHE_SIZE", "512"))
+RAG_CACHE_TTL_SECONDS = int(os.getenv("RAG_CACHE_TTL_SECONDS", "600"))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+
+_MISSING = object()
+
+
+def normalize_query(query: str) -> str:
+    """캐시 키용 쿼리 정규화: 유니코드 NFC + 공백 정리 (대소문자는 임베딩에 영향이 있어 유지)"""
+    return unicodedata.normalize("NFC", " ".join((query or "").split()))
+
+
+def context_key(context: Optional[Dict[str, Any]]) -> str:
+    """context dict를 순서와 무관한 문자열 키로"""
+    if not context:
+        return ""
+    return json.dumps(context, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class TTLCache:
+    """스레드 안전 LRU 캐시 (ttl_seconds > 0이면 항목 만료)"""
+
+    def __init__(self, maxsize: int, ttl_seconds: int = 0):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING or (self.ttl_seconds > 0 and time.monotonic() - item[0] > self.ttl_seconds):
+                if item is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute: Callable[[], Any]):
+        """캐시에 있으면 반환, 없으면 compute() 결과를 저장 후 반환 (compute는 잠금 밖에서 실행)"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._data)
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class RetrievalCache:
+    """프로세스 공용 쿼리 임베딩·검색 결과 캐시"""
+
+    def __init__(self):
+        self.embeddings = TTLCache(QUERY_EMBEDDING_CACHE_SIZE)
+        self.results = TTLCache(RAG_CACHE_SIZE, RAG_CACHE_TTL_SECONDS)
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def embed(self, model_name: str, query: str, encode: Callable[[str], Any]):
+        """정규화된 쿼리의 임베딩 (읽기 전용 배열로 공유)"""
+        normalized = normalize_query(query)
+
+        def compute():
+            vector = encode(normalized)
+            if hasattr(vector, "setflags"):
+                vector.setflags(write=False)
+            return vector
+
+        return self.embeddings.get_or_compute((model_name, normalized), compute)
+
+    def embed_many(self, model_name: str, queries: List[str], encode_batch: Callable[[List[str]], List[Any]]):
+        """여러 쿼리의 임베딩 (입력 순서대로). 캐시에 없는 쿼리만 중복 없이 모아 encode_batch 한 번으로 계산"""
+        normalized = [normalize_query(query) for query in queries]
+        vectors = {}
+        missing = []
+        for text in dict.fromkeys(normalized):
+            vector = self.embeddings.get((model_name, text))
+            if vector is None:
+                missing.append(text)
+            else:
+                vectors[text] = vector
+
+        if missing:
+            for text, vector in zip(missing, encode_batch(missing)):
+                if hasattr(vector, "setflags"):
+                    vector.setflags(write=False)
+                self.embeddings.set((model_name, text), vector)
+                vectors[text] = vector
+        return [vectors[text] for text in normalized]
+
+    def invalidate(self, reason: str = ""):
+        """가이드·컬렉션 재구축 시 호출: 세대를 올리고 결과 캐시를 비움"""
+        with self._lock:
+            self.generation += 1
+        self.results.clear()
+        print(f"[RAG Cache] 🔄 검색 결과 캐시 무효화{f' ({reason})' if reason else ''} → 세대 {self.generation}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "generation": self.generation,
+            "query_embeddings": self.embeddings.stats(),
+            "results": self.results.stats(),
+        }
+
+
+# 전역 캐시
+retrieval_cache = RetrievalCache()
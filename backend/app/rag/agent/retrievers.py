@@ -6,16 +6,35 @@
 """
 import os
 import json
-import pickle
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-from konlpy.tag import Okt
+import threading
+import time
 from rank_bm25 import BM25Okapi
-import torch
-from typing import List, Dict, Any, Optional
+import numpy as np
+from typing import List, Dict, Any, NamedTuple, Optional
 from collections import defaultdict
 
+from agent.guide_embeddings import GuideEmbeddingStore
+from agent.guide_index import GuideIndex, top_k_indices
+from agent.korean_tokenizer import TokenizedCorpusStore
+from agent.model_registry import model_registry
+from agent.retrieval_cache import context_key, normalize_query, retrieval_cache
+from agent.sparse_bm25 import filter_candidates, load_or_convert
+
+EMBEDDING_MODEL_NAME = 'upskyy/e5-base-korean'
+# 가이드 하이브리드 점수를 계산할 후보 수 (벡터·BM25·context 필터별 상위 N개)
+GUIDE_CANDIDATES = int(os.getenv("GUIDE_CANDIDATES", "50"))
+# application_guides.jsonl 변경(mtime·크기) 확인 간격
+GUIDES_RELOAD_CHECK_SECONDS = int(os.getenv("GUIDES_RELOAD_CHECK_SECONDS", "5"))
+
+
+class GuideSet(NamedTuple):
+    """한 번에 교체되는 애플리케이션 가이드 검색 상태"""
+    guides: List[Dict[str, Any]]
+    corpus: List[str]
+    bm25: Optional[BM25Okapi]
+    index: Optional[GuideIndex]
+    version: Optional[str]
+
 
 class HybridRetriever:
     """하이브리드 검색기 - BM25 + Vector Search"""
@@ -23,23 +42,16 @@ class HybridRetriever:
     def __init__(self, index_base_path='./data/staging'):
         print("✅ Hybrid Retriever 초기화 중...")
         self.index_base_path = index_base_path
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-
-        # 임베딩 모델 및 토크나이저
-        self.model = SentenceTransformer('upskyy/e5-base-korean', device=device)
-        self.tokenizer = Okt()
-
-        # ChromaDB 클라이언트
-        chroma_db_path = os.path.join(index_base_path, 'chroma_db')
-        self.client = chromadb.PersistentClient(
-            path=chroma_db_path,
-            settings=Settings(anonymized_telemetry=False)
-        )
-
-        # Application Guides 로드 (JSONL)
-        self.guides = []
-        self.guides_corpus = []
-        self.guides_bm25 = None
+
+        # 임베딩 모델·토크나이저·ChromaDB 클라이언트는 프로세스 공용 레지스트리에서 공유
+        self.tokenizer = model_registry.tokenizer()
+        self.client = model_registry.chroma_client(os.path.join(index_base_path, 'chroma_db'))
+
+        # Application Guides 로드 (JSONL) - 파일이 바뀌면 검색 시 다시 로드
+        self.guides_path = os.path.join(index_base_path, 'application_guides.jsonl')
+        self.guide_set = GuideSet([], [], None, None, None)
+        self._guides_checked_at = time.monotonic()
+        self._reload_lock = threading.Lock()
         self._load_application_guides()
 
         # A_cases BM25 인덱스 로드
@@ -50,44 +62,106 @@ class HybridRetriever:
 
         print("🎉 Hybrid Retriever 초기화 완료.")
 
-    def _load_application_guides(self):
-        """애플리케이션 가이드 로드 및 BM25 인덱스 생성"""
-        guides_path = os.path.join(self.index_base_path, 'application_guides.jsonl')
+    @property
+    def model(self):
+        """임베딩 모델 (유휴 해제됐으면 레지스트리가 다시 로드)"""
+        return model_registry.embedding_model(EMBEDDING_MODEL_NAME)
 
-        if not os.path.exists(guides_path):
-            print(f"⚠️ 애플리케이션 가이드를 찾을 수 없습니다: {guides_path}")
+    @property
+    def guides(self) -> List[Dict[str, Any]]:
+        return self.guide_set.guides
+
+    @property
+    def index_version(self) -> str:
+        """검색 결과 캐시 키용 인덱스 버전 (가이드 파일 버전 + 캐시 세대)"""
+        return f"{self.guide_set.version}:{retrieval_cache.generation}"
+
+    def _guides_file_version(self) -> Optional[str]:
+        try:
+            stat = os.stat(self.guides_path)
+        except OSError:
+            return None
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def _load_application_guides(self):
+        """애플리케이션 가이드 로드 및 BM25 인덱스 생성 (다 만든 뒤 guide_set을 한 번에 교체)"""
+        version = self._guides_file_version()
+        if version is None:
+            print(f"⚠️ 애플리케이션 가이드를 찾을 수 없습니다: {self.guides_path}")
             return
 
+        guides = []
+        corpus = []
         try:
-            with open(guides_path, 'r', encoding='utf-8') as f:
+            with open(self.guides_path, 'r', encoding='utf-8') as f:
                 for line in f:
                     guide = json.loads(line.strip())
-                    self.guides.append(guide)
+                    guides.append(guide)
 
                     # 검색용 텍스트 생성: scenario + interpretation + keywords
                     search_text = f"{guide['scenario']} {guide['interpretation']} {' '.join(guide['keywords'])}"
-                    self.guides_corpus.append(search_text)
-
-            # BM25 인덱스 생성
-            if self.guides_corpus:
-                tokenized_corpus = [self.tokenizer.morphs(text) for text in self.guides_corpus]
-                self.guides_bm25 = BM25Okapi(tokenized_corpus)
-                print(f"   - 애플리케이션 가이드 {len(self.guides)}개 로드 및 BM25 인덱스 생성 완료.")
+                    corpus.append(search_text)
+
+            # BM25 인덱스 생성 (토큰화 결과는 저장해 두고 바뀐 가이드만 다시 토큰화)
+            if corpus:
+                tokenized_corpus = TokenizedCorpusStore(self.guides_path, self.tokenizer).load(corpus)
+                bm25 = BM25Okapi(tokenized_corpus)
+                print(f"   - 애플리케이션 가이드 {len(guides)}개 로드 및 BM25 인덱스 생성 완료.")
+
+                # 가이드 임베딩: 저장된 행렬 재사용, 바뀐 가이드만 다시 임베딩 (그때만 모델 로드)
+                store = GuideEmbeddingStore(self.guides_path, lambda: self.model, EMBEDDING_MODEL_NAME)
+                embeddings = store.load(corpus)
+                self.guide_set = GuideSet(guides, corpus, bm25, GuideIndex(guides, embeddings), version)
+            else:
+                self.guide_set = GuideSet([], [], None, None, version)
         except Exception as e:
             print(f"   - 🚨 애플리케이션 가이드 로드 실패: {e}")
 
+    def reload_application_guides(self):
+        """가이드를 다시 로드하고 검색 결과 캐시를 무효화"""
+        with self._reload_lock:
+            self._load_application_guides()
+        retrieval_cache.invalidate("application_guides 재로드")
+
+    def _reload_guides_if_changed(self):
+        """
+        GUIDES_RELOAD_CHECK_SECONDS마다 가이드 파일이 바뀌었는지 확인 (mtime·크기).
+        다른 스레드가 이미 다시 로드 중이면 기다리지 않고 이전 가이드로 검색
+        """
+        now = time.monotonic()
+        if now - self._guides_checked_at < GUIDES_RELOAD_CHECK_SECONDS:
+            return
+        self._guides_checked_at = now
+        version = self._guides_file_version()
+        if version is None or version == self.guide_set.version:
+            return
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            print("   - 애플리케이션 가이드 변경 감지 → 다시 로드")
+            self._load_application_guides()
+        finally:
+            self._reload_lock.release()
+        retrieval_cache.invalidate("application_guides 변경")
+
+    def _embed_queries(self, queries: List[str]) -> List[np.ndarray]:
+        """L2 정규화된 쿼리 임베딩 (프로세스 공용 캐시, 캐시에 없는 쿼리는 한 번의 배치로 인코딩)"""
+        def encode_batch(texts: List[str]) -> List[np.ndarray]:
+            matrix = self.model.encode(texts, normalize_embeddings=True)
+            return [np.array(row) for row in matrix]
+
+        return retrieval_cache.embed_many(EMBEDDING_MODEL_NAME, queries, encode_batch)
+
     def _load_a_cases_index(self):
-        """A_cases BM25 인덱스 로드"""
-        index_path = os.path.join(self.index_base_path, 'bm25/A_cases_bm25.pkl')
+        """A_cases BM25 인덱스 로드 (희소 행렬 .npz, 없으면 기존 .pkl 변환)"""
         try:
-            with open(index_path, 'rb') as f:
-                data = pickle.load(f)
-                self.bm25_A = data['bm25']
-                self.documents_A = data['documents']
-                self.meta_index_A = data['meta_index']
+            index = load_or_convert(self.index_base_path, 'A_cases', self.tokenizer.name)
+            self.bm25_A = index.bm25
+            self.documents_A = index.documents
+            self.meta_index_A = index.meta_index
             print(f"   - A_cases 인덱스 로드 완료 ({len(self.documents_A)}개 문서).")
         except FileNotFoundError:
-            print(f"   - ⚠️ A_cases BM25 인덱스를 찾을 수 없습니다: {index_path}")
+            print(f"   - ⚠️ A_cases BM25 인덱스를 찾을 수 없습니다: {os.path.join(self.index_base_path, 'bm25')}")
         except Exception as e:
             print(f"   - 🚨 A_cases 인덱스 로드 실패: {e}")
 
@@ -101,118 +175,179 @@ class HybridRetriever:
         """
         애플리케이션 가이드 검색 (최우선)
         - BM25와 Vector 검색을 결합한 하이브리드 검색
+        - 같은 (정규화된 쿼리, context, top_k, 인덱스 버전)은 결과 캐시에서 반환
         """
-        if not self.guides:
-            return []
+        return self.search_application_guides_batch([query], context, top_k, use_hybrid)[0]
 
-        results = []
+    def search_application_guides_batch(
+        self,
+        queries: List[str],
+        context: Optional[Dict[str, Any]] = None,
+        top_k: int = 3,
+        use_hybrid: bool = True
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        여러 쿼리의 애플리케이션 가이드 검색 (같은 context, 쿼리 순서대로 결과 목록)
+        - 결과 캐시에 없는 쿼리만 모아 임베딩을 한 번의 배치로 계산한 뒤 쿼리별 하이브리드 점수 계산
+        """
+        self._reload_guides_if_changed()
+        guide_set = self.guide_set
+        if not guide_set.guides or guide_set.index is None:
+            return [[] for _ in queries]
+
+        queries = [normalize_query(query) for query in queries]
+        version = f"{guide_set.version}:{retrieval_cache.generation}"
+        keys = [('guides', query, context_key(context), top_k, use_hybrid, version) for query in queries]
+        results = [retrieval_cache.results.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            embeddings = self._embed_queries([queries[i] for i in missing])
+            for i, query_embedding in zip(missing, embeddings):
+                results[i] = self._search_application_guides(
+                    guide_set, queries[i], query_embedding, context, top_k, use_hybrid
+                )
+                retrieval_cache.results.set(keys[i], results[i])
+        return [[dict(result) for result in query_results] for query_results in results]
+
+    def _search_application_guides(
+        self,
+        guide_set: "GuideSet",
+        query: str,
+        query_embedding: np.ndarray,
+        context: Optional[Dict[str, Any]],
+        top_k: int,
+        use_hybrid: bool
+    ) -> List[Dict[str, Any]]:
+        guides, index = guide_set.guides, guide_set.index
 
         # 1. BM25 검색
-        bm25_scores = {}
-        if self.guides_bm25 and use_hybrid:
+        bm25_scores = None
+        if guide_set.bm25 and use_hybrid:
             tokenized_query = self.tokenizer.morphs(query)
-            bm25_raw_scores = self.guides_bm25.get_scores(tokenized_query)
-            bm25_scores = {i: score for i, score in enumerate(bm25_raw_scores)}
-
-        # 2. Vector 검색 (의미 기반)
-        query_embedding = self.model.encode(query)
-        guide_embeddings = self.model.encode(self.guides_corpus)
-
-        # 코사인 유사도 계산
-        from sklearn.metrics.pairwise import cosine_similarity
-        import numpy as np
-        vector_scores = cosine_similarity([query_embedding], guide_embeddings)[0]
-
-        # 3. 하이브리드 스코어 계산 (RRF - Reciprocal Rank Fusion 간소화 버전)
-        combined_scores = {}
-        for i in range(len(self.guides)):
-            bm25_score = bm25_scores.get(i, 0) if use_hybrid else 0
-            vector_score = vector_scores[i]
-
-            # 가중치 조합 (Vector에 더 높은 가중치)
-            combined_scores[i] = 0.3 * bm25_score + 0.7 * vector_score
-
-            # Context 필터링 (옵션)
-            if context:
-                guide = self.guides[i]
-                guide_context = guide.get('context', {})
-
-                # 발신자/수신자 타입 일치 시 보너스
-                if context.get('sender_type') == guide_context.get('sender_type'):
-                    combined_scores[i] *= 1.2
-                if context.get('receiver_type') == guide_context.get('receiver_type'):
-                    combined_scores[i] *= 1.2
+            bm25_scores = np.asarray(guide_set.bm25.get_scores(tokenized_query), dtype=np.float32)
 
-        # 4. 상위 K개 선택
-        sorted_indices = sorted(combined_scores.keys(), key=lambda x: combined_scores[x], reverse=True)[:top_k]
+        # 2. Vector 검색 (의미 기반) - 후보 선택
+        # 가이드 임베딩은 로드 시 정규화해 두었으므로 행렬 × 쿼리 벡터가 코사인 유사도
+        candidates = self._guide_candidates(index, query_embedding, bm25_scores, context, top_k)
+
+        # 3. 하이브리드 스코어 계산 (후보만, Vector에 더 높은 가중치)
+        vector_scores = index.score(query_embedding, candidates)
+        combined_scores = 0.7 * vector_scores
+        if bm25_scores is not None:
+            combined_scores += 0.3 * bm25_scores[candidates]
 
-        for idx in sorted_indices:
+        # Context 필터링 (옵션): 발신자/수신자 타입 일치 시 보너스
+        combined_scores *= index.context_multiplier(candidates, context)
+
+        # 4. 상위 K개 선택
+        results = []
+        for position in top_k_indices(combined_scores, top_k):
+            idx = candidates[position]
             results.append({
-                'guide_id': self.guides[idx]['guide_id'],
-                'score': combined_scores[idx],
+                'guide_id': guides[idx]['guide_id'],
+                'score': float(combined_scores[position]),
                 'source': 'application_guides',
-                'content': self.guides[idx],
+                'content': guides[idx],
                 'metadata': {
-                    'scenario': self.guides[idx]['scenario'],
-                    'actionable_directive': self.guides[idx]['actionable_directive']
+                    'scenario': guides[idx]['scenario'],
+                    'actionable_directive': guides[idx]['actionable_directive']
                 }
             })
 
         return results
 
+    @staticmethod
+    def _guide_candidates(
+        index: GuideIndex,
+        query_embedding: np.ndarray,
+        bm25_scores: Optional[np.ndarray],
+        context: Optional[Dict[str, Any]],
+        top_k: int
+    ) -> np.ndarray:
+        """
+        하이브리드 점수를 계산할 가이드 후보 (행 번호)
+        - 벡터 상위, BM25 상위, context(발신자/수신자 타입)로 필터링한 벡터 상위의 합집합
+        - 가이드 수가 후보 수 이하면 전체
+        """
+        limit = max(GUIDE_CANDIDATES, top_k)
+        if index.size <= limit:
+            return np.arange(index.size)
+
+        parts = [index.search(query_embedding, limit)]
+        if bm25_scores is not None:
+            parts.append(top_k_indices(bm25_scores, limit))
+        if context:
+            sender = {'sender_type': context.get('sender_type')}
+            receiver = {'receiver_type': context.get('receiver_type')}
+            for where in (sender, receiver, {**sender, **receiver}):
+                parts.append(index.search(query_embedding, limit, where=where))
+        return np.unique(np.concatenate(parts))
+
     def search_laws_and_policies(self, query: str, top_k: int = 5) -> Dict[str, List[Dict[str, Any]]]:
         """
         법률 및 정책 검색 (Vector Search)
+        - 같은 (정규화된 쿼리, top_k, 인덱스 버전)은 결과 캐시에서 반환 (컬렉션 검색이 실패한 결과는 저장하지 않음)
         """
-        results = {'laws': [], 'policies': []}
+        return self.search_laws_and_policies_batch([query], top_k)[0]
 
-        try:
-            query_embedding = self.model.encode(query).tolist()
-
-            # C_laws 검색
-            try:
-                collection_laws = self.client.get_collection('C_laws')
-                laws_results = collection_laws.query(
-                    query_embeddings=[query_embedding],
-                    n_results=top_k,
-                    include=["metadatas", "documents", "distances"]
-                )
-
-                for i, doc_id in enumerate(laws_results['ids'][0]):
-                    results['laws'].append({
-                        'id': doc_id,
-                        'score': 1 - laws_results['distances'][0][i],
-                        'source': 'C_laws',
-                        'content': laws_results['documents'][0][i],
-                        'metadata': laws_results['metadatas'][0][i]
-                    })
-            except Exception as e:
-                print(f"⚠️ C_laws 검색 실패: {e}")
-
-            # B_policies 검색
-            try:
-                collection_policies = self.client.get_collection('B_policies')
-                policies_results = collection_policies.query(
-                    query_embeddings=[query_embedding],
-                    n_results=top_k,
-                    include=["metadatas", "documents", "distances"]
-                )
+    def search_laws_and_policies_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5
+    ) -> List[Dict[str, List[Dict[str, Any]]]]:
+        """
+        여러 쿼리의 법률 및 정책 검색 (쿼리 순서대로 결과)
+        - 결과 캐시에 없는 쿼리만 모아 임베딩 배치 1회 + 컬렉션별 다중 쿼리 1회
+        """
+        queries = [normalize_query(query) for query in queries]
+        version = self.index_version
+        results = [retrieval_cache.results.get(('laws_policies', query, top_k, version)) for query in queries]
+        pending = list(dict.fromkeys(query for query, result in zip(queries, results) if result is None))
+        if pending:
+            fetched, complete = self._query_laws_and_policies(pending, top_k)
+            if complete:
+                for query, result in zip(pending, fetched):
+                    retrieval_cache.results.set(('laws_policies', query, top_k, version), result)
+            by_query = dict(zip(pending, fetched))
+            results = [by_query[query] if result is None else result for query, result in zip(queries, results)]
+        return [{name: [dict(item) for item in items] for name, items in result.items()} for result in results]
+
+    def _query_laws_and_policies(self, queries: List[str], top_k: int):
+        """C_laws·B_policies 컬렉션에 쿼리 전체를 한 번씩 질의. (쿼리별 결과, 모든 컬렉션 검색 성공 여부)"""
+        results = [{'laws': [], 'policies': []} for _ in queries]
+        complete = True
 
-                for i, doc_id in enumerate(policies_results['ids'][0]):
-                    results['policies'].append({
-                        'id': doc_id,
-                        'score': 1 - policies_results['distances'][0][i],
-                        'source': 'B_policies',
-                        'content': policies_results['documents'][0][i],
-                        'metadata': policies_results['metadatas'][0][i]
-                    })
-            except Exception as e:
-                print(f"⚠️ B_policies 검색 실패: {e}")
+        try:
+            # 컬렉션은 코사인 공간이라 정규화된 쿼리 벡터로도 거리가 같음
+            query_embeddings = [embedding.tolist() for embedding in self._embed_queries(queries)]
+
+            for name, collection_name in (('laws', 'C_laws'), ('policies', 'B_policies')):
+                try:
+                    collection = self.client.get_collection(collection_name)
+                    raw = collection.query(
+                        query_embeddings=query_embeddings,
+                        n_results=top_k,
+                        include=["metadatas", "documents", "distances"]
+                    )
+
+                    for q, result in enumerate(results):
+                        for i, doc_id in enumerate(raw['ids'][q]):
+                            result[name].append({
+                                'id': doc_id,
+                                'score': 1 - raw['distances'][q][i],
+                                'source': collection_name,
+                                'content': raw['documents'][q][i],
+                                'metadata': raw['metadatas'][q][i]
+                            })
+                except Exception as e:
+                    complete = False
+                    print(f"⚠️ {collection_name} 검색 실패: {e}")
 
         except Exception as e:
+            complete = False
             print(f"🚨 법률/정책 검색 실패: {e}")
 
-        return results
+        return results, complete
 
     def search_cases(
         self,
@@ -227,30 +362,22 @@ class HybridRetriever:
             return []
 
         # 필터링
-        candidate_indices = set(range(len(self.documents_A)))
-        if filters:
-            for field, value in filters.items():
-                if field in self.meta_index_A and value in self.meta_index_A[field]:
-                    candidate_indices.intersection_update(self.meta_index_A[field][value])
-                else:
-                    return []
-
-        if not candidate_indices:
+        candidates = filter_candidates(self.meta_index_A, filters)
+        if candidates is not None and candidates.size == 0:
             return []
 
-        # BM25 검색
+        # BM25 검색 (후보 문서만 점수 계산)
         tokenized_query = self.tokenizer.morphs(query)
-        doc_scores = self.bm25_A.get_scores(tokenized_query)
-
-        candidate_scores = {idx: doc_scores[idx] for idx in candidate_indices}
-        sorted_indices = sorted(candidate_scores, key=candidate_scores.get, reverse=True)[:top_k]
+        candidate_scores = self.bm25_A.get_scores(tokenized_query, candidates)
+        top = top_k_indices(candidate_scores, top_k)
+        sorted_indices = top if candidates is None else candidates[top]
 
         results = []
-        for idx in sorted_indices:
+        for position, idx in zip(top, sorted_indices):
             doc = self.documents_A[idx]
             results.append({
                 'id': doc.get('case_id', 'N/A'),
-                'score': candidate_scores[idx],
+                'score': float(candidate_scores[position]),
                 'source': 'A_cases',
                 'content': doc.get('before_text', '') + ' -> ' + doc.get('after_text', ''),
                 'metadata': doc
@@ -0,0 +1,256 @@
+"""
+희소 행렬 BM25 인덱스 (A_cases)
+- rank_bm25.BM25Okapi와 같은 점수를 CSR 용어-문서 행렬(행: 용어, 열: 문서)로 계산
+- 각 칸에는 BM25 가중치 idf·tf·(k1+1) / (tf + k1·(1-b+b·dl/avgdl))를 미리 계산해 저장
+  → 쿼리 점수는 쿼리 용어 행의 가중치 합
+- 메타데이터 필터로 좁힌 후보 문서만 점수 계산 (get_scores(..., candidates))
+- 저장 형식: 버전이 있는 .npz (pickle 없음, allow_pickle=False로 로드)
+
+    bm25/A_cases_bm25.npz    format_version, params[k1, b, epsilon, avgdl], vocab(정렬), indptr, doc_ids, weights,
+                             documents(JSON), meta_index(JSON [필드, 값, 문서 목록]), tokenizer(JSON, 토크나이저 이름)
+
+기존 bm25/A_cases_bm25.pkl만 있으면 로드할 때 한 번 변환해 .npz를 옆에 저장합니다 (Okt로 만든 인덱스).
+쿼리는 인덱스를 만든 토크나이저로 토큰화해야 하므로, load_or_convert에 현재 토크나이저 이름을 넘기면
+다를 때 ValueError를 냅니다 (같은 KOREAN_TOKENIZER로 scripts/hybrid/build_bm25.py를 다시 실행).
+"""
+import json
+import math
+import os
+import pickle
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+FORMAT_VERSION = 1
+# 후보 수 × 이 값이 포스팅 길이보다 작으면 이진 탐색, 아니면 위치 표로 계산
+_SEARCH_RATIO = 16
+
+
+class SparseBM25:
+    """BM25Okapi 호환 CSR 점수 계산기"""
+
+    def __init__(self, vocab: np.ndarray, indptr: np.ndarray, doc_ids: np.ndarray, weights: np.ndarray,
+                 doc_count: int, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25, avgdl: float = 0.0):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.doc_count = doc_count
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.avgdl = avgdl
+
+    @classmethod
+    def from_doc_freqs(cls, doc_freqs: List[Dict[str, int]], doc_len: List[int], idf: Dict[str, float],
+                       k1: float, b: float, epsilon: float, avgdl: float) -> "SparseBM25":
+        """문서별 용어 빈도와 idf로 가중치 행렬 생성 (BM25Okapi 내부 상태와 같은 입력)"""
+        postings = defaultdict(list)
+        for doc_id, freqs in enumerate(doc_freqs):
+            norm = k1 * (1 - b + b * doc_len[doc_id] / avgdl) if avgdl else k1
+            for term, tf in freqs.items():
+                weight = (idf.get(term) or 0) * tf * (k1 + 1) / (tf + norm)
+                postings[term].append((doc_id, weight))
+
+        vocab = sorted(postings)
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        for i, term in enumerate(vocab):
+            indptr[i + 1] = indptr[i] + len(postings[term])
+        doc_ids = np.empty(indptr[-1], dtype=np.int32)
+        weights = np.empty(indptr[-1], dtype=np.float32)
+        for i, term in enumerate(vocab):
+            entries = postings[term]  # 문서 순서로 추가되어 이미 정렬됨
+            doc_ids[indptr[i]:indptr[i + 1]] = [doc_id for doc_id, _ in entries]
+            weights[indptr[i]:indptr[i + 1]] = [weight for _, weight in entries]
+
+        return cls(np.array(vocab, dtype=str), indptr, doc_ids, weights, len(doc_freqs), k1, b, epsilon, avgdl)
+
+    @classmethod
+    def from_tokenized(cls, tokenized_corpus: List[List[str]], k1: float = 1.5, b: float = 0.75,
+                       epsilon: float = 0.25) -> "SparseBM25":
+        """토큰화된 말뭉치로 생성 (idf·avgdl 계산은 rank_bm25.BM25Okapi와 동일)"""
+        doc_freqs = [Counter(tokens) for tokens in tokenized_corpus]
+        doc_len = [len(tokens) for tokens in tokenized_corpus]
+        avgdl = sum(doc_len) / len(doc_len) if doc_len else 0.0
+
+        document_frequency = Counter()
+        for freqs in doc_freqs:
+            document_frequency.update(freqs.keys())
+        corpus_size = len(doc_freqs)
+        idf = {}
+        negative = []
+        for term, freq in document_frequency.items():
+            idf[term] = math.log(corpus_size - freq + 0.5) - math.log(freq + 0.5)
+            if idf[term] < 0:
+                negative.append(term)
+        if idf:
+            floor = epsilon * sum(idf.values()) / len(idf)
+            for term in negative:
+                idf[term] = floor
+
+        return cls.from_doc_freqs(doc_freqs, doc_len, idf, k1, b, epsilon, avgdl)
+
+    @classmethod
+    def from_okapi(cls, bm25) -> "SparseBM25":
+        """기존 pickle의 BM25Okapi 객체에서 변환"""
+        return cls.from_doc_freqs(bm25.doc_freqs, bm25.doc_len, bm25.idf, bm25.k1, bm25.b,
+                                  bm25.epsilon, bm25.avgdl)
+
+    def _term_rows(self, query_tokens: Iterable[str]):
+        """쿼리 용어 → (행 번호, 쿼리 내 등장 횟수). 사전에 없는 용어는 점수 0이라 제외"""
+        counts = Counter(query_tokens)
+        if not counts or self.vocab.size == 0:
+            return []
+        terms = np.array(list(counts), dtype=str)
+        rows = np.searchsorted(self.vocab, terms)
+        found = rows < self.vocab.size
+        found[found] = self.vocab[rows[found]] == terms[found]
+        return [(int(row), counts[term]) for row, term, hit in zip(rows, terms.tolist(), found) if hit]
+
+    def get_scores(self, query_tokens: Iterable[str], candidates: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        BM25 점수. candidates(정렬된 문서 번호 배열)가 있으면 그 문서들만 계산해 같은 순서로 반환,
+        없으면 전체 문서 점수 (BM25Okapi.get_scores와 같은 값)
+        """
+        term_rows = self._term_rows(query_tokens)
+        if candidates is None:
+            scores = np.zeros(self.doc_count, dtype=np.float32)
+            for row, count in term_rows:
+                start, end = self.indptr[row], self.indptr[row + 1]
+                scores[self.doc_ids[start:end]] += count * self.weights[start:end]
+            return scores
+
+        scores = np.zeros(candidates.size, dtype=np.float32)
+        if candidates.size == 0:
+            return scores
+        slots = None
+        for row, count in term_rows:
+            start, end = self.indptr[row], self.indptr[row + 1]
+            docs = self.doc_ids[start:end]
+            if candidates.size * _SEARCH_RATIO < docs.size:
+                # 후보가 포스팅보다 훨씬 적으면 포스팅에서 후보를 이진 탐색
+                positions = np.minimum(np.searchsorted(docs, candidates), docs.size - 1)
+                hit = docs[positions] == candidates
+                scores[hit] += count * self.weights[start:end][positions[hit]]
+            else:
+                # 아니면 문서 번호 → 후보 위치 표를 한 번 만들어 포스팅을 그대로 흩뿌림
+                if slots is None:
+                    slots = np.full(self.doc_count, -1, dtype=np.int64)
+                    slots[candidates] = np.arange(candidates.size)
+                positions = slots[docs]
+                hit = positions >= 0
+                scores[positions[hit]] += count * self.weights[start:end][hit]
+        return scores
+
+
+class BM25Index(NamedTuple):
+    """A_cases 통합 인덱스 (점수 계산기 + 문서 + 메타데이터 역색인)"""
+    bm25: SparseBM25
+    documents: List[Dict[str, Any]]
+    meta_index: Dict[str, Dict[Any, List[int]]]
+    tokenizer: Optional[str] = None  # 말뭉치를 토큰화한 백엔드 이름 (okt | simple, 모르면 None)
+
+
+def _json_array(value) -> np.ndarray:
+    return np.frombuffer(json.dumps(value, ensure_ascii=False).encode('utf-8'), dtype=np.uint8)
+
+
+def save_index(path: str, index: BM25Index):
+    """버전 있는 .npz로 저장 (임시 파일에 쓴 뒤 교체)"""
+    bm25 = index.bm25
+    # JSON 객체 키는 문자열만 되므로 (필드, 값, 문서 목록)으로 풀어 값의 타입(정수 점수 등)을 보존
+    meta_entries = [[field, value, list(rows)] for field, values in index.meta_index.items()
+                    for value, rows in values.items()]
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                format_version=np.array([FORMAT_VERSION]),
+                params=np.array([bm25.k1, bm25.b, bm25.epsilon, bm25.avgdl], dtype=np.float64),
+                doc_count=np.array([bm25.doc_count]),
+                vocab=bm25.vocab,
+                indptr=bm25.indptr,
+                doc_ids=bm25.doc_ids,
+                weights=bm25.weights,
+                documents=_json_array(index.documents),
+                meta_index=_json_array(meta_entries),
+                tokenizer=_json_array(index.tokenizer),
+            )
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_index(path: str) -> BM25Index:
+    """save_index로 저장한 .npz 로드. 형식 버전이 다르면 ValueError"""
+    with np.load(path, allow_pickle=False) as data:
+        version = int(data['format_version'][0])
+        if version != FORMAT_VERSION:
+            raise ValueError(f"지원하지 않는 BM25 인덱스 형식 버전: {version} (필요: {FORMAT_VERSION})")
+        k1, b, epsilon, avgdl = (float(value) for value in data['params'])
+        bm25 = SparseBM25(data['vocab'], data['indptr'], data['doc_ids'], data['weights'],
+                          int(data['doc_count'][0]), k1, b, epsilon, avgdl)
+        documents = json.loads(data['documents'].tobytes().decode('utf-8'))
+        meta_entries = json.loads(data['meta_index'].tobytes().decode('utf-8'))
+        # 토크나이저 이름을 기록하기 전에 저장한 인덱스는 None
+        tokenizer = json.loads(data['tokenizer'].tobytes().decode('utf-8')) if 'tokenizer' in data.files else None
+
+    meta_index = {}
+    for field, value, rows in meta_entries:
+        meta_index.setdefault(field, {})[value] = rows
+    return BM25Index(bm25, documents, meta_index, tokenizer)
+
+
+def load_or_convert(index_base_path: str, name: str = 'A_cases', tokenizer: Optional[str] = None) -> BM25Index:
+    """
+    bm25/<name>_bm25.npz 로드. 없거나 형식이 다르면 기존 <name>_bm25.pkl(BM25Okapi)을 변환해 저장 후 반환.
+    둘 다 없으면 FileNotFoundError.
+    tokenizer(검색에 쓸 토크나이저 이름)가 인덱스를 만든 토크나이저와 다르면 ValueError, 인덱스에 기록이 없으면 경고만
+    """
+    index = _load_or_convert(index_base_path, name)
+    if tokenizer is not None:
+        if index.tokenizer is None:
+            print(f"   - ⚠️ {name} BM25 인덱스에 토크나이저 기록이 없습니다. "
+                  f"{tokenizer}로 만든 인덱스가 아니면 build_bm25.py를 다시 실행하세요.")
+        elif index.tokenizer != tokenizer:
+            raise ValueError(f"{name} BM25 인덱스는 {index.tokenizer} 토크나이저로 만들어졌습니다 "
+                             f"(현재 KOREAN_TOKENIZER={tokenizer}). 같은 토크나이저로 build_bm25.py를 다시 실행하세요.")
+    return index
+
+
+def _load_or_convert(index_base_path: str, name: str) -> BM25Index:
+    npz_path = os.path.join(index_base_path, 'bm25', f'{name}_bm25.npz')
+    pkl_path = os.path.join(index_base_path, 'bm25', f'{name}_bm25.pkl')
+    if os.path.exists(npz_path):
+        try:
+            return load_index(npz_path)
+        except (ValueError, KeyError) as e:
+            if not os.path.exists(pkl_path):
+                raise
+            print(f"   - ⚠️ {npz_path} 다시 변환: {e}")
+
+    with open(pkl_path, 'rb') as f:
+        data = pickle.load(f)
+    # .pkl은 Okt만 쓰던 이전 빌드 스크립트가 만든 인덱스
+    index = BM25Index(SparseBM25.from_okapi(data['bm25']), data['documents'], data['meta_index'], 'okt')
+    try:
+        save_index(npz_path, index)
+        print(f"   - BM25 인덱스를 희소 행렬 형식으로 변환했습니다: {npz_path}")
+    except OSError as e:
+        print(f"   - ⚠️ 변환한 BM25 인덱스 저장 실패 (메모리에서만 사용): {e}")
+    return index
+
+
+def filter_candidates(meta_index: Dict[str, Dict[Any, List[int]]],
+                      filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+    """메타데이터 필터(AND)에 맞는 문서 번호 (정렬). 필터가 없으면 None (전체 문서)"""
+    candidates = None
+    for field, value in (filters or {}).items():
+        if field not in meta_index or value not in meta_index[field]:
+            return np.empty(0, dtype=np.int64)
+        rows = np.unique(np.asarray(meta_index[field][value], dtype=np.int64))
+        candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+    return candidates
@@ -0,0 +1,171 @@
+"""
+A_cases BM25 인덱스 벤치마크: 기존 pickle(BM25Okapi) vs 희소 행렬 .npz(agent/sparse_bm25.py)
+- 로드 시간, 파일 크기
+- 쿼리 지연: 필터 없음 / 필터 1개 / 필터 2개 (기존: 전체 get_scores + 후보 dict + 전체 정렬,
+  새 방식: 후보 문서만 점수 계산 + argpartition)
+- 결과 일치: 상위 K 문서 일치율, 점수 최대 오차
+
+실행 방법 (app/rag 디렉토리에서, rank_bm25 필요):
+    # 실제 인덱스 (data/staging/bm25/A_cases_bm25.pkl)
+    python benchmark_bm25.py --index-dir ./data/staging
+    # 합성 말뭉치 (인덱스 없이)
+    python benchmark_bm25.py --docs 50000 --vocab 20000 --doc-len 120
+"""
+import argparse
+import os
+import pickle
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from statistics import median
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from agent.guide_index import top_k_indices
+from agent.sparse_bm25 import BM25Index, SparseBM25, filter_candidates, load_index, save_index
+
+META_FIELDS = {'category': 12, 'channel': 4, 'task_type': 6}
+
+
+def build_synthetic(index_dir: str, docs: int, vocab: int, doc_len: int, seed: int) -> str:
+    """지프 분포 토큰으로 합성 A_cases 인덱스(.pkl) 생성"""
+    rng = np.random.default_rng(seed)
+    terms = [f"t{i}" for i in range(vocab)]
+    tokenized = []
+    documents = []
+    meta_index = defaultdict(lambda: defaultdict(list))
+    for doc_id in range(docs):
+        length = max(1, int(rng.normal(doc_len, doc_len / 4)))
+        ids = np.minimum(rng.zipf(1.2, size=length) - 1, vocab - 1)
+        tokenized.append([terms[i] for i in ids])
+        doc = {'case_id': f"A-{doc_id}"}
+        for field, cardinality in META_FIELDS.items():
+            doc[field] = f"{field}-{rng.integers(cardinality)}"
+            meta_index[field][doc[field]].append(doc_id)
+        documents.append(doc)
+
+    path = os.path.join(index_dir, 'bm25', 'A_cases_bm25.pkl')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        pickle.dump({'bm25': BM25Okapi(tokenized),
+                     'documents': documents,
+                     'meta_index': {field: dict(values) for field, values in meta_index.items()}}, f)
+    return path
+
+
+def timed(fn, repeat: int) -> Tuple[float, object]:
+    """repeat번 실행한 중앙값(ms)과 마지막 결과"""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return median(samples), result
+
+
+def okapi_search(bm25, meta_index, query, filters, top_k) -> List[Tuple[int, float]]:
+    """기존 search_cases/search_A_cases와 같은 경로"""
+    candidate_indices = set(range(len(bm25.doc_len)))
+    for field, value in (filters or {}).items():
+        if field in meta_index and value in meta_index[field]:
+            candidate_indices.intersection_update(meta_index[field][value])
+        else:
+            return []
+    doc_scores = bm25.get_scores(query)
+    candidate_scores = {idx: doc_scores[idx] for idx in candidate_indices}
+    ranked = sorted(candidate_scores, key=candidate_scores.get, reverse=True)[:top_k]
+    return [(idx, candidate_scores[idx]) for idx in ranked]
+
+
+def sparse_search(bm25: SparseBM25, meta_index, query, filters, top_k) -> List[Tuple[int, float]]:
+    candidates = filter_candidates(meta_index, filters)
+    if candidates is not None and candidates.size == 0:
+        return []
+    scores = bm25.get_scores(query, candidates)
+    top = top_k_indices(scores, top_k)
+    rows = top if candidates is None else candidates[top]
+    return [(int(row), float(scores[position])) for position, row in zip(top, rows)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A_cases BM25 인덱스 벤치마크 (pickle vs 희소 행렬)")
+    parser.add_argument("--index-dir", help="bm25/A_cases_bm25.pkl이 있는 디렉토리 (없으면 합성 말뭉치)")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--vocab", type=int, default=15000)
+    parser.add_argument("--doc-len", type=int, default=80)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--query-len", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3, help="로드 시간 측정 반복 횟수")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bm25_bench_")
+    if args.index_dir:
+        pkl_path = os.path.join(args.index_dir, 'bm25', 'A_cases_bm25.pkl')
+    else:
+        print(f"합성 말뭉치 생성: 문서 {args.docs}개, 어휘 {args.vocab}개, 평균 길이 {args.doc_len}")
+        pkl_path = build_synthetic(work_dir, args.docs, args.vocab, args.doc_len, args.seed)
+    npz_path = os.path.join(work_dir, 'A_cases_bm25.npz')
+
+    def load_pickle():
+        with open(pkl_path, 'rb') as f:
+            return pickle.load(f)
+
+    pkl_ms, data = timed(load_pickle, args.repeat)
+    okapi, meta_index = data['bm25'], data['meta_index']
+    start = time.perf_counter()
+    save_index(npz_path, BM25Index(SparseBM25.from_okapi(okapi), data['documents'], meta_index))
+    convert_ms = (time.perf_counter() - start) * 1000
+    npz_ms, index = timed(lambda: load_index(npz_path), args.repeat)
+    sparse = index.bm25
+
+    print("-" * 72)
+    print(f"{'':<22}{'pickle':>14}{'npz':>14}")
+    print(f"{'파일 크기 (MB)':<22}{os.path.getsize(pkl_path) / 1e6:>14.2f}{os.path.getsize(npz_path) / 1e6:>14.2f}")
+    print(f"{'로드 시간 (ms)':<22}{pkl_ms:>14.1f}{npz_ms:>14.1f}   (변환 {convert_ms:.0f}ms, 1회)")
+
+    # 쿼리: 실제 문서의 용어에서 추출, 필터 값은 실제 메타데이터에서 추출
+    rng = random.Random(args.seed)
+    doc_terms = [list(freqs) for freqs in okapi.doc_freqs if freqs]
+    queries = [[rng.choice(rng.choice(doc_terms)) for _ in range(args.query_len)] for _ in range(args.queries)]
+    fields = [field for field, values in meta_index.items() if values]
+
+    def random_filters(count: int) -> Dict:
+        chosen = rng.sample(fields, min(count, len(fields)))
+        return {field: rng.choice(list(meta_index[field])) for field in chosen}
+
+    print("-" * 72)
+    print(f"{'쿼리 지연 (ms)':<22}{'pickle p50':>14}{'npz p50':>14}{'후보 수':>10}{'top-k 일치':>12}")
+    for label, filter_count in (("필터 없음", 0), ("필터 1개", 1), ("필터 2개", 2)):
+        old_times, new_times, sizes = [], [], []
+        matched = 0
+        max_error = 0.0
+        for query in queries:
+            filters = random_filters(filter_count)
+            old_ms, old = timed(lambda: okapi_search(okapi, meta_index, query, filters, args.top_k), 1)
+            new_ms, new = timed(lambda: sparse_search(sparse, index.meta_index, query, filters, args.top_k), 1)
+            old_times.append(old_ms)
+            new_times.append(new_ms)
+            candidates = filter_candidates(index.meta_index, filters)
+            sizes.append(len(okapi.doc_len) if candidates is None else candidates.size)
+            # 동점 순서 차이는 무시하고 점수 목록으로 비교 (float32 저장 오차 허용)
+            old_scores = sorted(score for _, score in old)
+            new_scores = sorted(score for _, score in new)
+            matched += len(old_scores) == len(new_scores) and np.allclose(old_scores, new_scores, atol=1e-4)
+            if old:
+                full = okapi.get_scores(query)
+                max_error = max(max_error, max(abs(full[row] - score) for row, score in new))
+        print(f"{label:<22}{median(old_times):>14.2f}{median(new_times):>14.2f}{int(median(sizes)):>10}"
+              f"{matched:>9}/{len(queries)}   (점수 최대 오차 {max_error:.2e})")
+
+
+if __name__ == "__main__":
+    main()
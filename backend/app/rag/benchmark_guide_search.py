@@ -0,0 +1,202 @@
+"""
+/vectordb/analyze 가이드라인 검색 백엔드 비교: OpenAI Vector Store(file_search) vs 로컬 하이브리드 인덱스
+- 지연: 백엔드별 p50/p95 (결과·쿼리 임베딩 캐시를 비운 검색), 로컬은 캐시 적중 지연과 인덱스 준비 시간도 함께
+- 결과 품질 일치 (OpenAI 결과를 기준으로)
+    출처 일치 : OpenAI 결과 파일명 중 로컬 결과에도 있는 비율
+    내용 일치 : OpenAI 결과 청크마다 로컬 결과와의 최대 토큰 자카드 유사도 평균
+    판단 일치 : 같은 PII 목록에 대한 규칙 엔진(routes.decide_masking_with_llm) 결정(마스킹 여부·방법)이 같은 비율
+                --llm이면 분석 엔드포인트와 같은 LLM 판단(decide_all_pii_with_rag)으로 비교 (API 비용 발생)
+
+실행 방법 (backend 디렉토리에서, OPENAI_API_KEY·OPENAI_VECTOR_STORE_ID 필요):
+    python app/rag/benchmark_guide_search.py --repeat 5
+    python app/rag/benchmark_guide_search.py --queries-file queries.txt --json guide_search.json
+    # 로컬만 (네트워크 없이 지연만 측정)
+    python app/rag/benchmark_guide_search.py --local-only
+    # 회귀 검사: 판단 일치율이 기준보다 낮으면 종료 코드 1
+    python app/rag/benchmark_guide_search.py --min-decision-agreement 0.9
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from statistics import mean, median
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from agent.retrieval_cache import retrieval_cache
+from app.vectordb import routes
+
+RECEIVER_TYPES = ("external", "internal", "사외", "사내")
+PII_TERMS = ("주민등록번호", "전화번호", "이메일", "계좌번호", "이름")
+SAMPLE_PII = [
+    {"type": "email", "value": "hong@example.com"},
+    {"type": "phone", "value": "010-1234-5678"},
+    {"type": "jumin", "value": "900101-1234567"},
+    {"type": "account", "value": "110-123-456789"},
+    {"type": "person", "value": "홍길동"},
+    {"type": "address", "value": "서울특별시 중구 세종대로 110"},
+]
+_WORD = re.compile(r"[가-힣A-Za-z0-9]+")
+
+
+def default_cases() -> List[Tuple[str, Dict[str, Any]]]:
+    """분석 엔드포인트와 같은 쿼리 + PII 종류별 쿼리"""
+    cases = []
+    for receiver_type in RECEIVER_TYPES:
+        context = {"receiver_type": receiver_type}
+        cases.append((f"{receiver_type} 전송 개인정보 마스킹", context))
+        cases.extend((f"{receiver_type} 전송 {term} 마스킹", context) for term in PII_TERMS)
+    return cases
+
+
+def load_cases(path: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """한 줄에 '수신자유형<TAB>쿼리' (탭이 없으면 external)"""
+    cases = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            receiver_type, _, query = line.partition("\t") if "\t" in line else ("external", "", line)
+            cases.append((query, {"receiver_type": receiver_type}))
+    return cases
+
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def words(text: str) -> set:
+    return set(_WORD.findall((text or "").lower()))
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def clear_caches():
+    retrieval_cache.results.clear()
+    retrieval_cache.embeddings.clear()
+
+
+async def timed_search(search, query: str, context: Dict[str, Any], repeat: int, cold: bool = True):
+    """repeat번 검색한 지연(ms) 목록과 마지막 결과"""
+    samples = []
+    results = []
+    for _ in range(repeat):
+        if cold:
+            clear_caches()
+        start = time.perf_counter()
+        results = await search(query, context)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples, results
+
+
+async def decisions(guides: List[Dict[str, Any]], context: Dict[str, Any], use_llm: bool) -> Dict[str, Tuple]:
+    if use_llm:
+        from app.vectordb.rag_masking import decide_all_pii_with_rag
+        decided = await decide_all_pii_with_rag(SAMPLE_PII, context, guides)
+    else:
+        decided = await routes.decide_masking_with_llm("", SAMPLE_PII, context, guides)
+    return {key: (value["should_mask"], value["masking_method"]) for key, value in decided.items()}
+
+
+def compare(remote: List[Dict[str, Any]], local: List[Dict[str, Any]]) -> Dict[str, Optional[float]]:
+    """OpenAI 결과 기준 출처·내용 일치"""
+    remote_files = {item.get("filename") for item in remote if item.get("filename")}
+    local_files = {item.get("filename") for item in local}
+    local_words = [words(item.get("content", "")) for item in local]
+    content = [max((jaccard(words(item.get("content", "")), other) for other in local_words), default=0.0)
+               for item in remote]
+    return {
+        "source_overlap": len(remote_files & local_files) / len(remote_files) if remote_files else None,
+        "content_overlap": mean(content) if content else None,
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    cases = load_cases(args.queries_file) if args.queries_file else default_cases()
+    print(f"가이드 검색 백엔드 비교: 쿼리 {len(cases)}개, 반복 {args.repeat}회 (현재 설정: {routes.GUIDE_SEARCH_BACKEND})")
+
+    start = time.perf_counter()
+    await asyncio.to_thread(routes.local_guide_search._current)
+    index_ms = (time.perf_counter() - start) * 1000
+    print(f"로컬 인덱스 준비: {index_ms:.0f}ms ({routes.local_guide_search.stats()['guides']}개 가이드)")
+
+    latency = {"openai": [], "local": [], "local_cached": []}
+    rows = []
+    for query, context in cases:
+        local_ms, local = await timed_search(routes.search_local_guides, query, context, args.repeat)
+        cached_ms, _ = await timed_search(routes.search_local_guides, query, context, args.repeat, cold=False)
+        latency["local"].extend(local_ms)
+        latency["local_cached"].extend(cached_ms)
+        row = {"query": query, "receiver_type": context["receiver_type"], "local_results": len(local)}
+
+        if not args.local_only:
+            remote_ms, remote = await timed_search(routes.search_with_assistant, query, context, args.repeat)
+            latency["openai"].extend(remote_ms)
+            row.update(compare(remote, local), openai_results=len(remote))
+            if remote:
+                expected = await decisions(remote, context, args.llm)
+                actual = await decisions(local, context, args.llm)
+                row["decision_agreement"] = sum(expected[key] == actual.get(key) for key in expected) / len(expected)
+        rows.append(row)
+
+    summary = {"index_ms": round(index_ms, 1), "cases": len(cases), "latency_ms": {}}
+    print("-" * 72)
+    print(f"{'지연 (ms)':<22}{'p50':>12}{'p95':>12}{'평균':>12}")
+    for name, samples in latency.items():
+        if not samples:
+            continue
+        summary["latency_ms"][name] = {"p50": round(median(samples), 2), "p95": round(percentile(samples, 0.95), 2),
+                                       "mean": round(mean(samples), 2)}
+        print(f"{name:<22}{median(samples):>12.1f}{percentile(samples, 0.95):>12.1f}{mean(samples):>12.1f}")
+
+    if not args.local_only:
+        print("-" * 72)
+        for metric, label in (("source_overlap", "출처 일치"), ("content_overlap", "내용 일치"),
+                              ("decision_agreement", "판단 일치")):
+            values = [row[metric] for row in rows if row.get(metric) is not None]
+            summary[metric] = round(mean(values), 3) if values else None
+            shown = f"{summary[metric]:.3f}" if values else "-"
+            print(f"{label:<22}{shown:>12}   ({len(values)}/{len(rows)}개 쿼리)")
+        empty = sum(1 for row in rows if not row.get("openai_results"))
+        if empty:
+            print(f"⚠️ OpenAI 결과가 없는 쿼리 {empty}개 (API 키·Vector Store ID 확인)")
+
+    summary["rows"] = rows
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가이드라인 검색 백엔드 비교 (OpenAI Vector Store vs 로컬 인덱스)")
+    parser.add_argument("--queries-file", help="한 줄에 '수신자유형<TAB>쿼리' (기본: 분석 엔드포인트 쿼리 + PII별 쿼리)")
+    parser.add_argument("--repeat", type=int, default=3, help="쿼리별 반복 횟수")
+    parser.add_argument("--local-only", action="store_true", help="OpenAI 호출 없이 로컬 지연만 측정")
+    parser.add_argument("--llm", action="store_true", help="판단 일치를 LLM 판단으로 비교 (API 비용 발생)")
+    parser.add_argument("--json", help="결과를 JSON으로 저장할 경로")
+    parser.add_argument("--min-decision-agreement", type=float, help="판단 일치율이 이보다 낮으면 종료 코드 1")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.json}")
+
+    agreement = summary.get("decision_agreement")
+    if args.min_decision_agreement is not None and agreement is not None and agreement < args.min_decision_agreement:
+        print(f"❌ 판단 일치율 {agreement:.3f} < 기준 {args.min_decision_agreement}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,509 @@
+"""
+SMTP 수신(포트 2526 aiosmtpd) 부하 테스트
+동시 SMTP 세션 N개로 메일을 보내며 수신 응답(250) 지연, 처리량, 메모리 증가, 오류율을 측정합니다.
+
+기본 대상은 이 프로세스 안에서 띄운 실제 수신 경로입니다:
+    aiosmtpd Controller + FastAPISMTPHandler(스트리밍 파싱·GridFS 첨부 저장) + ingest 큐(insert_many)
+MongoDB는 --mongo로 고릅니다.
+    mongomock (기본)            : mongomock + mongomock-motor 메모리 DB (pip install mongomock mongomock-motor)
+    mongodb://localhost:27017 : 로컬 mongod의 임시 DB (끝나면 삭제)
+이미 떠 있는 서버를 치려면 --target host:port (이 경우 서버 쪽 메모리·저장 지표는 측정하지 않음).
+
+실행 방법 (backend 디렉토리에서):
+    python app/rag/benchmark_smtp_ingest.py --sessions 20 --messages 50
+    python app/rag/benchmark_smtp_ingest.py --body-sizes 2k,64k --attachment-mix none:5,pdf:3,zip:1,inline:1 \\
+        --attachment-size 512k --dlp-token-ratio 0.5 --json ingest_baseline.json
+    # 회귀 검사: 기준을 넘으면 종료 코드 1
+    python app/rag/benchmark_smtp_ingest.py --max-error-rate 0.01 --max-p95-ms 200
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import sys
+import time
+import zipfile
+from email.mime.application import MIMEApplication
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+DEFAULT_PORT = 2527  # 실제 서버(2526)와 겹치지 않게
+
+# 가짜 PII가 들어간 본문 한 줄 (분석 단계에서 실제와 비슷한 텍스트가 되도록)
+_SAMPLE_LINE = "담당자 김철수 (010-1234-5678, chulsoo.kim@example.com) 주민번호 900101-1234567 계좌 110-123-456789\n"
+# 1x1 PNG
+_PNG_BYTES = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000100ffff03000006000557bfab"
+    "d40000000049454e44ae426082"
+)
+
+
+def parse_size(text: str) -> int:
+    """'64k', '1m', '512' → 바이트 수"""
+    text = text.strip().lower()
+    units = {"k": 1024, "m": 1024 * 1024}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def parse_mix(text: str) -> List[Tuple[str, int]]:
+    """'none:5,pdf:3' → [("none", 5), ("pdf", 3)]"""
+    mix = []
+    for item in text.split(","):
+        kind, _, weight = item.partition(":")
+        if kind not in ("none", "pdf", "zip", "inline"):
+            raise ValueError(f"알 수 없는 첨부 종류: {kind} (none, pdf, zip, inline)")
+        mix.append((kind, int(weight or 1)))
+    return mix
+
+
+def percentile(samples: List[float], fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def current_rss_bytes() -> int:
+    """현재 프로세스 RSS (Linux /proc, 없으면 최대 RSS)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+
+
+class MessageFactory:
+    """본문 크기 × 첨부 종류 조합별로 메일을 미리 만들어 두고, 보낼 때 헤더만 바꿔 씁니다"""
+
+    def __init__(self, body_sizes: List[int], attachment_mix: List[Tuple[str, int]],
+                 attachment_size: int, dlp_token_ratio: float, seed: int = 0):
+        self.body_sizes = body_sizes
+        self.kinds = [kind for kind, _ in attachment_mix]
+        self.weights = [weight for _, weight in attachment_mix]
+        self.attachment_size = attachment_size
+        self.dlp_token_ratio = dlp_token_ratio
+        self.random = random.Random(seed)
+        self._templates: Dict[Tuple[int, str], bytes] = {}
+
+    def _body(self, size: int) -> str:
+        repeat = size // len(_SAMPLE_LINE.encode("utf-8")) + 1
+        return (_SAMPLE_LINE * repeat)[:max(size // 3, 1)]
+
+    def _attachment_bytes(self) -> bytes:
+        # 압축이 거의 안 되는 데이터 (실제 PDF·이미지와 비슷한 디코딩·해시 비용)
+        return os.urandom(self.attachment_size)
+
+    def _template(self, body_size: int, kind: str) -> bytes:
+        key = (body_size, kind)
+        if key in self._templates:
+            return self._templates[key]
+
+        msg = MIMEMultipart("related" if kind == "inline" else "mixed")
+        body = self._body(body_size)
+        if kind == "inline":
+            msg.attach(MIMEText(f"<p>{body}</p><img src=\"cid:logo@bench\">", "html", "utf-8"))
+            image = MIMEImage(_PNG_BYTES + self._attachment_bytes(), "png")
+            image["Content-ID"] = "<logo@bench>"
+            image.add_header("Content-Disposition", "inline", filename="logo.png")
+            msg.attach(image)
+        else:
+            msg.attach(MIMEText(body, "plain", "utf-8"))
+        if kind == "pdf":
+            part = MIMEApplication(b"%PDF-1.4\n" + self._attachment_bytes(), "pdf")
+            part.add_header("Content-Disposition", "attachment", filename=("utf-8", "", "견적서.pdf"))
+            msg.attach(part)
+        elif kind == "zip":
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr("고객명단.txt", _SAMPLE_LINE * 200)
+                archive.writestr("scan.bin", self._attachment_bytes())
+            part = MIMEApplication(buffer.getvalue(), "zip")
+            part.add_header("Content-Disposition", "attachment", filename="documents.zip")
+            msg.attach(part)
+
+        self._templates[key] = msg.as_bytes(policy=msg.policy.clone(linesep="\r\n"))
+        return self._templates[key]
+
+    def make(self, session: int, index: int) -> Tuple[bytes, str]:
+        """(SMTP DATA 바이트, 첨부 종류)"""
+        body_size = self.random.choice(self.body_sizes)
+        kind = self.random.choices(self.kinds, self.weights)[0]
+        template = self._template(body_size, kind)
+
+        headers = [
+            "From: sender{0}@partner.example.com".format(session),
+            "To: receiver@guardcap.example.com",
+            f"Subject: [ingest-bench] session {session} #{index}",
+            f"Message-ID: <bench-{session}-{index}-{time.monotonic_ns()}@bench>",
+        ]
+        if self.random.random() < self.dlp_token_ratio:
+            content_hash = hashlib.sha256(template).hexdigest()
+            headers += [
+                f"X-DLP-Token: {hashlib.sha256(f'{session}:{index}'.encode()).hexdigest()}",
+                f"X-DLP-Content-Hash: {content_hash}",
+                f"X-DLP-Timestamp: {time.time():.0f}",
+            ]
+        return "\r\n".join(headers).encode("utf-8") + b"\r\n" + template, kind
+
+
+class SMTPLoadClient:
+    """asyncio SMTP 클라이언트 세션 (한 연결로 여러 메일 전송)"""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def _reply(self) -> Tuple[int, str]:
+        lines = []
+        while True:
+            line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+            if not line:
+                raise ConnectionError("서버가 연결을 끊었습니다")
+            lines.append(line.decode("utf-8", "replace").rstrip())
+            if line[3:4] != b"-":
+                return int(line[:3]), "\n".join(lines)
+
+    async def _command(self, command: str) -> Tuple[int, str]:
+        self.writer.write(command.encode("utf-8") + b"\r\n")
+        await self.writer.drain()
+        return await self._reply()
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, limit=1024 * 1024), self.timeout
+        )
+        code, reply = await self._reply()
+        if code != 220:
+            raise ConnectionError(f"인사 응답 오류: {reply}")
+        code, reply = await self._command("EHLO bench.local")
+        if code != 250:
+            raise ConnectionError(f"EHLO 오류: {reply}")
+
+    async def send(self, sender: str, recipient: str, data: bytes) -> Tuple[int, float]:
+        """메일 한 통 전송. Returns: (DATA 종료 응답 코드, 본문 전송 완료 → 응답까지 초)"""
+        for command, expected in ((f"MAIL FROM:<{sender}>", 250), (f"RCPT TO:<{recipient}>", 250)):
+            code, _ = await self._command(command)
+            if code != expected:
+                await self._command("RSET")
+                return code, 0.0
+        code, _ = await self._command("DATA")
+        if code != 354:
+            return code, 0.0
+        self.writer.write(re.sub(rb"(?m)^\.", b"..", data))
+        if not data.endswith(b"\r\n"):
+            self.writer.write(b"\r\n")
+        self.writer.write(b".\r\n")
+        await self.writer.drain()
+        started = time.perf_counter()
+        code, _ = await self._reply()
+        return code, time.perf_counter() - started
+
+    async def close(self):
+        if self.writer is None:
+            return
+        with contextlib.suppress(Exception):
+            await asyncio.wait_for(self._command("QUIT"), 2)
+        self.writer.close()
+
+
+class InProcessIngestServer:
+    """이 프로세스 안에서 띄우는 실제 수신 경로 (aiosmtpd + 핸들러 + ingest 큐 + Mongo 대역)"""
+
+    def __init__(self, port: int, mongo: str):
+        self.port = port
+        self.mongo = mongo
+        self.controller = None
+        self.queue = None
+        self._client = None
+        self._sync_client = None
+        self._db_name = f"guardcap_ingest_bench_{os.getpid()}"
+
+    def _open_databases(self):
+        if self.mongo == "mongomock":
+            try:
+                import mongomock
+                import mongomock.gridfs
+                from mongomock_motor import AsyncMongoMockClient
+            except ImportError:
+                raise SystemExit("❌ mongomock 대역을 쓰려면: pip install mongomock mongomock-motor\n"
+                                 "   (또는 --mongo mongodb://localhost:27017)")
+            mongomock.gridfs.enable_gridfs_integration()
+            self._client = AsyncMongoMockClient()
+            self._sync_client = mongomock.MongoClient()
+        else:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            from pymongo import MongoClient
+            self._client = AsyncIOMotorClient(self.mongo)
+            self._sync_client = MongoClient(self.mongo)
+        return self._client[self._db_name], self._sync_client[self._db_name]
+
+    async def start(self):
+        from aiosmtpd.controller import Controller
+        from app.smtp_server import handler as smtp_handler
+        from app.smtp_server.ingest import ingest_queue
+
+        db, sync_db = self._open_databases()
+        # 핸들러의 첨부파일 GridFS 저장이 대역 DB를 쓰도록 교체 (ingest 큐는 start(db=...)로 지정)
+        smtp_handler.get_sync_database = lambda: sync_db
+        self.queue = ingest_queue
+        await self.queue.start(db=db)
+
+        self.controller = Controller(smtp_handler.FastAPISMTPHandler(), hostname="127.0.0.1", port=self.port)
+        self.controller.start()
+
+    async def drain(self, timeout: float) -> Optional[float]:
+        """저장 큐가 빌 때까지 걸린 시간 (timeout 초과 시 None)"""
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.queue._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return time.perf_counter() - started
+
+    async def stop(self):
+        if self.controller is not None:
+            self.controller.stop()
+        if self.queue is not None:
+            await self.queue.stop()
+        if self.mongo != "mongomock" and self._sync_client is not None:
+            self._sync_client.drop_database(self._db_name)
+            self._sync_client.close()
+            self._client.close()
+
+
+class SMTPIngestBenchmark:
+    """동시 세션 부하 생성 + 지표 집계"""
+
+    def __init__(self, host: str, port: int, sessions: int, messages: int, factory: MessageFactory,
+                 timeout: float = 60.0):
+        self.host = host
+        self.port = port
+        self.sessions = sessions
+        self.messages = messages
+        self.factory = factory
+        self.timeout = timeout
+        self.latencies: List[float] = []
+        self.latency_by_kind: Dict[str, List[float]] = {}
+        self.codes: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.bytes_sent = 0
+        self.rss_samples: List[int] = []
+
+    def _count(self, table: Dict[str, int], key: str):
+        table[key] = table.get(key, 0) + 1
+
+    async def _session(self, session: int):
+        client = SMTPLoadClient(self.host, self.port, self.timeout)
+        try:
+            await client.connect()
+            for index in range(self.messages):
+                data, kind = self.factory.make(session, index)
+                code, latency = await client.send(f"sender{session}@partner.example.com",
+                                                  "receiver@guardcap.example.com", data)
+                self._count(self.codes, str(code))
+                if code == 250:
+                    self.latencies.append(latency)
+                    self.latency_by_kind.setdefault(kind, []).append(latency)
+                    self.bytes_sent += len(data)
+        except Exception as e:
+            self._count(self.errors, type(e).__name__)
+        finally:
+            await client.close()
+
+    async def _sample_memory(self, interval: float = 0.2):
+        while True:
+            self.rss_samples.append(current_rss_bytes())
+            await asyncio.sleep(interval)
+
+    async def run(self) -> float:
+        sampler = asyncio.create_task(self._sample_memory())
+        started = time.perf_counter()
+        await asyncio.gather(*(self._session(session) for session in range(self.sessions)))
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await sampler
+        return elapsed
+
+    def summary(self, elapsed: float, rss_before: int, rss_after: int) -> Dict:
+        attempted = self.sessions * self.messages
+        accepted = self.codes.get("250", 0)
+        tempfail = sum(count for code, count in self.codes.items() if code.startswith("4"))
+        permfail = sum(count for code, count in self.codes.items() if code.startswith("5"))
+        session_errors = sum(self.errors.values())
+        ms = [s * 1000 for s in self.latencies]
+
+        def latency(samples: List[float]) -> Dict:
+            return {
+                "p50": round(percentile(samples, 0.50), 2) if samples else None,
+                "p95": round(percentile(samples, 0.95), 2) if samples else None,
+                "p99": round(percentile(samples, 0.99), 2) if samples else None,
+                "max": round(max(samples), 2) if samples else None,
+            }
+
+        return {
+            "sessions": self.sessions,
+            "messages_per_session": self.messages,
+            "attempted": attempted,
+            "accepted": accepted,
+            "tempfail_4xx": tempfail,
+            "permfail_5xx": permfail,
+            "session_errors": self.errors,
+            "reply_codes": self.codes,
+            "error_rate": round((attempted - accepted) / attempted, 4) if attempted else 0.0,
+            "elapsed_sec": round(elapsed, 3),
+            "throughput_msg_per_sec": round(accepted / elapsed, 2) if elapsed else None,
+            "throughput_mb_per_sec": round(self.bytes_sent / elapsed / 1024 / 1024, 2) if elapsed else None,
+            "accept_latency_ms": latency(ms),
+            "accept_latency_ms_by_attachment": {
+                kind: latency([s * 1000 for s in samples]) for kind, samples in sorted(self.latency_by_kind.items())
+            },
+            "rss_mb": {
+                "before": round(rss_before / 1024 / 1024, 1),
+                "peak": round(max(self.rss_samples + [rss_after]) / 1024 / 1024, 1),
+                "after": round(rss_after / 1024 / 1024, 1),
+                "growth": round((rss_after - rss_before) / 1024 / 1024, 1),
+            },
+            "sessions_failed": session_errors,
+        }
+
+
+def print_summary(result: Dict):
+    print("\n" + "=" * 80)
+    print(" 📊 SMTP 수신 부하 테스트 결과 ".center(80, "="))
+    print("=" * 80)
+    print(f"\n세션 {result['sessions']}개 × 메일 {result['messages_per_session']}통 = {result['attempted']}통")
+    print(f"   수신(250): {result['accepted']}  일시 거절(4xx): {result['tempfail_4xx']}  "
+          f"영구 거절(5xx): {result['permfail_5xx']}  세션 오류: {result['session_errors'] or 0}")
+    print(f"   오류율: {result['error_rate'] * 100:.2f}%  응답 코드: {result['reply_codes']}")
+    print(f"\n⏱️  소요 {result['elapsed_sec']}초 → {result['throughput_msg_per_sec']} msg/s, "
+          f"{result['throughput_mb_per_sec']} MB/s")
+    lat = result["accept_latency_ms"]
+    print(f"   수신 응답 지연(ms): p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']}  max {lat['max']}")
+    for kind, by_kind in result["accept_latency_ms_by_attachment"].items():
+        print(f"     - {kind:<7} p50 {by_kind['p50']}  p95 {by_kind['p95']}  p99 {by_kind['p99']}")
+    rss = result["rss_mb"]
+    print(f"\n🧠 RSS(MB): 시작 {rss['before']} → 최대 {rss['peak']} → 종료 {rss['after']} (증가 {rss['growth']})")
+    if "ingest" in result:
+        ingest = result["ingest"]
+        print(f"\n💾 저장 큐: 저장 {ingest['written']}통, 저장 실패 {ingest['write_errors']}, "
+              f"큐 최대 깊이 {ingest['queue_max_depth']}/{ingest['queue_capacity']}, "
+              f"평균 배치 {ingest['avg_batch_size']}, 큐 비우기 {result.get('drain_sec')}초")
+    print("\n" + "=" * 80)
+
+
+async def run(args) -> Dict:
+    factory = MessageFactory(
+        body_sizes=[parse_size(size) for size in args.body_sizes.split(",")],
+        attachment_mix=parse_mix(args.attachment_mix),
+        attachment_size=parse_size(args.attachment_size),
+        dlp_token_ratio=args.dlp_token_ratio,
+        seed=args.seed,
+    )
+
+    server = None
+    if args.target:
+        host, _, port = args.target.rpartition(":")
+        host, port = host or "127.0.0.1", int(port)
+    else:
+        host, port = "127.0.0.1", args.port
+        server = InProcessIngestServer(port, args.mongo)
+
+    quiet = contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext()
+    benchmark = SMTPIngestBenchmark(host, port, args.sessions, args.messages, factory, timeout=args.timeout)
+    try:
+        with quiet:
+            if server is not None:
+                await server.start()
+            # 템플릿 생성 비용이 측정에 섞이지 않도록 미리 만들어 둠
+            for session in range(min(args.sessions, 8)):
+                factory.make(session, -1)
+            rss_before = current_rss_bytes()
+            elapsed = await benchmark.run()
+            drain = await server.drain(args.timeout) if server is not None else None
+            rss_after = current_rss_bytes()
+        result = benchmark.summary(elapsed, rss_before, rss_after)
+        result["config"] = {
+            "target": args.target or f"in-process ({args.mongo})",
+            "body_sizes": args.body_sizes,
+            "attachment_mix": args.attachment_mix,
+            "attachment_size": args.attachment_size,
+            "dlp_token_ratio": args.dlp_token_ratio,
+        }
+        if server is not None:
+            result["drain_sec"] = round(drain, 3) if drain is not None else None
+            result["ingest"] = server.queue.metrics_snapshot()
+    finally:
+        if server is not None:
+            with contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext():
+                await server.stop()
+    return result
+
+
+def main():
+    """메인 실행 함수"""
+    parser = argparse.ArgumentParser(description="SMTP 수신 부하 테스트")
+    parser.add_argument("--sessions", type=int, default=10, help="동시 SMTP 세션 수 (기본값: 10)")
+    parser.add_argument("--messages", type=int, default=20, help="세션당 메일 수 (기본값: 20)")
+    parser.add_argument("--body-sizes", default="2k,32k", help="본문 크기 목록, 무작위 선택 (기본값: 2k,32k)")
+    parser.add_argument("--attachment-mix", default="none:5,pdf:3,zip:1,inline:1",
+                        help="첨부 종류:가중치 (none, pdf, zip, inline)")
+    parser.add_argument("--attachment-size", default="256k", help="첨부파일 크기 (기본값: 256k)")
+    parser.add_argument("--dlp-token-ratio", type=float, default=1.0,
+                        help="X-DLP-Token 헤더를 붙일 메일 비율 0~1 (기본값: 1.0)")
+    parser.add_argument("--target", help="이미 떠 있는 SMTP 서버 host:port (없으면 프로세스 안에서 띄움)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"프로세스 안 서버 포트 (기본값: {DEFAULT_PORT})")
+    parser.add_argument("--mongo", default="mongomock", help="mongomock 또는 mongodb:// URI (임시 DB 사용 후 삭제)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="응답·큐 비우기 대기 시간(초)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="결과를 JSON 파일로 저장 (회귀 비교용)")
+    parser.add_argument("--max-error-rate", type=float, help="오류율이 이 값을 넘으면 종료 코드 1")
+    parser.add_argument("--max-p95-ms", type=float, help="수신 응답 p95가 이 값을 넘으면 종료 코드 1")
+    parser.add_argument("--verbose", action="store_true", help="서버 로그 출력")
+    args = parser.parse_args()
+
+    try:
+        result = asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("\n\n⚠️  사용자에 의해 중단되었습니다.")
+        return
+
+    print_summary(result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 결과가 {args.json}에 저장되었습니다.")
+
+    failures = []
+    if args.max_error_rate is not None and result["error_rate"] > args.max_error_rate:
+        failures.append(f"오류율 {result['error_rate']} > {args.max_error_rate}")
+    p95 = result["accept_latency_ms"]["p95"]
+    if args.max_p95_ms is not None and (p95 is None or p95 > args.max_p95_ms):
+        failures.append(f"p95 {p95}ms > {args.max_p95_ms}ms")
+    if failures:
+        print(f"\n❌ 기준 초과: {', '.join(failures)}")
+        sys.exit(1)
+
+    print("\n✅ 벤치마크 완료!\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,12 @@
 import os
 import json
-import pickle
 from collections import defaultdict
-from konlpy.tag import Okt
 from tqdm import tqdm
-from rank_bm25 import BM25Okapi
 
 # 💡 수정된 부분: 프로젝트 최상위 폴더 기준으로 retriever를 import 합니다.
 from scripts.hybrid.retriever import GuardcapRetriever
+from agent.model_registry import model_registry
+from agent.sparse_bm25 import BM25Index, SparseBM25, save_index
 
 # --- 설정 (Configuration) ---
 STAGING_DIR = './data/staging'
@@ -29,9 +28,9 @@ def main():
     print("✅ BM25 통합 인덱스 구축을 시작합니다...")
     os.makedirs(BM25_INDEX_DIR, exist_ok=True)
     
-    print("Okt 형태소 분석기를 초기화합니다...")
-    tokenizer = Okt()
-    print("초기화 완료.")
+    # 검색 시와 같은 토크나이저 (KOREAN_TOKENIZER: okt | simple)
+    tokenizer = model_registry.tokenizer()
+    print(f"{tokenizer.name} 토크나이저 초기화 완료.")
 
     for doc_file, doc_config in CONFIG.items():
         filepath = os.path.join(STAGING_DIR, doc_file)
@@ -76,24 +75,16 @@ def main():
             continue
 
         print("  - 텍스트 토큰화를 시작합니다...")
-        tokenized_corpus = [tokenizer.morphs(doc) for doc in tqdm(corpus, desc="토큰화 진행")]
+        tokenized_corpus = [tokenizer.morphs_uncached(doc) for doc in tqdm(corpus, desc="토큰화 진행")]
         
         print("  - BM25 인덱스를 생성합니다...")
-        bm25 = BM25Okapi(tokenized_corpus)
-        
+        bm25 = SparseBM25.from_tokenized(tokenized_corpus)
+
         print("  - 통합 인덱스를 저장합니다...")
-        index_data = {
-            'bm25': bm25,
-            'documents': documents,
-            'meta_index': meta_index
-        }
-        
-        index_filename = f"{doc_file.split('.')[0]}_bm25.pkl"
+        index_filename = f"{doc_file.split('.')[0]}_bm25.npz"
         index_path = os.path.join(BM25_INDEX_DIR, index_filename)
-        
-        with open(index_path, 'wb') as f:
-            pickle.dump(index_data, f)
-            
+        save_index(index_path, BM25Index(bm25, documents, meta_index, tokenizer.name))
+
         print(f"  - 통합 인덱스가 성공적으로 저장되었습니다: {index_path}")
 
     print("\n🎉 BM25 통합 인덱스 구축 완료.")
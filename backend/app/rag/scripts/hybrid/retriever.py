@@ -1,14 +1,12 @@
 import os
 import json
-import pickle
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-from konlpy.tag import Okt
-import torch
 import numpy as np
 from collections import defaultdict
 
+from agent.guide_index import top_k_indices
+from agent.model_registry import model_registry
+from agent.sparse_bm25 import filter_candidates, load_or_convert
+
 class GuardcapRetriever:
     """
     Guardcap 프로젝트의 검색 요구사항에 맞춰 특수화된 검색기.
@@ -22,22 +20,15 @@ class GuardcapRetriever:
     
     def __init__(self, index_base_path='./data/staging'):
         print("✅ Guardcap 검색기 초기화 중...")
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(f"   - 사용할 디바이스: {device}")
 
-        # 1. 임베딩 모델 및 토크나이저 초기화
-        self.model = SentenceTransformer('upskyy/e5-base-korean', device=device)
-        self.tokenizer = Okt()
-        print("   - 임베딩 모델 및 Okt 토크나이저 로드 완료.")
+        # 1. 임베딩 모델 및 토크나이저 (프로세스 공용 레지스트리에서 공유, 모델은 첫 검색 때 로드)
+        self.tokenizer = model_registry.tokenizer()
+        print(f"   - {self.tokenizer.name} 토크나이저 준비 완료.")
 
         # 2. ChromaDB 클라이언트 초기화
-        chroma_db_path = os.path.join(index_base_path, 'chroma_db')
-        self.client = chromadb.PersistentClient(
-            path=chroma_db_path,
-            settings=Settings(anonymized_telemetry=False)
-        )
+        self.client = model_registry.chroma_client(os.path.join(index_base_path, 'chroma_db'))
         print("   - ChromaDB 클라이언트 초기화 완료.")
-        
+
         # 3. A(사례) 데이터 및 BM25 인덱스 로드
         self.bm25_model_A = None
         self.documents_A = []
@@ -45,18 +36,21 @@ class GuardcapRetriever:
         self._load_a_cases_index(index_base_path)
         print("🎉 검색기 초기화 완료.")
 
+    @property
+    def model(self):
+        """임베딩 모델 (유휴 해제됐으면 레지스트리가 다시 로드)"""
+        return model_registry.embedding_model('upskyy/e5-base-korean')
+
     def _load_a_cases_index(self, index_base_path):
-        """A_cases의 통합 인덱스 파일(.pkl)을 로드합니다."""
-        index_path = os.path.join(index_base_path, 'bm25/A_cases_bm25.pkl')
+        """A_cases의 통합 인덱스 파일(.npz, 없으면 기존 .pkl 변환)을 로드합니다."""
         try:
-            with open(index_path, 'rb') as f:
-                data = pickle.load(f)
-                self.bm25_model_A = data['bm25']
-                self.documents_A = data['documents']
-                self.meta_index_A = data['meta_index']
+            index = load_or_convert(index_base_path, 'A_cases', self.tokenizer.name)
+            self.bm25_model_A = index.bm25
+            self.documents_A = index.documents
+            self.meta_index_A = index.meta_index
             print(f"   - A_cases 통합 인덱스 로드 완료 ({len(self.documents_A)}개 문서).")
         except FileNotFoundError:
-            print(f"   - ⚠️ 경고: A_cases BM25 인덱스를 찾을 수 없습니다: {index_path}")
+            print(f"   - ⚠️ 경고: A_cases BM25 인덱스를 찾을 수 없습니다: {os.path.join(index_base_path, 'bm25')}")
         except Exception as e:
             print(f"   - 🚨 에러: A_cases 인덱스 로드 실패: {e}")
 
@@ -70,34 +64,26 @@ class GuardcapRetriever:
             print("경고: A_cases BM25 인덱스가 로드되지 않아 검색을 건너뜁니다.")
             return []
 
-        # 1. 필터링을 통해 검색 대상 문서 ID 목록(후보군) 선정
-        candidate_indices = set(range(len(self.documents_A)))
-        if filters:
-            for field, value in filters.items():
-                if field in self.meta_index_A and value in self.meta_index_A[field]:
-                    candidate_indices.intersection_update(self.meta_index_A[field][value])
-                else:
-                    return []
-        
-        if not candidate_indices:
+        # 1. 필터링을 통해 검색 대상 문서 ID 목록(후보군) 선정 (None이면 전체)
+        candidates = filter_candidates(self.meta_index_A, filters)
+        if candidates is not None and candidates.size == 0:
             return []
 
         # 2. BM25 검색 (후보군 내에서만)
         tokenized_query = self.tokenizer.morphs(query)
-        doc_scores = self.bm25_model_A.get_scores(tokenized_query)
-        
-        candidate_scores = {idx: doc_scores[idx] for idx in candidate_indices}
+        candidate_scores = self.bm25_model_A.get_scores(tokenized_query, candidates)
 
         # 3. 점수 기준으로 상위 K개 정렬
-        sorted_indices = sorted(candidate_scores, key=candidate_scores.get, reverse=True)[:top_k]
-        
+        top = top_k_indices(candidate_scores, top_k)
+        sorted_indices = top if candidates is None else candidates[top]
+
         # 4. 결과 포맷팅
         results = []
-        for idx in sorted_indices:
+        for position, idx in zip(top, sorted_indices):
             doc = self.documents_A[idx]
             results.append({
                 "id": doc.get('case_id', 'N/A'),
-                "score": candidate_scores[idx],
+                "score": float(candidate_scores[position]),
                 "source": "A_cases",
                 # ✨ 여기가 수정된 부분입니다.
                 "snippet": (doc.get('before_text') or doc.get('after_text') or '')[:200],
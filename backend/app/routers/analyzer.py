@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, Request
 from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
-from ..utils.recognizer_engine import recognize_pii_in_text
+from ..utils.recognizer_engine import recognize_pii_in_text, recognize_pii_in_email_body
 from ..utils.rag_integration import get_rag_engine
 from ..database.mongodb import get_db
 from ..auth.auth_utils import get_current_user  # ✅ 추가
@@ -52,6 +52,7 @@ class PIIEntityWithDecision(PIIEntity):
 class TextAnalysisResponse(BaseModel):
     full_text: str
     pii_entities: List[PIIEntity]
+    inline_images: List[Dict[str, Any]] = []  # 본문 인라인 이미지별 OCR 결과·좌표
 
 class TextAnalysisWithRAGResponse(BaseModel):
     """RAG 기반 분석 응답"""
@@ -59,12 +60,17 @@ class TextAnalysisWithRAGResponse(BaseModel):
     pii_entities: List[PIIEntityWithDecision]
     rag_enabled: bool
     warnings: List[str] = []
+    inline_images: List[Dict[str, Any]] = []
 
 @router.post("/analyze/text", response_model=TextAnalysisResponse)
 async def analyze_text(request: TextAnalysisRequest, db = Depends(get_db)):
     """
     추출된 텍스트에서 PII를 분석하고 탐지합니다.
+    OCR 결과가 아닌 본문이면 인라인 이미지를 떼어내 따로 OCR·분석합니다.
     """
+    if request.ocr_data is None:
+        return await recognize_pii_in_email_body(request.text_content, db_client=db)
+
     analysis_result = await recognize_pii_in_text(
         request.text_content,
         request.ocr_data,
@@ -82,12 +88,15 @@ async def analyze_text_with_rag(
     """
     RAG 기반 PII 분석 및 마스킹 결정
     """
-    # 1. PII 탐지
-    analysis_result = await recognize_pii_in_text(
-        analysis_request.text_content,
-        analysis_request.ocr_data,
-        db_client=db
-    )
+    # 1. PII 탐지 (본문이면 인라인 이미지도 OCR로 분석)
+    if analysis_request.ocr_data is None:
+        analysis_result = await recognize_pii_in_email_body(analysis_request.text_content, db_client=db)
+    else:
+        analysis_result = await recognize_pii_in_text(
+            analysis_request.text_content,
+            analysis_request.ocr_data,
+            db_client=db
+        )
 
     pii_entities = analysis_result.get("pii_entities", [])
 
@@ -150,7 +159,8 @@ async def analyze_text_with_rag(
             full_text=analysis_result.get("full_text", ""),
             pii_entities=entities_with_decisions,
             rag_enabled=rag_result.get("rag_enabled", False),
-            warnings=rag_result.get("warnings", [])
+            warnings=rag_result.get("warnings", []),
+            inline_images=analysis_result.get("inline_images", [])
         )
     else:
         entities_with_decisions = [
@@ -162,5 +172,6 @@ async def analyze_text_with_rag(
             full_text=analysis_result.get("full_text", ""),
             pii_entities=entities_with_decisions,
             rag_enabled=False,
-            warnings=["RAG가 비활성화되었거나 PII가 없음"]
+            warnings=["RAG가 비활성화되었거나 PII가 없음"],
+            inline_images=analysis_result.get("inline_images", [])
         )
\ No newline at end of file
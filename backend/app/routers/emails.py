@@ -381,6 +381,22 @@ async def download_email_attachment_by_filename(
         content_type = "application/octet-stream"
 
         for att in masked_email["masked_attachments"]:
+            if att.get("filename") == filename and att.get("file_id"):
+                # GridFS에 저장된 첨부파일은 청크 단위로 스트리밍
+                from app.utils.gridfs_store import open_download_stream, iter_gridfs_chunks
+                from urllib.parse import quote
+
+                grid_out = await open_download_stream(db, att["file_id"])
+                print(f"✅ GridFS 첨부파일 다운로드: {filename} ({grid_out.length} bytes, Email: {email_id}, User: {current_user['email']})")
+                return StreamingResponse(
+                    iter_gridfs_chunks(grid_out),
+                    media_type=att.get("content_type", "application/octet-stream"),
+                    headers={
+                        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}",
+                        "Content-Length": str(grid_out.length)
+                    }
+                )
+
             if att.get("filename") == filename:
                 base64_data = att.get("data")
                 if not base64_data:
@@ -1,13 +1,24 @@
 # app/routers/analyzer.py - RAG 분석에도 감사 로그 추가
 
 from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import os
-import base64
-
-from ..utils.masking_engine import PdfMaskingEngine
+import json
+import asyncio
+from urllib.parse import quote
+from bson import ObjectId
+
+from ..utils.masking_pool import mask_files
+from ..utils.gridfs_store import (
+    GridFSTarget, guess_content_type, upload_file_async, find_latest_file_id,
+    open_download_stream, iter_gridfs_chunks
+)
+from ..utils.masked_text import MaskingRule, TextSpan, HtmlTextMap, generate_masked_text
+from ..utils.inline_images import build_inline_image_patches
+from ..llm.masking_prompter import load_entity_masking_rules
 from ..routers.uploads import UPLOAD_DIR
 from ..models.email import MaskedEmailData, MaskedEmailResponse, AttachmentData
 from ..database.mongodb import get_db
@@ -28,23 +39,25 @@ class PIIItemFromAnalysis(BaseModel):
     pageIndex: int
     instance_index: int = 0
     bbox: Optional[List[int]] = None
+    anchor: Optional[Dict[str, Any]] = None  # Office 문서 위치 (분석 결과의 anchor)
 
 @router.post("/masking/pdf")
 async def mask_pii_in_pdf(
     pii_items: List[PIIItemFromAnalysis],
     request: Request,  # ✅ 추가
+    stream: bool = False,
     current_user: dict = Depends(get_current_user)  # ✅ 추가
 ):
     """
-    클라이언트에서 받은 PII 정보를 사용하여 PDF 또는 이미지 파일을 마스킹합니다.
+    클라이언트에서 받은 PII 정보를 사용하여 PDF, 이미지 또는 Office 파일을 마스킹합니다.
+    파일별 마스킹은 프로세스 풀에서 병렬로 실행되며,
+    stream=true이면 파일이 끝나는 순서대로 SSE 이벤트로 결과를 보냅니다.
     """
     
     print(f"[마스킹 API] 받은 PII 항목 수: {len(pii_items)}")
     
     pii_by_file = {}
     for item in pii_items:
-        print(f"[마스킹 API] 처리 중: {item.pii_type} '{item.text}' in {item.filename}")
-        
         if item.filename not in pii_by_file:
             pii_by_file[item.filename] = []
         
@@ -57,11 +70,15 @@ async def mask_pii_in_pdf(
         
         if item.bbox is not None:
             entity_data["bbox"] = item.bbox
+
+        if item.anchor is not None:
+            entity_data["anchor"] = item.anchor
         
         pii_by_file[item.filename].append(entity_data)
     
     masked_file_paths = {}
-    masking_engine = PdfMaskingEngine()
+    masked_file_ids = {}
+    jobs = {}
     
     for filename, entities in pii_by_file.items():
         original_file_path = os.path.join(UPLOAD_DIR, filename)
@@ -71,54 +88,200 @@ async def mask_pii_in_pdf(
             masked_file_paths[filename] = "File not found"
             continue
         
-        file_ext = os.path.splitext(filename)[1]
         masked_filename = f"masked_{filename}"
-        masked_file_path = os.path.join(UPLOAD_DIR, masked_filename)
-        
+        target = GridFSTarget(
+            filename=masked_filename,
+            content_type=guess_content_type(masked_filename),
+            metadata={
+                "kind": "masked_attachment",
+                "owner": current_user["email"],
+                "source_filename": filename,
+                "masked_by": current_user["email"],
+                "pii_count": len(entities),
+            }
+        )
+        print(f"[마스킹 API] 파일 마스킹 예약: {filename} ({len(entities)}개 PII)")
+        jobs[filename] = (original_file_path, entities, target)
+
+    async def run_jobs():
+        async for filename, stored, error in mask_files(jobs):
+            if error is None:
+                masked_file_paths[filename] = f"/api/v1/process/masking/masked-file/{stored['file_id']}"
+                masked_file_ids[filename] = stored
+                print(f"[마스킹 API] 마스킹 완료: {stored['filename']} (GridFS {stored['file_id']}, {stored['size']} bytes)")
+            else:
+                print(f"[마스킹 API] 마스킹 중 오류 발생 ({filename}): {error}")
+                masked_file_paths[filename] = f"Masking failed: {str(error)}"
+            yield filename, masked_file_paths[filename]
+
+    async def write_audit_log():
+        # ✅ 감사 로그 기록
         try:
-            print(f"[마스킹 API] 파일 마스킹 시작: {filename}")
-            for entity in entities:
-                if 'bbox' in entity:
-                    print(f"  - {entity['entity']}: '{entity['text']}' at page {entity['pageIndex']} bbox {entity['bbox']}")
-                else:
-                    print(f"  - {entity['entity']}: '{entity['text']}' at page {entity['pageIndex']} instance {entity['instance_index']}")
-            
-            masking_engine.redact_pdf_with_entities(
-                pdf_path=original_file_path,
-                entities=entities,
-                out_pdf_path=masked_file_path
+            await AuditLogger.log(
+                event_type=AuditEventType.MASKING_APPLY,
+                user_email=current_user["email"],
+                user_role=current_user.get("role", "user"),
+                action=f"첨부파일 마스킹: {len(pii_items)}개 PII",
+                resource_type="attachment",
+                details={
+                    "pii_count": len(pii_items),
+                    "files": list(pii_by_file.keys()),
+                    "masked_files": list(masked_file_paths.keys())
+                },
+                request=request,
+                success=True,
+                severity=AuditSeverity.INFO
             )
-            
-            masked_file_paths[filename] = f"/uploads/{masked_filename}"
-            print(f"[마스킹 API] 마스킹 완료: {masked_filename}")
-        
-        except Exception as e:
-            print(f"[마스킹 API] 마스킹 중 오류 발생: {e}")
-            import traceback
-            traceback.print_exc()
-            masked_file_paths[filename] = f"Masking failed: {str(e)}"
+        except Exception as log_error:
+            print(f"⚠️ 감사 로그 기록 실패: {log_error}")
+
+    if stream:
+        async def generate():
+            yield f"data: {json.dumps({'type': 'total', 'count': len(pii_by_file)})}\n\n"
+            for filename, result in list(masked_file_paths.items()):
+                yield f"data: {json.dumps({'type': 'file', 'filename': filename, 'result': result})}\n\n"
+            async for filename, result in run_jobs():
+                yield f"data: {json.dumps({'type': 'file', 'filename': filename, 'result': result})}\n\n"
+            await write_audit_log()
+            yield f"data: {json.dumps({'type': 'complete', 'status': 'success', 'masked_files': masked_file_paths, 'masked_file_ids': masked_file_ids})}\n\n"
+
+        return StreamingResponse(generate(), media_type="text/event-stream")
+
+    async for _ in run_jobs():
+        pass
+    await write_audit_log()
+
+    return {"status": "success", "masked_files": masked_file_paths, "masked_file_ids": masked_file_ids}
+
+
+DOWNLOADABLE_ATTACHMENT_KINDS = ("masked_attachment", "original_attachment")
+ATTACHMENT_ADMIN_ROLES = ["root_admin", "auditor", "approver"]
+
+
+def can_download_attachment(metadata: Dict[str, Any], current_user: dict) -> bool:
+    """GridFS 첨부파일 메타데이터(kind, owner)로 다운로드 권한 확인"""
+    if metadata.get("kind") not in DOWNLOADABLE_ATTACHMENT_KINDS:
+        return False
+    return metadata.get("owner") == current_user["email"] or current_user.get("role") in ATTACHMENT_ADMIN_ROLES
+
 
-    # ✅ 감사 로그 기록
+@router.get("/masking/masked-file/{file_id}")
+async def download_masked_file(
+    file_id: str,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    GridFS에 저장된 마스킹 결과 파일을 스트리밍으로 반환합니다.
+    본인이 저장한 첨부파일(마스킹 결과·원본)만 받을 수 있고, 관리자·감사자·승인자는 모두 조회 가능합니다.
+    다른 파일은 존재 여부를 드러내지 않도록 404를 반환합니다.
+    """
+    if not ObjectId.is_valid(file_id):
+        raise HTTPException(status_code=404, detail="마스킹된 파일을 찾을 수 없습니다")
     try:
-        await AuditLogger.log(
-            event_type=AuditEventType.MASKING_APPLY,
-            user_email=current_user["email"],
-            user_role=current_user.get("role", "user"),
-            action=f"첨부파일 마스킹: {len(pii_items)}개 PII",
-            resource_type="attachment",
-            details={
-                "pii_count": len(pii_items),
-                "files": list(pii_by_file.keys()),
-                "masked_files": list(masked_file_paths.keys())
-            },
-            request=request,
-            success=True,
-            severity=AuditSeverity.INFO
+        grid_out = await open_download_stream(db, file_id)
+    except Exception:
+        raise HTTPException(status_code=404, detail="마스킹된 파일을 찾을 수 없습니다")
+
+    metadata = grid_out.metadata or {}
+    if not can_download_attachment(metadata, current_user):
+        raise HTTPException(status_code=404, detail="마스킹된 파일을 찾을 수 없습니다")
+
+    return StreamingResponse(
+        iter_gridfs_chunks(grid_out),
+        media_type=metadata.get("content_type", "application/octet-stream"),
+        headers={
+            "Content-Disposition": f"inline; filename*=UTF-8''{quote(grid_out.filename)}",
+            "Content-Length": str(grid_out.length)
+        }
+    )
+
+
+class MaskingSpanDecision(BaseModel):
+    start: int                               # 텍스트 기준 시작 오프셋 (포함)
+    end: int                                 # 텍스트 기준 끝 오프셋 (미포함)
+    entity_type: str
+    value: Optional[str] = None              # 있으면 text[start:end]와 일치하는지 확인
+    should_mask: bool = True
+    masking_type: Optional[str] = None       # 없으면 엔티티 설정 → full
+    masking_char: Optional[str] = None
+    masking_pattern: Optional[str] = None
+
+
+class InlineImageRedaction(BaseModel):
+    html_start: int                          # 원본 HTML에서 data: URI 위치 (분석 결과 inline_images)
+    html_end: int
+    sha256: Optional[str] = None             # 있으면 URI의 이미지 해시와 일치하는지 확인
+    entities: List[Dict[str, Any]] = []      # OCR 좌표(bbox)가 있는 마스킹 대상
+
+
+class MaskedTextRequest(BaseModel):
+    text: str
+    is_html: bool = False
+    spans: List[MaskingSpanDecision] = []
+    inline_images: List[InlineImageRedaction] = []
+
+
+@router.post("/masking/text")
+async def generate_masked_body(
+    request_data: MaskedTextRequest,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    원본 본문과 PII 구간 결정 목록으로 마스킹된 본문을 만듭니다.
+    HTML 본문(is_html)이면 구간 오프셋은 HTML에서 뽑은 텍스트 기준이며, 응답의 patches는 HTML 오프셋 기준입니다.
+    patches([[start, end, replacement], ...])를 원본에 적용하면 masked_text가 됩니다.
+    inline_images가 있으면 본문의 data: 이미지를 OCR 좌표로 가린 이미지로 바꾸는 패치도 함께 만듭니다.
+    """
+    entity_rules = await load_entity_masking_rules(db)
+
+    text_map = HtmlTextMap(request_data.text) if request_data.is_html else None
+    text = text_map.text if text_map else request_data.text
+
+    spans = []
+    skipped = []
+    for index, decision in enumerate(request_data.spans):
+        if not decision.should_mask:
+            continue
+        if not 0 <= decision.start < decision.end <= len(text):
+            skipped.append({"index": index, "reason": "out_of_range"})
+            continue
+        if decision.value is not None and text[decision.start:decision.end] != decision.value:
+            skipped.append({"index": index, "reason": "value_mismatch"})
+            continue
+
+        entity_rule = entity_rules.get(decision.entity_type.upper(), {})
+        spans.append(TextSpan(
+            start=decision.start,
+            end=decision.end,
+            entity_type=decision.entity_type,
+            rule=MaskingRule(
+                masking_type=decision.masking_type or entity_rule.get("masking_type") or "full",
+                masking_char=decision.masking_char or entity_rule.get("masking_char") or "*",
+                masking_pattern=decision.masking_pattern or entity_rule.get("masking_pattern")
+            )
+        ))
+
+    image_patches, skipped_images = [], []
+    if request_data.inline_images:
+        image_patches, skipped_images = await asyncio.to_thread(
+            build_inline_image_patches,
+            request_data.text,
+            [redaction.model_dump() for redaction in request_data.inline_images]
         )
-    except Exception as log_error:
-        print(f"⚠️ 감사 로그 기록 실패: {log_error}")
 
-    return {"status": "success", "masked_files": masked_file_paths}
+    result = generate_masked_text(request_data.text, spans, is_html=request_data.is_html, text_map=text_map,
+                                  extra_patches=image_patches)
+    return {
+        "masked_text": result["masked_text"],
+        "patches": result["patches"],
+        "text": result["text"] if request_data.is_html else None,
+        "applied_count": len(spans),
+        "skipped": skipped,
+        "masked_image_count": len(image_patches),
+        "skipped_images": skipped_images
+    }
 
 
 class SaveMaskedEmailRequest(BaseModel):
@@ -129,6 +292,9 @@ class SaveMaskedEmailRequest(BaseModel):
     masked_body: str
     masked_attachment_filenames: List[str] = []
     original_attachment_filenames: List[str] = []
+    masked_attachment_file_ids: Dict[str, str] = {}  # 마스킹 파일명 → GridFS file_id
+    masked_body_patches: List[List[Any]] = []  # /masking/text의 patches (원본 본문 기준)
+    attachment_content_ids: Dict[str, str] = {}  # 원본 파일명 → Content-ID (본문 cid: 인라인 이미지)
     masking_decisions: dict = {}
     pii_masked_count: int = 0
 
@@ -155,7 +321,7 @@ async def save_masked_email(
         print(f"[Save] original_attachment_filenames: {request_data.original_attachment_filenames}")
         print("="*80 + "\n")
 
-        # 마스킹된 첨부파일과 원본 첨부파일을 모두 Base64로 읽어서 저장
+        # 첨부파일은 GridFS에 두고 문서에는 file_id와 해시만 저장
         masked_attachments_data = []
         masked_set = set(request_data.masked_attachment_filenames)
         print(f"[Save] 마스킹된 파일 목록: {masked_set}")
@@ -165,49 +331,58 @@ async def save_masked_email(
             print(f"\n[Save] 첨부파일 #{idx}: {original_filename}")
             
             masked_filename = f"masked_{original_filename}"
-            print(f"[Save] 마스킹 파일명: {masked_filename}")
 
             if masked_filename in masked_set:
-                filename_to_use = masked_filename
-                print(f"[Save] ✅ 마스킹된 파일 사용: {masked_filename}")
-            else:
-                filename_to_use = original_filename
-                print(f"[Save] 📄 원본 파일 사용: {original_filename}")
-
-            file_path = os.path.join(UPLOAD_DIR, filename_to_use)
-            print(f"[Save] 파일 경로: {file_path}")
-
-            if os.path.exists(file_path):
-                with open(file_path, 'rb') as f:
-                    file_content = f.read()
-                print(f"[Save] 파일 읽기 성공: {len(file_content)} bytes")
-
-                encoded_content = base64.b64encode(file_content).decode('utf-8')
-                print(f"[Save] Base64 인코딩 완료: {len(encoded_content)} chars")
-                
-                preview = encoded_content[:30] + "..." if len(encoded_content) > 30 else encoded_content
-                print(f"[Save] Base64 미리보기: {preview}")
-
-                content_type = "application/octet-stream"
-                if filename_to_use.lower().endswith('.pdf'):
-                    content_type = "application/pdf"
-                elif filename_to_use.lower().endswith(('.jpg', '.jpeg')):
-                    content_type = "image/jpeg"
-                elif filename_to_use.lower().endswith('.png'):
-                    content_type = "image/png"
-                
-                print(f"[Save] content_type: {content_type}")
-
-                masked_attachments_data.append({
-                    "filename": filename_to_use,
-                    "content_type": content_type,
-                    "size": len(file_content),
-                    "data": encoded_content
-                })
-
-                print(f"[Save] ✅ 첨부파일 데이터 추가 완료")
+                # 본인이 마스킹한 파일만 첨부 (다른 사용자의 file_id를 넘겨도 찾지 못함)
+                file_id = (
+                    request_data.masked_attachment_file_ids.get(masked_filename)
+                    or await find_latest_file_id(db, masked_filename, kind="masked_attachment",
+                                                 owner=current_user["email"])
+                )
+                file_doc = await db["fs.files"].find_one({
+                    "_id": ObjectId(file_id),
+                    "metadata.kind": "masked_attachment",
+                    "metadata.owner": current_user["email"],
+                }) if file_id and ObjectId.is_valid(file_id) else None
+
+                if not file_doc:
+                    print(f"[Save] ⚠️ GridFS에서 마스킹 파일을 찾을 수 없음: {masked_filename}")
+                    continue
+
+                metadata = file_doc.get("metadata") or {}
+                stored = {
+                    "file_id": str(file_doc["_id"]),
+                    "filename": masked_filename,
+                    "content_type": metadata.get("content_type", guess_content_type(masked_filename)),
+                    "sha256": file_doc.get("sha256"),
+                    "size": file_doc.get("length", 0),
+                }
+                print(f"[Save] ✅ 마스킹된 파일 사용: {masked_filename} (GridFS {stored['file_id']})")
             else:
-                print(f"[Save] ⚠️ 파일을 찾을 수 없음: {file_path}")
+                file_path = os.path.join(UPLOAD_DIR, original_filename)
+                if not os.path.exists(file_path):
+                    print(f"[Save] ⚠️ 파일을 찾을 수 없음: {file_path}")
+                    continue
+
+                stored = await upload_file_async(db, file_path, GridFSTarget(
+                    filename=original_filename,
+                    content_type=guess_content_type(original_filename),
+                    metadata={
+                        "kind": "original_attachment",
+                        "owner": current_user["email"],
+                        "email_id": request_data.email_id,
+                    }
+                ))
+                print(f"[Save] 📄 원본 파일 GridFS 저장: {original_filename} (GridFS {stored['file_id']})")
+
+            masked_attachments_data.append({
+                "filename": stored["filename"],
+                "content_type": stored["content_type"],
+                "size": stored["size"],
+                "file_id": stored["file_id"],
+                "sha256": stored["sha256"],
+                "content_id": request_data.attachment_content_ids.get(original_filename)
+            })
 
         print(f"\n[Save] 총 {len(masked_attachments_data)}개 첨부파일 준비 완료")
 
@@ -218,6 +393,7 @@ async def save_masked_email(
             to_emails=request_data.to_emails,
             subject=request_data.subject,
             masked_body=request_data.masked_body,
+            masked_body_patches=request_data.masked_body_patches,
             masked_attachments=[
                 AttachmentData(**att) for att in masked_attachments_data
             ],
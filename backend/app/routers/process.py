@@ -1,5 +1,7 @@
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
+import asyncio
+import functools
 import os
 import json
 import shutil  # <<<--- 추가
@@ -9,10 +11,19 @@ from pathlib import Path  # <<<--- 추가
 from ..routers.uploads import get_files, UPLOAD_DIR
 from ..routers.ocr_needed import check_ocr_needed, PreflightCheckRequest
 from ..routers.ocr import extract_ocr
-from ..utils.recognizer_engine import recognize_pii_in_text
+from ..utils.recognizer_engine import (
+    recognize_pii_in_text, recognize_pii_in_email_body, recognize_pii_in_document_file,
+    recognize_pii_in_archive_file
+)
+from ..utils.office_extractor import is_office_file
+from ..utils.hwp_extractor import is_hwp_file
+from ..utils.archive_extractor import is_archive_file
 from ..database.mongodb import get_db
 
-import smtplib
+from ..smtp_server.client import PreparedMessage
+from ..smtp_server.delivery import DeliveryJob, delivery_service
+from ..smtp_server.pool import SMTPServerConfig
+
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
@@ -35,7 +46,8 @@ async def process_documents(db = Depends(get_db)):
                 email_content = f.read()
 
             # DB 클라이언트를 전달하여 커스텀 엔티티도 분석
-            analysis_result = await recognize_pii_in_text(email_content, db_client=db)
+            # 본문의 인라인 이미지(data: URI)는 떼어내 OCR로 따로 분석 (결과의 inline_images)
+            analysis_result = await recognize_pii_in_email_body(email_content, db_client=db)
 
             if isinstance(analysis_result, dict):
                 analysis_result['original_text'] = email_content
@@ -47,6 +59,53 @@ async def process_documents(db = Depends(get_db)):
             })
             continue
 
+        if is_office_file(file_item.name) or is_hwp_file(file_item.name):
+            # Office/한글 문서는 OCR 없이 문서 구조에서 텍스트를 읽어 청크 단위로 분석
+            file_path = os.path.join(UPLOAD_DIR, file_item.name)
+
+            if not os.path.exists(file_path):
+                results.append({"filename": file_item.name, "status": "Error", "message": "File not found"})
+                continue
+
+            try:
+                analysis_result = await recognize_pii_in_document_file(file_path, db_client=db)
+            except Exception as e:
+                results.append({"filename": file_item.name, "status": "Error", "message": f"문서 분석 실패: {e}"})
+                continue
+
+            analysis_result['original_text'] = analysis_result['full_text']
+
+            results.append({
+                "filename": file_item.name,
+                "status": "ANALYSIS_COMPLETED",
+                "analysis_data": analysis_result
+            })
+            continue
+
+        if is_archive_file(file_item.name):
+            # 압축 파일은 중첩 압축 파일까지 풀면서 멤버별로 분석 (압축 폭탄 한도 초과 시 거부)
+            file_path = os.path.join(UPLOAD_DIR, file_item.name)
+
+            if not os.path.exists(file_path):
+                results.append({"filename": file_item.name, "status": "Error", "message": "File not found"})
+                continue
+
+            try:
+                analysis_result = await recognize_pii_in_archive_file(file_path, db_client=db)
+            except Exception as e:
+                results.append({"filename": file_item.name, "status": "Error", "message": f"압축 파일 분석 실패: {e}"})
+                continue
+
+            analysis_result['original_text'] = analysis_result['full_text']
+
+            results.append({
+                "filename": file_item.name,
+                "status": "ARCHIVE_REJECTED" if analysis_result['archive_error'] else "ANALYSIS_COMPLETED",
+                "message": analysis_result['archive_error'],
+                "analysis_data": analysis_result
+            })
+            continue
+
         ocr_needed_data = check_ocr_needed(PreflightCheckRequest(filename=file_item.name))
 
         if ocr_needed_data.get("ocr_needed", False):
@@ -136,40 +195,57 @@ def clear_uploads_folder():
         print(f"❗️ uploads 폴더 정리 중 오류 발생: {e}")
         return False
 
+def remove_uploaded_files(filenames: List[str]):
+    """이 메일에 첨부한 uploads 파일만 삭제합니다 (다른 사용자가 올린 파일은 그대로 둠)."""
+    for filename in filenames:
+        file_path = os.path.join(UPLOAD_DIR, os.path.basename(filename))
+        try:
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+                print(f"🗑️ 파일 삭제됨: {filename}")
+        except Exception as e:
+            print(f"⚠️ {filename} 삭제 실패: {e}")
+
+def _build_approved_message(request: ApproveRequest) -> MIMEMultipart:
+    """승인된 최종 메일 생성 (uploads 폴더의 첨부파일을 읽어 메시지에 담음)"""
+    msg = MIMEMultipart()
+    msg["Subject"] = Header(request.subject, 'utf-8')
+    msg["From"] = SENDER_NAVER_EMAIL
+    msg["To"] = ", ".join(request.recipients)
+    
+    msg.attach(MIMEText(request.final_body, 'plain', 'utf-8'))
+    
+    for filename in request.attachments:
+        file_path = os.path.join(UPLOAD_DIR, filename)
+        if os.path.exists(file_path):
+            with open(file_path, "rb") as f:
+                part = MIMEBase('application', 'octet-stream')
+                part.set_payload(f.read())
+            encoders.encode_base64(part)
+            part.add_header('Content-Disposition', f'attachment; filename="{Header(filename, "utf-8").encode()}"')
+            msg.attach(part)
+    return msg
+
 @router.post("/approve_and_send")
 async def approve_and_send_email(request: ApproveRequest):
     if not SENDER_APP_PASSWORD:
         return {"error": "네이버 앱 비밀번호가 서버 환경 변수에 설정되지 않았습니다."}
     
     try:
-        msg = MIMEMultipart()
-        msg["Subject"] = Header(request.subject, 'utf-8')
-        msg["From"] = SENDER_NAVER_EMAIL
-        msg["To"] = ", ".join(request.recipients)
-        
-        msg.attach(MIMEText(request.final_body, 'plain', 'utf-8'))
-        
-        for filename in request.attachments:
-            file_path = os.path.join(UPLOAD_DIR, filename)
-            if os.path.exists(file_path):
-                with open(file_path, "rb") as f:
-                    part = MIMEBase('application', 'octet-stream')
-                    part.set_payload(f.read())
-                encoders.encode_base64(part)
-                part.add_header('Content-Disposition', f'attachment; filename="{Header(filename, "utf-8").encode()}"')
-                msg.attach(part)
-
-        with smtplib.SMTP(NAVER_SMTP_SERVER, NAVER_SMTP_PORT) as smtp:
-            smtp.starttls()
-            smtp.login(SENDER_NAVER_ID, SENDER_APP_PASSWORD)
-            smtp.send_message(msg)
-            
-        print(f"✅ 최종 메일을 {request.recipients} (으)로 성공적으로 발송했습니다.")
-        
-        # ✅ 메일 발송 성공 후 uploads 폴더 비우기
-        clear_uploads_folder()
+        # 첨부파일까지 메시지에 담은 뒤 전송 큐에 넣고 바로 응답 (전송은 delivery 워커가 풀 연결로)
+        msg = await asyncio.to_thread(_build_approved_message, request)
+        job = DeliveryJob(
+            config=SMTPServerConfig(NAVER_SMTP_SERVER, NAVER_SMTP_PORT, SENDER_NAVER_ID, SENDER_APP_PASSWORD,
+                                    use_tls=True),
+            message=PreparedMessage(msg, SENDER_NAVER_EMAIL, list(request.recipients), []),
+            # ✅ 메일 발송 성공 후 이 메일의 첨부파일만 uploads에서 삭제 (등록 시점의 목록)
+            on_sent=functools.partial(remove_uploaded_files, list(request.attachments))
+        )
+        if not delivery_service.enqueue(job):
+            return {"error": "메일 전송 대기열이 가득 찼습니다. 잠시 후 다시 시도하세요."}
         
-        return {"message": "Email sent successfully"}
+        print(f"✅ 최종 메일을 {request.recipients} (으)로 보내도록 전송 대기열에 등록했습니다.")
+        return {"message": "Email queued for delivery", "status": "queued"}
 
     except Exception as e:
         print(f"❗️ 네이버 메일 발송 중 오류 발생: {e}")
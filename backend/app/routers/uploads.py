@@ -12,6 +12,7 @@ import uuid
 from app.database.mongodb import get_db
 from app.utils.datetime_utils import get_kst_now
 from app.models.email import AttachmentData, OriginalEmailData
+from app.utils.archive_extractor import inspect_archive, is_archive_file
 
 router = APIRouter()
 
@@ -47,12 +48,20 @@ async def upload_email(
             with open(file_path, 'wb') as f:
                 f.write(file_content)
 
+            # 압축 파일은 중첩 압축까지 멤버 목록을 만들고 압축 폭탄 한도를 검사
+            archive_manifest = None
+            if is_archive_file(attachment.filename):
+                archive_manifest = await asyncio.to_thread(inspect_archive, file_path, attachment.filename)
+                if archive_manifest["error"]:
+                    print(f"⚠️ 압축 파일 검사 실패: {attachment.filename} - {archive_manifest['error']}")
+
             # MongoDB에 저장할 첨부파일 데이터 준비 (Base64 인코딩)
             attachment_data = AttachmentData(
                 filename=attachment.filename,
                 content_type=attachment.content_type or "application/octet-stream",
                 size=len(file_content),
-                data=base64.b64encode(file_content).decode('utf-8')
+                data=base64.b64encode(file_content).decode('utf-8'),
+                archive=archive_manifest
             )
             attachment_data_list.append(attachment_data)
             print(f"✅ 첨부파일 준비: {attachment.filename} ({len(file_content)} bytes)")
@@ -110,8 +119,8 @@ def get_files():
             file_kind = "image"
         elif filename.endswith(".pdf"):
             file_kind = "pdf"
-        elif filename.endswith(".docx"):
-            file_kind = "docx"
+        elif filename.endswith((".docx", ".xlsx", ".pptx", ".hwp", ".hwpx", ".zip", ".7z")):
+            file_kind = os.path.splitext(filename)[1][1:]
         
         files_list.append(
             FileItem(
@@ -255,6 +264,17 @@ async def list_original_emails(
         # 전체 개수 조회
         total_count = await db.original_emails.count_documents(query)
 
+        # SMTP 전송 상태 (emails.delivery_status, 같은 메일을 여러 번 보냈으면 마지막 전송 기준)
+        deliveries = {}
+        email_ids = [email["email_id"] for email in emails if email.get("email_id")]
+        if email_ids:
+            delivery_cursor = db.emails.find(
+                {"source_email_id": {"$in": email_ids}},
+                {"_id": 0, "source_email_id": 1, "delivery_status": 1, "delivery_error": 1}
+            ).sort("created_at", 1)
+            async for delivery in delivery_cursor:
+                deliveries[delivery["source_email_id"]] = delivery
+
         # 첨부파일 필드명 변경 및 날짜 포맷 변환
         result_emails = []
         for email in emails:
@@ -279,6 +299,10 @@ async def list_original_emails(
                 from app.utils.datetime_utils import utc_to_kst
                 kst_dt = utc_to_kst(email["created_at"])
                 email["created_at"] = kst_dt.isoformat()
+
+            delivery = deliveries.get(email.get("email_id"), {})
+            email["delivery_status"] = delivery.get("delivery_status")
+            email["delivery_error"] = delivery.get("delivery_error")
             result_emails.append(email)
 
         return {
@@ -394,6 +418,11 @@ async def get_masked_email(
             kst_dt = utc_to_kst(masked_data["created_at"])
             masked_data["created_at"] = kst_dt.isoformat()
 
+        # GridFS에 저장된 첨부파일은 데이터 대신 다운로드 URL 제공
+        for att in masked_data.get("masked_attachments", []):
+            if att.get("file_id"):
+                att["download_url"] = f"/api/v1/process/masking/masked-file/{att['file_id']}"
+
         # 첨부파일 제외 옵션
         if not include_attachments and "masked_attachments" in masked_data:
             # 메타데이터만 포함 (masked_attachments 필드명 유지하되 data 제외)
@@ -401,7 +430,10 @@ async def get_masked_email(
                 {
                     "filename": att.get("filename"),
                     "content_type": att.get("content_type"),
-                    "size": att.get("size")
+                    "size": att.get("size"),
+                    "file_id": att.get("file_id"),
+                    "sha256": att.get("sha256"),
+                    "download_url": att.get("download_url")
                 }
                 for att in masked_data["masked_attachments"]
                 if att.get("filename")  # filename이 있는 것만 포함
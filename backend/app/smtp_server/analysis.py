@@ -0,0 +1,456 @@
+"""
+SMTP 수신 메일 자동 DLP 분석 파이프라인
+
+ingest 큐가 메일을 저장하면 메일 ID가 여기로 넘어오고, 워커(SMTP_ANALYSIS_CONCURRENCY개)가
+본문 → 첨부파일(GridFS) → (선택) RAG 마스킹 결정 순서로 분석해 결과를 emails 문서에 기록합니다.
+승인자는 메일을 열 때 이미 분석된 결과(analysis, analysis_summary)를 바로 봅니다.
+분석기(NER 모델)는 파이프라인에 하나만 로드해 워커가 함께 쓰고, 분석 호출은 스레드에서 실행되므로
+(NER 호출만 잠금으로 직렬화) 워커 수만큼 OCR·추출·규칙 분석이 이벤트 루프 밖에서 동시에 진행됩니다.
+
+분석 상태(analysis_status) - 승인 상태(status)와는 별개:
+    queued ──▶ analyzing ──▶ analyzed
+                   │    └──▶ failed   (SMTP_ANALYSIS_MAX_ATTEMPTS번 실패)
+                   └──▶ queued        (실패 후 재시도 대기)
+    analyzed / failed ──▶ queued      (재분석 요청)
+
+상태 변경은 "현재 상태가 허용된 이전 상태일 때만" 조건부 update로 하므로 여러 워커나 프로세스가
+같은 메일을 동시에 분석하지 않습니다. 큐가 가득 찼거나 서버가 재시작돼 놓친 메일은
+주기적으로 queued 메일을 찾아 다시 넣는 sweeper가 처리합니다.
+
+analyzing으로 가져갈 때 파이프라인 ID(analysis_owner)와 임대 시각(analysis_claimed_at)을 기록하고,
+분석하는 동안 임대를 갱신합니다. 결과 기록은 자기 임대일 때만 하며, 다른 프로세스의 analyzing 메일은
+임대가 SMTP_ANALYSIS_LEASE_SECONDS 넘게 갱신되지 않았을 때(프로세스가 죽음)만 sweeper가 queued로 되돌립니다.
+"""
+import asyncio
+import os
+import socket
+import tempfile
+import time
+import uuid
+from collections import deque
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from app.utils.datetime_utils import get_kst_now
+
+SMTP_ANALYSIS_CONCURRENCY = int(os.getenv("SMTP_ANALYSIS_CONCURRENCY", "2"))
+SMTP_ANALYSIS_QUEUE_SIZE = int(os.getenv("SMTP_ANALYSIS_QUEUE_SIZE", "1000"))
+SMTP_ANALYSIS_MAX_ATTEMPTS = int(os.getenv("SMTP_ANALYSIS_MAX_ATTEMPTS", "3"))
+# queued 상태로 남은 메일(큐 초과·재시도·재시작)을 다시 찾는 주기(초)
+SMTP_ANALYSIS_SWEEP_SECONDS = int(os.getenv("SMTP_ANALYSIS_SWEEP_SECONDS", "30"))
+# analyzing 임대 만료 시간(초): 이 동안 갱신이 없으면 프로세스가 죽은 것으로 보고 다시 대기열로
+SMTP_ANALYSIS_LEASE_SECONDS = int(os.getenv("SMTP_ANALYSIS_LEASE_SECONDS", "600"))
+SMTP_ANALYSIS_ENABLE_RAG = os.getenv("SMTP_ANALYSIS_ENABLE_RAG", "false").lower() == "true"
+# 본문 cid: 인라인 이미지로 읽어 올 첨부파일 최대 크기
+SMTP_ANALYSIS_INLINE_IMAGE_MAX_BYTES = int(os.getenv("SMTP_ANALYSIS_INLINE_IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+
+ANALYSIS_QUEUED = "queued"
+ANALYSIS_ANALYZING = "analyzing"
+ANALYSIS_ANALYZED = "analyzed"
+ANALYSIS_FAILED = "failed"
+
+# 상태 → 옮겨 갈 수 있는 상태
+ANALYSIS_TRANSITIONS = {
+    ANALYSIS_QUEUED: {ANALYSIS_ANALYZING},
+    ANALYSIS_ANALYZING: {ANALYSIS_ANALYZED, ANALYSIS_FAILED, ANALYSIS_QUEUED},
+    ANALYSIS_ANALYZED: {ANALYSIS_QUEUED},
+    ANALYSIS_FAILED: {ANALYSIS_QUEUED},
+}
+
+_DURATION_SAMPLES = 500
+
+
+async def advance_analysis_status(db, email_id, to_status: str, fields: Optional[Dict] = None,
+                                  from_statuses: Optional[Iterable[str]] = None, owner: Optional[str] = None) -> bool:
+    """
+    분석 상태를 옮깁니다. 현재 상태가 from_statuses(기본: to_status로 옮길 수 있는 모든 상태) 중
+    하나일 때만 바뀌며, 바뀌었으면 True. owner가 있으면 그 파이프라인이 임대한 메일일 때만 바뀝니다.
+    analyzing에서 벗어나면 임대 정보는 지웁니다.
+    """
+    allowed = [status for status, targets in ANALYSIS_TRANSITIONS.items() if to_status in targets]
+    if from_statuses is not None:
+        allowed = [status for status in allowed if status in set(from_statuses)]
+    query = {"_id": email_id, "analysis_status": {"$in": allowed}}
+    if owner is not None:
+        query["analysis_owner"] = owner
+    result = await db.emails.update_one(query, {"$set": {
+        "analysis_status": to_status, "analysis_updated_at": get_kst_now(),
+        "analysis_owner": None, "analysis_claimed_at": None, **(fields or {})
+    }})
+    return result.modified_count == 1
+
+
+def _email_context(email: Dict) -> Dict:
+    """RAG 판단용 메일 맥락: 수신자가 모두 발신자와 같은 도메인이면 내부 메일로 봄"""
+    def domain(address: str) -> str:
+        return address.strip().strip("<>").rsplit("@", 1)[-1].lower()
+
+    sender = email.get("from_email") or ""
+    recipients = [r for r in str(email.get("to_email") or "").split(",") if r.strip()]
+    internal = bool(recipients) and "@" in sender and all(domain(r) == domain(sender) for r in recipients)
+    return {
+        "sender_type": "internal",
+        "receiver_type": "internal" if internal else "external_customer",
+        "purpose": "일반 업무",
+        "has_consent": False,
+    }
+
+
+async def _download_to_temp(db, file_id: str, filename: str) -> str:
+    """GridFS 첨부파일을 청크 단위로 임시 파일에 내려받아 경로를 반환 (호출한 쪽에서 삭제)"""
+    from app.utils.gridfs_store import iter_gridfs_chunks, open_download_stream
+
+    grid_out = await open_download_stream(db, file_id)
+    with tempfile.NamedTemporaryFile(suffix=os.path.splitext(filename)[1], delete=False) as tmp:
+        try:
+            async for chunk in iter_gridfs_chunks(grid_out):
+                tmp.write(chunk)
+        except BaseException:
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+    return tmp.name
+
+
+async def _load_cid_parts(db, email: Dict) -> Dict:
+    """본문이 cid:로 참조하는 인라인 이미지 파트를 GridFS에서 읽음 {Content-ID: (바이트, content_type)}"""
+    from app.utils.gridfs_store import iter_gridfs_chunks, open_download_stream
+
+    body = email.get("original_body") or ""
+    cid_parts = {}
+    for attachment in email.get("attachments", []):
+        content_id = attachment.get("content_id")
+        if (not content_id or not attachment.get("file_id") or f"cid:{content_id}" not in body
+                or (attachment.get("size") or 0) > SMTP_ANALYSIS_INLINE_IMAGE_MAX_BYTES):
+            continue
+        grid_out = await open_download_stream(db, attachment["file_id"])
+        data = b"".join([chunk async for chunk in iter_gridfs_chunks(grid_out)])
+        cid_parts[content_id] = (data, attachment.get("content_type", "application/octet-stream"))
+    return cid_parts
+
+
+async def analyze_email(db, email: Dict, analyzer=None) -> Dict:
+    """
+    메일 한 통 분석: 본문(인라인 이미지 OCR 포함) → 첨부파일 → (선택) RAG 마스킹 결정
+    analyzer(NER 모델)를 넘기면 그대로 쓰고, 없으면 이 메일용으로 하나 만듭니다.
+
+    Returns:
+        dict: {"body", "attachments", "rag", "summary"} - PII에는 RAG 결정이 있으면 "masking_decision"이 붙음
+    """
+    from app.utils.recognizer_engine import (
+        create_analyzer, recognize_pii_in_attachment_file, recognize_pii_in_email_body
+    )
+
+    if analyzer is None:
+        analyzer = await create_analyzer(db)
+
+    # 1. 본문: data:/cid: 인라인 이미지는 떼어내 OCR, 나머지는 HTML을 걷어낸 텍스트로 분석
+    cid_parts = await _load_cid_parts(db, email)
+    body_result = await recognize_pii_in_email_body(
+        email.get("original_body") or "", db_client=db, cid_parts=cid_parts, analyzer=analyzer
+    )
+    body_result.pop("full_text", None)
+    for image in body_result.get("inline_images", []):
+        image.pop("full_text", None)
+    inline_ids = {image["content_id"] for image in body_result.get("inline_images", [])
+                  if image.get("content_id") and image.get("status") == "analyzed"}
+
+    # 2. 첨부파일: GridFS에서 임시 파일로 내려받아 형식별 분석 (본문에서 분석한 인라인 이미지는 제외)
+    attachment_results = []
+    for attachment in email.get("attachments", []):
+        filename = attachment.get("filename") or "attachment"
+        entry = {"filename": filename, "file_id": attachment.get("file_id"), "content_id": attachment.get("content_id")}
+        if attachment.get("content_id") in inline_ids:
+            entry.update(status="inline_image", pii_entities=[])
+        elif not attachment.get("file_id"):
+            entry.update(status="missing", pii_entities=[])
+        else:
+            temp_path = await _download_to_temp(db, attachment["file_id"], filename)
+            try:
+                result = await recognize_pii_in_attachment_file(temp_path, filename, db_client=db, analyzer=analyzer)
+            except Exception as e:
+                print(f"[DLP 분석] ⚠️ 첨부파일 분석 실패 ({filename}): {e}")
+                result = {"status": "error", "message": str(e), "pii_entities": []}
+            finally:
+                os.remove(temp_path)
+            result.pop("full_text", None)
+            entry.update(result)
+        attachment_results.append(entry)
+
+    # 3. RAG 마스킹 결정 (본문 + 인라인 이미지 + 첨부파일 PII 전체)
+    all_entities = list(body_result.get("pii_entities", []))
+    for image in body_result.get("inline_images", []):
+        all_entities.extend(image.get("pii_entities", []))
+    for entry in attachment_results:
+        all_entities.extend(entry.get("pii_entities", []))
+
+    rag = None
+    if SMTP_ANALYSIS_ENABLE_RAG and all_entities:
+        from app.utils.rag_integration import get_rag_engine
+
+        rag_result = await asyncio.to_thread(get_rag_engine().get_masking_decisions, all_entities, _email_context(email))
+        # 결정의 entity는 넘긴 dict와 같은 객체이므로 그대로 붙임
+        for decision in rag_result.get("decisions", []):
+            decision["entity"]["masking_decision"] = {
+                key: decision[key] for key in ("action", "reasoning", "referenced_guides", "referenced_laws", "confidence")
+            }
+        rag = {"enabled": rag_result.get("rag_enabled", False), "warnings": rag_result.get("warnings", [])}
+
+    pii_types: Dict[str, int] = {}
+    for entity in all_entities:
+        pii_types[entity["type"]] = pii_types.get(entity["type"], 0) + 1
+    actions = [entity["masking_decision"]["action"] for entity in all_entities if entity.get("masking_decision")]
+
+    return {
+        "body": body_result,
+        "attachments": attachment_results,
+        "rag": rag,
+        "summary": {
+            "pii_count": len(all_entities),
+            "pii_types": pii_types,
+            "mask_recommended": sum(1 for action in actions if action != "keep"),
+            "block_recommended": "block" in actions,
+            "attachment_errors": [entry["filename"] for entry in attachment_results
+                                  if entry["status"] in ("error", "archive_rejected")],
+        },
+    }
+
+
+class EmailAnalysisPipeline:
+    """메일 ID 큐 + 분석 워커 풀 + queued 메일 sweeper"""
+
+    def __init__(self, concurrency: int = SMTP_ANALYSIS_CONCURRENCY, maxsize: int = SMTP_ANALYSIS_QUEUE_SIZE):
+        self.concurrency = concurrency
+        self.maxsize = maxsize
+        # analyzing 임대에 기록하는 이 파이프라인의 ID (프로세스마다 다름)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._db = None
+        # 워커가 함께 쓰는 분석기 (NER 모델은 파이프라인당 한 번만 로드)
+        self._analyzer = None
+        self._analyzer_lock: Optional[asyncio.Lock] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending = set()  # 큐에 있거나 분석 중인 메일 ID (중복 투입 방지)
+        self._busy = 0
+        self.counters = {"enqueued": 0, "deferred": 0, "analyzed": 0, "retried": 0, "failed": 0, "reclaimed": 0}
+        self._durations = deque(maxlen=_DURATION_SAMPLES)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self, db=None):
+        """
+        워커·sweeper 시작. 다른 프로세스가 분석 중인 메일은 건드리지 않고,
+        임대가 만료된(분석하던 프로세스가 죽은) analyzing 메일만 sweeper가 queued로 되돌림
+        """
+        if self.running:
+            return
+        if db is None:
+            from app.database.mongodb import get_database
+            db = get_database()
+        self._db = db
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._analyzer_lock = asyncio.Lock()
+
+        # sweeper의 queued 조회(received_at 순)와 만료 임대 조회용
+        await db.emails.create_index([("analysis_status", 1), ("received_at", 1)])
+        await db.emails.create_index([("analysis_status", 1), ("analysis_claimed_at", 1)])
+
+        self._tasks = [asyncio.create_task(self._worker(index)) for index in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+        # 분석기(NER 모델)는 시작할 때 한 번 배경에서 로드 (앱 시작을 막지 않음, 워커는 로드가 끝날 때까지 대기)
+        self._tasks.append(asyncio.create_task(self._warm_up()))
+        print(f"[DLP 분석] ✅ 파이프라인 시작 (워커 {self.concurrency}개, RAG {'사용' if SMTP_ANALYSIS_ENABLE_RAG else '미사용'})")
+
+    async def stop(self):
+        """워커 종료. 이 파이프라인이 분석 중이던 메일은 queued로 되돌려 다른 프로세스·다음 시작 때 분석"""
+        if not self.running:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._pending.clear()
+        try:
+            released = await self._db.emails.update_many(
+                {"analysis_status": ANALYSIS_ANALYZING, "analysis_owner": self.owner},
+                {"$set": {"analysis_status": ANALYSIS_QUEUED, "analysis_owner": None,
+                          "analysis_claimed_at": None, "analysis_updated_at": get_kst_now()}}
+            )
+            if released.modified_count:
+                print(f"[DLP 분석] 🔄 분석 중이던 메일 {released.modified_count}건을 다시 대기열로")
+        except Exception as e:
+            print(f"[DLP 분석] ⚠️ 분석 중 메일 반환 실패 (임대 만료 후 다시 분석됨): {e}")
+        print(f"[DLP 분석] ✅ 파이프라인 종료 (분석 {self.counters['analyzed']}건)")
+
+    def enqueue(self, email_id) -> bool:
+        """
+        분석 대기열에 넣습니다 (파이프라인의 이벤트 루프에서 호출).
+        가득 찼으면 False - 메일은 queued로 남아 sweeper가 나중에 넣습니다.
+        """
+        if not self.running or email_id in self._pending:
+            return False
+        try:
+            self._queue.put_nowait(email_id)
+        except asyncio.QueueFull:
+            self.counters["deferred"] += 1
+            return False
+        self._pending.add(email_id)
+        self.counters["enqueued"] += 1
+        return True
+
+    def enqueue_many(self, email_ids: Iterable):
+        for email_id in email_ids:
+            self.enqueue(email_id)
+
+    def metrics_snapshot(self) -> Dict:
+        durations = sorted(self._durations)
+        return {
+            **self.counters,
+            "running": self.running,
+            "workers": self.concurrency,
+            "busy_workers": self._busy,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_capacity": self.maxsize,
+            "rag_enabled": SMTP_ANALYSIS_ENABLE_RAG,
+            "duration_ms": {
+                "avg": round(sum(durations) / len(durations) * 1000, 1) if durations else None,
+                "p95": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000, 1)
+                if durations else None,
+            },
+        }
+
+    async def _get_analyzer(self):
+        """공유 분석기 (처음 한 번 스레드에서 모델 로드). 커스텀 엔티티는 바뀌었을 때만 다시 로드"""
+        async with self._analyzer_lock:
+            if self._analyzer is None:
+                from app.utils.recognizer_engine import AnalyzerEngine
+
+                self._analyzer = await asyncio.to_thread(AnalyzerEngine, self._db)
+            await self._analyzer.reload_custom_entities()
+            return self._analyzer
+
+    async def _warm_up(self):
+        try:
+            await self._get_analyzer()
+        except Exception as e:
+            print(f"[DLP 분석] ⚠️ 분석기 준비 실패 (첫 분석 때 다시 시도): {e}")
+
+    async def reclaim_expired(self) -> int:
+        """임대가 만료된 analyzing 메일을 queued로 (임대 정보가 없는 이전 버전 문서는 마지막 갱신 시각 기준)"""
+        cutoff = get_kst_now() - timedelta(seconds=SMTP_ANALYSIS_LEASE_SECONDS)
+        result = await self._db.emails.update_many(
+            {"analysis_status": ANALYSIS_ANALYZING, "$or": [
+                {"analysis_claimed_at": {"$lt": cutoff}},
+                {"analysis_claimed_at": None, "analysis_updated_at": {"$lt": cutoff}},
+            ]},
+            {"$set": {"analysis_status": ANALYSIS_QUEUED, "analysis_owner": None,
+                      "analysis_claimed_at": None, "analysis_updated_at": get_kst_now()}}
+        )
+        if result.modified_count:
+            self.counters["reclaimed"] += result.modified_count
+            print(f"[DLP 분석] 🔄 임대가 만료된 분석 {result.modified_count}건을 다시 대기열로")
+        return result.modified_count
+
+    async def _renew_lease(self, email_id):
+        """분석하는 동안 임대 갱신 (만료 시간의 1/3 간격)"""
+        while True:
+            await asyncio.sleep(max(1, SMTP_ANALYSIS_LEASE_SECONDS // 3))
+            try:
+                await self._db.emails.update_one(
+                    {"_id": email_id, "analysis_status": ANALYSIS_ANALYZING, "analysis_owner": self.owner},
+                    {"$set": {"analysis_claimed_at": get_kst_now()}}
+                )
+            except Exception as e:
+                print(f"[DLP 분석] ⚠️ 임대 갱신 실패 ({email_id}): {e}")
+
+    async def _sweeper(self):
+        while True:
+            try:
+                await self.reclaim_expired()
+                free = self.maxsize - self._queue.qsize()
+                if free > 0:
+                    cursor = self._db.emails.find(
+                        {"analysis_status": ANALYSIS_QUEUED, "_id": {"$nin": list(self._pending)}},
+                        {"_id": 1}
+                    ).sort("received_at", 1).limit(free)
+                    async for doc in cursor:
+                        self.enqueue(doc["_id"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[DLP 분석] ⚠️ 대기 메일 조회 실패: {e}")
+            await asyncio.sleep(SMTP_ANALYSIS_SWEEP_SECONDS)
+
+    async def _worker(self, index: int):
+        while True:
+            email_id = await self._queue.get()
+            self._busy += 1
+            try:
+                await self._process(index, email_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[DLP 분석] ❌ 워커 {index}: {email_id} 처리 중 오류: {e}")
+            finally:
+                self._busy -= 1
+                self._pending.discard(email_id)
+                self._queue.task_done()
+
+    async def _process(self, index: int, email_id):
+        from pymongo import ReturnDocument
+
+        # queued → analyzing (다른 워커·프로세스가 먼저 가져갔으면 건너뜀), 이 파이프라인 이름으로 임대
+        now = get_kst_now()
+        email = await self._db.emails.find_one_and_update(
+            {"_id": email_id, "analysis_status": ANALYSIS_QUEUED},
+            {"$set": {"analysis_status": ANALYSIS_ANALYZING, "analysis_started_at": now,
+                      "analysis_updated_at": now, "analysis_owner": self.owner, "analysis_claimed_at": now},
+             "$inc": {"analysis_attempts": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if email is None:
+            return
+
+        started = time.perf_counter()
+        lease = asyncio.create_task(self._renew_lease(email_id))
+        try:
+            analysis = await analyze_email(self._db, email, await self._get_analyzer())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            attempts = email.get("analysis_attempts", 1)
+            if attempts >= SMTP_ANALYSIS_MAX_ATTEMPTS:
+                self.counters["failed"] += 1
+                await advance_analysis_status(self._db, email_id, ANALYSIS_FAILED, {"analysis_error": str(e)},
+                                              from_statuses=[ANALYSIS_ANALYZING], owner=self.owner)
+                print(f"[DLP 분석] ❌ 워커 {index}: {email_id} 분석 실패 ({attempts}회): {e}")
+            else:
+                # 다음 sweep 때 다시 분석
+                self.counters["retried"] += 1
+                await advance_analysis_status(self._db, email_id, ANALYSIS_QUEUED, {"analysis_error": str(e)},
+                                              from_statuses=[ANALYSIS_ANALYZING], owner=self.owner)
+                print(f"[DLP 분석] ⚠️ 워커 {index}: {email_id} 분석 실패, 재시도 예정 ({attempts}/{SMTP_ANALYSIS_MAX_ATTEMPTS}): {e}")
+            return
+        finally:
+            lease.cancel()
+
+        duration = time.perf_counter() - started
+        self._durations.append(duration)
+        stored = await advance_analysis_status(self._db, email_id, ANALYSIS_ANALYZED, {
+            "analysis": analysis,
+            "analysis_summary": analysis["summary"],
+            "pii_count": analysis["summary"]["pii_count"],
+            "analysis_error": None,
+            "analyzed_at": get_kst_now(),
+        }, from_statuses=[ANALYSIS_ANALYZING], owner=self.owner)
+        if stored:
+            self.counters["analyzed"] += 1
+            print(f"[DLP 분석] ✅ 워커 {index}: {email_id} 분석 완료 "
+                  f"(PII {analysis['summary']['pii_count']}개, {duration:.1f}s)")
+        else:
+            print(f"[DLP 분석] ⚠️ 워커 {index}: {email_id} 임대가 만료돼 다른 워커가 가져감 - 결과 버림")
+
+
+analysis_pipeline = EmailAnalysisPipeline()
@@ -5,17 +5,28 @@ SMTP 클라이언트를 사용한 메일 전송 유틸리티
 """
 import smtplib
 import os
+import re
+import uuid
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
 from email.utils import encode_rfc2231
-from typing import Optional, List
+from typing import Optional, List, NamedTuple
 import base64
 
+from app.smtp_server.pool import SMTPConnectionPool, SMTPServerConfig, smtp_pool
 from app.utils.datetime_utils import get_kst_now
 
 
+class PreparedMessage(NamedTuple):
+    """전송 준비가 끝난 메시지 (GridFS 첨부는 전송 시 스트리밍)"""
+    msg: MIMEMultipart
+    from_email: str
+    recipients: List[str]
+    streamed_attachments: List[dict]
+
+
 class SMTPEmailClient:
     """SMTP를 통한 이메일 전송 클라이언트 (TLS/SSL 지원)"""
 
@@ -28,6 +39,20 @@ class SMTPEmailClient:
         self.use_tls = os.getenv('SMTP_USE_TLS', 'true').lower() == 'true'
         self.use_ssl = os.getenv('SMTP_USE_SSL', 'false').lower() == 'true'
 
+    def resolve_config(self, smtp_config: Optional[dict] = None) -> SMTPServerConfig:
+        """사용자 SMTP 설정(없으면 환경변수)을 SMTPServerConfig로 변환"""
+        if not smtp_config:
+            return SMTPServerConfig(self.smtp_host, self.smtp_port, self.smtp_user, self.smtp_password,
+                                    self.use_tls, self.use_ssl)
+        return SMTPServerConfig(
+            host=smtp_config.get('smtp_host', self.smtp_host),
+            port=int(smtp_config.get('smtp_port', self.smtp_port)),
+            user=smtp_config.get('smtp_user', self.smtp_user) or '',
+            password=smtp_config.get('smtp_password', self.smtp_password) or '',
+            use_tls=bool(smtp_config.get('smtp_use_tls', smtp_config.get('use_tls', self.use_tls))),
+            use_ssl=bool(smtp_config.get('smtp_use_ssl', smtp_config.get('use_ssl', self.use_ssl))),
+        )
+
     def send_email(
         self,
         from_email: str,
@@ -40,7 +65,8 @@ class SMTPEmailClient:
         smtp_config: Optional[dict] = None
     ) -> dict:
         """
-        SMTP를 통해 이메일 전송
+        SMTP를 통해 이메일 전송 (동기, 풀의 연결 재사용).
+        API 라우트는 app.smtp_server.delivery의 전송 큐를 쓰고, 이 메서드는 스크립트·단발 전송용입니다.
 
         Args:
             from_email: 발신자 이메일
@@ -59,192 +85,12 @@ class SMTPEmailClient:
             dict: {"success": bool, "message": str, "sent_at": datetime}
         """
         try:
-            # 사용자 SMTP 설정이 제공된 경우 사용
-            if smtp_config:
-                smtp_host = smtp_config.get('smtp_host', self.smtp_host)
-                smtp_port = smtp_config.get('smtp_port', self.smtp_port)
-                smtp_user = smtp_config.get('smtp_user', self.smtp_user)
-                smtp_password = smtp_config.get('smtp_password', self.smtp_password)
-                use_tls = smtp_config.get('smtp_use_tls', smtp_config.get('use_tls', self.use_tls))
-                use_ssl = smtp_config.get('smtp_use_ssl', smtp_config.get('use_ssl', self.use_ssl))
-
-                print(f"[SMTP Client] 🔧 사용자 SMTP 설정 사용")
-                print(f"  Host: {smtp_host}")
-                print(f"  Port: {smtp_port}")
-                print(f"  User: {smtp_user}")
-            else:
-                smtp_host = self.smtp_host
-                smtp_port = self.smtp_port
-                smtp_user = self.smtp_user
-                smtp_password = self.smtp_password
-                use_tls = self.use_tls
-                use_ssl = self.use_ssl
-
-                print(f"[SMTP Client] 🔧 환경변수 SMTP 설정 사용")
-
-            # MIMEMultipart 메시지 생성
-            msg = MIMEMultipart()
-            msg['From'] = from_email
-            msg['To'] = to
-            msg['Subject'] = subject
-
-            if cc:
-                msg['Cc'] = cc
-            if bcc:
-                msg['Bcc'] = bcc
-
-            # 본문 추가 (HTML)
-            msg.attach(MIMEText(body, 'html', 'utf-8'))
-
-            # 첨부파일 추가
-            if attachments:
-                print(f"[SMTP Client] 📎 첨부파일 처리 시작: {len(attachments)}개")
-
-                for idx, attachment in enumerate(attachments):
-                    try:
-                        if not isinstance(attachment, dict):
-                            print(f"[SMTP Client] ⚠️ 첨부파일 #{idx}: dict 형태가 아님")
-                            continue
-
-                        filename = attachment.get('filename')
-                        if not filename:
-                            print(f"[SMTP Client] ⚠️ 첨부파일 #{idx}: filename 없음")
-                            continue
-
-                        print(f"[SMTP Client] 📦 첨부파일 #{idx}: {filename}")
-
-                        # Base64 데이터가 있는 경우 (MongoDB에서 온 경우)
-                        if 'data' in attachment and attachment['data']:
-                            print(f"[SMTP Client]   → Base64 데이터로 처리")
-                            
-                            base64_data = attachment['data']
-                            content_type = attachment.get('content_type', 'application/octet-stream')
-
-                            # Base64 디코딩
-                            try:
-                                file_data = base64.b64decode(base64_data)
-                                print(f"[SMTP Client]   → 디코딩 성공: {len(file_data)} bytes")
-                            except Exception as decode_error:
-                                print(f"[SMTP Client] ❌ Base64 디코딩 실패: {decode_error}")
-                                continue
-
-                            # MIME part 생성
-                            part = MIMEBase('application', 'octet-stream')
-                            part.set_payload(file_data)
-                            encoders.encode_base64(part)
-
-                            # RFC 2231 형식으로 한글 파일명 인코딩
-                            try:
-                                # UTF-8로 인코딩된 파일명 설정
-                                part.add_header(
-                                    'Content-Disposition',
-                                    'attachment',
-                                    filename=('utf-8', '', filename)
-                                )
-                            except Exception as header_error:
-                                print(f"[SMTP Client] ⚠️ 헤더 설정 실패, fallback 사용: {header_error}")
-                                # Fallback: 간단한 ASCII 헤더
-                                safe_filename = filename.encode('ascii', 'ignore').decode('ascii')
-                                part.add_header(
-                                    'Content-Disposition',
-                                    f'attachment; filename="{safe_filename}"'
-                                )
-
-                            msg.attach(part)
-                            print(f"[SMTP Client] ✅ Base64 첨부파일 추가: {filename} ({len(file_data)} bytes)")
-
-                        # 파일 경로가 있는 경우
-                        else:
-                            print(f"[SMTP Client]   → 파일 경로로 처리")
-                            
-                            # 프로젝트 루트 디렉토리 기준으로 uploads 경로 설정
-                            project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-                            uploads_dir = os.path.join(project_root, 'uploads')
-
-                            # 절대 경로 생성
-                            if os.path.isabs(filename):
-                                full_path = filename
-                            elif filename.startswith('uploads/') or filename.startswith('uploads\\'):
-                                full_path = os.path.join(project_root, filename)
-                            else:
-                                full_path = os.path.join(uploads_dir, filename)
-
-                            print(f"[SMTP Client]   → 파일 경로: {full_path}")
-
-                            if not os.path.exists(full_path):
-                                print(f"[SMTP Client] ❌ 파일 없음: {full_path}")
-                                continue
-
-                            with open(full_path, 'rb') as f:
-                                file_data = f.read()
-                                
-                            part = MIMEBase('application', 'octet-stream')
-                            part.set_payload(file_data)
-                            encoders.encode_base64(part)
-                            
-                            try:
-                                part.add_header(
-                                    'Content-Disposition',
-                                    'attachment',
-                                    filename=('utf-8', '', os.path.basename(filename))
-                                )
-                            except:
-                                safe_filename = os.path.basename(filename).encode('ascii', 'ignore').decode('ascii')
-                                part.add_header(
-                                    'Content-Disposition',
-                                    f'attachment; filename="{safe_filename}"'
-                                )
-                            
-                            msg.attach(part)
-                            print(f"[SMTP Client] ✅ 파일 첨부파일 추가: {os.path.basename(filename)} ({len(file_data)} bytes)")
-
-                    except Exception as e:
-                        print(f"[SMTP Client] ❌ 첨부파일 #{idx} 처리 오류: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        continue
+            config = self.resolve_config(smtp_config)
+            print(f"[SMTP Client] 🔧 {'사용자' if smtp_config else '환경변수'} SMTP 설정 사용 "
+                  f"({config.host}:{config.port}, {config.protocol})")
 
-            # 수신자 리스트 생성
-            recipients = [email.strip() for email in to.split(',')]
-            if cc:
-                recipients.extend([email.strip() for email in cc.split(',')])
-            if bcc:
-                recipients.extend([email.strip() for email in bcc.split(',')])
-
-            # SMTP 서버 연결 및 전송
-            print(f"[SMTP Client] 메일 전송 시작...")
-            print(f"  From: {from_email}")
-            print(f"  To: {to}")
-            print(f"  Subject: {subject}")
-            print(f"  Protocol: {'SSL' if use_ssl else 'TLS' if use_tls else 'Plain'}")
-            print(f"  SMTP Server: {smtp_host}:{smtp_port}")
-            print(f"  Attachments: {len(attachments) if attachments else 0}개")
-
-            # SMTP 서버 연결 (SSL 또는 TLS)
-            if use_ssl:
-                # SSL 사용 (포트 465)
-                print(f"[SMTP Client] SSL 연결 시도: {smtp_host}:{smtp_port}")
-                with smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=30) as server:
-                    # 인증 (설정된 경우)
-                    if smtp_user and smtp_password:
-                        server.login(smtp_user, smtp_password)
-
-                    # 메일 전송
-                    server.send_message(msg)
-            else:
-                # TLS 또는 Plain SMTP 사용 (포트 587 또는 25)
-                print(f"[SMTP Client] SMTP 연결 시도: {smtp_host}:{smtp_port}")
-                with smtplib.SMTP(smtp_host, smtp_port, timeout=30) as server:
-                    if use_tls:
-                        print(f"[SMTP Client] STARTTLS 활성화")
-                        server.starttls()
-
-                    # 인증 (설정된 경우)
-                    if smtp_user and smtp_password:
-                        server.login(smtp_user, smtp_password)
-
-                    # 메일 전송
-                    server.send_message(msg)
+            prepared = self.build_message(from_email, to, subject, body, cc, bcc, attachments)
+            self.deliver(config, prepared)
 
             sent_at = get_kst_now()
             print(f"[SMTP Client] ✅ 메일 전송 완료: {sent_at}")
@@ -284,6 +130,270 @@ class SMTPEmailClient:
                 "sent_at": None
             }
 
+    def build_message(
+        self,
+        from_email: str,
+        to: str,
+        subject: str,
+        body: str,
+        cc: Optional[str] = None,
+        bcc: Optional[str] = None,
+        attachments: Optional[List[dict]] = None
+    ) -> PreparedMessage:
+        """
+        MIME 메시지와 수신자 목록을 만듭니다 (파일·Base64 첨부는 여기서 읽고, GridFS 첨부는 전송 시 스트리밍).
+        전송 큐에 넣기 전에 호출하므로 이후 uploads 폴더가 비워져도 전송에는 영향이 없습니다.
+        """
+        # MIMEMultipart 메시지 생성
+        msg = MIMEMultipart()
+        msg['From'] = from_email
+        msg['To'] = to
+        msg['Subject'] = subject
+
+        if cc:
+            msg['Cc'] = cc
+        if bcc:
+            msg['Bcc'] = bcc
+
+        # 본문 추가 (HTML)
+        msg.attach(MIMEText(body, 'html', 'utf-8'))
+
+        # 첨부파일 추가
+        streamed_attachments = []
+        if attachments:
+            print(f"[SMTP Client] 📎 첨부파일 처리 시작: {len(attachments)}개")
+
+            for idx, attachment in enumerate(attachments):
+                try:
+                    if not isinstance(attachment, dict):
+                        print(f"[SMTP Client] ⚠️ 첨부파일 #{idx}: dict 형태가 아님")
+                        continue
+
+                    filename = attachment.get('filename')
+                    if not filename:
+                        print(f"[SMTP Client] ⚠️ 첨부파일 #{idx}: filename 없음")
+                        continue
+
+                    print(f"[SMTP Client] 📦 첨부파일 #{idx}: {filename}")
+
+                    # GridFS 파일인 경우: 전송 시점에 청크 단위로 스트리밍
+                    if attachment.get('file_id'):
+                        print(f"[SMTP Client]   → GridFS 스트리밍 전송 예약 ({attachment['file_id']})")
+                        streamed_attachments.append(attachment)
+
+                    # Base64 데이터가 있는 경우 (MongoDB에서 온 경우)
+                    elif 'data' in attachment and attachment['data']:
+                        print(f"[SMTP Client]   → Base64 데이터로 처리")
+                        
+                        base64_data = attachment['data']
+                        content_type = attachment.get('content_type', 'application/octet-stream')
+
+                        # Base64 디코딩
+                        try:
+                            file_data = base64.b64decode(base64_data)
+                            print(f"[SMTP Client]   → 디코딩 성공: {len(file_data)} bytes")
+                        except Exception as decode_error:
+                            print(f"[SMTP Client] ❌ Base64 디코딩 실패: {decode_error}")
+                            continue
+
+                        # MIME part 생성
+                        part = MIMEBase('application', 'octet-stream')
+                        part.set_payload(file_data)
+                        encoders.encode_base64(part)
+
+                        # RFC 2231 형식으로 한글 파일명 인코딩
+                        disposition = _set_content_id(part, attachment.get('content_id'))
+                        try:
+                            # UTF-8로 인코딩된 파일명 설정
+                            part.add_header(
+                                'Content-Disposition',
+                                disposition,
+                                filename=('utf-8', '', filename)
+                            )
+                        except Exception as header_error:
+                            print(f"[SMTP Client] ⚠️ 헤더 설정 실패, fallback 사용: {header_error}")
+                            # Fallback: 간단한 ASCII 헤더
+                            safe_filename = filename.encode('ascii', 'ignore').decode('ascii')
+                            part.add_header(
+                                'Content-Disposition',
+                                f'{disposition}; filename="{safe_filename}"'
+                            )
+
+                        msg.attach(part)
+                        print(f"[SMTP Client] ✅ Base64 첨부파일 추가: {filename} ({len(file_data)} bytes)")
+
+                    # 파일 경로가 있는 경우
+                    else:
+                        print(f"[SMTP Client]   → 파일 경로로 처리")
+                        
+                        # 프로젝트 루트 디렉토리 기준으로 uploads 경로 설정
+                        project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+                        uploads_dir = os.path.join(project_root, 'uploads')
+
+                        # 절대 경로 생성
+                        if os.path.isabs(filename):
+                            full_path = filename
+                        elif filename.startswith('uploads/') or filename.startswith('uploads\\'):
+                            full_path = os.path.join(project_root, filename)
+                        else:
+                            full_path = os.path.join(uploads_dir, filename)
+
+                        print(f"[SMTP Client]   → 파일 경로: {full_path}")
+
+                        if not os.path.exists(full_path):
+                            print(f"[SMTP Client] ❌ 파일 없음: {full_path}")
+                            continue
+
+                        with open(full_path, 'rb') as f:
+                            file_data = f.read()
+                            
+                        part = MIMEBase('application', 'octet-stream')
+                        part.set_payload(file_data)
+                        encoders.encode_base64(part)
+                        
+                        disposition = _set_content_id(part, attachment.get('content_id'))
+                        try:
+                            part.add_header(
+                                'Content-Disposition',
+                                disposition,
+                                filename=('utf-8', '', os.path.basename(filename))
+                            )
+                        except:
+                            safe_filename = os.path.basename(filename).encode('ascii', 'ignore').decode('ascii')
+                            part.add_header(
+                                'Content-Disposition',
+                                f'{disposition}; filename="{safe_filename}"'
+                            )
+                        
+                        msg.attach(part)
+                        print(f"[SMTP Client] ✅ 파일 첨부파일 추가: {os.path.basename(filename)} ({len(file_data)} bytes)")
+
+                except Exception as e:
+                    print(f"[SMTP Client] ❌ 첨부파일 #{idx} 처리 오류: {e}")
+                    import traceback
+                    traceback.print_exc()
+                    continue
+
+        # 수신자 리스트 생성
+        recipients = [email.strip() for email in to.split(',')]
+        if cc:
+            recipients.extend([email.strip() for email in cc.split(',')])
+        if bcc:
+            recipients.extend([email.strip() for email in bcc.split(',')])
+
+        return PreparedMessage(msg, from_email, recipients, streamed_attachments)
+
+    def deliver(self, config: SMTPServerConfig, prepared: PreparedMessage,
+                pool: Optional[SMTPConnectionPool] = None):
+        """풀에서 빌린 연결로 준비된 메시지 전송 (동기, 실패 시 smtplib 예외)"""
+        pool = pool or smtp_pool
+        print(f"[SMTP Client] 메일 전송 시작: {prepared.msg['Subject']} → {len(prepared.recipients)}명 "
+              f"({config.host}:{config.port}, {config.protocol})")
+        with pool.connection(config) as server:
+            self._send_message(server, prepared.msg, prepared.from_email,
+                               prepared.recipients, prepared.streamed_attachments)
+
+    def _send_message(self, server: smtplib.SMTP, msg: MIMEMultipart, from_email: str,
+                      recipients: List[str], streamed_attachments: List[dict]):
+        """
+        메시지 전송. GridFS 첨부파일이 있으면 DATA 명령을 직접 열고
+        본문 뒤에 첨부파일을 청크 단위 Base64로 흘려보내 전체 파일을 메모리에 올리지 않습니다.
+        """
+        if not streamed_attachments:
+            server.send_message(msg)
+            return
+
+        from app.database.mongodb import get_sync_database
+        from app.utils.gridfs_store import iter_gridfs_chunks_sync
+
+        db = get_sync_database()
+
+        # Bcc는 수신자 목록에만 쓰고 헤더로는 보내지 않음 (send_message와 동일)
+        del msg['Bcc']
+        boundary = msg.get_boundary()
+        if not boundary:
+            boundary = f"==============={uuid.uuid4().hex}=="
+            msg.set_boundary(boundary)
+        head = msg.as_bytes(policy=msg.policy.clone(linesep="\r\n"))
+        closing = f"--{boundary}--".encode("ascii")
+        head = head[:head.rindex(closing)]
+
+        server.ehlo_or_helo_if_needed()
+        code, resp = server.mail(from_email)
+        if code != 250:
+            raise smtplib.SMTPSenderRefused(code, resp, from_email)
+        refused = {}
+        for recipient in recipients:
+            code, resp = server.rcpt(recipient)
+            if code not in (250, 251):
+                refused[recipient] = (code, resp)
+        if len(refused) == len(recipients):
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        code, resp = server.docmd("DATA")
+        if code != 354:
+            raise smtplib.SMTPDataError(code, resp)
+
+        server.send(_quote_periods(head))
+        for attachment in streamed_attachments:
+            filename = attachment['filename']
+            part = MIMEBase(*attachment.get('content_type', 'application/octet-stream').split('/', 1))
+            part['Content-Transfer-Encoding'] = 'base64'
+            disposition = _set_content_id(part, attachment.get('content_id'))
+            part.add_header('Content-Disposition', disposition, filename=('utf-8', '', filename))
+            part.set_payload('')
+            part_head = part.as_bytes(policy=part.policy.clone(linesep="\r\n"))
+
+            server.send(_quote_periods(f"--{boundary}\r\n".encode("ascii") + part_head))
+            sent = 0
+            for line_block in _iter_base64_lines(iter_gridfs_chunks_sync(db, attachment['file_id'])):
+                server.send(line_block)
+                sent += len(line_block)
+            print(f"[SMTP Client] ✅ GridFS 첨부파일 스트리밍: {filename} ({sent} bytes encoded)")
+
+        server.send(closing + b"\r\n.\r\n")
+        code, resp = server.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, resp)
+
+
+def _set_content_id(part: MIMEBase, content_id: Optional[str]) -> str:
+    """
+    본문에서 cid:로 참조하는 인라인 이미지면 Content-ID를 붙이고 'inline'을,
+    아니면 'attachment'를 반환 (Content-Disposition 값)
+    """
+    if not content_id:
+        return 'attachment'
+    part['Content-ID'] = f"<{content_id.strip().strip('<>')}>"
+    return 'inline'
+
+
+def _quote_periods(data: bytes) -> bytes:
+    """SMTP DATA 투명성: 줄 맨 앞의 '.'을 '..'으로 변환"""
+    return re.sub(rb'(?m)^\.', b'..', data)
+
+
+def _iter_base64_lines(chunks, line_bytes: int = 57, lines_per_block: int = 1024):
+    """바이트 청크를 76자 줄 단위 Base64 블록(CRLF 포함)으로 인코딩"""
+    block_size = line_bytes * lines_per_block
+    pending = b""
+    for chunk in chunks:
+        pending += chunk
+        if len(pending) < block_size:
+            continue
+        cut = len(pending) - len(pending) % line_bytes
+        yield _encode_base64_lines(pending[:cut], line_bytes)
+        pending = pending[cut:]
+    if pending:
+        yield _encode_base64_lines(pending, line_bytes)
+
+
+def _encode_base64_lines(data: bytes, line_bytes: int) -> bytes:
+    return b"".join(
+        base64.b64encode(data[i:i + line_bytes]) + b"\r\n"
+        for i in range(0, len(data), line_bytes)
+    )
+
 
 # 싱글톤 인스턴스
 smtp_client = SMTPEmailClient()
\ No newline at end of file
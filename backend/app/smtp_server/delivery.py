@@ -0,0 +1,294 @@
+"""
+발신 메일 전송 큐
+
+API 라우트는 메시지를 만들어 큐에 넣고 바로 응답하며, 워커(SMTP_DELIVERY_CONCURRENCY개)가
+app.smtp_server.pool의 연결 풀에서 인증된 연결을 빌려 스레드(asyncio.to_thread)에서 전송합니다.
+같은 서버로 가는 메일은 연결·STARTTLS·로그인을 다시 하지 않습니다.
+
+전송 상태(emails 문서의 delivery_status - 승인 상태 status와는 별개):
+    queued ──▶ sending ──▶ sent
+                  │   └──▶ failed   (영구 오류 5xx·인증 실패, 또는 SMTP_DELIVERY_MAX_ATTEMPTS번 실패)
+                  └──▶ queued       (일시 오류 4xx·연결 끊김 → 지수 백오프 후 재시도)
+
+API 라우트는 대기열 등록(email_queue)만 감사 로그에 남기고, 전송 완료·최종 실패(email_send)는
+워커가 job.audit 정보로 기록합니다.
+
+큐는 메모리에만 있습니다. SMTP 비밀번호를 DB에 남기지 않기 위해서이며, 서버가 재시작되면
+전송 중이던 메일은 시작 시 failed(delivery_error)로 표시됩니다.
+
+지표(전송률, 큐 깊이, 전송 지연, 연결 재사용)는 metrics_snapshot()으로 조회합니다
+(GET /api/v1/smtp/delivery/metrics).
+"""
+import asyncio
+import os
+import smtplib
+import time
+from collections import deque
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from app.audit.logger import AuditLogger
+from app.smtp_server.client import PreparedMessage, smtp_client
+from app.smtp_server.pool import SMTPConnectionPool, SMTPServerConfig, smtp_pool
+from app.utils.datetime_utils import get_kst_now
+
+SMTP_DELIVERY_CONCURRENCY = int(os.getenv("SMTP_DELIVERY_CONCURRENCY", "8"))
+SMTP_DELIVERY_QUEUE_SIZE = int(os.getenv("SMTP_DELIVERY_QUEUE_SIZE", "1000"))
+SMTP_DELIVERY_MAX_ATTEMPTS = int(os.getenv("SMTP_DELIVERY_MAX_ATTEMPTS", "5"))
+# n번째 재시도는 base * 2^(n-1)초 뒤 (최대 _RETRY_MAX_SECONDS)
+SMTP_DELIVERY_RETRY_BASE_SECONDS = float(os.getenv("SMTP_DELIVERY_RETRY_BASE_SECONDS", "2"))
+_RETRY_MAX_SECONDS = 300.0
+
+DELIVERY_QUEUED = "queued"
+DELIVERY_SENDING = "sending"
+DELIVERY_SENT = "sent"
+DELIVERY_FAILED = "failed"
+
+_LATENCY_SAMPLES = 1000
+_RATE_WINDOW_SECONDS = 60.0
+
+
+class DeliveryAudit(NamedTuple):
+    """전송 결과 감사 로그에 남길 보낸 사람·메일 정보"""
+    user_email: str
+    user_role: str
+    to_emails: List[str]
+    subject: str
+    has_attachments: bool = False
+
+
+class DeliveryJob(NamedTuple):
+    """전송 작업 (메모리 큐 전용 - 비밀번호가 들어 있으므로 DB에 저장하지 않음)"""
+    config: SMTPServerConfig
+    message: PreparedMessage
+    email_id: Optional[object] = None          # emails 문서 _id (상태 기록용, 없으면 기록 안 함)
+    on_sent: Optional[Callable[[], None]] = None  # 전송 성공 후 호출 (이벤트 루프에서)
+    audit: Optional[DeliveryAudit] = None      # 전송 완료/최종 실패 감사 로그 (없으면 기록 안 함)
+    attempt: int = 1
+    enqueued_at: float = 0.0
+
+
+def is_transient_error(error: Exception) -> bool:
+    """다시 보내면 성공할 수 있는 오류인지 (4xx 응답, 연결 끊김·타임아웃)"""
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    return isinstance(error, OSError)
+
+
+class EmailDeliveryService:
+    """전송 큐 + 워커 풀 + 재시도 스케줄러"""
+
+    def __init__(self, concurrency: int = SMTP_DELIVERY_CONCURRENCY, maxsize: int = SMTP_DELIVERY_QUEUE_SIZE,
+                 pool: Optional[SMTPConnectionPool] = None):
+        self.concurrency = concurrency
+        self.maxsize = maxsize
+        self.pool = pool or smtp_pool
+        self._db = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+        self._retry_handles = set()
+        self._busy = 0
+        self.counters = {"enqueued": 0, "rejected": 0, "sent": 0, "retried": 0, "failed": 0}
+        self._sent_at = deque()
+        self._send_latency = deque(maxlen=_LATENCY_SAMPLES)   # 전송 1건 (연결 대기 포함)
+        self._e2e_latency = deque(maxlen=_LATENCY_SAMPLES)    # 큐 진입 → 전송 완료
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self, db=None):
+        """워커 시작. 이전 실행에서 queued/sending에 멈춘 메일은 failed로 표시"""
+        if self.running:
+            return
+        if db is None:
+            from app.database.mongodb import get_database
+            db = get_database()
+        self._db = db
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+
+        interrupted = await db.emails.update_many(
+            {"delivery_status": {"$in": [DELIVERY_QUEUED, DELIVERY_SENDING]}},
+            {"$set": {"delivery_status": DELIVERY_FAILED, "delivery_error": "서버 재시작으로 전송이 중단되었습니다",
+                      "delivery_updated_at": get_kst_now()}}
+        )
+        if interrupted.modified_count:
+            print(f"[SMTP Delivery] ⚠️ 재시작으로 중단된 전송 {interrupted.modified_count}건을 failed로 표시")
+
+        self._tasks = [asyncio.create_task(self._worker(index)) for index in range(self.concurrency)]
+        print(f"[SMTP Delivery] ✅ 전송 큐 시작 (워커 {self.concurrency}개, 서버당 연결 {self.pool.max_per_server}개)")
+
+    async def stop(self, timeout: float = 30.0):
+        """큐에 남은 메일을 timeout까지 보낸 뒤 워커 종료, 풀의 연결을 QUIT"""
+        if not self.running:
+            return
+        for handle in self._retry_handles:
+            handle.cancel()
+        self._retry_handles.clear()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[SMTP Delivery] ⚠️ 종료 시 보내지 못한 메일: {self._queue.qsize()}개")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(self.pool.close_all)
+        print(f"[SMTP Delivery] ✅ 전송 큐 종료 (전송 {self.counters['sent']}건)")
+
+    def is_full(self) -> bool:
+        return self._queue is None or self._queue.full()
+
+    def enqueue(self, job: DeliveryJob) -> bool:
+        """
+        전송 큐에 넣습니다 (서비스의 이벤트 루프에서 호출).
+        시작 전이거나 가득 찼으면 False - 호출한 쪽에서 503으로 응답합니다.
+        """
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(job._replace(enqueued_at=job.enqueued_at or time.monotonic()))
+        except asyncio.QueueFull:
+            self.counters["rejected"] += 1
+            return False
+        self.counters["enqueued"] += 1
+        return True
+
+    def metrics_snapshot(self) -> Dict:
+        now = time.monotonic()
+        while self._sent_at and now - self._sent_at[0] > _RATE_WINDOW_SECONDS:
+            self._sent_at.popleft()
+        send_ms = sorted(s * 1000 for s in self._send_latency)
+        e2e_ms = sorted(s * 1000 for s in self._e2e_latency)
+
+        def summary(samples: List[float]) -> Dict:
+            return {
+                "avg": round(sum(samples) / len(samples), 2) if samples else None,
+                "p95": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2) if samples else None,
+            }
+
+        return {
+            **self.counters,
+            "running": self.running,
+            "workers": self.concurrency,
+            "busy_workers": self._busy,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_capacity": self.maxsize,
+            "retry_scheduled": len(self._retry_handles),
+            "sent_per_sec": round(len(self._sent_at) / _RATE_WINDOW_SECONDS, 2),
+            "send_latency_ms": summary(send_ms),
+            "end_to_end_latency_ms": summary(e2e_ms),
+            "pool": self.pool.snapshot(),
+        }
+
+    async def _set_status(self, job: DeliveryJob, status: str, fields: Optional[Dict] = None):
+        if job.email_id is None or self._db is None:
+            return
+        try:
+            await self._db.emails.update_one(
+                {"_id": job.email_id},
+                {"$set": {"delivery_status": status, "delivery_attempts": job.attempt,
+                          "delivery_updated_at": get_kst_now(), **(fields or {})}}
+            )
+        except Exception as e:
+            print(f"[SMTP Delivery] ⚠️ {job.email_id} 상태 기록 실패 ({status}): {e}")
+
+    async def _audit(self, job: DeliveryJob, error: Optional[str] = None):
+        """전송 완료(error=None) 또는 최종 실패 감사 로그"""
+        if job.audit is None:
+            return
+        try:
+            await AuditLogger.log_email_send(
+                user_email=job.audit.user_email,
+                user_role=job.audit.user_role,
+                to_emails=job.audit.to_emails,
+                subject=job.audit.subject,
+                has_attachments=job.audit.has_attachments,
+                email_id=str(job.email_id) if job.email_id is not None else None,
+                success=error is None,
+                error_message=error,
+            )
+        except Exception as e:
+            print(f"[SMTP Delivery] ⚠️ {job.email_id} 감사 로그 기록 실패: {e}")
+
+    async def _fail(self, job: DeliveryJob, error: str):
+        self.counters["failed"] += 1
+        await self._set_status(job, DELIVERY_FAILED, {"delivery_error": error})
+        await self._audit(job, error)
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                job = await asyncio.wait_for(self._queue.get(), self.pool.idle_seconds)
+            except asyncio.TimeoutError:
+                # 한동안 보낼 메일이 없으면 오래 쉰 연결 정리
+                await asyncio.to_thread(self.pool.prune)
+                continue
+            self._busy += 1
+            try:
+                await self._deliver(index, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[SMTP Delivery] ❌ 워커 {index}: 전송 처리 중 오류: {e}")
+            finally:
+                self._busy -= 1
+                self._queue.task_done()
+
+    async def _deliver(self, index: int, job: DeliveryJob):
+        await self._set_status(job, DELIVERY_SENDING)
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(smtp_client.deliver, job.config, job.message, self.pool)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._handle_failure(index, job, e)
+            return
+
+        self._send_latency.append(time.perf_counter() - started)
+        self._e2e_latency.append(time.monotonic() - job.enqueued_at)
+        self._sent_at.append(time.monotonic())
+        self.counters["sent"] += 1
+        await self._set_status(job, DELIVERY_SENT, {"sent_at": get_kst_now(), "delivery_error": None})
+        await self._audit(job)
+        print(f"[SMTP Delivery] ✅ 워커 {index}: 전송 완료 {job.message.msg['Subject']} "
+              f"(→ {len(job.message.recipients)}명, {job.attempt}회차)")
+        if job.on_sent is not None:
+            try:
+                job.on_sent()
+            except Exception as e:
+                print(f"[SMTP Delivery] ⚠️ 전송 후 콜백 실패: {e}")
+
+    async def _handle_failure(self, index: int, job: DeliveryJob, error: Exception):
+        if is_transient_error(error) and job.attempt < SMTP_DELIVERY_MAX_ATTEMPTS:
+            delay = min(_RETRY_MAX_SECONDS, SMTP_DELIVERY_RETRY_BASE_SECONDS * 2 ** (job.attempt - 1))
+            self.counters["retried"] += 1
+            await self._set_status(job, DELIVERY_QUEUED, {"delivery_error": str(error)})
+            print(f"[SMTP Delivery] ⚠️ 워커 {index}: 전송 실패, {delay:.0f}초 뒤 재시도 "
+                  f"({job.attempt}/{SMTP_DELIVERY_MAX_ATTEMPTS}): {error}")
+            retry = job._replace(attempt=job.attempt + 1)
+            handle = self._loop.call_later(delay, self._requeue, retry)
+            self._retry_handles.add(handle)
+            return
+
+        await self._fail(job, str(error))
+        print(f"[SMTP Delivery] ❌ 워커 {index}: 전송 실패 ({job.attempt}회): {error}")
+
+    def _requeue(self, job: DeliveryJob):
+        self._retry_handles = {handle for handle in self._retry_handles if not handle.cancelled()
+                               and handle.when() > self._loop.time()}
+        if not self.enqueue(job):
+            asyncio.ensure_future(self._fail(job, "전송 큐가 가득 차 재시도하지 못했습니다"))
+
+
+delivery_service = EmailDeliveryService()
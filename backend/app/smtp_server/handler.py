@@ -8,14 +8,21 @@ FastAPI용 SMTP 핸들러
 """
 
 import asyncio
-from email import message_from_bytes, policy
 from aiosmtpd.controller import Controller
 from datetime import datetime,timedelta
 import sys
 import os
+import tempfile
 
 from app.auth.integrity import verify_integrity_token
+from bson import ObjectId
 from app.database.mongodb import get_sync_database
+from app.utils.archive_extractor import inspect_archive, is_archive_file
+from app.utils.inline_images import normalize_content_id
+from app.utils.gridfs_store import GridFSTarget, GridFSUploadWriter, delete_files_sync
+from app.smtp_server.ingest import ingest_queue
+from app.smtp_server.analysis import ANALYSIS_QUEUED
+from app.smtp_server.mime_stream import open_message_source, parse_message_stream
 
 # SMTP 서버 포트 설정
 SMTP_SERVER_HOST = '127.0.0.1'
@@ -35,7 +42,7 @@ class FastAPISMTPHandler:
     1. 프록시로부터 메일 수신
     2. X-DLP-Token 헤더로 무결성 검증
     3. 메일을 메타데이터로 파싱
-    4. MongoDB에 저장
+    4. 저장 큐에 넣고 응답 (MongoDB 저장은 ingest 큐의 writer가 배치로 수행)
     """
 
     async def handle_DATA(self, server, session, envelope):
@@ -46,17 +53,25 @@ class FastAPISMTPHandler:
         1. 프록시가 메일을 SMTP로 전송
         2. X-DLP-Token 헤더와 함께 수신
         3. 토큰으로 무결성 검증
-        4. MongoDB에 저장 (동기 방식)
+        4. 저장 큐에 넣기 (큐가 가득 차면 451로 응답해 보내는 쪽이 재전송)
 
-        주의: 이 함수는 aiosmtpd의 비동기 핸들러이지만,
-             MongoDB 저장은 별도의 메서드에서 동기로 수행합니다.
+        주의: 이 핸들러는 aiosmtpd Controller 스레드의 이벤트 루프에서 실행되므로
+             DB에 직접 쓰지 않고 FastAPI 루프의 ingest 큐로 넘깁니다.
         """
 
         print(f"\n[FastAPI SMTP] 📬 메일 수신 시작...")
 
+        # 큐가 이미 가득 찼으면 파싱하기 전에 거절 (백프레셔)
+        if ingest_queue.is_full():
+            print(f"[FastAPI SMTP] ⚠️ 저장 큐가 가득 참 → 451")
+            return '451 4.3.0 Mail queue full, try again later'
+
+        email_id = ObjectId()
+        stored_file_ids = []
         try:
-            # 1️⃣ 메일 파싱
-            mail = message_from_bytes(envelope.content, policy=policy.default)
+            # 1️⃣ 메일 파싱 (스트리밍: 첨부파일은 디코딩하면서 바로 해시 계산·GridFS 저장)
+            parsed = await asyncio.to_thread(_parse_and_store, envelope.content, email_id, stored_file_ids)
+            mail = parsed.headers
 
             from_email = mail.get('From')
             to_email = mail.get('To')
@@ -102,36 +117,51 @@ class FastAPISMTPHandler:
                 print(f"  (주의: SMTP 헤더 추가로 원본 바이너리가 변경되어 토큰 검증 생략)")
                 print(f"       → 정확한 검증을 위해서는 별도 설계 필요")
 
-            # 3️⃣ 메일 본문 및 첨부파일 추출
-            body = ""
-            body_part = mail.get_body(preferencelist=('plain', 'html'))
-            if body_part:
-                body = body_part.get_content()
+            # 3️⃣ 메일 본문 및 첨부파일 정리
+            body = parsed.body
 
             attachments = []
-            for part in mail.iter_attachments():
-                att_data = part.get_payload(decode=True)
-                attachments.append({
-                    "filename": part.get_filename(),
-                    "content_type": part.get_content_type(),
-                    "size": len(att_data),
-                    "hash": __import__('hashlib').sha256(att_data).hexdigest()
-                })
+            policy_violations = []
+            for stored in parsed.attachments:
+                attachment = {
+                    "filename": stored["filename"],
+                    "content_type": stored["content_type"],
+                    "size": stored["size"],
+                    "hash": stored["sha256"],
+                    "file_id": stored["file_id"]
+                }
+                # 본문에서 cid:로 참조하는 인라인 이미지는 마스킹 후에도 같은 Content-ID로 보내야 함
+                if stored["content_id"]:
+                    attachment["content_id"] = normalize_content_id(stored["content_id"])
+
+                # 압축 파일은 멤버 목록을 기록하고 압축 폭탄·암호화 멤버를 정책 위반으로 표시
+                if "archive" in stored:
+                    manifest = stored["archive"]
+                    attachment["archive"] = manifest
+                    encrypted = [m["path"] for m in manifest["members"] if m["status"] == "encrypted"]
+                    if manifest["error"]:
+                        policy_violations.append(f"압축 파일 검사 실패 ({attachment['filename']}): {manifest['error']}")
+                    elif encrypted:
+                        policy_violations.append(f"암호화된 압축 멤버 ({attachment['filename']}): {', '.join(encrypted)}")
+                    print(f"  📦 {attachment['filename']}: 멤버 {len(manifest['members'])}개"
+                          f"{' / ' + manifest['error'] if manifest['error'] else ''}")
+
+                attachments.append(attachment)
 
             print(f"[FastAPI SMTP] ✅ 메일 콘텐츠 추출 완료")
             print(f"  첨부파일: {len(attachments)}개")
 
-            # 4️⃣ MongoDB에 저장 (동기 방식)
-            # 이벤트 루프 충돌을 피하기 위해 동기 DB 클라이언트 사용
-            db = get_sync_database()
-
+            # 4️⃣ 저장 큐에 넣기
+            # _id를 미리 정해 두어 첨부파일(GridFS metadata)과 연결하고, writer가 재시도해도 같은 문서로 저장되게 함
             email_record = {
+                "_id": email_id,
                 "from_email": from_email,
                 "to_email": to_email,
                 "subject": subject,
                 "original_body": body,
                 "masked_body": None,
                 "status": "approved",
+                "analysis_status": ANALYSIS_QUEUED,  # 저장되면 자동 DLP 분석 대기열로 들어감
                 "attachments": attachments,
                 "team_name": None,  # TODO: 사용자 정보에서 팀 추출
                 "content_hash": content_hash,
@@ -140,28 +170,91 @@ class FastAPISMTPHandler:
                 "received_at": get_kst_now(),
                 "dlp_verified": dlp_verified,
                 "dlp_verified_at": get_kst_now() if dlp_verified else None,
-                "dlp_policy_violation": None,
+                "dlp_policy_violation": "; ".join(policy_violations) or None,
                 "reviewed_at": None,
                 "reviewed_by": None,
                 "reject_reason": None
             }
 
-            # 동기 방식으로 저장 (await 불필요)
-            result = db.emails.insert_one(email_record)
+            if not await ingest_queue.submit(email_record):
+                print(f"[FastAPI SMTP] ⚠️ 저장 큐가 가득 참 → 451")
+                await _discard_attachments(stored_file_ids)
+                return '451 4.3.0 Mail queue full, try again later'
 
-            print(f"[FastAPI SMTP] ✅ MongoDB에 저장 완료")
-            print(f"  Document ID: {result.inserted_id}")
+            print(f"[FastAPI SMTP] ✅ 저장 큐에 등록")
+            print(f"  Document ID: {email_record['_id']}")
             print(f"  검증 상태: {'✅ 토큰 수신됨' if dlp_verified else '❌ 토큰 없음'}\n")
 
-            return '250 OK: Message accepted and stored'
+            return '250 OK: Message accepted for delivery'
 
         except Exception as e:
             print(f"[FastAPI SMTP] ❌ 오류 발생: {e}")
             import traceback
             traceback.print_exc()
+            await _discard_attachments(stored_file_ids)
             return '500 Internal Server Error'
 
 
+class _AttachmentWriter:
+    """
+    수신 첨부파일 writer (mime_stream 파서가 디코딩한 청크를 받음)
+    GridFS에 바로 저장하고, 압축 파일이면 구조 검사용으로 임시 파일에도 씁니다.
+    """
+
+    def __init__(self, db, email_id: ObjectId, headers, stored_file_ids: list):
+        self._filename = headers.get_filename() or "attachment"
+        self._stored_file_ids = stored_file_ids
+        self._upload = GridFSUploadWriter(db, GridFSTarget(
+            filename=self._filename,
+            content_type=headers.get_content_type(),
+            metadata={"kind": "smtp_attachment", "email_id": str(email_id)}
+        ))
+        self._archive = None
+        if is_archive_file(self._filename):
+            self._archive = tempfile.NamedTemporaryFile(suffix=os.path.splitext(self._filename)[1], delete=False)
+
+    def write(self, chunk: bytes):
+        self._upload.write(chunk)
+        if self._archive is not None:
+            self._archive.write(chunk)
+
+    def close(self) -> dict:
+        stored = self._upload.close()
+        self._stored_file_ids.append(stored["file_id"])
+        if self._archive is not None:
+            self._archive.close()
+            try:
+                stored["archive"] = inspect_archive(self._archive.name, self._filename)
+            finally:
+                os.remove(self._archive.name)
+        return stored
+
+    def abort(self):
+        self._upload.abort()
+        if self._archive is not None:
+            self._archive.close()
+            os.remove(self._archive.name)
+
+
+def _parse_and_store(content: bytes, email_id: ObjectId, stored_file_ids: list):
+    """메일을 스트리밍으로 파싱하면서 첨부파일을 GridFS에 저장 (동기, 스레드에서 실행)"""
+    db = get_sync_database()
+    with open_message_source(content) as source:
+        return parse_message_stream(
+            source, lambda headers: _AttachmentWriter(db, email_id, headers, stored_file_ids)
+        )
+
+
+async def _discard_attachments(file_ids: list):
+    """저장하지 못한 메일의 첨부파일을 GridFS에서 삭제"""
+    if not file_ids:
+        return
+    try:
+        await asyncio.to_thread(delete_files_sync, get_sync_database(), file_ids)
+    except Exception as e:
+        print(f"[FastAPI SMTP] ⚠️ 첨부파일 정리 실패: {e}")
+
+
 async def start_smtp_server():
     """
     FastAPI용 SMTP 서버 시작
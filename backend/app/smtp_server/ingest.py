@@ -0,0 +1,265 @@
+"""
+SMTP 수신 메일 저장 큐
+
+handle_DATA에서 MongoDB에 바로 쓰지 않고, 크기가 제한된 asyncio 큐에 넣은 뒤 응답합니다.
+큐는 FastAPI 이벤트 루프에서 motor 기반 writer 태스크들이 비우며, 모인 문서를 insert_many로
+묶어 저장합니다. 큐가 가득 차면 submit이 False를 돌려주고 핸들러는 451(일시적 실패)로 응답해
+보내는 쪽 MTA가 나중에 다시 보내게 합니다.
+
+aiosmtpd Controller는 별도 스레드의 이벤트 루프에서 핸들러를 실행하므로, submit은 큐가 있는
+루프로 run_coroutine_threadsafe를 통해 넘깁니다 (같은 루프면 바로 넣음).
+
+지표(수신율, 큐 깊이, 저장 지연)는 metrics_snapshot()으로 조회합니다 (GET /api/v1/smtp/ingest/metrics).
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+SMTP_INGEST_QUEUE_SIZE = int(os.getenv("SMTP_INGEST_QUEUE_SIZE", "1000"))
+SMTP_INGEST_WRITERS = int(os.getenv("SMTP_INGEST_WRITERS", "2"))
+SMTP_INGEST_BATCH_SIZE = int(os.getenv("SMTP_INGEST_BATCH_SIZE", "100"))
+# 첫 문서를 꺼낸 뒤 배치를 채우려고 기다리는 최대 시간
+SMTP_INGEST_BATCH_WAIT_MS = int(os.getenv("SMTP_INGEST_BATCH_WAIT_MS", "20"))
+SMTP_INGEST_WRITE_RETRIES = int(os.getenv("SMTP_INGEST_WRITE_RETRIES", "3"))
+
+# 지표 계산용 최근 기록 개수 / 수신율 계산 구간(초)
+_LATENCY_SAMPLES = 1000
+_RATE_WINDOW_SECONDS = 60.0
+
+
+def _percentile(samples: List[float], fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class IngestMetrics:
+    """수신·저장 지표 (큐가 있는 이벤트 루프에서만 갱신)"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.received = 0        # submit 호출 수
+        self.accepted = 0        # 큐에 들어간 메일
+        self.rejected = 0        # 큐가 가득 차 451로 거절한 메일
+        self.written = 0         # 저장 완료
+        self.write_errors = 0    # 재시도 후에도 저장 실패
+        self.batches = 0
+        self.max_depth = 0
+        self._accepted_at = deque()  # 최근 _RATE_WINDOW_SECONDS 동안 받은 시각
+        self._write_latency = deque(maxlen=_LATENCY_SAMPLES)   # insert_many 소요 시간
+        self._e2e_latency = deque(maxlen=_LATENCY_SAMPLES)     # 큐 진입 → 저장 완료
+        self._batch_sizes = deque(maxlen=_LATENCY_SAMPLES)
+
+    def record_accept(self, depth: int):
+        now = time.monotonic()
+        self.accepted += 1
+        self.max_depth = max(self.max_depth, depth)
+        self._accepted_at.append(now)
+        while self._accepted_at and now - self._accepted_at[0] > _RATE_WINDOW_SECONDS:
+            self._accepted_at.popleft()
+
+    def record_batch(self, size: int, write_seconds: float, enqueued_at: List[float]):
+        now = time.monotonic()
+        self.batches += 1
+        self.written += size
+        self._batch_sizes.append(size)
+        self._write_latency.append(write_seconds)
+        self._e2e_latency.extend(now - t for t in enqueued_at)
+
+    def snapshot(self, depth: int, capacity: int) -> Dict:
+        now = time.monotonic()
+        recent = [t for t in self._accepted_at if now - t <= _RATE_WINDOW_SECONDS]
+        window = min(_RATE_WINDOW_SECONDS, max(time.time() - self.started_at, 1e-9))
+        write_ms = [s * 1000 for s in self._write_latency]
+        e2e_ms = [s * 1000 for s in self._e2e_latency]
+        return {
+            "received": self.received,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "written": self.written,
+            "write_errors": self.write_errors,
+            "batches": self.batches,
+            "ingest_rate_per_sec": round(len(recent) / window, 2),
+            "queue_depth": depth,
+            "queue_capacity": capacity,
+            "queue_max_depth": self.max_depth,
+            "avg_batch_size": round(sum(self._batch_sizes) / len(self._batch_sizes), 1) if self._batch_sizes else None,
+            "write_latency_ms": {
+                "avg": round(sum(write_ms) / len(write_ms), 2) if write_ms else None,
+                "p95": round(_percentile(write_ms, 0.95), 2) if write_ms else None,
+            },
+            "end_to_end_latency_ms": {
+                "avg": round(sum(e2e_ms) / len(e2e_ms), 2) if e2e_ms else None,
+                "p95": round(_percentile(e2e_ms, 0.95), 2) if e2e_ms else None,
+            },
+        }
+
+
+class EmailIngestQueue:
+    """크기 제한 큐 + insert_many 배치 writer"""
+
+    def __init__(self, maxsize: int = SMTP_INGEST_QUEUE_SIZE, writers: int = SMTP_INGEST_WRITERS,
+                 batch_size: int = SMTP_INGEST_BATCH_SIZE, batch_wait_ms: int = SMTP_INGEST_BATCH_WAIT_MS,
+                 collection_name: str = "emails"):
+        self.maxsize = maxsize
+        self.writers = writers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.collection_name = collection_name
+        self.metrics = IngestMetrics()
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+        self._collection = None
+        self._on_written: Optional[Callable[[List], None]] = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self, db=None, on_written: Optional[Callable[[List], None]] = None):
+        """
+        현재 이벤트 루프에서 writer 태스크 시작 (db를 주지 않으면 get_database())
+        on_written: 저장된 문서 _id 목록을 받는 콜백 (같은 루프에서 호출, 예: 자동 분석 대기열)
+        """
+        if self.running:
+            return
+        self._on_written = on_written
+        if db is None:
+            from app.database.mongodb import get_database
+            db = get_database()
+        self._collection = db[self.collection_name]
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.create_task(self._writer(index)) for index in range(self.writers)]
+        print(f"[SMTP Ingest] ✅ 저장 큐 시작 (크기 {self.maxsize}, writer {self.writers}개, 배치 {self.batch_size})")
+
+    async def stop(self, timeout: float = 10.0):
+        """남은 문서를 timeout까지 저장한 뒤 writer 종료"""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[SMTP Ingest] ⚠️ 종료 시 저장하지 못한 메일: {self._queue.qsize()}개")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        print(f"[SMTP Ingest] ✅ 저장 큐 종료 (저장 {self.metrics.written}개)")
+
+    def is_full(self) -> bool:
+        """큐가 가득 찼는지 (다른 스레드에서 읽어도 되는 근삿값)"""
+        return self._queue is None or self._queue.full()
+
+    def _offer(self, document: Dict) -> bool:
+        self.metrics.received += 1
+        try:
+            self._queue.put_nowait((time.monotonic(), document))
+        except asyncio.QueueFull:
+            self.metrics.rejected += 1
+            return False
+        self.metrics.record_accept(self._queue.qsize())
+        return True
+
+    async def _offer_async(self, document: Dict) -> bool:
+        return self._offer(document)
+
+    async def submit(self, document: Dict) -> bool:
+        """
+        저장할 메일 문서를 큐에 넣습니다. 큐가 가득 찼거나 시작 전이면 False (호출한 쪽에서 451 응답).
+        다른 이벤트 루프(aiosmtpd 스레드)에서 호출해도 됩니다.
+        """
+        if not self.running:
+            return False
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        if current is self._loop:
+            return self._offer(document)
+        future = asyncio.run_coroutine_threadsafe(self._offer_async(document), self._loop)
+        return await asyncio.wrap_future(future)
+
+    def metrics_snapshot(self) -> Dict:
+        depth = self._queue.qsize() if self._queue is not None else 0
+        snapshot = self.metrics.snapshot(depth, self.maxsize)
+        snapshot["running"] = self.running
+        snapshot["writers"] = self.writers
+        return snapshot
+
+    async def _next_batch(self) -> List:
+        """첫 문서를 기다린 뒤 batch_wait 동안 batch_size까지 더 모음"""
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.batch_wait
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _writer(self, index: int):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._write_batch(index, batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write_batch(self, index: int, batch: List):
+        documents = [document for _, document in batch]
+        for attempt in range(1, SMTP_INGEST_WRITE_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                await self._collection.insert_many(documents, ordered=False)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 일부 문서만 실패(BulkWriteError)하면 나머지는 이미 저장됐으므로 다시 넣지 않음.
+                # 재시도 중의 중복 키(11000)는 앞선 시도에서 저장된 문서(_id가 같음)라 성공으로 셈
+                details = getattr(e, "details", None) or {}
+                failed = {error.get("index") for error in details.get("writeErrors", [])
+                          if not (attempt > 1 and error.get("code") == 11000)}
+                if details.get("writeErrors"):
+                    self.metrics.write_errors += len(failed)
+                    written = [item for position, item in enumerate(batch) if position not in failed]
+                    self.metrics.record_batch(len(written), time.perf_counter() - started, [t for t, _ in written])
+                    self._notify_written([document for _, document in written])
+                    if failed:
+                        print(f"[SMTP Ingest] ⚠️ writer {index}: {len(failed)}개 저장 실패 ({e})")
+                    return
+                if attempt == SMTP_INGEST_WRITE_RETRIES:
+                    self.metrics.write_errors += len(documents)
+                    print(f"[SMTP Ingest] ❌ writer {index}: 메일 {len(documents)}개 저장 실패 ({e})")
+                    return
+                print(f"[SMTP Ingest] ⚠️ writer {index}: 저장 재시도 {attempt}/{SMTP_INGEST_WRITE_RETRIES} ({e})")
+                await asyncio.sleep(0.2 * 2 ** (attempt - 1))
+                continue
+
+            self.metrics.record_batch(len(documents), time.perf_counter() - started, [t for t, _ in batch])
+            self._notify_written(documents)
+            return
+
+    def _notify_written(self, documents: List[Dict]):
+        if self._on_written is None:
+            return
+        try:
+            self._on_written([document["_id"] for document in documents if "_id" in document])
+        except Exception as e:
+            print(f"[SMTP Ingest] ⚠️ 저장 후 콜백 실패: {e}")
+
+
+ingest_queue = EmailIngestQueue()
@@ -0,0 +1,330 @@
+"""
+수신 메일 스트리밍 MIME 파서
+
+message_from_bytes는 메일 전체를 Message 트리로 올리고, get_payload(decode=True)가 첨부파일마다
+디코딩된 사본을 또 만들기 때문에 50MB 메일이면 메모리에 여러 벌이 생깁니다.
+
+여기서는 메일을 줄 단위로 읽으면서
+- 각 파트의 헤더는 BytesFeedParser에 조금씩 넣어 파싱하고
+- 본문 텍스트(text/plain, text/html)만 메모리에 모으고
+- 첨부파일은 Content-Transfer-Encoding(base64 / quoted-printable / 7bit·8bit·binary)을 스트리밍으로
+  풀어 바로 writer(해시 계산 + GridFS 저장)에 넘깁니다.
+그래서 첨부파일 크기와 관계없이 메일당 추가 메모리가 일정합니다.
+
+SMTP_SPOOL_THRESHOLD_BYTES보다 큰 메일은 먼저 디스크 임시 파일로 옮긴 뒤 그 파일에서 읽습니다.
+"""
+import binascii
+import os
+import re
+import tempfile
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesFeedParser
+from io import BytesIO
+from typing import BinaryIO, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+SMTP_SPOOL_THRESHOLD_BYTES = int(os.getenv("SMTP_SPOOL_THRESHOLD_BYTES", str(8 * 1024 * 1024)))
+
+# 중첩 multipart 최대 깊이 (넘으면 안쪽 multipart를 하나의 첨부파일로 취급)
+MIME_MAX_DEPTH = 10
+# 한 번에 읽는 최대 줄 길이 (줄바꿈 없는 바이너리 파트도 이 단위로 끊어 읽음)
+_READ_LINE_LIMIT = 64 * 1024
+# 파트 헤더 최대 크기 (빈 줄 없이 계속되면 여기서 헤더를 끝냄)
+_MAX_HEADER_BYTES = 256 * 1024
+# base64 줄을 모아서 한 번에 디코딩하는 단위
+_DECODE_BATCH_BYTES = 64 * 1024
+_SPOOL_COPY_CHUNK = 1024 * 1024
+
+_B64_INVALID = re.compile(rb"[^A-Za-z0-9+/=]")
+_EOLS = (b"\r\n", b"\n", b"\r")
+
+
+class ParsedMessage(NamedTuple):
+    """
+    스트리밍 파싱 결과
+
+    headers: 최상위 헤더 (EmailMessage, 본문 없음)
+    body: text/plain 우선, 없으면 text/html 본문
+    attachments: [{**writer.close() 결과, "filename", "content_type", "content_id"}, ...]
+    """
+    headers: EmailMessage
+    body: str
+    attachments: List[Dict]
+
+
+def open_message_source(content: bytes) -> BinaryIO:
+    """
+    파싱용 입력. 임계값 이하는 복사 없이 메모리에서, 넘으면 임시 파일에 나눠 써서 디스크에서 읽습니다.
+    (임시 파일은 닫으면 삭제됨)
+    """
+    if len(content) <= SMTP_SPOOL_THRESHOLD_BYTES:
+        return BytesIO(content)
+
+    spool = tempfile.TemporaryFile(prefix="smtp_spool_")
+    view = memoryview(content)
+    for offset in range(0, len(view), _SPOOL_COPY_CHUNK):
+        spool.write(view[offset:offset + _SPOOL_COPY_CHUNK])
+    spool.seek(0)
+    return spool
+
+
+def _split_eol(line: bytes) -> Tuple[bytes, bytes]:
+    for eol in _EOLS:
+        if line.endswith(eol):
+            return line[:-len(eol)], eol
+    return line, b""
+
+
+class _LineReader:
+    """줄 단위 읽기. 긴 줄은 _READ_LINE_LIMIT로 끊고, 줄의 시작인지(경계 후보인지) 함께 돌려줌"""
+
+    def __init__(self, source: BinaryIO):
+        self._source = source
+        self._at_line_start = True
+
+    def readline(self) -> Tuple[bytes, bool]:
+        line = self._source.readline(_READ_LINE_LIMIT)
+        at_line_start = self._at_line_start
+        self._at_line_start = line.endswith(b"\n")
+        return line, at_line_start
+
+
+def _match_boundary(line: bytes, boundaries: List[bytes]) -> Optional[Tuple[int, bool]]:
+    """경계 줄이면 (boundaries 안의 위치, 닫는 경계 여부)"""
+    if not line.startswith(b"--"):
+        return None
+    stripped = line.rstrip(b" \t\r\n")
+    for level in range(len(boundaries) - 1, -1, -1):
+        delimiter = b"--" + boundaries[level]
+        if stripped == delimiter:
+            return level, False
+        if stripped == delimiter + b"--":
+            return level, True
+    return None
+
+
+# ==================== Content-Transfer-Encoding 디코더 ====================
+# 파트 본문의 마지막 줄바꿈은 다음 경계에 속하므로, 줄바꿈은 다음 줄이 올 때까지 보류합니다.
+
+class _RawDecoder:
+    """7bit / 8bit / binary"""
+
+    def __init__(self, write: Callable[[bytes], None]):
+        self._write = write
+        self._eol = b""
+
+    def feed(self, content: bytes, eol: bytes):
+        data = self._eol + content
+        if data:
+            self._write(data)
+        self._eol = eol
+
+    def close(self, keep_last_eol: bool):
+        if keep_last_eol and self._eol:
+            self._write(self._eol)
+
+
+class _QuotedPrintableDecoder(_RawDecoder):
+    def feed(self, content: bytes, eol: bytes):
+        if eol and content.endswith(b"="):
+            # 소프트 줄바꿈: 줄을 이어 붙임
+            super().feed(binascii.a2b_qp(content[:-1]), b"")
+        else:
+            super().feed(binascii.a2b_qp(content), eol)
+
+
+class _Base64Decoder:
+    def __init__(self, write: Callable[[bytes], None]):
+        self._write = write
+        self._lines: List[bytes] = []
+        self._buffered = 0
+        self._remainder = b""
+
+    def feed(self, content: bytes, eol: bytes):
+        self._lines.append(content)
+        self._buffered += len(content)
+        if self._buffered >= _DECODE_BATCH_BYTES:
+            self._flush()
+
+    def _flush(self):
+        data = self._remainder + _B64_INVALID.sub(b"", b"".join(self._lines))
+        self._lines, self._buffered = [], 0
+        usable = len(data) - len(data) % 4
+        if usable:
+            try:
+                self._write(binascii.a2b_base64(data[:usable]))
+            except binascii.Error:
+                pass
+        self._remainder = data[usable:]
+
+    def close(self, keep_last_eol: bool):
+        self._flush()
+        tail = self._remainder.rstrip(b"=")
+        if len(tail) % 4 > 1:
+            try:
+                self._write(binascii.a2b_base64(tail + b"=" * (-len(tail) % 4)))
+            except binascii.Error:
+                pass
+        self._remainder = b""
+
+
+def _decoder_for(headers: EmailMessage, write: Callable[[bytes], None]):
+    encoding = str(headers.get("Content-Transfer-Encoding", "7bit")).strip().lower()
+    if encoding == "base64":
+        return _Base64Decoder(write)
+    if encoding == "quoted-printable":
+        return _QuotedPrintableDecoder(write)
+    return _RawDecoder(write)
+
+
+# ==================== 파서 ====================
+
+def _is_body_candidate(headers: EmailMessage) -> bool:
+    return (headers.get_content_type() in ("text/plain", "text/html")
+            and headers.get_content_disposition() != "attachment"
+            and not headers.get_filename())
+
+
+def _decode_text(data: bytes, headers: EmailMessage) -> str:
+    charset = headers.get_content_charset() or "us-ascii"
+    try:
+        return data.decode(charset, errors="replace")
+    except LookupError:
+        return data.decode("utf-8", errors="replace")
+
+
+class _StreamingParser:
+    def __init__(self, source: BinaryIO, open_attachment: Callable[[EmailMessage], object]):
+        self._reader = _LineReader(source)
+        self._open_attachment = open_attachment
+        self.top_headers: Optional[EmailMessage] = None
+        self.bodies: Dict[str, str] = {}
+        self.attachments: List[Dict] = []
+        self._open_writers: List[object] = []
+
+    def _read_headers(self, boundaries: List[bytes]) -> Tuple[EmailMessage, Optional[Tuple[int, bool]], bool]:
+        """파트 헤더를 빈 줄까지 읽음. Returns: (헤더, 헤더 중간에 만난 경계, EOF 여부)"""
+        parser = BytesFeedParser(policy=policy.default)
+        size = 0
+        while True:
+            line, at_line_start = self._reader.readline()
+            if not line:
+                parser.feed(b"\r\n")
+                return parser.close(), None, True
+            boundary = _match_boundary(line, boundaries) if at_line_start else None
+            if boundary is not None:
+                parser.feed(b"\r\n")
+                return parser.close(), boundary, False
+            if at_line_start and line in _EOLS:
+                parser.feed(b"\r\n")
+                return parser.close(), None, False
+            parser.feed(line)
+            size += len(line)
+            if size > _MAX_HEADER_BYTES:
+                parser.feed(b"\r\n\r\n")
+                return parser.close(), None, False
+
+    def _skip_to_boundary(self, boundaries: List[bytes]) -> Optional[Tuple[int, bool]]:
+        """프리앰블·에필로그를 버리고 다음 경계까지 이동 (EOF면 None)"""
+        while True:
+            line, at_line_start = self._reader.readline()
+            if not line:
+                return None
+            boundary = _match_boundary(line, boundaries) if at_line_start else None
+            if boundary is not None:
+                return boundary
+
+    def _pump_body(self, headers: EmailMessage, boundaries: List[bytes],
+                   write: Callable[[bytes], None]) -> Optional[Tuple[int, bool]]:
+        """다음 경계까지 본문을 디코딩해 write로 넘김"""
+        decoder = _decoder_for(headers, write)
+        while True:
+            line, at_line_start = self._reader.readline()
+            if not line:
+                decoder.close(keep_last_eol=True)
+                return None
+            boundary = _match_boundary(line, boundaries) if at_line_start else None
+            if boundary is not None:
+                decoder.close(keep_last_eol=False)
+                return boundary
+            decoder.feed(*_split_eol(line))
+
+    def _parse_leaf(self, headers: EmailMessage, boundaries: List[bytes]) -> Optional[Tuple[int, bool]]:
+        if _is_body_candidate(headers):
+            chunks: List[bytes] = []
+            boundary = self._pump_body(headers, boundaries, chunks.append)
+            subtype = headers.get_content_subtype()
+            if subtype not in self.bodies:
+                self.bodies[subtype] = _decode_text(b"".join(chunks), headers)
+            return boundary
+
+        writer = self._open_attachment(headers)
+        self._open_writers.append(writer)
+        boundary = self._pump_body(headers, boundaries, writer.write)
+        stored = writer.close()
+        self._open_writers.remove(writer)
+
+        content_id = headers.get("Content-ID")
+        self.attachments.append({
+            **stored,
+            "filename": headers.get_filename(),
+            "content_type": headers.get_content_type(),
+            "content_id": str(content_id) if content_id else None,
+        })
+        return boundary
+
+    def parse_entity(self, boundaries: List[bytes], depth: int = 0) -> Optional[Tuple[int, bool]]:
+        """
+        헤더 + 본문 하나를 읽습니다.
+        Returns: 이 엔티티를 끝낸 경계 (boundaries 안의 위치, 닫는 경계 여부). EOF면 None
+        """
+        headers, boundary, eof = self._read_headers(boundaries)
+        if self.top_headers is None:
+            self.top_headers = headers
+        if boundary is not None or eof:
+            return boundary
+
+        inner = headers.get_boundary() if headers.get_content_maintype() == "multipart" else None
+        if not inner or depth >= MIME_MAX_DEPTH:
+            return self._parse_leaf(headers, boundaries)
+
+        nested = boundaries + [inner.encode("utf-8", errors="surrogateescape")]
+        level = len(nested) - 1
+        boundary = self._skip_to_boundary(nested)
+        while boundary is not None and boundary == (level, False):
+            boundary = self.parse_entity(nested, depth + 1)
+        if boundary == (level, True):
+            # 에필로그는 버리고 바깥 경계까지 이동
+            boundary = self._skip_to_boundary(boundaries) if boundaries else None
+        return boundary
+
+    def abort(self):
+        for writer in self._open_writers:
+            writer.abort()
+        self._open_writers = []
+
+
+def parse_message_stream(source: BinaryIO, open_attachment: Callable[[EmailMessage], object]) -> ParsedMessage:
+    """
+    메일을 스트리밍으로 파싱합니다.
+
+    Args:
+        source: 메일 원문 (open_message_source 결과)
+        open_attachment: 첨부파일 파트 헤더를 받아 writer를 돌려주는 함수.
+            writer는 write(bytes), close() -> dict, abort()를 가져야 합니다.
+            (실패하면 이미 닫힌 첨부파일 정리는 호출한 쪽에서 합니다)
+
+    Returns:
+        ParsedMessage
+    """
+    parser = _StreamingParser(source, open_attachment)
+    try:
+        parser.parse_entity([])
+    except BaseException:
+        parser.abort()
+        raise
+
+    body = parser.bodies.get("plain")
+    if body is None:
+        body = parser.bodies.get("html", "")
+    return ParsedMessage(parser.top_headers, body, parser.attachments)
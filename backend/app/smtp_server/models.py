@@ -30,6 +30,7 @@ class EmailSendRequest(BaseModel):
     attachments: Optional[List[dict]] = None
     masked_email_id: Optional[str] = None  # 마스킹된 이메일 ID (MongoDB)
     use_masked_email: bool = False  # 마스킹된 이메일 사용 여부
+    source_email_id: Optional[str] = None  # 작성한 원본 이메일 ID (original_emails.email_id, 전송 상태 조회용)
 
     # [제거] 이 필드는 더 이상 클라이언트가 보내지 않음
     # smtp_config: Optional[SMTPSettings] = None 
@@ -38,7 +39,9 @@ class EmailSendResponse(BaseModel):
     success: bool
     message: str
     email_id: str
-    sent_at: datetime
+    status: str = "queued"  # 전송 상태: queued → sending → sent / failed (GET /smtp/emails/{email_id}의 delivery_status로 확인)
+    queued_at: Optional[datetime] = None
+    sent_at: Optional[datetime] = None
 
 class EmailListResponse(BaseModel):
     emails: List[dict]
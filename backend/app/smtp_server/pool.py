@@ -0,0 +1,197 @@
+"""
+발신 SMTP 연결 풀
+
+메일마다 TCP 연결 → STARTTLS 핸드셰이크 → 로그인을 반복하지 않도록, 인증까지 끝난 smtplib 연결을
+(호스트, 포트, 계정, 비밀번호 해시, SSL/TLS) 단위로 보관했다가 다음 메일에 다시 씁니다.
+비밀번호 해시를 키에 넣으므로 같은 계정이라도 다른 비밀번호로는 기존(인증된) 연결을 받지 못합니다.
+
+- 서버별 동시 연결 수는 SMTP_POOL_MAX_PER_SERVER로 제한 (넘으면 반납될 때까지 대기)
+- SMTP_POOL_IDLE_SECONDS보다 오래 쉰 연결은 닫고, 잠깐이라도 쉰 연결은 NOOP으로 살아 있는지 확인
+- 연결 하나로 SMTP_POOL_MAX_MESSAGES개를 보내면 QUIT 후 새로 연결 (서버 측 제한 대비)
+- 전송 중 예외가 난 연결은 상태를 알 수 없으므로 다시 쓰지 않고 닫음
+
+smtplib은 동기 라이브러리라 풀은 스레드(asyncio.to_thread)에서 사용합니다.
+"""
+import hashlib
+import os
+import smtplib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, NamedTuple
+
+SMTP_POOL_MAX_PER_SERVER = int(os.getenv("SMTP_POOL_MAX_PER_SERVER", "4"))
+SMTP_POOL_IDLE_SECONDS = int(os.getenv("SMTP_POOL_IDLE_SECONDS", "60"))
+SMTP_POOL_MAX_MESSAGES = int(os.getenv("SMTP_POOL_MAX_MESSAGES", "100"))
+SMTP_TIMEOUT_SECONDS = int(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+
+# 이 시간 이상 쉰 연결은 꺼내기 전에 NOOP으로 확인
+_NOOP_AFTER_SECONDS = 5.0
+
+
+class SMTPServerConfig(NamedTuple):
+    """발신 SMTP 서버 접속 정보"""
+    host: str
+    port: int
+    user: str = ""
+    password: str = ""
+    use_tls: bool = True
+    use_ssl: bool = False
+
+    @property
+    def pool_key(self) -> tuple:
+        secret = hashlib.sha256(self.password.encode("utf-8")).hexdigest() if self.password else ""
+        return (self.host, int(self.port), self.user, secret, bool(self.use_ssl), bool(self.use_tls))
+
+    @property
+    def protocol(self) -> str:
+        return "SSL" if self.use_ssl else "TLS" if self.use_tls else "Plain"
+
+
+class _PooledConnection:
+    __slots__ = ("server", "last_used", "messages")
+
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.last_used = time.monotonic()
+        self.messages = 0
+
+
+def open_smtp_connection(config: SMTPServerConfig) -> smtplib.SMTP:
+    """SMTP 서버에 연결하고 STARTTLS·로그인까지 마친 연결을 반환"""
+    if config.use_ssl:
+        server = smtplib.SMTP_SSL(config.host, config.port, timeout=SMTP_TIMEOUT_SECONDS)
+    else:
+        server = smtplib.SMTP(config.host, config.port, timeout=SMTP_TIMEOUT_SECONDS)
+    try:
+        if config.use_tls and not config.use_ssl:
+            server.starttls()
+        if config.user and config.password:
+            server.login(config.user, config.password)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+
+class SMTPConnectionPool:
+    """서버(pool_key)별 유휴 연결 보관 + 동시 연결 수 제한 (스레드 안전)"""
+
+    def __init__(self, max_per_server: int = SMTP_POOL_MAX_PER_SERVER,
+                 idle_seconds: int = SMTP_POOL_IDLE_SECONDS, max_messages: int = SMTP_POOL_MAX_MESSAGES):
+        self.max_per_server = max_per_server
+        self.idle_seconds = idle_seconds
+        self.max_messages = max_messages
+        self._lock = threading.Lock()
+        self._idle: Dict[tuple, deque] = {}
+        self._slots: Dict[tuple, threading.BoundedSemaphore] = {}
+        self.counters = {"connects": 0, "reuses": 0, "discards": 0, "expired": 0}
+
+    @contextmanager
+    def connection(self, config: SMTPServerConfig) -> Iterator[smtplib.SMTP]:
+        """
+        연결을 빌려 씁니다. 블록이 정상 종료되면 풀로 돌아가고, 예외가 나면 닫힙니다.
+
+            with smtp_pool.connection(config) as server:
+                server.send_message(msg)
+        """
+        key = config.pool_key
+        slot = self._slot(key)
+        slot.acquire()
+        try:
+            pooled = self._checkout(key, config)
+            try:
+                yield pooled.server
+            except BaseException:
+                self._count("discards")
+                pooled.server.close()
+                raise
+            pooled.messages += 1
+            pooled.last_used = time.monotonic()
+            if pooled.messages >= self.max_messages:
+                _quit(pooled.server)
+            else:
+                with self._lock:
+                    self._idle.setdefault(key, deque()).append(pooled)
+        finally:
+            slot.release()
+
+    def prune(self):
+        """idle_seconds보다 오래 쉰 연결을 닫음"""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for idle in self._idle.values():
+                fresh = [pooled for pooled in idle if now - pooled.last_used <= self.idle_seconds]
+                expired.extend(pooled for pooled in idle if now - pooled.last_used > self.idle_seconds)
+                idle.clear()
+                idle.extend(fresh)
+            self.counters["expired"] += len(expired)
+        for pooled in expired:
+            _quit(pooled.server)
+
+    def close_all(self):
+        with self._lock:
+            connections = [pooled for idle in self._idle.values() for pooled in idle]
+            self._idle.clear()
+        for pooled in connections:
+            _quit(pooled.server)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "servers": len(self._slots),
+                "idle_connections": sum(len(idle) for idle in self._idle.values()),
+                "max_per_server": self.max_per_server,
+            }
+
+    def _slot(self, key: tuple) -> threading.BoundedSemaphore:
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = threading.BoundedSemaphore(self.max_per_server)
+            return slot
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _checkout(self, key: tuple, config: SMTPServerConfig) -> _PooledConnection:
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                pooled = idle.pop() if idle else None
+            if pooled is None:
+                break
+            idle_for = time.monotonic() - pooled.last_used
+            if idle_for > self.idle_seconds:
+                self._count("expired")
+                _quit(pooled.server)
+                continue
+            if idle_for > _NOOP_AFTER_SECONDS:
+                try:
+                    code, _ = pooled.server.noop()
+                except (smtplib.SMTPException, OSError):
+                    code = None
+                if code != 250:
+                    self._count("expired")
+                    pooled.server.close()
+                    continue
+            self._count("reuses")
+            return pooled
+
+        server = open_smtp_connection(config)
+        self._count("connects")
+        return _PooledConnection(server)
+
+
+def _quit(server: smtplib.SMTP):
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+
+smtp_pool = SMTPConnectionPool()
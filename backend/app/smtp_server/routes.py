@@ -1,6 +1,8 @@
 """
 SMTP 메일 전송 및 이메일 관리 API 라우터 (수정됨)
 """
+import asyncio
+import time
 from fastapi import APIRouter, HTTPException, status, Query, Depends, Request
 from typing import Optional, Any # <<< [수정] Any 또는 dict를 위해 추가
 from datetime import datetime,timedelta
@@ -9,6 +11,12 @@ from app.utils.datetime_utils import get_kst_now
 from app.database.mongodb import get_database, SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_USE_TLS, SMTP_USE_SSL # 기본 설정 Import
 from app.smtp_server.models import EmailSendRequest, EmailSendResponse, EmailListResponse
 from app.smtp_server.client import smtp_client
+from app.smtp_server.delivery import DELIVERY_FAILED, DELIVERY_QUEUED, DeliveryAudit, DeliveryJob, delivery_service
+from app.smtp_server.ingest import ingest_queue
+from app.smtp_server.worker import INGEST_WORKERS_COLLECTION, worker_is_alive
+from app.smtp_server.analysis import (
+    ANALYSIS_ANALYZED, ANALYSIS_FAILED, ANALYSIS_QUEUED, advance_analysis_status, analysis_pipeline
+)
 from app.audit.logger import AuditLogger
 from app.audit.models import AuditEventType
 
@@ -68,28 +76,29 @@ async def send_email(
                         print(f"  - filename: {att.get('filename')}")
                         print(f"  - content_type: {att.get('content_type')}")
                         print(f"  - size: {att.get('size')}")
-                        print(f"  - data 존재: {'data' in att}")
-                        print(f"  - data 길이: {len(att.get('data', ''))} chars")
+                        print(f"  - file_id: {att.get('file_id')}")
                         
                         # 첨부파일 데이터 구조 검증
                         if not att.get('filename'):
                             print(f"  ⚠️ filename 없음, 건너뜀")
                             continue
                         
-                        if not att.get('data'):
-                            print(f"  ⚠️ data 없음, 건너뜀")
+                        if not att.get('file_id') and not att.get('data'):
+                            print(f"  ⚠️ file_id/data 없음, 건너뜀")
                             continue
                         
-                        # Base64 데이터 앞 20자 출력 (디버깅용)
-                        data_preview = att.get('data', '')[:20]
-                        print(f"  - data 미리보기: {data_preview}...")
-                        
-                        attachments_to_send.append({
+                        attachment = {
                             "filename": att.get("filename"),
                             "content_type": att.get("content_type", "application/octet-stream"),
                             "size": att.get("size", 0),
-                            "data": att.get("data")  # Base64 문자열
-                        })
+                            "sha256": att.get("sha256"),
+                            "content_id": att.get("content_id"),  # 본문 cid: 인라인 이미지
+                        }
+                        if att.get("file_id"):
+                            attachment["file_id"] = att["file_id"]  # GridFS에서 스트리밍 전송
+                        else:
+                            attachment["data"] = att["data"]  # 구버전 문서: Base64 문자열
+                        attachments_to_send.append(attachment)
                     
                     print(f"\n[SMTP Send] ✅ 총 {len(attachments_to_send)}개 첨부파일 준비 완료")
                 else:
@@ -130,44 +139,44 @@ async def send_email(
             print(f"[SMTP Send] ✅ 사용자 저장된 SMTP 설정을 사용합니다.")
             smtp_config = user_smtp_config
 
+        if delivery_service.is_full():
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="메일 전송 대기열이 가득 찼습니다. 잠시 후 다시 시도하세요."
+            )
+
         # 본문 준비 (HTML)
         bodyHtml = email_data.body.replace('\n', '<br>')
 
-        print(f"\n[SMTP Send] 🚀 SMTP 클라이언트 호출")
+        print(f"\n[SMTP Send] 📨 전송 큐 등록")
         print(f"[SMTP Send] SMTP Host: {smtp_config.get('smtp_host')}")
         print(f"[SMTP Send] SMTP Port: {smtp_config.get('smtp_port')}")
         print(f"[SMTP Send] 전달할 첨부파일: {len(attachments_to_send)}개")
 
-        # SMTP 전송
-        result = smtp_client.send_email(
-            from_email=email_data.from_email,
-            to=email_data.to,
-            subject=email_data.subject,
-            body=bodyHtml,
-            cc=email_data.cc,
-            bcc=email_data.bcc,
-            attachments=attachments_to_send,
-            smtp_config=smtp_config
+        # 메시지 생성 (파일 읽기·Base64 디코딩은 스레드에서), 전송은 delivery 워커가 담당
+        prepared = await asyncio.to_thread(
+            smtp_client.build_message,
+            email_data.from_email,
+            email_data.to,
+            email_data.subject,
+            bodyHtml,
+            email_data.cc,
+            email_data.bcc,
+            attachments_to_send
         )
 
-        if not result["success"]:
-            print(f"[SMTP Send] ❌ SMTP 전송 실패: {result['message']}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=result["message"]
-            )
-
-        print(f"[SMTP Send] ✅ SMTP 전송 성공")
-
-        # MongoDB에 전송 기록 저장
+        # MongoDB에 전송 기록 저장 (delivery_status: queued → sending → sent/failed는 delivery 워커가 갱신)
         attachments_for_db = []
         for att in attachments_to_send:
             attachments_for_db.append({
                 "filename": att.get("filename"),
                 "content_type": att.get("content_type"),
-                "size": att.get("size")
+                "size": att.get("size"),
+                "file_id": att.get("file_id"),
+                "sha256": att.get("sha256")
             })
 
+        queued_at = get_kst_now()
         email_record = {
             "from_email": email_data.from_email,
             "to_email": email_data.to,
@@ -177,38 +186,68 @@ async def send_email(
             "original_body": email_data.body,
             "masked_body": None,
             "status": "sent",
+            "delivery_status": DELIVERY_QUEUED,
             "attachments": attachments_for_db,
-            "sent_at": result["sent_at"],
-            "created_at": get_kst_now(),
+            "sent_at": None,
+            "delivery_queued_at": queued_at,
+            "delivery_attempts": 0,
+            "created_at": queued_at,
             "dlp_verified": False,
             "dlp_token": None,
             "owner_email": current_user.get("email"),
-            "masked_email_id": email_data.masked_email_id if email_data.use_masked_email else None
+            "masked_email_id": email_data.masked_email_id if email_data.use_masked_email else None,
+            # 작성한 메일(original_emails.email_id) - 보낸 메일 화면에서 전송 상태 조회용
+            "source_email_id": email_data.source_email_id or email_data.masked_email_id
         }
 
         insert_result = await db.emails.insert_one(email_record)
         print(f"[SMTP Send] 📝 MongoDB 기록 저장 완료: {insert_result.inserted_id}")
 
-        # 감사 로그 기록
-        await AuditLogger.log_email_send(
+        to_emails = email_data.to.split(',') if isinstance(email_data.to, str) else [email_data.to]
+        job = DeliveryJob(
+            config=smtp_client.resolve_config(smtp_config),
+            message=prepared,
+            email_id=insert_result.inserted_id,
+            # 전송 완료/실패 감사 로그는 delivery 워커가 기록
+            audit=DeliveryAudit(
+                user_email=current_user.get("email"),
+                user_role=current_user.get("role", "user"),
+                to_emails=to_emails,
+                subject=email_data.subject,
+                has_attachments=len(attachments_to_send) > 0,
+            )
+        )
+        if not delivery_service.enqueue(job):
+            await db.emails.update_one(
+                {"_id": insert_result.inserted_id},
+                {"$set": {"delivery_status": DELIVERY_FAILED, "delivery_error": "전송 대기열이 가득 찼습니다"}}
+            )
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="메일 전송 대기열이 가득 찼습니다. 잠시 후 다시 시도하세요."
+            )
+
+        # 감사 로그 기록 (대기열 등록 - 전송 결과는 delivery 워커가 기록)
+        await AuditLogger.log_email_queue(
             user_email=current_user.get("email"),
             user_role=current_user.get("role", "user"),
-            to_emails=email_data.to.split(',') if isinstance(email_data.to, str) else [email_data.to],
+            to_emails=to_emails,
             subject=email_data.subject,
+            email_id=str(insert_result.inserted_id),
             has_attachments=len(attachments_to_send) > 0,
-            masked_count=0,
             request=http_request,
         )
 
         print(f"\n{'='*80}")
-        print(f"✅ [SMTP Send] 이메일 전송 완료")
+        print(f"✅ [SMTP Send] 이메일 전송 대기열 등록 완료")
         print(f"{'='*80}\n")
 
         return EmailSendResponse(
             success=True,
-            message=result["message"],
+            message="메일이 전송 대기열에 등록되었습니다",
             email_id=str(insert_result.inserted_id),
-            sent_at=result["sent_at"]
+            status=DELIVERY_QUEUED,
+            queued_at=queued_at
         )
 
     except HTTPException as he:
@@ -348,4 +387,120 @@ async def get_email(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"이메일 조회 중 오류가 발생했습니다: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.get("/ingest/metrics")
+async def get_ingest_metrics(current_user: dict = Depends(get_current_user)):
+    """
+    SMTP 수신 저장 큐 지표 (관리자 전용)
+
+    수신율, 큐 깊이, insert_many 지연, 수신→저장 지연, 451 거절 수
+    """
+    if current_user.get("role") not in ["root_admin", "system_admin", "auditor"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="수신 지표 조회 권한이 없습니다"
+        )
+    return ingest_queue.metrics_snapshot()
+
+
+@router.get("/ingest/workers")
+async def get_ingest_workers(
+    db: get_database = Depends(),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    독립 SMTP 수신 워커 상태 (관리자 전용, SMTP_INGEST_MODE=external)
+
+    워커별 하트비트(세션 수, 저장 큐 지표)와 살아 있는 워커 합계
+    """
+    if current_user.get("role") not in ["root_admin", "system_admin", "auditor"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="수신 지표 조회 권한이 없습니다"
+        )
+
+    now = time.time()
+    workers = []
+    async for worker in db[INGEST_WORKERS_COLLECTION].find().sort("index", 1):
+        worker["worker_id"] = worker.pop("_id")
+        worker["alive"] = worker_is_alive(worker, now)
+        workers.append(worker)
+
+    alive = [worker for worker in workers if worker["alive"]]
+    return {
+        "workers": workers,
+        "alive": len(alive),
+        "active_sessions": sum(worker.get("active_sessions", 0) for worker in alive),
+        "received": sum(worker.get("ingest", {}).get("received", 0) for worker in alive),
+        "written": sum(worker.get("ingest", {}).get("written", 0) for worker in alive),
+        "rejected": sum(worker.get("ingest", {}).get("rejected", 0) for worker in alive),
+        "ingest_rate_per_sec": round(sum(worker.get("ingest", {}).get("ingest_rate_per_sec", 0) for worker in alive), 2),
+    }
+
+
+@router.get("/delivery/metrics")
+async def get_delivery_metrics(current_user: dict = Depends(get_current_user)):
+    """
+    발신 메일 전송 큐 지표 (관리자 전용)
+
+    초당 전송 수, 큐 깊이, 재시도·실패 건수, 전송 지연, SMTP 연결 생성·재사용 수
+    """
+    if current_user.get("role") not in ["root_admin", "system_admin", "auditor"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="전송 지표 조회 권한이 없습니다"
+        )
+    return delivery_service.metrics_snapshot()
+
+
+@router.get("/analysis/metrics")
+async def get_analysis_metrics(current_user: dict = Depends(get_current_user)):
+    """
+    수신 메일 자동 DLP 분석 지표 (관리자 전용)
+
+    대기열 깊이, 분석 중인 워커 수, 분석 완료·재시도·실패 건수, 분석 소요 시간
+    """
+    if current_user.get("role") not in ["root_admin", "system_admin", "auditor"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="분석 지표 조회 권한이 없습니다"
+        )
+    return analysis_pipeline.metrics_snapshot()
+
+
+@router.post("/emails/{email_id}/reanalyze")
+async def reanalyze_email(
+    email_id: str,
+    db: get_database = Depends(),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    수신 메일 DLP 재분석 요청 (관리자·승인자)
+
+    분석 완료(analyzed) 또는 실패(failed) 상태의 메일만 다시 대기열(queued)에 넣습니다.
+    """
+    if current_user.get("role") not in ["root_admin", "system_admin", "approver"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="재분석 권한이 없습니다"
+        )
+    try:
+        obj_id = ObjectId(email_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="잘못된 이메일 ID 형식입니다"
+        )
+
+    requeued = await advance_analysis_status(
+        db, obj_id, ANALYSIS_QUEUED, {"analysis_attempts": 0, "analysis_error": None},
+        from_statuses=[ANALYSIS_ANALYZED, ANALYSIS_FAILED]
+    )
+    if not requeued:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="분석 완료 또는 실패 상태의 메일만 재분석할 수 있습니다"
+        )
+    analysis_pipeline.enqueue(obj_id)
+    return {"success": True, "email_id": email_id, "analysis_status": ANALYSIS_QUEUED}
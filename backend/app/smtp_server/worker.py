@@ -0,0 +1,241 @@
+"""
+독립 SMTP 수신 워커 (멀티 프로세스)
+
+FastAPI 프로세스 안의 aiosmtpd Controller 하나는 NER·마스킹과 CPU를 나눠 쓰므로, 수신 처리량이
+코어 수만큼 늘지 않습니다. 이 모듈은 API와 분리된 수신 전용 프로세스 N개를 띄웁니다.
+
+    python -m app.smtp_server.worker --processes 4          (backend 디렉토리에서)
+
+- 각 프로세스는 SO_REUSEPORT로 같은 포트(기본 2526)를 열고, 커널이 연결을 프로세스에 나눠 줍니다.
+- 워커는 자기 이벤트 루프에서 aiosmtpd SMTP 프로토콜·핸들러·ingest 큐를 함께 돌립니다.
+  Controller 스레드가 없어 루프 간 전달도 필요 없습니다.
+- 워커끼리, 그리고 API와 공유하는 것은 MongoDB뿐입니다. 저장된 메일은 analysis_status=queued로 남고,
+  API 프로세스의 분석 파이프라인 sweeper가 가져갑니다. 워커는 수신·저장만 하고 분석은 하지 않습니다.
+- 상태 보고: 워커마다 SMTP_WORKER_HEARTBEAT_SECONDS마다 smtp_ingest_workers 컬렉션에
+  하트비트(세션 수, 큐 지표)를 기록합니다 (GET /api/v1/smtp/ingest/workers).
+- 감독 프로세스는 죽은 워커를 다시 띄웁니다.
+
+이 모드를 쓸 때는 API 서버를 SMTP_INGEST_MODE=external로 실행해 내장 SMTP 서버를 끕니다.
+SO_REUSEPORT가 없는 플랫폼(Windows)에서는 프로세스 1개로 실행합니다.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+SMTP_WORKER_HEARTBEAT_SECONDS = int(os.getenv("SMTP_WORKER_HEARTBEAT_SECONDS", "10"))
+INGEST_WORKERS_COLLECTION = "smtp_ingest_workers"
+
+# 워커가 이 시간 안에 연달아 죽으면 재시작 간격을 늘림
+_RESTART_BACKOFF_MAX_SECONDS = 30.0
+
+
+def worker_is_alive(heartbeat: Dict, now: float) -> bool:
+    """하트비트 문서가 최근(주기의 3배 이내) 것인지"""
+    return heartbeat.get("state") == "running" and \
+        now - heartbeat.get("heartbeat_ts", 0) <= SMTP_WORKER_HEARTBEAT_SECONDS * 3
+
+
+class _WorkerState:
+    """워커 프로세스의 SMTP 세션 수"""
+
+    def __init__(self):
+        self.active_sessions = 0
+        self.total_sessions = 0
+
+
+def _smtp_protocol_factory(handler, state: _WorkerState, loop: asyncio.AbstractEventLoop):
+    from aiosmtpd.smtp import SMTP
+
+    class CountingSMTP(SMTP):
+        def connection_made(self, transport):
+            state.active_sessions += 1
+            state.total_sessions += 1
+            super().connection_made(transport)
+
+        def connection_lost(self, error):
+            state.active_sessions -= 1
+            super().connection_lost(error)
+
+    return lambda: CountingSMTP(handler, loop=loop)
+
+
+async def _heartbeat(db, worker_id: str, index: int, host: str, port: int, state: _WorkerState,
+                     started_at: float):
+    from app.smtp_server.ingest import ingest_queue
+    from app.utils.datetime_utils import get_kst_now
+
+    while True:
+        try:
+            await db[INGEST_WORKERS_COLLECTION].update_one(
+                {"_id": worker_id},
+                {"$set": {
+                    "index": index,
+                    "hostname": socket.gethostname(),
+                    "pid": os.getpid(),
+                    "listen": f"{host}:{port}",
+                    "state": "running",
+                    "started_ts": started_at,
+                    "heartbeat_ts": time.time(),
+                    "heartbeat_at": get_kst_now(),
+                    "active_sessions": state.active_sessions,
+                    "total_sessions": state.total_sessions,
+                    "ingest": ingest_queue.metrics_snapshot(),
+                }},
+                upsert=True
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[SMTP Worker {index}] ⚠️ 하트비트 기록 실패: {e}")
+        await asyncio.sleep(SMTP_WORKER_HEARTBEAT_SECONDS)
+
+
+async def serve(index: int, host: str, port: int, reuse_port: bool):
+    """워커 프로세스 본체: Mongo 연결 → ingest 큐 → SMTP 리스너 → 하트비트 (SIGTERM까지)"""
+    from app.database.mongodb import close_mongo_connection, connect_to_mongo, get_database
+    from app.smtp_server.handler import FastAPISMTPHandler
+    from app.smtp_server.ingest import ingest_queue
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    try:
+        loop.add_signal_handler(signal.SIGTERM, stop.set)
+    except NotImplementedError:  # Windows: 감독 프로세스의 terminate()로 바로 종료
+        pass
+
+    await connect_to_mongo()
+    db = get_database()
+    await ingest_queue.start()
+
+    state = _WorkerState()
+    server = await loop.create_server(
+        _smtp_protocol_factory(FastAPISMTPHandler(), state, loop), host=host, port=port, reuse_port=reuse_port
+    )
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    heartbeat = asyncio.create_task(_heartbeat(db, worker_id, index, host, port, state, time.time()))
+    print(f"[SMTP Worker {index}] ✅ 수신 시작 {host}:{port} (pid {os.getpid()}"
+          f"{', SO_REUSEPORT' if reuse_port else ''})")
+
+    try:
+        await stop.wait()
+    finally:
+        print(f"[SMTP Worker {index}] 종료 중... (진행 중 세션 {state.active_sessions}개)")
+        server.close()
+        await server.wait_closed()
+        heartbeat.cancel()
+        await asyncio.gather(heartbeat, return_exceptions=True)
+        await ingest_queue.stop()
+        try:
+            await db[INGEST_WORKERS_COLLECTION].update_one(
+                {"_id": worker_id}, {"$set": {"state": "stopped", "heartbeat_ts": time.time()}}
+            )
+        except Exception as e:
+            print(f"[SMTP Worker {index}] ⚠️ 종료 상태 기록 실패: {e}")
+        await close_mongo_connection()
+        print(f"[SMTP Worker {index}] ✅ 종료 완료 (저장 {ingest_queue.metrics.written}개)")
+
+
+def _run_worker(index: int, host: str, port: int, reuse_port: bool):
+    """spawn된 자식 프로세스 진입점"""
+    from dotenv import load_dotenv
+
+    load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent.parent.parent / '.env')
+    # Ctrl+C는 감독 프로세스가 받아 SIGTERM으로 전달
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(serve(index, host, port, reuse_port))
+
+
+class IngestSupervisor:
+    """워커 프로세스 N개를 띄우고, 죽으면 다시 띄우는 감독 프로세스"""
+
+    def __init__(self, processes: int, host: str, port: int):
+        self.reuse_port = hasattr(socket, "SO_REUSEPORT")
+        if processes > 1 and not self.reuse_port:
+            print("[SMTP Supervisor] ⚠️ SO_REUSEPORT를 지원하지 않는 플랫폼 → 워커 1개로 실행")
+            processes = 1
+        self.processes = processes
+        self.host = host
+        self.port = port
+        self._context = multiprocessing.get_context("spawn")
+        self._workers: Dict[int, multiprocessing.Process] = {}
+        self._restarts: Dict[int, int] = {}
+        self._last_start: Dict[int, float] = {}
+        self._stopping = False
+
+    def _spawn(self, index: int):
+        process = self._context.Process(
+            target=_run_worker,
+            args=(index, self.host, self.port, self.reuse_port),
+            name=f"smtp-ingest-{index}",
+            daemon=False,
+        )
+        process.start()
+        self._workers[index] = process
+        self._last_start[index] = time.monotonic()
+
+    def _request_stop(self, signum=None, frame=None):
+        self._stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        print(f"[SMTP Supervisor] 🚀 수신 워커 {self.processes}개 시작 ({self.host}:{self.port})")
+        for index in range(self.processes):
+            self._spawn(index)
+
+        pending_restart: Dict[int, float] = {}
+        while not self._stopping:
+            time.sleep(1)
+            now = time.monotonic()
+            for index, process in list(self._workers.items()):
+                if process.is_alive() or index in pending_restart:
+                    continue
+                # 바로 다시 죽는 워커는 재시작 간격을 늘림 (포트 충돌·DB 접속 실패 등)
+                crashed_fast = now - self._last_start[index] < 10
+                self._restarts[index] = self._restarts.get(index, 0) + 1 if crashed_fast else 0
+                delay = min(_RESTART_BACKOFF_MAX_SECONDS, 2 ** self._restarts[index] - 1)
+                print(f"[SMTP Supervisor] ⚠️ 워커 {index} 종료됨 (exit {process.exitcode}) → {delay:.0f}초 뒤 재시작")
+                pending_restart[index] = now + delay
+            for index, due in list(pending_restart.items()):
+                if now >= due:
+                    del pending_restart[index]
+                    self._spawn(index)
+
+        self.stop()
+
+    def stop(self, timeout: float = 30.0):
+        print("[SMTP Supervisor] 종료 중... (워커에 SIGTERM)")
+        for process in self._workers.values():
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in self._workers.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+        print("[SMTP Supervisor] ✅ 종료 완료")
+
+
+def main(argv: Optional[list] = None):
+    from app.smtp_server.handler import SMTP_SERVER_HOST, SMTP_SERVER_PORT
+
+    parser = argparse.ArgumentParser(description="독립 SMTP 수신 워커")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("SMTP_INGEST_PROCESSES", str(os.cpu_count() or 1))),
+                        help="워커 프로세스 수 (기본값: SMTP_INGEST_PROCESSES 또는 CPU 코어 수)")
+    parser.add_argument("--host", default=os.getenv("SMTP_INGEST_HOST", SMTP_SERVER_HOST))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SMTP_INGEST_PORT", str(SMTP_SERVER_PORT))))
+    args = parser.parse_args(argv)
+
+    IngestSupervisor(args.processes, args.host, args.port).run()
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    main()
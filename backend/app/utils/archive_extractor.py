@@ -0,0 +1,290 @@
+"""
+압축 첨부파일(ZIP/7z) 재귀 탐색
+
+압축 파일 안의 멤버를 하나씩 임시 디렉토리로 풀면서 같은 패스에서 SHA-256을 계산하고,
+멤버가 다시 압축 파일이면 한 단계 깊게 들어갑니다. 압축 폭탄을 막기 위해 아래 한도를 둡니다.
+- 전체 해제 바이트 (ARCHIVE_MAX_TOTAL_BYTES): 중첩된 압축 파일까지 합친 실제 해제 크기
+- 압축률 (ARCHIVE_MAX_RATIO): 멤버별 해제 크기 / 압축 크기, ARCHIVE_RATIO_MIN_BYTES 이상일 때만 검사
+- 중첩 깊이 (ARCHIVE_MAX_DEPTH), 멤버 수 (ARCHIVE_MAX_MEMBERS)
+ZIP 헤더의 크기 값은 믿지 않고 실제로 풀린 바이트를 세면서 한도를 넘는 순간 중단합니다.
+내용이 같은 멤버(해시 기준)는 한 번만 풀어 두고 나머지는 duplicate_of로 원본 멤버를 가리킵니다.
+
+7z 읽기에는 py7zr이 필요합니다. 7z는 멤버 단위 스트리밍을 지원하지 않아 헤더의 크기로 먼저
+한도를 검사한 뒤 한 번에 풀고, 풀린 파일 크기로 다시 검사합니다.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import zipfile
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional
+
+ARCHIVE_EXTENSIONS = (".zip", ".7z")
+
+ARCHIVE_MAX_TOTAL_BYTES = int(os.getenv("ARCHIVE_MAX_TOTAL_BYTES", str(512 * 1024 * 1024)))
+ARCHIVE_MAX_RATIO = int(os.getenv("ARCHIVE_MAX_RATIO", "100"))
+ARCHIVE_RATIO_MIN_BYTES = int(os.getenv("ARCHIVE_RATIO_MIN_BYTES", str(1024 * 1024)))
+ARCHIVE_MAX_DEPTH = int(os.getenv("ARCHIVE_MAX_DEPTH", "3"))
+ARCHIVE_MAX_MEMBERS = int(os.getenv("ARCHIVE_MAX_MEMBERS", "1000"))
+ARCHIVE_COPY_SIZE = 1024 * 1024
+
+_ZIP_FLAG_ENCRYPTED = 0x01
+_7Z_SIGNATURE = b"7z\xbc\xaf\x27\x1c"
+_ZIP_SIGNATURES = (b"PK\x03\x04", b"PK\x05\x06")
+
+
+class ArchiveLimitError(ValueError):
+    """압축 폭탄 한도 초과"""
+
+
+class ArchiveLimits(NamedTuple):
+    max_total_bytes: int = ARCHIVE_MAX_TOTAL_BYTES
+    max_ratio: int = ARCHIVE_MAX_RATIO
+    ratio_min_bytes: int = ARCHIVE_RATIO_MIN_BYTES
+    max_depth: int = ARCHIVE_MAX_DEPTH
+    max_members: int = ARCHIVE_MAX_MEMBERS
+
+
+class ArchiveMember(NamedTuple):
+    """
+    압축 파일 안의 멤버 하나
+
+    path: 최상위 압축 파일 기준 경로 (중첩 압축 파일은 "inner.zip/a.docx"처럼 이어 붙임)
+    status: extracted(풀림) / archive(중첩 압축 파일, 안쪽 멤버가 뒤따름) /
+            duplicate(같은 내용이 이미 있음) / encrypted(암호화되어 검사 불가)
+    file_path: 풀린 임시 파일 경로 (extracted일 때만)
+    """
+    path: str
+    name: str
+    depth: int
+    size: int
+    compressed_size: Optional[int]
+    sha256: Optional[str]
+    status: str
+    file_path: Optional[str] = None
+    duplicate_of: Optional[str] = None
+
+
+def is_archive_file(filename: str) -> bool:
+    """ZIP/7z 여부 (확장자 기준, Office 문서처럼 ZIP 구조인 파일은 제외)"""
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def _archive_format(path: str, name: str) -> Optional[str]:
+    """확장자와 시그니처가 모두 맞아야 압축 파일로 취급"""
+    ext = os.path.splitext(name)[1].lower()
+    with open(path, "rb") as f:
+        head = f.read(8)
+    if ext == ".zip" and head.startswith(_ZIP_SIGNATURES):
+        return "zip"
+    if ext == ".7z" and head.startswith(_7Z_SIGNATURE):
+        return "7z"
+    return None
+
+
+class _ArchiveWalker:
+    def __init__(self, work_dir: str, root_name: str, limits: ArchiveLimits):
+        self.work_dir = work_dir
+        self.root_name = root_name
+        self.limits = limits
+        self.total_bytes = 0
+        self.member_count = 0
+        self.seen: Dict[str, str] = {}  # sha256 → 처음 나온 멤버 경로
+        self._serial = 0
+
+    def _temp_path(self, name: str) -> str:
+        self._serial += 1
+        return os.path.join(self.work_dir, f"{self._serial:06d}{os.path.splitext(name)[1].lower()}")
+
+    def _count_member(self, path: str):
+        self.member_count += 1
+        if self.member_count > self.limits.max_members:
+            raise ArchiveLimitError(f"멤버 수 한도 초과 ({self.limits.max_members}개): {path}")
+
+    def _add_bytes(self, size: int, path: str):
+        self.total_bytes += size
+        if self.total_bytes > self.limits.max_total_bytes:
+            raise ArchiveLimitError(f"전체 해제 크기 한도 초과 ({self.limits.max_total_bytes} bytes): {path}")
+
+    def _check_ratio(self, size: int, compressed_size: Optional[int], path: str):
+        if not compressed_size or size < self.limits.ratio_min_bytes:
+            return
+        if size > compressed_size * self.limits.max_ratio:
+            raise ArchiveLimitError(f"압축률 한도 초과 (1:{self.limits.max_ratio}): {path}")
+
+    def _copy_member(self, src: BinaryIO, path: str, compressed_size: Optional[int],
+                     out: Optional[BinaryIO] = None):
+        """
+        멤버를 읽으면서 해시를 계산하고 한도를 검사 → (크기, sha256)
+        out이 있으면 읽은 내용을 그대로 씀 (ZIP 멤버를 임시 파일로 풀 때)
+        """
+        digest = hashlib.sha256()
+        size = 0
+        while True:
+            chunk = src.read(ARCHIVE_COPY_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            self._add_bytes(len(chunk), path)
+            self._check_ratio(size, compressed_size, path)
+            digest.update(chunk)
+            if out is not None:
+                out.write(chunk)
+        return size, digest.hexdigest()
+
+    def _finish_member(self, path: str, name: str, depth: int, size: int, compressed_size: Optional[int],
+                       sha256: str, file_path: str) -> Iterator[ArchiveMember]:
+        """중복이면 임시 파일을 지우고, 압축 파일이면 안쪽으로 들어감"""
+        original = self.seen.get(sha256)
+        if original is not None:
+            os.remove(file_path)
+            yield ArchiveMember(path, name, depth, size, compressed_size, sha256, "duplicate", duplicate_of=original)
+            return
+        self.seen[sha256] = path
+
+        fmt = _archive_format(file_path, name)
+        if fmt is None:
+            yield ArchiveMember(path, name, depth, size, compressed_size, sha256, "extracted", file_path)
+            return
+
+        yield ArchiveMember(path, name, depth, size, compressed_size, sha256, "archive")
+        try:
+            yield from self.walk(file_path, fmt, path, depth + 1)
+        finally:
+            os.remove(file_path)
+
+    def walk(self, archive_path: str, fmt: str, prefix: str, depth: int) -> Iterator[ArchiveMember]:
+        if depth > self.limits.max_depth:
+            raise ArchiveLimitError(f"중첩 깊이 한도 초과 ({self.limits.max_depth}단계): {prefix}")
+        if fmt == "zip":
+            yield from self._walk_zip(archive_path, prefix, depth)
+        else:
+            yield from self._walk_7z(archive_path, prefix, depth)
+
+    def _walk_zip(self, archive_path: str, prefix: str, depth: int) -> Iterator[ArchiveMember]:
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                path = f"{prefix}/{info.filename}" if prefix else info.filename
+                name = os.path.basename(info.filename)
+                self._count_member(path)
+
+                if info.flag_bits & _ZIP_FLAG_ENCRYPTED:
+                    yield ArchiveMember(path, name, depth, info.file_size, info.compress_size, None, "encrypted")
+                    continue
+                # 헤더 크기만으로 이미 한도를 넘으면 풀기 전에 중단 (실제 크기는 복사하면서 다시 셈)
+                if self.total_bytes + info.file_size > self.limits.max_total_bytes:
+                    raise ArchiveLimitError(f"전체 해제 크기 한도 초과 ({self.limits.max_total_bytes} bytes): {path}")
+                self._check_ratio(info.file_size, info.compress_size, path)
+
+                file_path = self._temp_path(name)
+                with archive.open(info) as src, open(file_path, "wb") as out:
+                    size, sha256 = self._copy_member(src, path, info.compress_size, out)
+                yield from self._finish_member(path, name, depth, size, info.compress_size, sha256, file_path)
+
+    def _walk_7z(self, archive_path: str, prefix: str, depth: int) -> Iterator[ArchiveMember]:
+        try:
+            import py7zr
+        except ImportError:
+            raise RuntimeError("7z 파일을 읽으려면 py7zr 패키지가 필요합니다 (pip install py7zr)")
+
+        try:
+            archive = py7zr.SevenZipFile(archive_path, mode="r")
+        except py7zr.exceptions.PasswordRequired:
+            archive = None
+        if archive is None or archive.needs_password():
+            # 멤버 목록까지 암호화될 수 있으므로 압축 파일 전체를 암호화 멤버 하나로 보고함
+            if archive is not None:
+                archive.close()
+            path = prefix or self.root_name
+            self._count_member(path)
+            yield ArchiveMember(path, os.path.basename(path), depth, os.path.getsize(archive_path),
+                                None, None, "encrypted")
+            return
+
+        with archive:
+            entries = [entry for entry in archive.list() if not entry.is_directory]
+            declared = sum(entry.uncompressed or 0 for entry in entries)
+            for entry in entries:
+                self._count_member(f"{prefix}/{entry.filename}" if prefix else entry.filename)
+            archive_name = prefix or self.root_name
+            if self.total_bytes + declared > self.limits.max_total_bytes:
+                raise ArchiveLimitError(f"전체 해제 크기 한도 초과 ({self.limits.max_total_bytes} bytes): {archive_name}")
+            # 솔리드 압축은 멤버별 압축 크기가 없으므로 압축 파일 전체 기준으로 압축률 검사
+            self._check_ratio(declared, os.path.getsize(archive_path), archive_name)
+
+            extract_dir = self._temp_path("")
+            os.makedirs(extract_dir)
+            archive.extractall(path=extract_dir)
+
+        try:
+            for entry in entries:
+                path = f"{prefix}/{entry.filename}" if prefix else entry.filename
+                name = os.path.basename(entry.filename)
+                member_path = os.path.join(extract_dir, entry.filename)
+                if not os.path.isfile(member_path):
+                    continue
+                # 헤더 크기를 믿지 않고 풀린 파일을 다시 읽어 크기·해시를 확인
+                file_path = self._temp_path(name)
+                os.replace(member_path, file_path)
+                with open(file_path, "rb") as src:
+                    size, sha256 = self._copy_member(src, path, None)
+                self._check_ratio(size, entry.compressed, path)
+                yield from self._finish_member(path, name, depth, size, entry.compressed, sha256, file_path)
+        finally:
+            shutil.rmtree(extract_dir, ignore_errors=True)
+
+
+def walk_archive(archive_path: str, work_dir: str, name: Optional[str] = None,
+                 limits: Optional[ArchiveLimits] = None) -> Iterator[ArchiveMember]:
+    """
+    압축 파일의 멤버를 중첩 압축 파일까지 재귀로 풀며 yield 합니다.
+    풀린 파일은 work_dir에 남으며 정리는 호출한 쪽에서 합니다. 한도를 넘으면 ArchiveLimitError.
+    """
+    name = name or os.path.basename(archive_path)
+    fmt = _archive_format(archive_path, name)
+    if fmt is None:
+        raise ValueError(f"지원하지 않는 압축 파일이거나 손상된 파일입니다: {name}")
+    walker = _ArchiveWalker(work_dir, name, limits or ArchiveLimits())
+    return walker.walk(archive_path, fmt, "", 1)
+
+
+def summarize_members(members: List[ArchiveMember]) -> List[Dict]:
+    """저장·응답용 멤버 목록 (임시 파일 경로 제외)"""
+    return [
+        {
+            "path": member.path,
+            "depth": member.depth,
+            "size": member.size,
+            "compressed_size": member.compressed_size,
+            "sha256": member.sha256,
+            "status": member.status,
+            "duplicate_of": member.duplicate_of,
+        }
+        for member in members
+    ]
+
+
+def inspect_archive(archive_path: str, name: Optional[str] = None,
+                    limits: Optional[ArchiveLimits] = None) -> Dict:
+    """
+    압축 파일 구조만 검사 (PII 분석 없이 멤버 목록과 한도 위반 여부)
+    Returns: {"members", "total_bytes", "error"} - 한도를 넘으면 그때까지의 멤버와 error 메시지
+    """
+    members: List[ArchiveMember] = []
+    error = None
+    with tempfile.TemporaryDirectory(prefix="archive_") as work_dir:
+        try:
+            for member in walk_archive(archive_path, work_dir, name, limits):
+                members.append(member)
+                if member.file_path and member.status == "extracted":
+                    os.remove(member.file_path)
+        except Exception as e:
+            error = str(e)
+
+    return {
+        "members": summarize_members(members),
+        "total_bytes": sum(member.size for member in members if member.status != "duplicate"),
+        "error": error,
+    }
@@ -0,0 +1,197 @@
+"""
+GridFS 첨부파일 저장소 헬퍼
+
+마스킹 결과와 첨부파일을 전체 파일 버퍼 없이 청크 단위로 GridFS에 쓰고 읽습니다.
+업로드하면서 SHA-256과 크기를 함께 계산해 masked_emails 문서에 파일 ID와 함께 저장합니다.
+"""
+import hashlib
+import mimetypes
+import os
+import tempfile
+from typing import AsyncIterator, BinaryIO, Dict, Iterator, NamedTuple, Optional
+
+from bson import ObjectId
+
+GRIDFS_COPY_CHUNK_SIZE = 1024 * 1024
+# 마스킹 결과를 GridFS로 옮기기 전 임시 버퍼: 이 크기를 넘으면 디스크로 넘어갑니다
+MASKING_SPOOL_MAX_MEMORY = int(os.getenv("MASKING_SPOOL_MAX_MEMORY", str(8 * 1024 * 1024)))
+
+
+class GridFSTarget(NamedTuple):
+    """GridFS에 저장할 파일 정보"""
+    filename: str
+    content_type: str
+    metadata: Dict = {}
+
+
+def guess_content_type(filename: str) -> str:
+    """파일명으로 MIME 타입 추정"""
+    content_type, _ = mimetypes.guess_type(filename)
+    return content_type or "application/octet-stream"
+
+
+def spooled_output() -> tempfile.SpooledTemporaryFile:
+    """마스킹 엔진 출력용 임시 파일 (작으면 메모리, 크면 디스크)"""
+    return tempfile.SpooledTemporaryFile(max_size=MASKING_SPOOL_MAX_MEMORY)
+
+
+def _stored_file_info(file_id, target: GridFSTarget, sha256: str, size: int) -> Dict:
+    return {
+        "file_id": str(file_id),
+        "filename": target.filename,
+        "content_type": target.content_type,
+        "sha256": sha256,
+        "size": size,
+    }
+
+
+def upload_stream_sync(db, source: BinaryIO, target: GridFSTarget) -> Dict:
+    """
+    파일 객체를 청크 단위로 GridFS에 업로드합니다 (동기, 마스킹 워커 프로세스용).
+
+    Returns:
+        dict: {"file_id", "filename", "content_type", "sha256", "size"}
+    """
+    from gridfs import GridFSBucket
+
+    bucket = GridFSBucket(db)
+    hasher = hashlib.sha256()
+    size = 0
+
+    with bucket.open_upload_stream(
+        target.filename,
+        metadata={**target.metadata, "content_type": target.content_type}
+    ) as grid_in:
+        while True:
+            chunk = source.read(GRIDFS_COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            grid_in.write(chunk)
+            size += len(chunk)
+        grid_in.sha256 = hasher.hexdigest()
+
+    return _stored_file_info(grid_in._id, target, hasher.hexdigest(), size)
+
+
+class GridFSUploadWriter:
+    """
+    받은 청크를 바로 GridFS에 쓰는 동기 writer (SMTP 수신 첨부파일용).
+    업로드 소스가 파일이 아니라 디코더가 밀어 넣는 바이트일 때 사용하며, 쓰면서 SHA-256·크기를 계산합니다.
+    """
+
+    def __init__(self, db, target: GridFSTarget):
+        from gridfs import GridFSBucket
+
+        self.target = target
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self._grid_in = GridFSBucket(db).open_upload_stream(
+            target.filename,
+            metadata={**target.metadata, "content_type": target.content_type}
+        )
+
+    def write(self, chunk: bytes):
+        self.sha256.update(chunk)
+        self._grid_in.write(chunk)
+        self.size += len(chunk)
+
+    def close(self) -> Dict:
+        """업로드 완료. Returns: {"file_id", "filename", "content_type", "sha256", "size"}"""
+        self._grid_in.sha256 = self.sha256.hexdigest()
+        self._grid_in.close()
+        return _stored_file_info(self._grid_in._id, self.target, self.sha256.hexdigest(), self.size)
+
+    def abort(self):
+        self._grid_in.abort()
+
+
+def delete_files_sync(db, file_ids) -> None:
+    """GridFS 파일 삭제 (동기). 이미 없는 파일은 무시"""
+    from gridfs import GridFSBucket
+    from gridfs.errors import NoFile
+
+    bucket = GridFSBucket(db)
+    for file_id in file_ids:
+        try:
+            bucket.delete(ObjectId(file_id))
+        except NoFile:
+            pass
+
+
+async def upload_file_async(db, file_path: str, target: GridFSTarget) -> Dict:
+    """
+    디스크의 파일을 청크 단위로 GridFS에 업로드합니다 (motor).
+
+    Returns:
+        dict: {"file_id", "filename", "content_type", "sha256", "size"}
+    """
+    from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+    bucket = AsyncIOMotorGridFSBucket(db)
+    hasher = hashlib.sha256()
+    size = 0
+
+    grid_in = bucket.open_upload_stream(
+        target.filename,
+        metadata={**target.metadata, "content_type": target.content_type}
+    )
+    try:
+        with open(file_path, "rb") as f:
+            while True:
+                chunk = f.read(GRIDFS_COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                await grid_in.write(chunk)
+                size += len(chunk)
+        await grid_in.set("sha256", hasher.hexdigest())
+        await grid_in.close()
+    except Exception:
+        await grid_in.abort()
+        raise
+
+    return _stored_file_info(grid_in._id, target, hasher.hexdigest(), size)
+
+
+async def open_download_stream(db, file_id: str):
+    """GridFS 파일의 다운로드 스트림 (motor GridOut)"""
+    from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+    return await AsyncIOMotorGridFSBucket(db).open_download_stream(ObjectId(file_id))
+
+
+async def iter_gridfs_chunks(grid_out) -> AsyncIterator[bytes]:
+    """motor GridOut을 청크 단위로 순회 (StreamingResponse용)"""
+    while True:
+        chunk = await grid_out.readchunk()
+        if not chunk:
+            break
+        yield chunk
+
+
+def iter_gridfs_chunks_sync(db, file_id: str) -> Iterator[bytes]:
+    """GridFS 파일을 청크 단위로 순회 (동기, SMTP 전송용)"""
+    from gridfs import GridFSBucket
+
+    grid_out = GridFSBucket(db).open_download_stream(ObjectId(file_id))
+    try:
+        while True:
+            chunk = grid_out.readchunk()
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        grid_out.close()
+
+
+async def find_latest_file_id(db, filename: str, kind: Optional[str] = None,
+                              owner: Optional[str] = None) -> Optional[str]:
+    """파일명으로 가장 최근에 저장된 GridFS 파일 ID 조회 (owner가 있으면 그 사용자가 저장한 파일만)"""
+    query = {"filename": filename}
+    if kind:
+        query["metadata.kind"] = kind
+    if owner:
+        query["metadata.owner"] = owner
+    doc = await db["fs.files"].find_one(query, sort=[("uploadDate", -1)], projection={"_id": 1})
+    return str(doc["_id"]) if doc else None
@@ -0,0 +1,229 @@
+"""
+한글(HWP/HWPX) 첨부파일 텍스트 추출
+
+렌더링 후 OCR하지 않고 문서 구조에서 텍스트를 바로 읽습니다.
+- HWP 5.0: OLE 복합 문서의 BodyText/SectionN 스트림(raw deflate)을 구역 단위로 열어
+  청크 단위로 압축을 풀면서 레코드(PARA_TEXT)를 읽습니다. 압축 해제 결과는 레코드 하나 크기만큼만
+  버퍼에 남으므로 수백 페이지 문서도 전체 압축 해제 버퍼가 필요 없습니다.
+- HWPX: ZIP 안의 Contents/sectionN.xml을 Office 문서와 같은 방식(iterparse)으로 읽습니다.
+
+문단마다 {"section", "paragraph"} 앵커를 붙이며, 분석기에는 Office 문서와 같은 TextChunk로 넘깁니다.
+HWP 읽기에는 olefile이 필요합니다.
+"""
+import os
+import re
+import struct
+import zipfile
+import zlib
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple, Union
+
+from app.utils.office_extractor import (
+    OFFICE_CHUNK_CHARS, TextChunk, XmlPartSpec, chunk_paragraphs, iter_xml_blocks, join_paragraphs
+)
+
+HWP_EXTENSIONS = (".hwp", ".hwpx")
+
+HWP_READ_SIZE = 64 * 1024
+# 압축 해제 한 번에 꺼낼 최대 바이트 (레코드 버퍼 상한의 기준)
+HWP_INFLATE_SIZE = 256 * 1024
+
+_HWP_SIGNATURE = b"HWP Document File"
+_HWP_FLAG_COMPRESSED = 0x01
+_HWP_FLAG_PASSWORD = 0x02
+_HWP_FLAG_DISTRIBUTION = 0x04
+
+_HWPTAG_PARA_HEADER = 0x42
+_HWPTAG_PARA_TEXT = 0x43
+
+# PARA_TEXT 제어 문자: 크기가 WCHAR 8개(16바이트)인 인라인/확장 제어
+_HWP_WIDE_CONTROLS = frozenset({1, 2, 3, 4, 5, 6, 7, 8, 9, 11, 12, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23})
+_HWP_CONTROL_TEXT = {9: "\t", 10: "\n", 24: "-", 30: " ", 31: " "}
+
+_HWPX_SECTION_RE = re.compile(r"Contents/section(\d+)\.xml")
+_HP = "{http://www.hancom.co.kr/hwpml/2011/paragraph}"
+_HWPX_SPEC = XmlPartSpec(
+    block_tag=f"{_HP}p",
+    text_tags=frozenset({f"{_HP}t"}),
+    break_tags={
+        f"{_HP}tab": "\t",
+        f"{_HP}lineBreak": "\n",
+        f"{_HP}nbSpace": " ",
+        f"{_HP}fwSpace": " ",
+        f"{_HP}hyphen": "-",
+    },
+)
+
+
+def is_hwp_file(filename: str) -> bool:
+    """HWP/HWPX 여부 (확장자 기준)"""
+    return filename.lower().endswith(HWP_EXTENSIONS)
+
+
+# ===== HWP 5.0 (OLE) =====
+
+def _decode_para_text(data: bytes) -> str:
+    """PARA_TEXT 레코드(UTF-16LE)에서 제어 문자를 걸러 표시 텍스트만 반환"""
+    chars = []
+    index = 0
+    length = len(data) // 2
+    while index < length:
+        code = data[2 * index] | (data[2 * index + 1] << 8)
+        if code >= 32:
+            # 일반 문자 구간은 한 번에 디코딩
+            end = index + 1
+            while end < length and (data[2 * end] | (data[2 * end + 1] << 8)) >= 32:
+                end += 1
+            chars.append(data[2 * index:2 * end].decode("utf-16-le", errors="replace"))
+            index = end
+            continue
+        chars.append(_HWP_CONTROL_TEXT.get(code, ""))
+        index += 8 if code in _HWP_WIDE_CONTROLS else 1
+    return "".join(chars).rstrip("\r\n")
+
+
+def _iter_inflated(stream: BinaryIO, compressed: bool) -> Iterator[bytes]:
+    """구역 스트림을 HWP_INFLATE_SIZE 이하 조각으로 압축 해제하며 yield"""
+    if not compressed:
+        while True:
+            data = stream.read(HWP_READ_SIZE)
+            if not data:
+                return
+            yield data
+
+    inflater = zlib.decompressobj(-15)
+    while not inflater.eof:
+        data = inflater.unconsumed_tail or stream.read(HWP_READ_SIZE)
+        if not data:
+            break
+        inflated = inflater.decompress(data, HWP_INFLATE_SIZE)
+        if inflated:
+            yield inflated
+    tail = inflater.flush()
+    if tail:
+        yield tail
+
+
+def _iter_section_records(stream: BinaryIO, compressed: bool) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    구역 스트림의 레코드를 (tag_id, level, payload)로 yield 합니다.
+    버퍼에는 아직 끝나지 않은 레코드 하나와 압축 해제 조각 하나만 남습니다.
+    """
+    buffer = bytearray()
+    for data in _iter_inflated(stream, compressed):
+        buffer += data
+        position = 0
+        while len(buffer) - position >= 4:
+            header = struct.unpack_from("<I", buffer, position)[0]
+            size = header >> 20
+            start = position + 4
+            if size == 0xFFF:
+                if len(buffer) - position < 8:
+                    break
+                size = struct.unpack_from("<I", buffer, start)[0]
+                start += 4
+            if len(buffer) < start + size:
+                break
+            yield header & 0x3FF, (header >> 10) & 0x3FF, bytes(buffer[start:start + size])
+            position = start + size
+        del buffer[:position]
+
+
+def _open_hwp(file: Union[str, BinaryIO]):
+    try:
+        import olefile
+    except ImportError:
+        raise RuntimeError("HWP 파일을 읽으려면 olefile 패키지가 필요합니다 (pip install olefile)")
+
+    ole = olefile.OleFileIO(file)
+    try:
+        header = ole.openstream("FileHeader").read(256)
+    except Exception:
+        ole.close()
+        raise ValueError("HWP FileHeader 스트림이 없습니다")
+    if not header.startswith(_HWP_SIGNATURE):
+        ole.close()
+        raise ValueError("HWP 5.0 문서가 아닙니다")
+
+    flags = struct.unpack_from("<I", header, 36)[0]
+    if flags & _HWP_FLAG_PASSWORD:
+        ole.close()
+        raise ValueError("암호가 걸린 HWP 문서는 읽을 수 없습니다")
+    if flags & _HWP_FLAG_DISTRIBUTION:
+        ole.close()
+        raise ValueError("배포용 HWP 문서는 읽을 수 없습니다")
+    return ole, bool(flags & _HWP_FLAG_COMPRESSED)
+
+
+def _hwp_section_numbers(ole) -> list:
+    numbers = []
+    for entry in ole.listdir(streams=True, storages=False):
+        if len(entry) == 2 and entry[0] == "BodyText" and entry[1].startswith("Section"):
+            try:
+                numbers.append(int(entry[1][len("Section"):]))
+            except ValueError:
+                continue
+    return sorted(numbers)
+
+
+def _iter_hwp_paragraphs(file: Union[str, BinaryIO]) -> Iterator[Tuple[str, Dict]]:
+    ole, compressed = _open_hwp(file)
+    try:
+        for section in _hwp_section_numbers(ole):
+            # olefile은 압축된 구역 스트림을 읽어 두지만, 압축 해제는 조각 단위로만 함
+            stream = ole.openstream(f"BodyText/Section{section}")
+            paragraph = -1
+            paragraph_level = 0
+            for tag_id, level, payload in _iter_section_records(stream, compressed):
+                if tag_id == _HWPTAG_PARA_HEADER:
+                    paragraph += 1
+                    paragraph_level = level
+                elif tag_id == _HWPTAG_PARA_TEXT:
+                    text = _decode_para_text(payload)
+                    if text.strip():
+                        yield text, {"section": section, "paragraph": paragraph, "level": paragraph_level}
+    finally:
+        ole.close()
+
+
+# ===== HWPX (ZIP/XML) =====
+
+def _iter_hwpx_paragraphs(file: Union[str, BinaryIO]) -> Iterator[Tuple[str, Dict]]:
+    with zipfile.ZipFile(file) as archive:
+        sections = sorted(
+            (int(match.group(1)), name)
+            for name in archive.namelist()
+            for match in [_HWPX_SECTION_RE.fullmatch(name)] if match
+        )
+        for section, name in sections:
+            with archive.open(name) as stream:
+                for block in iter_xml_blocks(stream, _HWPX_SPEC):
+                    if block.text.strip():
+                        yield block.text, {"section": section, "paragraph": block.index}
+
+
+# ===== 공통 =====
+
+def iter_hwp_paragraphs(file: Union[str, BinaryIO], ext: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+    """
+    HWP/HWPX 문서의 문단을 문서 순서대로 (텍스트, 앵커)로 yield 합니다.
+    file은 경로 또는 파일 객체이며, 파일 객체면 ext(".hwp"/".hwpx")를 함께 넘깁니다.
+    앵커: {"section", "paragraph"} (HWP는 표·글상자 안 문단 깊이 "level" 포함)
+    """
+    ext = (ext or os.path.splitext(file)[1]).lower()
+    if ext == ".hwp":
+        return _iter_hwp_paragraphs(file)
+    if ext == ".hwpx":
+        return _iter_hwpx_paragraphs(file)
+    raise ValueError(f"지원하지 않는 한글 문서 형식: {ext}")
+
+
+def iter_hwp_chunks(file: Union[str, BinaryIO], ext: Optional[str] = None,
+                    max_chars: int = OFFICE_CHUNK_CHARS) -> Iterator[TextChunk]:
+    """HWP/HWPX 텍스트를 문단 경계에서 max_chars 이하로 묶은 청크로 yield 합니다."""
+    return chunk_paragraphs(iter_hwp_paragraphs(file, ext), max_chars)
+
+
+def extract_hwp_text(file: Union[str, BinaryIO], ext: Optional[str] = None,
+                     max_chars: Optional[int] = None) -> str:
+    """HWP/HWPX 문서의 텍스트 (max_chars가 있으면 그 길이까지만 읽음)"""
+    return join_paragraphs(iter_hwp_paragraphs(file, ext), max_chars)
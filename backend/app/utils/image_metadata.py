@@ -0,0 +1,167 @@
+"""
+이미지 메타데이터 제거
+
+마스킹할 영역이 없는 JPEG(스마트폰의 MPO 포함)/PNG는 다시 인코딩하지 않고 세그먼트/청크 단위로 복사하면서
+EXIF(GPS 포함)·XMP·IPTC·주석·텍스트 청크와 EOI 뒤에 붙은 추가 이미지(MPO 보조 프레임)를 제거합니다.
+EXIF 방향(Orientation)은 최소 EXIF로 다시 기록해 화면 표시 방향을 유지합니다.
+그 밖의 형식(WEBP, TIFF, GIF 등)은 구조를 안전하게 복사할 수 없어 마스킹 엔진이 다시 인코딩합니다.
+"""
+import struct
+import zlib
+from typing import BinaryIO, Optional
+
+from PIL import Image
+
+ORIENTATION_TAG = 0x0112
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# 재인코딩 없이 메타데이터만 제거해 복사할 수 있는 형식
+RAW_COPY_FORMATS = ("JPEG", "PNG")
+
+# JPEG: APP1(EXIF/XMP), APP13(IPTC/Photoshop), COM
+_JPEG_DROP_MARKERS = {0xE1, 0xED, 0xFE}
+# 길이 필드가 없는 JPEG 마커: TEM, RST0-7
+_JPEG_STANDALONE_MARKERS = {0x01} | set(range(0xD0, 0xD8))
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_DROP_CHUNKS = {b"tEXt", b"zTXt", b"iTXt", b"eXIf", b"tIME"}
+
+
+def normalize_image_format(image_format: Optional[str]) -> Optional[str]:
+    """PIL 형식 이름 정규화: MPO(스마트폰 JPEG, 보조 프레임 포함)는 첫 프레임만 JPEG로 다룸"""
+    return "JPEG" if image_format == "MPO" else image_format
+
+
+def orientation_exif(orientation: Optional[int]) -> Optional[Image.Exif]:
+    """방향 태그만 담은 EXIF (기본 방향이면 None)"""
+    if not orientation or orientation == 1:
+        return None
+    exif = Image.Exif()
+    exif[ORIENTATION_TAG] = orientation
+    return exif
+
+
+def copy_without_metadata(src_path: str, out: BinaryIO, image_format: str, orientation: Optional[int]):
+    """
+    원본 이미지를 재인코딩 없이 out으로 복사하면서 메타데이터를 제거합니다.
+    RAW_COPY_FORMATS(JPEG/PNG)만 지원하며, 다른 형식은 메타데이터를 그대로 내보내지 않도록 ValueError
+    """
+    if image_format not in RAW_COPY_FORMATS:
+        raise ValueError(f"메타데이터를 제거해 복사할 수 없는 형식: {image_format}")
+
+    exif = orientation_exif(orientation)
+    exif_bytes = exif.tobytes() if exif is not None else None
+
+    with open(src_path, "rb") as src:
+        if image_format == "JPEG":
+            _copy_jpeg(src, out, exif_bytes)
+        else:
+            _copy_png(src, out, exif_bytes[6:] if exif_bytes else None)
+
+
+def _copy_bytes(src: BinaryIO, out: BinaryIO, length: int):
+    while length > 0:
+        chunk = src.read(min(length, COPY_CHUNK_SIZE))
+        if not chunk:
+            raise ValueError("이미지 데이터가 예상보다 짧습니다")
+        out.write(chunk)
+        length -= len(chunk)
+
+
+def _copy_jpeg(src: BinaryIO, out: BinaryIO, exif_bytes: Optional[bytes]):
+    if src.read(2) != b"\xff\xd8":
+        raise ValueError("JPEG SOI 마커가 없습니다")
+    out.write(b"\xff\xd8")
+
+    pending_exif = exif_bytes
+    marker = _read_jpeg_marker(src)
+    while marker is not None:
+        if marker == 0xD9:  # EOI: 뒤에 붙은 데이터(MPF 보조 이미지 등)는 버림
+            out.write(b"\xff\xd9")
+            return
+        if marker in _JPEG_STANDALONE_MARKERS:
+            out.write(bytes((0xFF, marker)))
+            marker = _read_jpeg_marker(src)
+            continue
+
+        length = struct.unpack(">H", src.read(2))[0]
+        payload = src.read(length - 2)
+
+        # 최소 EXIF는 APP0(JFIF) 바로 뒤, 다른 세그먼트 앞에 기록
+        if pending_exif and marker != 0xE0:
+            out.write(b"\xff\xe1" + struct.pack(">H", len(pending_exif) + 2) + pending_exif)
+            pending_exif = None
+
+        drop = marker in _JPEG_DROP_MARKERS or (marker == 0xE2 and payload.startswith(b"MPF\x00"))
+        if not drop:
+            out.write(bytes((0xFF, marker)) + struct.pack(">H", length) + payload)
+
+        if marker == 0xDA:  # SOS: 다음 마커가 나올 때까지 엔트로피 데이터 복사
+            marker = _copy_jpeg_scan(src, out)
+        else:
+            marker = _read_jpeg_marker(src)
+
+
+def _read_jpeg_marker(src: BinaryIO) -> Optional[int]:
+    byte = src.read(1)
+    while byte and byte != b"\xff":
+        byte = src.read(1)
+    while byte == b"\xff":  # 채움 바이트 0xFF 건너뛰기
+        byte = src.read(1)
+    return byte[0] if byte else None
+
+
+def _copy_jpeg_scan(src: BinaryIO, out: BinaryIO) -> Optional[int]:
+    """엔트로피 코딩 데이터를 복사하고 스캔을 끝내는 마커를 반환 (0xFF00, RST는 데이터로 취급)"""
+    carry_ff = False
+    while True:
+        chunk = src.read(COPY_CHUNK_SIZE)
+        if not chunk:
+            return None
+        if carry_ff:
+            chunk = b"\xff" + chunk
+            carry_ff = False
+
+        pos = 0
+        while True:
+            idx = chunk.find(b"\xff", pos)
+            if idx == -1:
+                out.write(chunk)
+                break
+            if idx == len(chunk) - 1:
+                out.write(chunk[:idx])
+                carry_ff = True
+                break
+            following = chunk[idx + 1]
+            if following == 0x00 or 0xD0 <= following <= 0xD7 or following == 0xFF:
+                pos = idx + 1 if following == 0xFF else idx + 2
+                continue
+            out.write(chunk[:idx])
+            # 마커 뒤의 남은 바이트는 스트림으로 되돌림
+            src.seek(-(len(chunk) - idx - 2), 1)
+            return following
+
+
+def _copy_png(src: BinaryIO, out: BinaryIO, exif_payload: Optional[bytes]):
+    if src.read(8) != _PNG_SIGNATURE:
+        raise ValueError("PNG 시그니처가 없습니다")
+    out.write(_PNG_SIGNATURE)
+
+    while True:
+        header = src.read(8)
+        if len(header) < 8:
+            return
+        length, chunk_type = struct.unpack(">I4s", header)
+
+        if chunk_type == b"IDAT" and exif_payload:
+            crc = zlib.crc32(b"eXIf" + exif_payload) & 0xFFFFFFFF
+            out.write(struct.pack(">I4s", len(exif_payload), b"eXIf") + exif_payload + struct.pack(">I", crc))
+            exif_payload = None
+
+        if chunk_type in _PNG_DROP_CHUNKS:
+            src.seek(length + 4, 1)
+            continue
+
+        out.write(header)
+        _copy_bytes(src, out, length + 4)
+        if chunk_type == b"IEND":
+            return
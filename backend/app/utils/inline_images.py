@@ -0,0 +1,207 @@
+"""
+HTML 본문의 인라인 이미지 (data: URI, cid: 참조)
+
+HTML 메일 본문에 스크린샷이 data: URI(수 MB의 base64)나 cid: 참조(multipart/related 파트)로 들어오면
+텍스트 분석에는 쓸모가 없고 검사만 느려집니다. 본문 전처리에서 이미지를 떼어내 OCR/이미지 경로로
+보내고, 남은 본문은 base64 없이 분석합니다.
+
+떼어낸 이미지마다 원본 HTML에서의 URI 위치(html_start, html_end)와 내용 해시를 기록해 두고,
+마스킹할 때는 OCR 좌표(bbox)로 이미지를 가린 뒤 같은 위치의 URI만 바꾸는 패치를 만듭니다.
+cid: 이미지는 MIME 파트 자체를 마스킹하므로 Content-ID로 찾아 바꿉니다.
+"""
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from io import BytesIO
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.utils.masked_text import SpanPatch
+
+# base64 본문은 줄바꿈으로만 접을 수 있음: 공백 뒤의 글자·따옴표·괄호는 URI가 아니라 본문으로 봄
+_DATA_URI_RE = re.compile(
+    r"data:(image/[A-Za-z0-9.+-]+)(?:;[A-Za-z0-9=._-]+)*;base64,"
+    r"([A-Za-z0-9+/]+(?:[ \t]*\r?\n[ \t]*[A-Za-z0-9+/]+)*={0,2})(?![A-Za-z0-9+/=])",
+    re.I)
+_CID_RE = re.compile(r"""cid:([^"'\s<>)]+)""", re.I)
+
+# OCR(Clova)이 받는 이미지 형식
+INLINE_IMAGE_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+    "image/gif": ".gif",
+}
+
+
+class InlineImage(NamedTuple):
+    """
+    본문에서 떼어낸 인라인 이미지
+
+    source: "data"(data: URI) / "cid"(multipart/related 파트 참조)
+    html_start, html_end: 원본 HTML에서 URI("data:..." 또는 "cid:...") 위치
+    data: 이미지 바이트 (cid 파트를 받지 못했으면 None)
+    """
+    index: int
+    source: str
+    content_type: str
+    html_start: int
+    html_end: int
+    content_id: Optional[str]
+    data: Optional[bytes]
+    sha256: Optional[str]
+
+    @property
+    def extension(self) -> Optional[str]:
+        return INLINE_IMAGE_EXTENSIONS.get(self.content_type.lower())
+
+
+def normalize_content_id(content_id: str) -> str:
+    """Content-ID 헤더("<abc@host>")와 cid: 참조("abc@host")를 같은 형태로"""
+    return content_id.strip().strip("<>")
+
+
+def _is_image_data(data: bytes) -> bool:
+    """
+    이미지 시그니처로 시작하고 형식의 끝 표시가 헤더 뒤 어딘가에 있는지(또는 헤더의 파일 크기만큼 있는지).
+    카메라 MPF·제조사 트레일러, 0 패딩처럼 끝 표시 뒤에 바이트가 붙은 실제 이미지도 이미지로 봅니다.
+    """
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return data.rfind(b"IEND\xaeB`\x82") > 8
+    if data.startswith(b"\xff\xd8\xff"):
+        return data.rfind(b"\xff\xd9") > 3
+    if data.startswith((b"GIF87a", b"GIF89a")):
+        return data.rfind(b";") >= 13  # 헤더(6) + 논리 화면 설명자(7) 뒤
+    if data.startswith(b"RIFF") and data[8:12] == b"WEBP":
+        return 12 <= int.from_bytes(data[4:8], "little") + 8 <= len(data)
+    if data.startswith(b"BM") and len(data) >= 26:
+        return 26 <= int.from_bytes(data[2:6], "little") <= len(data)
+    return False
+
+
+def _decode_data_uri(payload: str) -> Optional[bytes]:
+    """
+    data: URI의 base64를 디코딩. 실제 이미지가 아니면 None
+    (이미지로 확인된 URI만 본문에서 떼어내므로, 'data:image/png;base64,' 뒤에 적은 본문 텍스트가 분석에서 빠지지 않음)
+    """
+    try:
+        data = base64.b64decode(re.sub(r"\s+", "", payload), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return data if _is_image_data(data) else None
+
+
+def lift_inline_images(html: str, cid_parts: Optional[Dict[str, Tuple[bytes, str]]] = None
+                       ) -> Tuple[str, List[InlineImage]]:
+    """
+    본문에서 인라인 이미지를 떼어냅니다.
+    cid_parts: {Content-ID: (바이트, content_type)} - 메일의 multipart/related 파트
+
+    Returns:
+        (base64를 뺀 본문, 이미지 목록). 본문의 data: URI는 "data:<type>;base64,"만 남기고
+        cid: 참조는 그대로 둡니다. 같은 cid를 여러 번 참조하면 참조마다 항목이 생깁니다.
+    """
+    cid_parts = {normalize_content_id(key): value for key, value in (cid_parts or {}).items()}
+    images: List[InlineImage] = []
+    pieces = []
+    cursor = 0
+
+    for match in _DATA_URI_RE.finditer(html):
+        data = _decode_data_uri(match.group(2))
+        if data is None:
+            continue
+        pieces.append(html[cursor:match.start(2)])
+        cursor = match.end()
+        images.append(InlineImage(
+            index=len(images),
+            source="data",
+            content_type=match.group(1).lower(),
+            html_start=match.start(),
+            html_end=match.end(),
+            content_id=None,
+            data=data,
+            sha256=hashlib.sha256(data).hexdigest(),
+        ))
+    pieces.append(html[cursor:])
+    stripped = "".join(pieces)
+
+    for match in _CID_RE.finditer(html):
+        content_id = normalize_content_id(match.group(1))
+        data, content_type = cid_parts.get(content_id, (None, "application/octet-stream"))
+        images.append(InlineImage(
+            index=len(images),
+            source="cid",
+            content_type=content_type.lower(),
+            html_start=match.start(),
+            html_end=match.end(),
+            content_id=content_id,
+            data=data,
+            sha256=hashlib.sha256(data).hexdigest() if data is not None else None,
+        ))
+
+    return stripped, images
+
+
+def strip_inline_image_data(html: str) -> str:
+    """본문의 data: URI에서 base64만 빼낸 사본 (텍스트 분석용). 이미지로 디코딩되지 않는 URI는 그대로 둠"""
+    def strip(match):
+        if _decode_data_uri(match.group(2)) is None:
+            return match.group()
+        return match.group()[:match.start(2) - match.start()]
+
+    return _DATA_URI_RE.sub(strip, html)
+
+
+def mask_inline_image(data: bytes, extension: str, entities: List[Dict]) -> bytes:
+    """OCR 좌표(bbox)가 있는 엔티티 영역을 가린 이미지 바이트 (원본 형식 유지)"""
+    from app.utils.masking_engine import UnifiedMaskingEngine
+
+    with tempfile.NamedTemporaryFile(suffix=extension, delete=False) as tmp:
+        tmp.write(data)
+        src_path = tmp.name
+    try:
+        out = BytesIO()
+        UnifiedMaskingEngine()._mask_image_file(src_path, entities, out)
+        return out.getvalue()
+    finally:
+        os.remove(src_path)
+
+
+def build_inline_image_patches(html: str, redactions: List[Dict]) -> Tuple[List[SpanPatch], List[Dict]]:
+    """
+    data: 이미지 마스킹 패치 목록 (원본 HTML 오프셋 기준)
+    redactions: [{"html_start", "html_end", "sha256", "entities": [{"bbox": [...]}, ...]}, ...]
+    위치의 URI가 바뀌었거나 해시가 다르면 건너뛰고 skipped에 담습니다.
+
+    Returns:
+        (patches, skipped)
+    """
+    patches: List[SpanPatch] = []
+    skipped = []
+    for index, redaction in enumerate(redactions):
+        start, end = redaction.get("html_start", -1), redaction.get("html_end", -1)
+        match = _DATA_URI_RE.fullmatch(html, start, end) if 0 <= start < end <= len(html) else None
+        if match is None:
+            skipped.append({"index": index, "reason": "not_a_data_uri"})
+            continue
+
+        content_type = match.group(1).lower()
+        extension = INLINE_IMAGE_EXTENSIONS.get(content_type)
+        data = _decode_data_uri(match.group(2))
+        if extension is None or data is None:
+            skipped.append({"index": index, "reason": "unsupported_image"})
+            continue
+        if redaction.get("sha256") and hashlib.sha256(data).hexdigest() != redaction["sha256"]:
+            skipped.append({"index": index, "reason": "hash_mismatch"})
+            continue
+
+        entities = [entity for entity in redaction.get("entities", []) if entity.get("bbox")]
+        if not entities:
+            continue
+        masked = mask_inline_image(data, extension, entities)
+        patches.append((start, end, f"data:{content_type};base64,{base64.b64encode(masked).decode('ascii')}"))
+
+    patches.sort(key=lambda patch: patch[0])
+    return patches, skipped
@@ -0,0 +1,241 @@
+"""
+마스킹된 본문 생성
+
+원본 본문과 PII 구간(span) 결정 목록을 받아 본문을 한 번만 훑으면서 마스킹된 본문을 만듭니다.
+- 서로 겹치는 구간은 하나로 합친 뒤, 그중 가장 긴 구간의 규칙으로 마스킹
+- 엔티티별 masking_type(full/partial/custom/redact/hash/none)과 masking_char, masking_pattern 적용
+- HTML 본문은 프론트엔드 htmlToText와 같은 방식으로 텍스트를 뽑고, 텍스트 오프셋을 HTML 오프셋으로
+  되돌려 태그는 그대로 두고 텍스트 노드만 바꿉니다
+- 결과와 함께 저장용 패치 [[start, end, replacement], ...]를 돌려주며 apply_span_patches로 복원합니다
+"""
+import html
+import re
+from bisect import bisect_right
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.llm.masking_prompter import MaskingPrompter
+from app.utils.masking_rules import MaskingRules
+
+SpanPatch = Tuple[int, int, str]
+
+# htmlToText와 동일: <br>, </div>, </p>는 줄바꿈, 나머지 태그는 제거
+_HTML_TOKEN_RE = re.compile(r"<!--.*?-->|<[^>]*>|&(?:#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);?", re.S)
+_HTML_NEWLINE_TAG_RE = re.compile(r"<(?:br\b[^>]*|/div\s*|/p\s*)>", re.I)
+
+
+class MaskingRule(NamedTuple):
+    """엔티티 마스킹 규칙"""
+    masking_type: str = "full"
+    masking_char: str = "*"
+    masking_pattern: Optional[str] = None
+
+
+class TextSpan(NamedTuple):
+    """마스킹할 텍스트 구간 [start, end)"""
+    start: int
+    end: int
+    entity_type: str
+    rule: MaskingRule = MaskingRule()
+
+
+def mask_value(value: str, entity_type: str, rule: MaskingRule) -> str:
+    """규칙에 따라 값 하나를 마스킹 (none이면 원본 그대로)"""
+    masking_type = (rule.masking_type or "full").lower()
+    masking_char = rule.masking_char or "*"
+
+    if masking_type == "none":
+        return value
+    if masking_type == "redact":
+        return "[REDACTED]"
+    if masking_type == "hash":
+        return "[HASHED]"
+    if masking_type == "custom" and rule.masking_pattern:
+        return MaskingPrompter._apply_custom_pattern(value, rule.masking_pattern, masking_char)
+
+    level = "partial" if masking_type == "partial" else "full"
+    masked = MaskingRules.apply_masking(value, entity_type, level)
+    if masking_char != "*":
+        masked = masked.replace("*", masking_char)
+    return masked
+
+
+def merge_overlapping_spans(spans: List[TextSpan]) -> List[TextSpan]:
+    """
+    시작 위치 순으로 정렬한 뒤 겹치는 구간을 합칩니다.
+    합친 구간의 엔티티/규칙은 가장 긴 원래 구간을 따릅니다 (길이가 같으면 먼저 시작한 구간).
+    """
+    merged: List[TextSpan] = []
+    owner_length = 0
+    for span in sorted(spans, key=lambda s: (s.start, -s.end)):
+        if span.end <= span.start:
+            continue
+        if merged and span.start < merged[-1].end:
+            current = merged[-1]
+            if span.end - span.start > owner_length:
+                owner_length = span.end - span.start
+                current = current._replace(entity_type=span.entity_type, rule=span.rule)
+            merged[-1] = current._replace(end=max(current.end, span.end))
+        else:
+            merged.append(span)
+            owner_length = span.end - span.start
+    return merged
+
+
+def build_text_patches(text: str, spans: List[TextSpan]) -> List[SpanPatch]:
+    """평문 본문의 마스킹 패치 목록 (원본 오프셋 기준, 바뀌지 않는 구간은 제외)"""
+    patches = []
+    for span in merge_overlapping_spans(spans):
+        end = min(span.end, len(text))
+        if span.start >= end:
+            continue
+        value = text[span.start:end]
+        masked = mask_value(value, span.entity_type, span.rule)
+        if masked != value:
+            patches.append((span.start, end, masked))
+    return patches
+
+
+def apply_span_patches(source: str, patches: List[SpanPatch]) -> str:
+    """정렬된, 겹치지 않는 패치를 원본에 한 번에 적용"""
+    parts = []
+    cursor = 0
+    for start, end, replacement in patches:
+        parts.append(source[cursor:start])
+        parts.append(replacement)
+        cursor = end
+    parts.append(source[cursor:])
+    return "".join(parts)
+
+
+class HtmlTextMap:
+    """
+    HTML에서 뽑은 텍스트와 HTML 오프셋 대응표
+
+    units: (text_start, html_start, html_end, literal) 목록. literal 단위는 텍스트 1글자가
+    HTML 1글자에 대응하고, 엔티티(&amp; 등)와 태그가 만든 줄바꿈은 단위 전체가 한 덩어리입니다.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.units: List[Tuple[int, int, int, bool]] = []
+        pieces = []
+        text_length = 0
+
+        def add(piece: str, html_start: int, html_end: int, literal: bool):
+            nonlocal text_length
+            if piece:
+                self.units.append((text_length, html_start, html_end, literal))
+                pieces.append(piece)
+                text_length += len(piece)
+
+        cursor = 0
+        for match in _HTML_TOKEN_RE.finditer(source):
+            add(source[cursor:match.start()], cursor, match.start(), True)
+            token = match.group()
+            if token.startswith("&"):
+                add(html.unescape(token), match.start(), match.end(), False)
+            elif _HTML_NEWLINE_TAG_RE.fullmatch(token):
+                # 태그가 만든 줄바꿈: HTML에서 바꿀 글자가 없으므로 폭 0
+                add("\n", match.end(), match.end(), False)
+            cursor = match.end()
+        add(source[cursor:], cursor, len(source), True)
+
+        self.text = "".join(pieces)
+        self._unit_starts = [unit[0] for unit in self.units]
+
+    def html_segments(self, start: int, end: int) -> List[Tuple[int, int, int, int]]:
+        """
+        텍스트 구간 [start, end)에 대응하는 연속된 HTML 구간 목록
+        Returns: [(text_start, text_end, html_start, html_end), ...] (태그가 만든 줄바꿈은 제외)
+        """
+        segments: List[List[int]] = []
+        index = max(bisect_right(self._unit_starts, start) - 1, 0)
+        while index < len(self.units):
+            unit_text_start, html_start, html_end, literal = self.units[index]
+            unit_text_end = (self.units[index + 1][0] if index + 1 < len(self.units)
+                             else len(self.text))
+            if unit_text_start >= end:
+                break
+            index += 1
+            if html_start == html_end:
+                continue
+
+            seg_text_start = max(start, unit_text_start)
+            seg_text_end = min(end, unit_text_end)
+            if literal:
+                seg_html_start = html_start + (seg_text_start - unit_text_start)
+                seg_html_end = html_start + (seg_text_end - unit_text_start)
+            else:
+                seg_html_start, seg_html_end = html_start, html_end
+
+            if segments and segments[-1][3] == seg_html_start:
+                segments[-1][1] = seg_text_end
+                segments[-1][3] = seg_html_end
+            else:
+                segments.append([seg_text_start, seg_text_end, seg_html_start, seg_html_end])
+        return [tuple(segment) for segment in segments]
+
+
+def split_masked_value(masked: str, lengths: List[int]) -> List[str]:
+    """
+    마스킹 결과를 원래 조각 길이 비율대로 나눕니다.
+    값이 여러 텍스트 노드(태그, 서식 run)에 걸쳐 있을 때 노드 구조를 유지하려고 사용합니다.
+    """
+    total = sum(lengths) or 1
+    pieces = []
+    consumed_length = 0
+    consumed_masked = 0
+    for position, length in enumerate(lengths):
+        consumed_length += length
+        if position == len(lengths) - 1:
+            cut = len(masked)
+        else:
+            cut = round(len(masked) * consumed_length / total)
+        pieces.append(masked[consumed_masked:cut])
+        consumed_masked = cut
+    return pieces
+
+
+def build_html_patches(text_map: HtmlTextMap, spans: List[TextSpan]) -> List[SpanPatch]:
+    """
+    HTML 본문의 마스킹 패치 목록 (HTML 오프셋 기준)
+    구간이 태그를 가로지르면 마스킹 결과를 텍스트 노드별 길이 비율로 나눠 태그를 보존합니다.
+    """
+    patches = []
+    for start, end, masked in build_text_patches(text_map.text, spans):
+        segments = text_map.html_segments(start, end)
+        if not segments:
+            continue
+        pieces = split_masked_value(masked, [seg_end - seg_start for seg_start, seg_end, _, _ in segments])
+        for (_, _, html_start, html_end), piece in zip(segments, pieces):
+            patches.append((html_start, html_end, html.escape(piece, quote=False)))
+    return patches
+
+
+def generate_masked_text(source: str, spans: List[TextSpan], is_html: bool = False,
+                         text_map: Optional[HtmlTextMap] = None,
+                         extra_patches: Optional[List[SpanPatch]] = None) -> Dict:
+    """
+    원본 본문과 구간 목록으로 마스킹된 본문을 만듭니다.
+    HTML이면 spans의 오프셋은 HTML에서 뽑은 텍스트(결과의 "text") 기준입니다.
+    이미 만든 HtmlTextMap이 있으면 text_map으로 넘겨 다시 파싱하지 않습니다.
+    extra_patches는 원본 오프셋 기준 패치(인라인 이미지 교체 등)로, 텍스트 패치와 겹치지 않아야 합니다.
+
+    Returns:
+        dict: {"masked_text", "patches", "text"}
+    """
+    if is_html:
+        text_map = text_map or HtmlTextMap(source)
+        patches = build_html_patches(text_map, spans)
+        text = text_map.text
+    else:
+        patches = build_text_patches(source, spans)
+        text = source
+    if extra_patches:
+        patches = sorted(patches + list(extra_patches), key=lambda patch: patch[0])
+
+    return {
+        "masked_text": apply_span_patches(source, patches),
+        "patches": [list(patch) for patch in patches],
+        "text": text,
+    }
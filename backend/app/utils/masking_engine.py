@@ -1,7 +1,17 @@
 import fitz  # PyMuPDF
-from PIL import Image, ImageDraw
+from PIL import Image, ImageColor, JpegImagePlugin
+import math
 import os
-from typing import List, Dict, Any
+from collections import defaultdict
+from typing import List, Dict, Any, Tuple, Union, BinaryIO
+
+from .image_metadata import (
+    ORIENTATION_TAG, RAW_COPY_FORMATS, copy_without_metadata, normalize_image_format, orientation_exif
+)
+from .office_extractor import OFFICE_EXTENSIONS, redact_office_file
+
+# 마스킹할 이미지의 최대 픽셀 수 (디코딩된 이미지 한 장의 메모리 상한)
+MASKING_IMAGE_MAX_PIXELS = int(os.getenv("MASKING_IMAGE_MAX_PIXELS", str(150_000_000)))
 
 class UnifiedMaskingEngine:
     """
@@ -11,9 +21,11 @@ class UnifiedMaskingEngine:
     def __init__(self):
         self.mask_color = (0, 0, 0)  # 검은색 마스킹
         
-    def redact_pdf_with_entities(self, pdf_path: str, entities: List[Dict], out_pdf_path: str):
+    def redact_pdf_with_entities(self, pdf_path: str, entities: List[Dict], out_pdf_path: Union[str, BinaryIO]):
         """
-        파일 확장자에 따라 PDF 또는 이미지 마스킹을 수행합니다.
+        파일 확장자에 따라 PDF, 이미지 또는 Office(DOCX/XLSX/PPTX) 마스킹을 수행합니다.
+        out_pdf_path에는 파일 경로 또는 쓰기 가능한 바이너리 스트림을 줄 수 있습니다
+        (스트림이면 원본과 같은 형식으로 저장).
         """
         file_ext = os.path.splitext(pdf_path)[1].lower()
         
@@ -21,43 +33,56 @@ class UnifiedMaskingEngine:
             self._mask_pdf_file(pdf_path, entities, out_pdf_path)
         elif file_ext in ['.png', '.jpg', '.jpeg', '.bmp', '.gif']:
             self._mask_image_file(pdf_path, entities, out_pdf_path)
+        elif file_ext in OFFICE_EXTENSIONS:
+            redact_office_file(pdf_path, entities, out_pdf_path)
         else:
             raise ValueError(f"지원하지 않는 파일 형식: {file_ext}")
     
-    def _mask_pdf_file(self, pdf_path: str, entities: List[Dict], out_pdf_path: str):
+    def locate_pdf_redactions(self, pdf_path: str, entities: List[Dict],
+                              start_page: int, end_page: int) -> Dict[int, List[Tuple[float, float, float, float]]]:
+        """
+        PDF의 [start_page, end_page) 구간에서 마스킹할 영역만 찾아 {페이지: [(x0, y0, x1, y1), ...]}로 반환합니다.
+        대용량 PDF를 페이지 구간 단위로 병렬 처리할 때 사용하며, 리댁션은 apply_pdf_redactions로
+        원본 문서에 한 번에 적용합니다 (목차·내부 링크·양식 필드가 단일 처리와 같이 유지됨).
+        """
+        range_entities = [
+            entity for entity in entities
+            if start_page <= (entity.get("pageIndex", 0) or 0) < end_page
+        ]
+        with fitz.open(pdf_path) as doc:
+            rects_by_page = self._collect_pdf_rects(doc, range_entities)
+        return {page: [tuple(rect) for rect in rects] for page, rects in rects_by_page.items()}
+
+    def apply_pdf_redactions(self, pdf_path: str, rects_by_page: Dict[int, List[Tuple[float, float, float, float]]],
+                             out_pdf_path: Union[str, BinaryIO]):
+        """
+        locate_pdf_redactions로 모은 영역을 원본 PDF에 리댁션해 저장합니다.
+        """
+        doc = fitz.open(pdf_path)
+        try:
+            total_rects = self._apply_pdf_rects(
+                doc, {page: [fitz.Rect(*rect) for rect in rects] for page, rects in rects_by_page.items()}
+            )
+            print(f"[PDF 마스킹] 저장 중: {out_pdf_path} (총 {total_rects}개 영역, {len(rects_by_page)}개 페이지)")
+            doc.save(out_pdf_path, garbage=3, deflate=True)
+        finally:
+            doc.close()
+        print(f"[✔] PDF 저장 완료: {out_pdf_path}")
+
+    def _mask_pdf_file(self, pdf_path: str, entities: List[Dict], out_pdf_path: Union[str, BinaryIO]):
         """
         PDF 파일을 마스킹합니다.
+        엔티티를 페이지별로 묶어 페이지당 한 번만 텍스트를 추출하고,
+        수집한 영역을 리댁션 주석으로 한 번에 추가한 뒤 apply_redactions를 한 번 호출합니다.
         """
         try:
             print(f"[PDF 마스킹] 파일 열기: {pdf_path}")
             doc = fitz.open(pdf_path)
 
-            for entity in entities:
-                pii_text = entity.get("text", "")
-                entity_type = entity.get("entity", "")
-                target_page = entity.get("pageIndex", 0)
-                bbox = entity.get("bbox", None)
-                instance_index = entity.get("instance_index", None)
+            total_rects = self._apply_pdf_rects(doc, self._collect_pdf_rects(doc, entities))
 
-                print(f"[PDF 마스킹] 검색 중: '{pii_text}' (타입: {entity_type}, 페이지: {target_page}, bbox: {bbox}, 인스턴스: {instance_index})")
-
-                if not pii_text.strip():
-                    print(f"[PDF 마스킹] 빈 텍스트 스킵: {entity}")
-                    continue
-
-                if target_page < len(doc):
-                    page = doc[target_page]
-                    # bbox가 있으면 bbox로 직접 마스킹
-                    if bbox and len(bbox) == 4:
-                        self._mask_by_bbox(page, bbox, pii_text)
-                    else:
-                        # bbox가 없으면 텍스트 검색 + instance_index 사용
-                        self._mask_text_in_pdf_page(page, pii_text, entity_type, instance_index=instance_index)
-                else:
-                    print(f"[PDF 마스킹] 잘못된 페이지 번호 {target_page}")
-
-            print(f"[PDF 마스킹] 저장 중: {out_pdf_path}")
-            doc.save(out_pdf_path)
+            print(f"[PDF 마스킹] 저장 중: {out_pdf_path} (총 {total_rects}개 영역)")
+            doc.save(out_pdf_path, garbage=3, deflate=True)
             doc.close()
             print(f"[✔] PDF 저장 완료: {out_pdf_path}")
 
@@ -67,133 +92,204 @@ class UnifiedMaskingEngine:
             traceback.print_exc()
             raise e
 
-    def _mask_by_bbox(self, page, bbox: List[float], pii_text: str):
-        """
-        bbox 좌표를 사용하여 직접 마스킹합니다.
-        """
-        x1, y1, x2, y2 = bbox
-        rect = fitz.Rect(x1, y1, x2, y2)
-        print(f"[PDF 마스킹] bbox로 마스킹: '{pii_text}' at {rect}")
-        page.draw_rect(rect, color=self.mask_color, fill=self.mask_color)
-    
-    def _mask_image_file(self, image_path: str, entities: List[Dict], out_image_path: str):
+    def _collect_pdf_rects(self, doc, entities: List[Dict]) -> Dict[int, List["fitz.Rect"]]:
+        """엔티티를 페이지별로 묶어 마스킹할 영역을 찾음 (페이지당 텍스트 추출 한 번)"""
+        entities_by_page: Dict[int, List[Dict]] = defaultdict(list)
+        for entity in entities:
+            pii_text = entity.get("text", "")
+            if not pii_text.strip():
+                print(f"[PDF 마스킹] 빈 텍스트 스킵: {entity}")
+                continue
+
+            target_page = entity.get("pageIndex", 0) or 0
+            if not 0 <= target_page < len(doc):
+                print(f"[PDF 마스킹] 잘못된 페이지 번호 {target_page}")
+                continue
+            entities_by_page[target_page].append(entity)
+
+        rects_by_page: Dict[int, List["fitz.Rect"]] = {}
+        for page_index in sorted(entities_by_page):
+            page = doc[page_index]
+            page_entities = entities_by_page[page_index]
+            text_index = None
+            rects = []
+
+            for entity in page_entities:
+                bbox = entity.get("bbox", None)
+                # bbox가 있으면 bbox로 직접 마스킹
+                if bbox and len(bbox) == 4:
+                    rects.append(fitz.Rect(*bbox))
+                    continue
+
+                # bbox가 없으면 텍스트 인덱스 검색 + instance_index 사용
+                if text_index is None:
+                    text_index = _PdfPageTextIndex(page)
+                rects.extend(self._locate_text_in_pdf_page(
+                    text_index,
+                    entity.get("text", ""),
+                    entity.get("entity", ""),
+                    instance_index=entity.get("instance_index", None)
+                ))
+
+            if rects:
+                rects_by_page[page_index] = rects
+                print(f"[PDF 마스킹] 페이지 {page_index}: 엔티티 {len(page_entities)}개, 영역 {len(rects)}개")
+        return rects_by_page
+
+    def _apply_pdf_rects(self, doc, rects_by_page: Dict[int, List["fitz.Rect"]]) -> int:
+        """페이지별 영역을 리댁션 주석으로 추가하고 페이지마다 apply_redactions 한 번. 리댁션한 영역 수"""
+        total_rects = 0
+        for page_index in sorted(rects_by_page):
+            page = doc[page_index]
+            for rect in rects_by_page[page_index]:
+                page.add_redact_annot(rect, fill=self.mask_color)
+            page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_PIXELS)
+            total_rects += len(rects_by_page[page_index])
+        return total_rects
+
+    def _mask_image_file(self, image_path: str, entities: List[Dict], out_image_path: Union[str, BinaryIO]):
         """
         이미지 파일을 마스킹합니다. OCR bbox 좌표를 사용합니다.
+        OCR은 저장된 픽셀 방향 그대로 수행되므로 bbox도 원본 픽셀 좌표로 적용하고,
+        EXIF 방향은 최소 EXIF로 유지합니다. 원본 형식을 유지하며 GPS 등 나머지 메타데이터는 제거합니다.
+        이미지 위에 걸치는 엔티티가 없는 JPEG/PNG는 디코딩/재인코딩 없이 메타데이터만 제거해 복사하고,
+        그 밖의 형식은 마스킹할 영역이 없어도 다시 인코딩해 메타데이터를 제거합니다.
+        MPO(스마트폰 JPEG)는 첫 프레임만 JPEG로 저장합니다.
         """
         try:
             print(f"[이미지 마스킹] 파일 열기: {image_path}")
             
-            # PIL로 이미지 열기
+            # PIL로 이미지 열기 (헤더만 읽음)
             with Image.open(image_path) as img:
-                # RGB 모드로 변환
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                draw = ImageDraw.Draw(img)
-                
-                # 각 엔티티에 대해 마스킹 수행
-                for entity in entities:
-                    pii_text = entity.get("text", "")
-                    entity_type = entity.get("entity", "")
-                    bbox = entity.get("bbox", [])
-                    
-                    print(f"[이미지 마스킹] 처리 중: '{pii_text}' (타입: {entity_type})")
-                    print(f"  bbox: {bbox}")
-                    
-                    if not bbox or len(bbox) != 4:
-                        print(f"[이미지 마스킹] 유효하지 않은 bbox: {bbox}")
-                        continue
-                    
-                    # bbox 좌표로 검은색 사각형 그리기
-                    x1, y1, x2, y2 = bbox
-                    
-                    # 좌표 유효성 검사
-                    img_width, img_height = img.size
-                    x1 = max(0, min(x1, img_width))
-                    y1 = max(0, min(y1, img_height))
-                    x2 = max(x1, min(x2, img_width))
-                    y2 = max(y1, min(y2, img_height))
-                    
-                    print(f"  조정된 좌표: ({x1}, {y1}, {x2}, {y2})")
-                    
-                    # 검은색 사각형으로 마스킹
-                    draw.rectangle([x1, y1, x2, y2], fill=(0, 0, 0))
-                
-                # 마스킹된 이미지 저장
-                print(f"[이미지 마스킹] 저장 중: {out_image_path}")
-                
-                # 출력 파일 확장자에 맞춰 저장
-                out_ext = os.path.splitext(out_image_path)[1].lower()
-                if out_ext == '.jpg' or out_ext == '.jpeg':
-                    img.save(out_image_path, 'JPEG', quality=95)
+                image_format = normalize_image_format(img.format)
+                orientation = img.getexif().get(ORIENTATION_TAG, 1)
+                rects = self._image_mask_rects(entities, img.size)
+                raw_copy = not rects and image_format in RAW_COPY_FORMATS
+
+                if not raw_copy:
+                    width, height = img.size
+                    if width * height > MASKING_IMAGE_MAX_PIXELS:
+                        raise ValueError(
+                            f"이미지가 너무 큽니다: {width}x{height} (최대 {MASKING_IMAGE_MAX_PIXELS} 픽셀)"
+                        )
+
+                    # 원본 모드 그대로 영역만 덮어씀 (RGB 변환 사본을 만들지 않음)
+                    img.load()
+                    fill = _black_for_mode(img)
+                    for rect in rects:
+                        img.paste(fill, rect)
+                    print(f"[이미지 마스킹] {len(rects)}개 영역 마스킹")
+
+                    print(f"[이미지 마스킹] 저장 중: {image_format}")
+                    self._save_image_like_source(img, image_format, orientation, out_image_path)
+
+            if raw_copy:
+                print(f"[이미지 마스킹] 이미지에 걸치는 엔티티 없음 → 재인코딩 없이 메타데이터만 제거")
+                if isinstance(out_image_path, str):
+                    with open(out_image_path, "wb") as out:
+                        copy_without_metadata(image_path, out, image_format, orientation)
                 else:
-                    img.save(out_image_path, 'PNG')
-                
-                print(f"[✔] 이미지 저장 완료: {out_image_path}")
+                    copy_without_metadata(image_path, out_image_path, image_format, orientation)
+
+            print(f"[✔] 이미지 저장 완료: {image_path}")
                 
         except Exception as e:
             print(f"[이미지 마스킹 오류] {e}")
             import traceback
             traceback.print_exc()
             raise e
-    
-    def _mask_text_in_pdf_page(self, page, search_text: str, entity_type: str, instance_index: int = None):
+
+    @staticmethod
+    def _image_mask_rects(entities: List[Dict], size: Tuple[int, int]) -> List[Tuple[int, int, int, int]]:
+        """엔티티 bbox를 이미지 경계로 자르고, 면적이 있는 영역만 반환합니다."""
+        img_width, img_height = size
+        rects = []
+        for entity in entities:
+            bbox = entity.get("bbox", [])
+            if not bbox or len(bbox) != 4:
+                print(f"[이미지 마스킹] 유효하지 않은 bbox: {bbox} ('{entity.get('text', '')}')")
+                continue
+
+            x1, y1, x2, y2 = bbox
+            x1 = int(max(0, min(x1, img_width)))
+            y1 = int(max(0, min(y1, img_height)))
+            x2 = int(max(x1, min(math.ceil(x2), img_width)))
+            y2 = int(max(y1, min(math.ceil(y2), img_height)))
+            if x2 > x1 and y2 > y1:
+                rects.append((x1, y1, x2, y2))
+        return rects
+
+    @staticmethod
+    def _save_image_like_source(img, image_format: str, orientation: int, out_image_path: Union[str, BinaryIO]):
         """
-        PDF 페이지에서 특정 텍스트를 찾아 마스킹합니다.
-        instance_index가 제공되면 해당 순서의 인스턴스만 마스킹합니다.
+        원본과 같은 형식으로 저장 (JPEG는 원본 양자화 테이블 유지, 메타데이터는 방향/ICC만 유지).
+        MPO는 image_format="JPEG"로 첫 프레임만 저장합니다.
         """
-        text_instances = page.search_for(search_text)
-        
-        if text_instances:
-            print(f"[PDF 마스킹] 페이지 {page.number}에서 '{search_text}' 발견: {len(text_instances)}개")
-            
+        exif = orientation_exif(orientation)
+        params = {}
+        if exif is not None:
+            params["exif"] = exif
+        if img.info.get("icc_profile"):
+            params["icc_profile"] = img.info["icc_profile"]
+        if img.info.get("dpi"):
+            params["dpi"] = img.info["dpi"]
+
+        # PIL은 주석을 img.info에서 그대로 옮겨 쓰므로 먼저 제거
+        img.info.pop("comment", None)
+
+        if image_format == "JPEG":
+            # quality="keep"과 같음 (MPO는 PIL이 "keep"을 거부하므로 양자화 테이블을 직접 전달)
+            params.update(qtables=img.quantization, subsampling=JpegImagePlugin.get_sampling(img),
+                          progressive=bool(img.info.get("progressive")))
+        else:
+            # TIFF 등은 원본 파일 객체의 태그(XMP·IPTC·EXIF IFD)를 저장 시 다시 쓰므로 픽셀만 담은 사본으로 저장
+            img = img.copy()
+            for key in ("exif", "xmp", "XML:com.adobe.xmp", "photoshop", "extension"):
+                img.info.pop(key, None)
+            if image_format not in ("PNG", "WEBP", "TIFF"):
+                params.pop("exif", None)
+
+        img.save(out_image_path, format=image_format, **params)
+
+    def _locate_text_in_pdf_page(self, text_index: "_PdfPageTextIndex", search_text: str,
+                                 entity_type: str, instance_index: int = None) -> List["fitz.Rect"]:
+        """
+        페이지 텍스트 인덱스에서 특정 텍스트의 마스킹 영역을 찾습니다.
+        instance_index가 제공되면 해당 순서의 인스턴스만 반환합니다.
+        """
+        hits = text_index.find(search_text)
+
+        if hits:
             # instance_index가 지정된 경우 해당 인덱스만 마스킹
             if instance_index is not None:
-                if 0 <= instance_index < len(text_instances):
-                    rect = text_instances[instance_index]
-                    print(f"[PDF 마스킹] 인스턴스 {instance_index} 마스킹: {rect}")
-                    page.draw_rect(rect, color=self.mask_color, fill=self.mask_color)
-                else:
-                    print(f"[PDF 마스킹] 잘못된 인스턴스 인덱스: {instance_index}")
-            else:
-                # 인덱스가 없으면 모든 인스턴스 마스킹 (기존 동작)
-                for i, rect in enumerate(text_instances):
-                    print(f"  위치 {i+1}: {rect}")
-                    page.draw_rect(rect, color=self.mask_color, fill=self.mask_color)
-        else:
-            self._fuzzy_search_and_mask_pdf(page, search_text, entity_type)
-    
-    def _fuzzy_search_and_mask_pdf(self, page, search_text: str, entity_type: str):
+                if 0 <= instance_index < len(hits):
+                    return hits[instance_index]
+                print(f"[PDF 마스킹] 잘못된 인스턴스 인덱스: {instance_index} ('{search_text}', {len(hits)}개 발견)")
+                return []
+            # 인덱스가 없으면 모든 인스턴스 마스킹 (기존 동작)
+            return [rect for hit in hits for rect in hit]
+
+        return self._fuzzy_search_pdf(text_index, search_text, entity_type)
+
+    def _fuzzy_search_pdf(self, text_index: "_PdfPageTextIndex", search_text: str,
+                          entity_type: str) -> List["fitz.Rect"]:
         """
         PDF에서 정확한 매칭이 실패했을 때 퍼지 검색을 수행합니다.
         """
-        print(f"[PDF 마스킹] 퍼지 검색 시작: '{search_text}'")
-        
-        # 페이지의 모든 텍스트 블록 가져오기
-        text_dict = page.get_text("dict")
-        
-        for block in text_dict["blocks"]:
-            if "lines" in block:
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        span_text = span["text"]
-                        
-                        # 다양한 방식으로 텍스트 매칭 시도
-                        if self._is_text_match(search_text, span_text):
-                            # span의 bbox 좌표 사용
-                            bbox = span["bbox"]
-                            rect = fitz.Rect(bbox)
-                            
-                            print(f"[PDF 마스킹] 퍼지 매칭 성공: '{search_text}' in '{span_text}'")
-                            print(f"  좌표: {rect}")
-                            
-                            # 마스킹 적용
-                            page.draw_rect(rect, color=self.mask_color, fill=self.mask_color)
-                            return True
-        
+        # 대소문자/공백 무시 매칭
+        hits = text_index.find_folded(search_text)
+        if hits:
+            return [rect for hit in hits for rect in hit]
+
+        # span 단위 매칭
+        for span_text, bbox in text_index.spans:
+            if span_text.strip() and self._is_text_match(search_text, span_text):
+                print(f"[PDF 마스킹] 퍼지 매칭 성공: '{search_text}' in '{span_text}'")
+                return [fitz.Rect(bbox)]
+
         # 그래도 찾지 못한 경우 단어별 검색
-        return self._word_by_word_search_pdf(page, search_text, entity_type)
-    
+        return self._word_by_word_search_pdf(text_index, search_text, entity_type)
+
     def _is_text_match(self, search_text: str, span_text: str) -> bool:
         """
         두 텍스트가 매칭되는지 다양한 방식으로 확인합니다.
@@ -221,27 +317,23 @@ class UnifiedMaskingEngine:
         
         return False
     
-    def _word_by_word_search_pdf(self, page, search_text: str, entity_type: str) -> bool:
+    def _word_by_word_search_pdf(self, text_index: "_PdfPageTextIndex", search_text: str,
+                                 entity_type: str) -> List["fitz.Rect"]:
         """
         PDF에서 단어별로 쪼개서 검색하는 마지막 시도입니다.
         """
-        print(f"[PDF 마스킹] 단어별 검색: '{search_text}'")
-        
         # 공백으로 단어 분리
-        words = search_text.split()
-        
-        for word in words:
-            if len(word.strip()) >= 2:  # 최소 2글자 이상만 검색
-                text_instances = page.search_for(word.strip())
-                if text_instances:
-                    print(f"[PDF 마스킹] 단어 '{word}' 발견: {len(text_instances)}개")
-                    for rect in text_instances:
-                        page.draw_rect(rect, color=self.mask_color, fill=self.mask_color)
-                    return True
-        
+        for word in search_text.split():
+            word = word.strip()
+            if len(word) >= 2:  # 최소 2글자 이상만 검색
+                hits = text_index.find(word)
+                if hits:
+                    print(f"[PDF 마스킹] 단어 '{word}' 발견: {len(hits)}개")
+                    return [rect for hit in hits for rect in hit]
+
         print(f"[PDF 마스킹] 텍스트 '{search_text}'를 찾을 수 없음")
-        return False
-    
+        return []
+
     def debug_pdf_text(self, pdf_path: str, page_num: int = 0):
         """
         디버깅을 위해 PDF 페이지의 모든 텍스트를 출력합니다.
@@ -274,6 +366,122 @@ class UnifiedMaskingEngine:
             print(f"  모드: {img.mode}")
 
 
+def _black_for_mode(img):
+    """이미지 모드에 맞는 검은색 채움 값 (팔레트 이미지는 가장 어두운 팔레트 인덱스)"""
+    if img.mode in ("P", "PA"):
+        palette = img.getpalette() or [0, 0, 0]
+        darkest = min(range(len(palette) // 3), key=lambda i: sum(palette[i * 3:i * 3 + 3]))
+        return darkest if img.mode == "P" else (darkest, 255)
+    if img.mode == "CMYK":
+        return (0, 0, 0, 255)
+    try:
+        return ImageColor.getcolor("black", img.mode)
+    except ValueError:
+        return 0
+
+
+class _PdfPageTextIndex:
+    """
+    PDF 페이지 한 장의 텍스트 인덱스.
+    rawdict를 한 번만 추출해 글자별 좌표를 보관하고, 검색 문자열 → 영역 목록을 캐시합니다.
+    """
+
+    def __init__(self, page):
+        self.spans: List[Tuple[str, Tuple[float, float, float, float]]] = []
+        chars: List[str] = []
+        # 글자별 (bbox, 줄 번호); 줄 사이 구분 공백은 None
+        self._char_boxes: List[Any] = []
+
+        raw = page.get_text("rawdict", flags=fitz.TEXTFLAGS_TEXT)
+        line_no = 0
+        for block in raw.get("blocks", []):
+            for line in block.get("lines", []):
+                if chars:
+                    chars.append(" ")
+                    self._char_boxes.append(None)
+                for span in line.get("spans", []):
+                    span_chars = span.get("chars", [])
+                    self.spans.append(("".join(c["c"] for c in span_chars), span["bbox"]))
+                    for c in span_chars:
+                        chars.append(c["c"])
+                        self._char_boxes.append((c["bbox"], line_no))
+                line_no += 1
+
+        self.text = "".join(chars)
+        self._folded = None
+        self._folded_pos: List[int] = []
+        self._cache: Dict[Tuple[str, bool], List[List["fitz.Rect"]]] = {}
+
+    def find(self, needle: str) -> List[List["fitz.Rect"]]:
+        """정확히 일치하는 모든 인스턴스를 반환합니다. 인스턴스마다 줄 단위 Rect 목록입니다."""
+        key = (needle, False)
+        if key not in self._cache:
+            self._cache[key] = [
+                self._rects_for(start, start + len(needle))
+                for start in self._occurrences(self.text, needle)
+            ]
+        return self._cache[key]
+
+    def find_folded(self, needle: str) -> List[List["fitz.Rect"]]:
+        """대소문자와 공백을 무시하고 일치하는 모든 인스턴스를 반환합니다."""
+        key = (needle, True)
+        if key not in self._cache:
+            if self._folded is None:
+                self._build_folded()
+            folded_needle = self._fold(needle)
+            hits = []
+            if folded_needle:
+                for start in self._occurrences(self._folded, folded_needle):
+                    orig_start = self._folded_pos[start]
+                    orig_end = self._folded_pos[start + len(folded_needle) - 1] + 1
+                    hits.append(self._rects_for(orig_start, orig_end))
+            self._cache[key] = hits
+        return self._cache[key]
+
+    @staticmethod
+    def _occurrences(haystack: str, needle: str) -> List[int]:
+        positions = []
+        if not needle:
+            return positions
+        start = haystack.find(needle)
+        while start != -1:
+            positions.append(start)
+            start = haystack.find(needle, start + len(needle))
+        return positions
+
+    @staticmethod
+    def _fold(text: str) -> str:
+        return "".join(_PdfPageTextIndex._fold_char(ch) for ch in text if not ch.isspace())
+
+    @staticmethod
+    def _fold_char(ch: str) -> str:
+        lowered = ch.lower()
+        return lowered if len(lowered) == 1 else ch
+
+    def _build_folded(self):
+        folded = []
+        for pos, ch in enumerate(self.text):
+            if ch.isspace():
+                continue
+            folded.append(self._fold_char(ch))
+            self._folded_pos.append(pos)
+        self._folded = "".join(folded)
+
+    def _rects_for(self, start: int, end: int) -> List["fitz.Rect"]:
+        """글자 범위 [start, end)를 줄 단위로 합친 Rect 목록으로 변환합니다."""
+        by_line: Dict[int, "fitz.Rect"] = {}
+        for entry in self._char_boxes[start:end]:
+            if entry is None:
+                continue
+            bbox, line_no = entry
+            rect = fitz.Rect(bbox)
+            if line_no in by_line:
+                by_line[line_no] |= rect
+            else:
+                by_line[line_no] = rect
+        return [by_line[line_no] for line_no in sorted(by_line)]
+
+
 # 기존 클래스명과의 호환성을 위한 별칭
 class PdfMaskingEngine(UnifiedMaskingEngine):
     """기존 코드와의 호환성을 위한 별칭"""
@@ -0,0 +1,158 @@
+"""
+첨부파일 마스킹 프로세스 풀
+
+마스킹(PyMuPDF/PIL)은 CPU 작업이라 async 라우트에서 직접 실행하면 이벤트 루프가 멈춥니다.
+파일 단위(대용량 PDF는 페이지 구간 단위)로 작업을 ProcessPoolExecutor에 보내고,
+끝나는 순서대로 결과를 돌려줍니다.
+
+출력 대상은 파일 경로 또는 GridFSTarget입니다. GridFSTarget이면 워커가 마스킹 결과를
+GridFS 업로드 스트림으로 바로 옮기고 {"file_id", "sha256", "size", ...}를 돌려줍니다.
+워커는 spawn으로 시작하므로 부모의 MongoDB 클라이언트/스레드를 물려받지 않습니다.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from app.utils.gridfs_store import GridFSTarget
+
+MaskingOutput = Union[str, GridFSTarget]
+
+MASKING_POOL_WORKERS = int(os.getenv("MASKING_POOL_WORKERS", "0")) or (os.cpu_count() or 1)
+PDF_SPLIT_MIN_PAGES = int(os.getenv("MASKING_PDF_SPLIT_MIN_PAGES", "200"))
+PDF_SPLIT_CHUNK_PAGES = int(os.getenv("MASKING_PDF_SPLIT_CHUNK_PAGES", "100"))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_masking_executor() -> ProcessPoolExecutor:
+    """프로세스 전역 마스킹 풀 (최초 호출 시 생성)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=MASKING_POOL_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                print(f"[마스킹 풀] 워커 {MASKING_POOL_WORKERS}개로 시작")
+    return _executor
+
+
+def shutdown_masking_executor():
+    """앱 종료 시 마스킹 풀 정리 (진행 중인 작업을 기다리므로 이벤트 루프에서는 asyncio.to_thread로 호출)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+            print("[마스킹 풀] 종료")
+
+
+# ===== 워커 프로세스에서 실행되는 작업 (pickle 가능하도록 모듈 최상위에 정의) =====
+
+_worker_engine = None
+
+
+def _get_worker_engine():
+    global _worker_engine
+    if _worker_engine is None:
+        from app.utils.masking_engine import UnifiedMaskingEngine
+        _worker_engine = UnifiedMaskingEngine()
+    return _worker_engine
+
+
+def _write_output(target: MaskingOutput, write) -> Any:
+    """write(out)로 마스킹 결과를 쓰고, GridFSTarget이면 GridFS에 업로드한 정보를 반환"""
+    if isinstance(target, str):
+        write(target)
+        return target
+
+    from app.database.mongodb import get_sync_database
+    from app.utils.gridfs_store import spooled_output, upload_stream_sync
+
+    with spooled_output() as spool:
+        write(spool)
+        spool.seek(0)
+        return upload_stream_sync(get_sync_database(), spool, target)
+
+
+def _mask_file_job(src_path: str, entities: List[Dict], target: MaskingOutput) -> Any:
+    engine = _get_worker_engine()
+    return _write_output(target, lambda out: engine.redact_pdf_with_entities(src_path, entities, out))
+
+
+def _locate_pdf_range_job(src_path: str, entities: List[Dict], start_page: int, end_page: int) -> Dict:
+    return _get_worker_engine().locate_pdf_redactions(src_path, entities, start_page, end_page)
+
+
+def _apply_pdf_redactions_job(src_path: str, rects_by_page: Dict, target: MaskingOutput) -> Any:
+    engine = _get_worker_engine()
+    return _write_output(target, lambda out: engine.apply_pdf_redactions(src_path, rects_by_page, out))
+
+
+def _pdf_page_count_job(src_path: str) -> int:
+    import fitz
+    with fitz.open(src_path) as doc:
+        return len(doc)
+
+
+# ===== 이벤트 루프 쪽 API =====
+
+async def mask_file(src_path: str, entities: List[Dict], target: MaskingOutput,
+                    executor: Executor = None) -> Any:
+    """
+    파일 하나를 풀에서 마스킹합니다. 경로 대상이면 경로를, GridFSTarget이면 저장 정보를 반환합니다.
+    PDF_SPLIT_MIN_PAGES 이상인 PDF는 PDF_SPLIT_CHUNK_PAGES 단위 구간으로 나눠 마스킹 영역을 병렬로 찾고 원본에 한 번에 적용합니다.
+    """
+    loop = asyncio.get_running_loop()
+    executor = executor or get_masking_executor()
+
+    if os.path.splitext(src_path)[1].lower() == ".pdf":
+        page_count = await loop.run_in_executor(executor, _pdf_page_count_job, src_path)
+        if page_count >= PDF_SPLIT_MIN_PAGES:
+            return await _mask_pdf_split(src_path, entities, target, page_count, executor)
+
+    return await loop.run_in_executor(executor, _mask_file_job, src_path, entities, target)
+
+
+async def _mask_pdf_split(src_path: str, entities: List[Dict], target: MaskingOutput,
+                          page_count: int, executor: Executor) -> Any:
+    """
+    페이지 구간별로 마스킹 영역 찾기(텍스트 추출·검색)를 병렬 처리한 뒤, 원본 문서 하나에 리댁션을 적용합니다.
+    부분 PDF를 이어 붙이지 않으므로 목차·내부 링크·양식 필드가 그대로 남습니다.
+    """
+    loop = asyncio.get_running_loop()
+    ranges = [
+        (start, min(start + PDF_SPLIT_CHUNK_PAGES, page_count))
+        for start in range(0, page_count, PDF_SPLIT_CHUNK_PAGES)
+    ]
+    print(f"[마스킹 풀] {os.path.basename(src_path)}: {page_count}페이지 → {len(ranges)}개 구간 병렬 처리")
+
+    parts = await asyncio.gather(*[
+        loop.run_in_executor(executor, _locate_pdf_range_job, src_path, entities, start, end)
+        for start, end in ranges
+    ])
+    rects_by_page = {page: rects for part in parts for page, rects in part.items()}
+    return await loop.run_in_executor(executor, _apply_pdf_redactions_job, src_path, rects_by_page, target)
+
+
+async def mask_files(jobs: Dict[str, Tuple[str, List[Dict], MaskingOutput]],
+                     executor: Executor = None) -> AsyncIterator[Tuple[str, Any, Optional[Exception]]]:
+    """
+    여러 파일을 동시에 마스킹하고 끝나는 순서대로 (key, result, error)를 yield 합니다.
+    jobs: {key: (src_path, entities, target)}
+    한 파일의 실패는 error로만 전달되고 다른 파일 처리에는 영향을 주지 않습니다.
+    """
+    async def run_one(key: str, src_path: str, entities: List[Dict], target: MaskingOutput):
+        try:
+            return key, await mask_file(src_path, entities, target, executor=executor), None
+        except Exception as e:
+            return key, None, e
+
+    tasks = [run_one(key, *job) for key, job in jobs.items()]
+    for next_done in asyncio.as_completed(tasks):
+        yield await next_done
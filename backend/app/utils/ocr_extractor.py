@@ -8,6 +8,9 @@ from dotenv import load_dotenv
 from typing import List, Dict, Any
 from io import BytesIO
 
+from app.utils.office_extractor import is_office_file, extract_office_text
+from app.utils.hwp_extractor import is_hwp_file, extract_hwp_text
+
 load_dotenv()
 
 class OCRResult:
@@ -212,6 +215,18 @@ def extract_text_from_file(file_content: bytes, file_name: str):
             "full_text": pdf_result.full_text,
             "pages": pages_data
         }
+    elif is_office_file(file_name):
+        # Office 문서는 OCR 없이 XML에서 텍스트를 바로 추출
+        return {
+            "full_text": extract_office_text(BytesIO(file_content), os.path.splitext(file_name)[1]),
+            "pages": []
+        }
+    elif is_hwp_file(file_name):
+        # 한글 문서도 렌더링/OCR 없이 본문 레코드(XML)에서 텍스트를 바로 추출
+        return {
+            "full_text": extract_hwp_text(BytesIO(file_content), os.path.splitext(file_name)[1]),
+            "pages": []
+        }
     else:
         return {
             "full_text": "지원하지 않는 파일 형식입니다.",
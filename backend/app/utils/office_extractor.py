@@ -0,0 +1,582 @@
+"""
+Office 첨부파일(DOCX/XLSX/PPTX) 텍스트 추출 및 마스킹
+
+OOXML은 ZIP 안의 XML 파트라서 이미지로 바꿔 OCR할 필요 없이 텍스트를 바로 읽을 수 있습니다.
+- 추출: ZIP 멤버를 스트림으로 열어 iterparse로 문단(셀)을 하나씩 읽고, 끝난 요소는 트리에서 떼어내
+  메모리를 가장 큰 문단 하나 수준으로 유지합니다. 문단마다 위치 앵커(파트/블록 번호와
+  시트·셀, 슬라이드·도형·문단)를 붙여 분석기에 청크 단위로 넘깁니다.
+- 마스킹: 같은 규칙으로 expat 파서를 돌리며 바이트 위치를 기록하고, 마스킹할 텍스트 노드의
+  내용만 바꿔 나머지 XML은 원본 바이트 그대로 복사합니다 (서식·네임스페이스 접두사 유지).
+
+XLSX 공유 문자열(sharedStrings.xml)은 셀이 인덱스로만 참조하므로 추출 시 목록을 메모리에 올리고,
+공유 문자열 셀을 마스킹할 때는 sharedStrings.xml의 해당 항목을 마스킹합니다.
+"""
+import os
+import posixpath
+import re
+import shutil
+import zipfile
+import xml.etree.ElementTree as ET
+import xml.parsers.expat
+from bisect import bisect_right
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+from xml.sax.saxutils import escape
+
+from app.utils.masked_text import (
+    MaskingRule, TextSpan, apply_span_patches, build_text_patches, split_masked_value
+)
+
+OFFICE_EXTENSIONS = (".docx", ".xlsx", ".pptx")
+
+# 분석기에 한 번에 넘길 최대 글자 수 (문단 단위로 자르므로 긴 문단 하나는 그대로 한 청크)
+OFFICE_CHUNK_CHARS = int(os.getenv("OFFICE_CHUNK_CHARS", "20000"))
+XML_READ_SIZE = 64 * 1024
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_P = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+_S = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_DOCX_PART_RE = re.compile(r"word/(document|header\d*|footer\d*|footnotes|endnotes|comments)\.xml")
+_CELL_TYPE_ATTR_RE = re.compile(r"""\st\s*=\s*("[^"]*"|'[^']*')""")
+
+
+def is_office_file(filename: str) -> bool:
+    """DOCX/XLSX/PPTX 여부 (확장자 기준)"""
+    return filename.lower().endswith(OFFICE_EXTENSIONS)
+
+
+class XmlPartSpec(NamedTuple):
+    """
+    XML 파트에서 블록(문단/셀)과 텍스트 노드를 찾는 규칙 (추출과 마스킹이 같은 규칙을 씀)
+    break_tags는 블록 안이나 텍스트 노드 안(혼합 콘텐츠, HWPX)에서 글자로 바꿀 요소입니다.
+    """
+    block_tag: str
+    text_tags: frozenset
+    break_tags: Dict[str, str]
+    skip_tags: frozenset = frozenset()
+    context_tag: Optional[str] = None  # 시작할 때마다 속성을 기억해 둘 요소 (PPTX 도형 cNvPr)
+    cell_block: bool = False           # XLSX 셀: 공유 문자열이 아니면 셀 전체를 인라인 문자열로 교체
+
+
+_DOCX_SPEC = XmlPartSpec(
+    block_tag=f"{_W}p",
+    # delText(변경 추적으로 삭제된 글)도 파일에 남아 있으므로 검사·마스킹 대상
+    text_tags=frozenset({f"{_W}t", f"{_W}delText"}),
+    break_tags={f"{_W}tab": "\t", f"{_W}br": "\n", f"{_W}cr": "\n"},
+)
+_PPTX_SPEC = XmlPartSpec(
+    block_tag=f"{_A}p",
+    text_tags=frozenset({f"{_A}t"}),
+    break_tags={f"{_A}br": "\n"},
+    context_tag=f"{_P}cNvPr",
+)
+_XLSX_SHEET_SPEC = XmlPartSpec(
+    block_tag=f"{_S}c",
+    text_tags=frozenset({f"{_S}v", f"{_S}t"}),
+    break_tags={},
+    skip_tags=frozenset({f"{_S}rPh"}),
+    cell_block=True,
+)
+_XLSX_SHARED_STRINGS_SPEC = XmlPartSpec(
+    block_tag=f"{_S}si",
+    text_tags=frozenset({f"{_S}t"}),
+    break_tags={},
+    skip_tags=frozenset({f"{_S}rPh"}),  # 윗주(후리가나)는 표시 텍스트가 아님
+)
+_XLSX_SHARED_STRINGS = "xl/sharedStrings.xml"
+
+
+class _Block(NamedTuple):
+    index: int
+    attrs: Dict[str, str]
+    context: Optional[Dict[str, str]]
+    context_serial: int
+    text: str
+
+
+class TextChunk(NamedTuple):
+    """
+    분석기에 넘길 텍스트 청크
+
+    offset: 파일 전체 텍스트 기준 청크 시작 위치
+    anchors: [(청크 내 시작, 끝, 앵커), ...] 문단(셀)마다 하나, 각 문단 끝에는 줄바꿈이 붙음
+    """
+    text: str
+    offset: int
+    anchors: List[Tuple[int, int, Dict]]
+
+    def anchor_at(self, start: int) -> Optional[Dict]:
+        """청크 내 위치 start가 속한 문단의 앵커 (문단 안 오프셋 포함)"""
+        index = bisect_right([anchor[0] for anchor in self.anchors], start) - 1
+        if index < 0:
+            return None
+        block_start, block_end, anchor = self.anchors[index]
+        if start >= block_end:
+            return None
+        return {**anchor, "offset": start - block_start}
+
+
+# ===== 추출 =====
+
+def iter_xml_blocks(stream: BinaryIO, spec: XmlPartSpec) -> Iterator[_Block]:
+    """iterparse로 블록을 문서 순서대로 읽습니다. 끝난 요소는 부모에서 떼어내 트리가 자라지 않게 합니다."""
+    elements = []
+    open_blocks = []
+    block_count = 0
+    skip_depth = 0
+    text_depth = 0
+    context = None
+    context_serial = 0
+
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            elements.append(elem)
+            if tag == spec.block_tag:
+                open_blocks.append((block_count, dict(elem.attrib), context, context_serial, []))
+                block_count += 1
+            elif tag in spec.skip_tags:
+                skip_depth += 1
+            elif tag in spec.text_tags:
+                text_depth += 1
+            elif tag == spec.context_tag:
+                context = dict(elem.attrib)
+                context_serial += 1
+            continue
+
+        elements.pop()
+        if tag in spec.skip_tags:
+            skip_depth -= 1
+        elif tag in spec.text_tags:
+            text_depth -= 1
+            if open_blocks and not skip_depth:
+                pieces = open_blocks[-1][4]
+                pieces.append(elem.text or "")
+                for child in elem:
+                    pieces.append(spec.break_tags.get(child.tag, ""))
+                    pieces.append(child.tail or "")
+        elif tag in spec.break_tags and open_blocks and not skip_depth and not text_depth:
+            open_blocks[-1][4].append(spec.break_tags[tag])
+
+        if tag == spec.block_tag:
+            index, attrs, block_context, serial, pieces = open_blocks.pop()
+            yield _Block(index, attrs, block_context, serial, "".join(pieces))
+
+        if not open_blocks and elements:
+            elements[-1].remove(elem)
+
+
+def _read_relationships(archive: zipfile.ZipFile, part_name: str) -> Dict[str, str]:
+    """파트의 관계(.rels) 파일을 읽어 {rId: 대상 파트 경로} 반환"""
+    directory, filename = posixpath.split(part_name)
+    rels_name = posixpath.join(directory, "_rels", f"{filename}.rels")
+    if rels_name not in archive.NameToInfo:
+        return {}
+    root = ET.fromstring(archive.read(rels_name))
+    targets = {}
+    for rel in root.iter(f"{_PKG_REL}Relationship"):
+        target = rel.get("Target", "")
+        if rel.get("TargetMode") == "External":
+            continue
+        if target.startswith("/"):
+            targets[rel.get("Id")] = target.lstrip("/")
+        else:
+            targets[rel.get("Id")] = posixpath.normpath(posixpath.join(directory, target))
+    return targets
+
+
+def _docx_parts(archive: zipfile.ZipFile) -> List[Tuple[str, XmlPartSpec, Dict]]:
+    names = sorted(name for name in archive.namelist() if _DOCX_PART_RE.fullmatch(name))
+    names.sort(key=lambda name: name != "word/document.xml")
+    return [(name, _DOCX_SPEC, {}) for name in names]
+
+
+def _pptx_parts(archive: zipfile.ZipFile) -> List[Tuple[str, XmlPartSpec, Dict]]:
+    presentation = "ppt/presentation.xml"
+    targets = _read_relationships(archive, presentation)
+    root = ET.fromstring(archive.read(presentation))
+    parts = []
+    for number, slide_id in enumerate(root.iter(f"{_P}sldId"), start=1):
+        name = targets.get(slide_id.get(f"{_R}id"))
+        if name in archive.NameToInfo:
+            parts.append((name, _PPTX_SPEC, {"slide": number}))
+    return parts
+
+
+def _xlsx_parts(archive: zipfile.ZipFile) -> List[Tuple[str, XmlPartSpec, Dict]]:
+    workbook = "xl/workbook.xml"
+    targets = _read_relationships(archive, workbook)
+    root = ET.fromstring(archive.read(workbook))
+    parts = []
+    for sheet in root.iter(f"{_S}sheet"):
+        name = targets.get(sheet.get(f"{_R}id"))
+        if name in archive.NameToInfo:
+            parts.append((name, _XLSX_SHEET_SPEC, {"sheet": sheet.get("name")}))
+    return parts
+
+
+def _office_parts(archive: zipfile.ZipFile, ext: str) -> List[Tuple[str, XmlPartSpec, Dict]]:
+    """텍스트를 담은 XML 파트 목록 [(파트 경로, 규칙, 파트 앵커)]"""
+    if ext == ".docx":
+        return _docx_parts(archive)
+    if ext == ".pptx":
+        return _pptx_parts(archive)
+    if ext == ".xlsx":
+        return _xlsx_parts(archive)
+    raise ValueError(f"지원하지 않는 Office 형식: {ext}")
+
+
+def _load_shared_strings(archive: zipfile.ZipFile) -> List[str]:
+    if _XLSX_SHARED_STRINGS not in archive.NameToInfo:
+        return []
+    with archive.open(_XLSX_SHARED_STRINGS) as stream:
+        return [block.text for block in iter_xml_blocks(stream, _XLSX_SHARED_STRINGS_SPEC)]
+
+
+def iter_office_paragraphs(file: Union[str, BinaryIO], ext: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+    """
+    Office 파일의 문단(XLSX는 셀)을 문서 순서대로 (텍스트, 앵커)로 yield 합니다.
+    file은 경로 또는 파일 객체이며, 파일 객체면 ext(".docx" 등)를 함께 넘깁니다.
+    앵커: {"part", "block"} + DOCX {"paragraph"} / PPTX {"slide", "shape", "paragraph"} /
+          XLSX {"sheet", "cell"} (공유 문자열 셀은 "shared_string" 인덱스 포함)
+    """
+    ext = (ext or os.path.splitext(file)[1]).lower()
+    with zipfile.ZipFile(file) as archive:
+        shared_strings = _load_shared_strings(archive) if ext == ".xlsx" else []
+
+        for part_name, spec, part_anchor in _office_parts(archive, ext):
+            shape_serial = None
+            shape_paragraph = 0
+            with archive.open(part_name) as stream:
+                for block in iter_xml_blocks(stream, spec):
+                    anchor = {"part": part_name, "block": block.index, **part_anchor}
+                    text = block.text
+
+                    if spec.cell_block:
+                        anchor["cell"] = block.attrs.get("r")
+                        if block.attrs.get("t") == "s":
+                            try:
+                                anchor["shared_string"] = int(text)
+                                text = shared_strings[anchor["shared_string"]]
+                            except (ValueError, IndexError):
+                                continue
+                    elif spec.context_tag:
+                        if block.context_serial != shape_serial:
+                            shape_serial = block.context_serial
+                            shape_paragraph = 0
+                        anchor["shape"] = (block.context or {}).get("id")
+                        anchor["paragraph"] = shape_paragraph
+                        shape_paragraph += 1
+                    else:
+                        anchor["paragraph"] = block.index
+
+                    if text.strip():
+                        yield text, anchor
+
+
+def chunk_paragraphs(paragraphs: Iterable[Tuple[str, Dict]], max_chars: int = OFFICE_CHUNK_CHARS) -> Iterator[TextChunk]:
+    """(텍스트, 앵커) 문단들을 문단 경계에서 max_chars 이하로 묶은 청크로 yield 합니다."""
+    pieces: List[str] = []
+    anchors: List[Tuple[int, int, Dict]] = []
+    length = 0
+    offset = 0
+
+    for text, anchor in paragraphs:
+        if pieces and length + len(text) + 1 > max_chars:
+            yield TextChunk("".join(pieces), offset, anchors)
+            offset += length
+            pieces, anchors, length = [], [], 0
+        anchors.append((length, length + len(text), anchor))
+        pieces.append(text)
+        pieces.append("\n")
+        length += len(text) + 1
+
+    if pieces:
+        yield TextChunk("".join(pieces), offset, anchors)
+
+
+def iter_office_chunks(file: Union[str, BinaryIO], ext: Optional[str] = None,
+                       max_chars: int = OFFICE_CHUNK_CHARS) -> Iterator[TextChunk]:
+    """Office 파일 텍스트를 문단 경계에서 max_chars 이하로 묶은 청크로 yield 합니다."""
+    return chunk_paragraphs(iter_office_paragraphs(file, ext), max_chars)
+
+
+def join_paragraphs(paragraphs: Iterable[Tuple[str, Dict]], max_chars: Optional[int] = None) -> str:
+    """문단 텍스트를 줄바꿈으로 이어 붙입니다 (max_chars가 있으면 그 길이까지만 읽음)"""
+    pieces = []
+    length = 0
+    for text, _ in paragraphs:
+        pieces.append(text + "\n")
+        length += len(text) + 1
+        if max_chars is not None and length >= max_chars:
+            break
+    text = "".join(pieces)
+    return text[:max_chars] if max_chars is not None else text
+
+
+def extract_office_text(file: Union[str, BinaryIO], ext: Optional[str] = None,
+                        max_chars: Optional[int] = None) -> str:
+    """Office 파일의 텍스트 (max_chars가 있으면 그 길이까지만 읽음)"""
+    return join_paragraphs(iter_office_paragraphs(file, ext), max_chars)
+
+
+# ===== 마스킹 =====
+
+class _Run(NamedTuple):
+    content_start: int   # 텍스트 노드 내용의 바이트 위치 (교체 불가한 줄바꿈/빈 요소는 -1)
+    content_end: int
+    text: str
+
+
+class _XmlPartRewriter:
+    """
+    XML 파트를 expat으로 스트리밍 파싱하면서 블록이 끝날 때마다 plan(block_index, attrs, text)로
+    블록 텍스트 기준 패치를 받아 해당 텍스트 노드의 바이트 구간만 바꿔 씁니다.
+    열린 블록 앞까지의 원본 바이트는 바로 출력해 버퍼가 블록 하나 크기를 넘지 않습니다.
+    """
+
+    def __init__(self, spec: XmlPartSpec, out: BinaryIO,
+                 plan: Callable[[int, Dict[str, str], str], List[Tuple[int, int, str]]]):
+        self.spec = spec
+        self.out = out
+        self.plan = plan
+        self.buffer = bytearray()
+        self.buffer_base = 0
+        self.flushed = 0
+        self.safe_position = 0
+        self.edits: List[Tuple[int, int, bytes]] = []
+        self.open_blocks: List[list] = []
+        self.block_count = 0
+        self.skip_depth = 0
+        self.text_start = None
+        self.text_pieces: List[str] = []
+        self.tag_names: Dict[str, str] = {}
+
+        self.parser = xml.parsers.expat.ParserCreate(namespace_separator=" ")
+        self.parser.buffer_text = True
+        self.parser.StartElementHandler = self._start
+        self.parser.EndElementHandler = self._end
+        self.parser.CharacterDataHandler = self._chars
+
+    def _qualify(self, name: str) -> str:
+        tag = self.tag_names.get(name)
+        if tag is None:
+            uri, _, local = name.rpartition(" ")
+            tag = self.tag_names[name] = f"{{{uri}}}{local}" if uri else local
+        return tag
+
+    def _tag_end(self, position: int) -> int:
+        """position에서 시작하는 태그의 '>' 다음 위치 (속성 값 안의 '>'는 건너뜀)"""
+        index = position - self.buffer_base
+        quote = None
+        while index < len(self.buffer):
+            char = self.buffer[index]
+            if quote:
+                if char == quote:
+                    quote = None
+            elif char in (0x22, 0x27):
+                quote = char
+            elif char == 0x3E:
+                return self.buffer_base + index + 1
+            index += 1
+        raise ValueError("XML 태그가 끝나지 않았습니다")
+
+    def _is_empty_element(self, tag_end: int) -> bool:
+        return self.buffer[tag_end - self.buffer_base - 2] == 0x2F  # '/>'
+
+    def _start(self, name, attrs):
+        tag = self._qualify(name)
+        position = self.parser.CurrentByteIndex
+        self.safe_position = position
+
+        if tag == self.spec.block_tag:
+            self.open_blocks.append([self.block_count, position, attrs, []])
+            self.block_count += 1
+        elif tag in self.spec.skip_tags:
+            self.skip_depth += 1
+        elif tag in self.spec.text_tags and self.open_blocks and not self.skip_depth:
+            tag_end = self._tag_end(position)
+            self.text_start = -1 if self._is_empty_element(tag_end) else tag_end
+            self.text_pieces = []
+
+    def _chars(self, data):
+        if self.text_start is not None:
+            self.text_pieces.append(data)
+
+    def _end(self, name):
+        tag = self._qualify(name)
+        position = self.parser.CurrentByteIndex
+        self.safe_position = position
+
+        if tag in self.spec.skip_tags:
+            self.skip_depth -= 1
+        elif self.open_blocks and not self.skip_depth:
+            if tag in self.spec.text_tags and self.text_start is not None:
+                text = "".join(self.text_pieces)
+                if self.text_start < 0:
+                    self.open_blocks[-1][3].append(_Run(-1, -1, text))
+                else:
+                    self.open_blocks[-1][3].append(_Run(self.text_start, position, text))
+                self.text_start = None
+            elif tag in self.spec.break_tags:
+                self.open_blocks[-1][3].append(_Run(-1, -1, self.spec.break_tags[tag]))
+
+        if tag == self.spec.block_tag:
+            index, block_start, attrs, runs = self.open_blocks.pop()
+            self._rewrite_block(index, block_start, position, attrs, runs)
+
+    def _rewrite_block(self, index: int, block_start: int, end_position: int,
+                       attrs: Dict[str, str], runs: List[_Run]):
+        text = "".join(run.text for run in runs)
+        patches = self.plan(index, attrs, text) if text else []
+        if not patches:
+            return
+
+        if self.spec.cell_block:
+            # 숫자/수식/인라인 문자열 셀은 셀 전체를 마스킹된 인라인 문자열 셀로 교체
+            start_tag_end = self._tag_end(block_start)
+            start_tag = bytes(self.buffer[block_start - self.buffer_base:start_tag_end - self.buffer_base]).decode("utf-8")
+            tag_name = re.match(r"<([^\s/>]+)", start_tag).group(1)
+            prefix = tag_name[:-1]
+            start_tag = _CELL_TYPE_ATTR_RE.sub("", start_tag[:-1]) + ' t="inlineStr">'
+            masked = escape(apply_span_patches(text, patches))
+            cell = (f'{start_tag}<{prefix}is><{prefix}t xml:space="preserve">{masked}'
+                    f'</{prefix}t></{prefix}is></{tag_name}>')
+            self.edits.append((block_start, self._tag_end(end_position), cell.encode("utf-8")))
+            return
+
+        # 문단: 패치를 텍스트 노드(run) 단위로 나눠 각 노드의 내용만 교체
+        run_offsets = []
+        offset = 0
+        for run in runs:
+            run_offsets.append(offset)
+            offset += len(run.text)
+
+        run_patches: Dict[int, List[Tuple[int, int, str]]] = {}
+        for start, end, masked in patches:
+            touched = [
+                (run_index, max(start, run_offsets[run_index]) - run_offsets[run_index],
+                 min(end, run_offsets[run_index] + len(run.text)) - run_offsets[run_index])
+                for run_index, run in enumerate(runs)
+                if run.content_start >= 0 and run_offsets[run_index] < end
+                and run_offsets[run_index] + len(run.text) > start
+            ]
+            if not touched:
+                continue
+            pieces = split_masked_value(masked, [local_end - local_start for _, local_start, local_end in touched])
+            for (run_index, local_start, local_end), piece in zip(touched, pieces):
+                run_patches.setdefault(run_index, []).append((local_start, local_end, piece))
+
+        for run_index, local_patches in run_patches.items():
+            run = runs[run_index]
+            new_text = apply_span_patches(run.text, local_patches)
+            self.edits.append((run.content_start, run.content_end, escape(new_text).encode("utf-8")))
+
+    def _flush(self, limit: int):
+        """limit 앞까지 편집을 적용해 출력하고 버퍼에서 버림"""
+        if limit <= self.flushed:
+            return
+        self.edits.sort()
+        remaining = []
+        for start, end, replacement in self.edits:
+            if end <= limit:
+                self.out.write(self.buffer[self.flushed - self.buffer_base:start - self.buffer_base])
+                self.out.write(replacement)
+                self.flushed = end
+            else:
+                remaining.append((start, end, replacement))
+        self.edits = remaining
+        if limit > self.flushed:
+            self.out.write(self.buffer[self.flushed - self.buffer_base:limit - self.buffer_base])
+            self.flushed = limit
+        del self.buffer[:self.flushed - self.buffer_base]
+        self.buffer_base = self.flushed
+
+    def rewrite(self, source: BinaryIO):
+        while True:
+            chunk = source.read(XML_READ_SIZE)
+            self.buffer += chunk
+            self.parser.Parse(chunk, not chunk)
+            if not chunk:
+                break
+            limit = self.open_blocks[0][1] if self.open_blocks else self.safe_position
+            self._flush(min(limit, self.safe_position))
+        self._flush(self.buffer_base + len(self.buffer))
+
+
+def _entity_spans(text: str, entities: List[Dict]) -> List[TextSpan]:
+    spans = []
+    for entity in entities:
+        value = entity.get("text") or ""
+        if not value:
+            continue
+        rule = MaskingRule(
+            masking_type=entity.get("masking_type") or "full",
+            masking_char=entity.get("masking_char") or "*",
+            masking_pattern=entity.get("masking_pattern")
+        )
+        offset = (entity.get("anchor") or {}).get("offset")
+        if offset is not None and text[offset:offset + len(value)] == value:
+            spans.append(TextSpan(offset, offset + len(value), entity.get("entity", ""), rule))
+            continue
+        position = text.find(value)
+        while position != -1:
+            spans.append(TextSpan(position, position + len(value), entity.get("entity", ""), rule))
+            position = text.find(value, position + len(value))
+    return spans
+
+
+def redact_office_file(src_path: str, entities: List[Dict], out: Union[str, BinaryIO]):
+    """
+    Office 파일의 PII 텍스트를 마스킹해 같은 형식으로 저장합니다.
+
+    entities: [{"entity", "text", "anchor"?, "masking_type"?, ...}]
+    anchor(추출 결과의 앵커)가 있으면 해당 문단만, 없으면 모든 문단에서 text를 찾아 마스킹합니다.
+    """
+    ext = os.path.splitext(src_path)[1].lower()
+
+    anchored: Dict[Tuple[str, int], List[Dict]] = {}
+    unanchored: List[Dict] = []
+    for entity in entities:
+        anchor = entity.get("anchor") or {}
+        if "part" in anchor and "block" in anchor:
+            if "shared_string" in anchor:
+                key = (_XLSX_SHARED_STRINGS, anchor["shared_string"])
+            else:
+                key = (anchor["part"], anchor["block"])
+            anchored.setdefault(key, []).append(entity)
+        else:
+            unanchored.append(entity)
+
+    with zipfile.ZipFile(src_path) as archive:
+        parts = {name: spec for name, spec, _ in _office_parts(archive, ext)}
+        if ext == ".xlsx" and _XLSX_SHARED_STRINGS in archive.NameToInfo:
+            parts[_XLSX_SHARED_STRINGS] = _XLSX_SHARED_STRINGS_SPEC
+        if not unanchored:
+            parts = {name: spec for name, spec in parts.items()
+                     if any(key[0] == name for key in anchored)}
+
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as masked_archive:
+            for info in archive.infolist():
+                target_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                target_info.compress_type = info.compress_type
+                target_info.external_attr = info.external_attr
+
+                with archive.open(info) as source, masked_archive.open(target_info, "w") as target:
+                    spec = parts.get(info.filename)
+                    if spec is None:
+                        shutil.copyfileobj(source, target, XML_READ_SIZE)
+                        continue
+
+                    def plan(index, attrs, text, part_name=info.filename, spec=spec):
+                        if spec.cell_block and attrs.get("t") == "s":
+                            return []  # 공유 문자열 셀은 sharedStrings.xml에서 마스킹
+                        block_entities = anchored.get((part_name, index), []) + unanchored
+                        return build_text_patches(text, _entity_spans(text, block_entities))
+
+                    _XmlPartRewriter(spec, target, plan).rewrite(source)
+
+    print(f"[✔] Office 마스킹 완료: {os.path.basename(src_path)} ({len(entities)}개 PII)")
@@ -15,6 +15,7 @@ sys.path.insert(0, str(RAG_DIR))
 
 try:
     from agent.retrievers import HybridRetriever
+    from agent.model_registry import model_registry
     RAG_AVAILABLE = True
 except Exception as e:
     print(f"⚠️ RAG 모듈 로드 실패: {e}")
@@ -106,27 +107,31 @@ class RAGMaskingDecisionEngine:
                 pii_by_type[entity_type] = []
             pii_by_type[entity_type].append(entity)
 
-        # 각 PII 타입에 대해 RAG 검색 수행
-        for entity_type, entities in pii_by_type.items():
-            # 검색 쿼리 생성
-            purpose = context.get("purpose", "일반 업무") if context else "일반 업무"
-            sender_type = context.get("sender_type", "internal") if context else "internal"
-            receiver_type = context.get("receiver_type", "external_customer") if context else "external_customer"
-
-            query = f"{purpose} 상황에서 {sender_type}에서 {receiver_type}로 {entity_type} 처리 방법"
-
-            # 1. 애플리케이션 가이드 검색
-            guides = self.retriever.search_application_guides(
-                query=query,
-                context={"sender_type": sender_type, "receiver_type": receiver_type} if context else None,
-                top_k=2
-            )
-
-            # 2. 법률/정책 검색
-            laws_policies = self.retriever.search_laws_and_policies(query, top_k=3)
-
-            # 각 엔티티에 대한 결정 생성
-            for entity in entities:
+        # 검색 쿼리 생성 (PII 타입별)
+        purpose = context.get("purpose", "일반 업무") if context else "일반 업무"
+        sender_type = context.get("sender_type", "internal") if context else "internal"
+        receiver_type = context.get("receiver_type", "external_customer") if context else "external_customer"
+
+        entity_types = list(pii_by_type)
+        queries = [
+            f"{purpose} 상황에서 {sender_type}에서 {receiver_type}로 {entity_type} 처리 방법"
+            for entity_type in entity_types
+        ]
+
+        # 모든 PII 타입의 검색을 한 번에 (쿼리 임베딩 배치 1회, 컬렉션별 다중 쿼리 1회)
+        # 1. 애플리케이션 가이드 검색
+        guides_by_type = self.retriever.search_application_guides_batch(
+            queries,
+            context={"sender_type": sender_type, "receiver_type": receiver_type} if context else None,
+            top_k=2
+        )
+
+        # 2. 법률/정책 검색
+        laws_policies_by_type = self.retriever.search_laws_and_policies_batch(queries, top_k=3)
+
+        # 각 엔티티에 대한 결정 생성
+        for entity_type, guides, laws_policies in zip(entity_types, guides_by_type, laws_policies_by_type):
+            for entity in pii_by_type[entity_type]:
                 decision = self._make_decision_for_entity(
                     entity,
                     entity_type,
@@ -275,3 +280,10 @@ def get_rag_engine() -> RAGMaskingDecisionEngine:
     if _rag_engine is None:
         _rag_engine = RAGMaskingDecisionEngine()
     return _rag_engine
+
+
+def get_model_registry_snapshot() -> Dict[str, Any]:
+    """공용 모델 레지스트리 현황 (로드된 모델별 메모리·유휴 시간). RAG 모듈이 없으면 빈 값"""
+    if not RAG_AVAILABLE:
+        return {"models": [], "total_memory_mb": 0}
+    return model_registry.snapshot()
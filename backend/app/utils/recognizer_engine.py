@@ -1,15 +1,25 @@
+import asyncio
+import os
+import tempfile
+import threading
 from typing import List, Dict, Any, Optional
 # 여러분의 AnalyzerEngine 코드가 의존하는 클래스들을 임포트합니다.
 # 이 파일들이 app/utils 폴더에 있어야 합니다.
 from app.utils.recognizer_registry import RecognizerRegistry
 from app.utils.ner.NER_engine import NerEngine
 from app.utils.entity import Entity, EntityGroup
+from app.utils.office_extractor import chunk_paragraphs, iter_office_chunks, is_office_file
+from app.utils.hwp_extractor import iter_hwp_chunks, is_hwp_file
+from app.utils.archive_extractor import ArchiveMember, is_archive_file, summarize_members, walk_archive
+from app.utils.ocr_extractor import extract_text_from_file
+from app.utils.inline_images import InlineImage, lift_inline_images, strip_inline_image_data
 
 # 여러분이 제공한 AnalyzerEngine 클래스
 class AnalyzerEngine:
     """
     규칙 기반(RecognizerRegistry) + NER 기반(NerEngine) 결과를
     하나의 EntityGroup으로 통합하여 반환.
+    여러 스레드가 analyze()를 함께 불러도 되며, 공유 NER 모델 호출만 잠금으로 직렬화합니다.
     """
     def __init__(self, db_client=None):
         print("...AnalyzerEngine 초기화 중...")
@@ -18,6 +28,7 @@ class AnalyzerEngine:
         self.registry.load_predefined_recognizers()
 
         self.nlp_engine = NerEngine()
+        self._ner_lock = threading.Lock()
         print("~AnalyzerEngine 준비 완료~")
 
     async def load_custom_entities(self):
@@ -26,9 +37,16 @@ class AnalyzerEngine:
             print("📋 커스텀 엔티티 로드 중...")
             await self.registry.load_custom_recognizers()
 
+    async def reload_custom_entities(self) -> bool:
+        """커스텀 엔티티가 바뀌었을 때만 다시 로드 (오래 쓰는 분석기용). 다시 로드했으면 True"""
+        if self.db_client is None:
+            return False
+        return await self.registry.reload_custom_recognizers()
+
     def analyze(self, text: str) -> EntityGroup:
         regex_group = self.registry.regex_analyze(text)
-        ner_group = self.nlp_engine.ner_analyze(text)
+        with self._ner_lock:
+            ner_group = self.nlp_engine.ner_analyze(text)
         combined = self._merge_groups(regex_group, ner_group)
         combined.entities = self._dedup_and_sort(combined.entities)
         
@@ -150,7 +168,18 @@ def find_text_coordinates_in_ocr(text: str, start_pos: int, end_pos: int, ocr_pa
     return coordinates
 
 
-async def recognize_pii_in_text(text_content: str, ocr_data: Optional[Dict] = None, db_client=None):
+async def create_analyzer(db_client=None) -> AnalyzerEngine:
+    # NER 모델 로드는 수 초 걸리므로 이벤트 루프 밖에서
+    analyzer = await asyncio.to_thread(AnalyzerEngine, db_client)
+
+    # 커스텀 엔티티 로드 (db_client가 있는 경우)
+    if db_client is not None:
+        await analyzer.load_custom_entities()
+    return analyzer
+
+
+async def recognize_pii_in_text(text_content: str, ocr_data: Optional[Dict] = None, db_client=None,
+                                analyzer: Optional[AnalyzerEngine] = None):
     """
     텍스트 분석을 수행하고 결과를 반환하는 최종 함수
     OCR 데이터가 있으면 PII의 좌표 정보도 함께 반환
@@ -160,7 +189,8 @@ async def recognize_pii_in_text(text_content: str, ocr_data: Optional[Dict] = No
     from html import unescape
 
     # HTML을 텍스트로 변환 (구조 유지)
-    cleaned_text = text_content
+    # 인라인 이미지(data: URI)의 base64는 분석할 텍스트가 아니므로 먼저 제거
+    cleaned_text = strip_inline_image_data(text_content)
 
     # 1. HTML 엔티티 디코딩 (&nbsp; → 공백 등)
     cleaned_text = unescape(cleaned_text)
@@ -185,13 +215,10 @@ async def recognize_pii_in_text(text_content: str, ocr_data: Optional[Dict] = No
 
     print(f"[DEBUG] 원본 텍스트 길이: {len(text_content)}, 정리 후: {len(cleaned_text)}")
 
-    analyzer = AnalyzerEngine(db_client=db_client)
-
-    # 커스텀 엔티티 로드 (db_client가 있는 경우)
-    if db_client is not None:
-        await analyzer.load_custom_entities()
+    if analyzer is None:
+        analyzer = await create_analyzer(db_client)
 
-    result = analyzer.analyze(cleaned_text)
+    result = await asyncio.to_thread(analyzer.analyze, cleaned_text)
 
     # FastAPI가 인식할 수 있는 딕셔너리 형태로 변환
     pii_entities_list = []
@@ -216,4 +243,314 @@ async def recognize_pii_in_text(text_content: str, ocr_data: Optional[Dict] = No
     return {
         "full_text": text_content,
         "pii_entities": pii_entities_list
-    }
\ No newline at end of file
+    }
+
+# 문서 파일 분석 결과에 담을 본문 미리보기 길이 (전체 텍스트는 메모리에 모으지 않음)
+DOCUMENT_TEXT_PREVIEW_CHARS = 20000
+
+
+def _analyze_chunks(analyzer: "AnalyzerEngine", chunks) -> Dict[str, Any]:
+    """
+    청크마다 분석기를 돌려 파일 전체 기준 오프셋과 앵커가 붙은 PII 목록을 만듭니다.
+    스레드에서 실행합니다 (NER 호출은 분석기 안에서 직렬화되고, 추출은 병렬로 진행).
+    """
+    pii_entities_list = []
+    preview = []
+    preview_length = 0
+    text_length = 0
+
+    for chunk in chunks:
+        if preview_length < DOCUMENT_TEXT_PREVIEW_CHARS:
+            preview.append(chunk.text[:DOCUMENT_TEXT_PREVIEW_CHARS - preview_length])
+            preview_length += len(preview[-1])
+        text_length += len(chunk.text)
+
+        result = analyzer.analyze(chunk.text)
+        for e in result.entities:
+            pii_entities_list.append({
+                "text": e.word,
+                "type": e.entity,
+                "score": e.score,
+                "start_char": chunk.offset + e.start,
+                "end_char": chunk.offset + e.end,
+                "anchor": chunk.anchor_at(e.start),
+            })
+
+    return {
+        "full_text": "".join(preview),
+        "text_length": text_length,
+        "truncated": text_length > preview_length,
+        "pii_entities": pii_entities_list
+    }
+
+
+async def recognize_pii_in_document_file(file_path: str, db_client=None,
+                                         analyzer: Optional[AnalyzerEngine] = None):
+    """
+    DOCX/XLSX/PPTX/HWP/HWPX 파일을 OCR 없이 문단 단위 청크로 나눠 분석합니다.
+    각 PII에는 파일 전체 텍스트 기준 오프셋과 위치 앵커(시트·셀, 슬라이드·도형·문단, 구역·문단 등)가
+    붙습니다. Office 문서의 앵커는 그대로 마스킹 요청에 넘기면 해당 위치만 마스킹됩니다.
+    """
+    chunks = iter_office_chunks(file_path) if is_office_file(file_path) else iter_hwp_chunks(file_path)
+    if analyzer is None:
+        analyzer = await create_analyzer(db_client)
+    return await asyncio.to_thread(_analyze_chunks, analyzer, chunks)
+
+
+# ===== 압축 파일 (ZIP/7z) =====
+
+# 압축 파일 멤버를 동시에 추출·분석할 개수 (풀려 있는 임시 파일 수도 이 값으로 제한됨)
+ARCHIVE_SCAN_CONCURRENCY = int(os.getenv("ARCHIVE_SCAN_CONCURRENCY", "4"))
+TEXT_EXTENSIONS = (".txt", ".csv", ".tsv", ".md", ".log", ".json", ".xml", ".html", ".htm")
+OCR_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".pdf")
+_TEXT_SAMPLE_SIZE = 64 * 1024
+
+
+def _detect_text_encoding(file_path: str) -> str:
+    """앞부분이 UTF-8로 읽히면 UTF-8, 아니면 CP949 (국내 CSV/TXT)"""
+    with open(file_path, "rb") as f:
+        sample = f.read(_TEXT_SAMPLE_SIZE)
+    try:
+        sample.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # 샘플 끝에서 잘린 멀티바이트 문자는 UTF-8로 봄
+        if e.start < len(sample) - 3:
+            return "cp949"
+    return "utf-8-sig"
+
+
+def _iter_text_paragraphs(file_path: str):
+    """텍스트 파일을 줄 단위 (텍스트, {"line"}) 문단으로 읽음"""
+    with open(file_path, "r", encoding=_detect_text_encoding(file_path), errors="replace") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.rstrip("\r\n")
+            if line.strip():
+                yield line, {"line": line_number}
+
+
+def _iter_file_chunks(file_path: str, name: str):
+    """파일명 확장자에 맞는 추출기로 청크를 만듦 (지원하지 않으면 None)"""
+    name = name.lower()
+    if is_office_file(name):
+        return iter_office_chunks(file_path, os.path.splitext(name)[1])
+    if is_hwp_file(name):
+        return iter_hwp_chunks(file_path, os.path.splitext(name)[1])
+    if name.endswith(TEXT_EXTENSIONS):
+        return chunk_paragraphs(_iter_text_paragraphs(file_path))
+    if name.endswith(OCR_EXTENSIONS):
+        with open(file_path, "rb") as f:
+            ocr_result = extract_text_from_file(f.read(), name)
+        return chunk_paragraphs([(ocr_result.get("full_text", ""), {"ocr": True})])
+    return None
+
+
+def _analyze_archive_member(analyzer: "AnalyzerEngine", member: ArchiveMember) -> Dict[str, Any]:
+    chunks = _iter_file_chunks(member.file_path, member.name)
+    if chunks is None:
+        return {"status": "unsupported", "pii_entities": []}
+    result = _analyze_chunks(analyzer, chunks)
+    result["status"] = "analyzed"
+    return result
+
+
+async def recognize_pii_in_archive_file(file_path: str, db_client=None, name: Optional[str] = None,
+                                        analyzer: Optional[AnalyzerEngine] = None):
+    """
+    ZIP/7z 파일을 중첩 압축 파일까지 풀면서 멤버별로 맞는 추출기(Office/한글/텍스트/OCR)로 분석합니다.
+
+    멤버는 풀리는 대로 최대 ARCHIVE_SCAN_CONCURRENCY개까지 동시에 추출·분석하고, 분석이 끝난
+    임시 파일은 바로 지웁니다. 분석기(NER 모델)는 하나를 공유하며 NER 호출만 분석기 안에서 직렬화됩니다.
+    압축 폭탄 한도를 넘으면 그때까지 분석한 멤버와 함께 archive_error를 돌려줍니다.
+
+    Returns:
+        dict: {"full_text", "pii_entities", "members", "archive_error"}
+              pii_entities의 오프셋은 각 멤버 텍스트 기준이며 "member"에 멤버 경로가 들어갑니다.
+    """
+    if analyzer is None:
+        analyzer = await create_analyzer(db_client)
+    slots = asyncio.Semaphore(ARCHIVE_SCAN_CONCURRENCY)
+    members: List[ArchiveMember] = []
+    member_results: Dict[str, Dict[str, Any]] = {}
+    tasks = []
+    archive_error = None
+
+    async def scan(member: ArchiveMember):
+        try:
+            member_results[member.path] = await asyncio.to_thread(
+                _analyze_archive_member, analyzer, member
+            )
+        except Exception as e:
+            print(f"[압축 파일] ⚠️ 멤버 분석 실패 ({member.path}): {e}")
+            member_results[member.path] = {"status": "error", "message": str(e), "pii_entities": []}
+        finally:
+            os.remove(member.file_path)
+            slots.release()
+
+    with tempfile.TemporaryDirectory(prefix="archive_") as work_dir:
+        walker = walk_archive(file_path, work_dir, name)
+        while True:
+            # 분석 슬롯이 비어야 다음 멤버를 풂 (풀린 채 대기하는 파일 수 제한)
+            await slots.acquire()
+            try:
+                member = await asyncio.to_thread(next, walker, None)
+            except Exception as e:
+                slots.release()
+                archive_error = str(e)
+                print(f"[압축 파일] ❌ 탐색 중단: {archive_error}")
+                break
+            if member is None:
+                slots.release()
+                break
+
+            members.append(member)
+            if member.status == "extracted":
+                tasks.append(asyncio.create_task(scan(member)))
+            else:
+                slots.release()
+
+        await asyncio.gather(*tasks)
+
+    pii_entities_list = []
+    breakdown = []
+    for member, summary in zip(members, summarize_members(members)):
+        result = member_results.get(member.duplicate_of or member.path)
+        if result is not None:
+            summary["analysis_status"] = result["status"]
+            summary["pii_count"] = len(result["pii_entities"])
+            if result.get("message"):
+                summary["message"] = result["message"]
+        if member.status == "extracted" and result is not None:
+            summary["text_length"] = result.get("text_length", 0)
+            for entity in result["pii_entities"]:
+                pii_entities_list.append({**entity, "member": member.path})
+        breakdown.append(summary)
+
+    return {
+        "full_text": "",
+        "pii_entities": pii_entities_list,
+        "members": breakdown,
+        "archive_error": archive_error,
+    }
+
+
+async def recognize_pii_in_attachment_file(file_path: str, name: str, db_client=None,
+                                           analyzer: Optional[AnalyzerEngine] = None):
+    """
+    첨부파일을 형식에 맞는 경로로 분석합니다 (받은 메일 자동 분석용).
+    압축 파일은 멤버별로, 이미지·PDF는 OCR 후 좌표와 함께, Office/한글/텍스트 파일은 청크 단위로 분석합니다.
+
+    Returns:
+        dict: 각 경로의 분석 결과 + "status" (analyzed / archive_rejected / unsupported)
+    """
+    if analyzer is None:
+        analyzer = await create_analyzer(db_client)
+    lowered = name.lower()
+
+    if is_archive_file(lowered):
+        result = await recognize_pii_in_archive_file(file_path, db_client, name, analyzer=analyzer)
+        result["status"] = "archive_rejected" if result["archive_error"] else "analyzed"
+        return result
+
+    if lowered.endswith(OCR_EXTENSIONS):
+        with open(file_path, "rb") as f:
+            file_content = f.read()
+        ocr_result = await asyncio.to_thread(extract_text_from_file, file_content, name)
+        result = await recognize_pii_in_text(ocr_result.get("full_text", ""), ocr_result, analyzer=analyzer)
+        result["status"] = "analyzed"
+        return result
+
+    chunks = _iter_file_chunks(file_path, name)
+    if chunks is None:
+        return {"status": "unsupported", "full_text": "", "pii_entities": []}
+    result = await asyncio.to_thread(_analyze_chunks, analyzer, chunks)
+    result["status"] = "analyzed"
+    return result
+
+
+# ===== HTML 본문 인라인 이미지 =====
+
+# 본문 인라인 이미지를 동시에 OCR할 개수
+INLINE_IMAGE_OCR_CONCURRENCY = int(os.getenv("INLINE_IMAGE_OCR_CONCURRENCY", "4"))
+
+
+def _analyze_inline_image(analyzer: "AnalyzerEngine", image: InlineImage) -> Dict[str, Any]:
+    """인라인 이미지 하나를 OCR하고 PII마다 이미지 좌표(bbox)를 붙임"""
+    ocr_result = extract_text_from_file(image.data, f"inline_{image.index}{image.extension}")
+    ocr_text = ocr_result.get("full_text", "")
+    result = analyzer.analyze(ocr_text)
+
+    pii_entities_list = []
+    for e in result.entities:
+        pii_entities_list.append({
+            "text": e.word,
+            "type": e.entity,
+            "score": e.score,
+            "start_char": e.start,
+            "end_char": e.end,
+            "coordinates": find_text_coordinates_in_ocr(ocr_text, e.start, e.end, ocr_result.get("pages", [])),
+        })
+    return {"status": "analyzed", "full_text": ocr_text, "pii_entities": pii_entities_list}
+
+
+async def recognize_pii_in_email_body(body: str, db_client=None,
+                                      cid_parts: Optional[Dict[str, Any]] = None,
+                                      analyzer: Optional[AnalyzerEngine] = None):
+    """
+    HTML 메일 본문을 분석합니다. data:/cid: 인라인 이미지는 떼어내 OCR로 따로 분석하고,
+    남은 본문은 base64 없이 텍스트로 분석합니다.
+    cid_parts: {Content-ID: (바이트, content_type)} - 받은 메일의 multipart/related 파트
+
+    Returns:
+        dict: recognize_pii_in_text 결과 + "inline_images"
+              각 이미지에는 원본 HTML의 URI 위치(html_start, html_end), sha256, content_id와
+              OCR 좌표가 붙은 pii_entities가 들어가 마스킹 패치(/masking/text)나 MIME 파트 교체에 씁니다.
+    """
+    stripped_body, images = lift_inline_images(body, cid_parts)
+    if analyzer is None:
+        analyzer = await create_analyzer(db_client)
+
+    result = await recognize_pii_in_text(stripped_body, db_client=db_client, analyzer=analyzer)
+    result["full_text"] = body
+
+    slots = asyncio.Semaphore(INLINE_IMAGE_OCR_CONCURRENCY)
+    image_results: Dict[str, Dict[str, Any]] = {}
+
+    async def scan(image: InlineImage):
+        async with slots:
+            try:
+                image_results[image.sha256] = await asyncio.to_thread(
+                    _analyze_inline_image, analyzer, image
+                )
+            except Exception as e:
+                print(f"[인라인 이미지] ⚠️ OCR/분석 실패 (#{image.index}): {e}")
+                image_results[image.sha256] = {"status": "error", "message": str(e), "pii_entities": []}
+
+    # 같은 이미지가 여러 번 들어 있으면 한 번만 OCR
+    unique = {}
+    for image in images:
+        if image.data is not None and image.extension and image.sha256 not in unique:
+            unique[image.sha256] = image
+    await asyncio.gather(*(scan(image) for image in unique.values()))
+
+    inline_images = []
+    for image in images:
+        entry = {
+            "index": image.index,
+            "source": image.source,
+            "content_type": image.content_type,
+            "content_id": image.content_id,
+            "html_start": image.html_start,
+            "html_end": image.html_end,
+            "sha256": image.sha256,
+            "size": len(image.data) if image.data is not None else None,
+        }
+        if image.data is None:
+            entry.update(status="missing", pii_entities=[])
+        elif not image.extension:
+            entry.update(status="unsupported", pii_entities=[])
+        else:
+            entry.update(image_results[image.sha256])
+        inline_images.append(entry)
+
+    result["inline_images"] = inline_images
+    return result
@@ -78,6 +78,7 @@ class RecognizerRegistry:
     def __init__(self, db_client=None):
         self.recognizers: Dict[str, EntityRecognizer] = {}
         self.db_client = db_client
+        self._custom_signature = None  # 마지막으로 로드한 커스텀 엔티티 (reload_custom_recognizers 비교용)
 
         # 엔티티 우선순위 정의
         self.entity_priority = {
@@ -152,6 +153,43 @@ class RecognizerRegistry:
         except Exception as e:
             print(f"❌ 커스텀 엔티티 로드 실패: {e}")
 
+    async def reload_custom_recognizers(self) -> bool:
+        """
+        커스텀 엔티티가 마지막 로드 이후 바뀌었으면(추가·수정·비활성화) 동적 Recognizer를 다시 만듦.
+        분석 중인 스레드가 이전 목록을 그대로 쓸 수 있도록 recognizers는 통째로 교체합니다. 다시 만들었으면 True
+        """
+        if self.db_client is None:
+            return False
+
+        docs = await self.db_client["entities"].find(
+            {"is_active": True},
+            {"_id": 0, "entity_id": 1, "name": 1, "regex_pattern": 1, "keywords": 1}
+        ).to_list(length=None)
+        signature = sorted(repr(sorted(doc.items())) for doc in docs)
+        if signature == self._custom_signature:
+            return False
+
+        recognizers = {name: r for name, r in self.recognizers.items() if not isinstance(r, DynamicRegexRecognizer)}
+        custom_count = 0
+        for doc in docs:
+            keywords = doc.get("keywords", [])
+            if isinstance(keywords, str):
+                keywords = [kw.strip() for kw in keywords.split(',') if kw.strip()]
+            if doc.get("regex_pattern"):
+                recognizer = DynamicRegexRecognizer(
+                    entity_id=doc.get("entity_id"),
+                    entity_type=doc.get("entity_id", "CUSTOM").upper(),
+                    name=doc.get("name"),
+                    regex_pattern=doc["regex_pattern"],
+                    keywords=keywords
+                )
+                recognizers[recognizer.name] = recognizer
+                custom_count += 1
+        self.recognizers = recognizers
+        self._custom_signature = signature
+        print(f"📦 커스텀 엔티티가 바뀌어 {custom_count}개를 다시 로드했습니다.")
+        return True
+
     def remove_recognizer(self, recognizer_name: str):
         if recognizer_name in self.recognizers:
             del self.recognizers[recognizer_name]
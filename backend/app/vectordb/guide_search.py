@@ -0,0 +1,137 @@
+"""
+/vectordb 분석용 가이드라인 검색 백엔드 (GUIDE_SEARCH_BACKEND로 선택)
+- openai : OpenAI Vector Store file_search (routes.search_with_assistant, 분석마다 네트워크 호출)
+- local  : STAGING_DIR의 가이드 JSONL로 만든 로컬 하이브리드 인덱스 (임베딩 + BM25), 네트워크 없음
+두 백엔드 모두 file_search 결과와 같은 형식({'content', 'filename', 'score'})을 반환하므로
+rag_masking의 판단 로직은 그대로 사용합니다.
+
+로컬 인덱스는 가이드 저장소(guide_store.py)의 버전이 바뀌면 다시 만들고, 토큰·임베딩은
+<STAGING_DIR>/vectordb_guides.tokens.json / .embeddings.json에 저장해 바뀐 가이드만 다시 계산합니다.
+임베딩 모델·토크나이저는 HybridRetriever와 같은 공용 레지스트리 인스턴스를 씁니다.
+"""
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from app.utils.rag_integration import RAG_AVAILABLE
+
+# 쿼리 임베딩·검색 결과 캐시 (의존성 없는 모듈이라 RAG 로드 실패와 무관하게 사용)
+RAG_DIR = str(Path(__file__).resolve().parent.parent / "rag")
+if RAG_DIR not in sys.path:
+    sys.path.insert(0, RAG_DIR)
+from agent.retrieval_cache import normalize_query, retrieval_cache
+
+GUIDE_SEARCH_BACKEND = os.getenv("GUIDE_SEARCH_BACKEND", "openai").lower()
+# 로컬 검색이 반환할 가이드 수 (file_search 기본 결과 수와 비슷하게)
+GUIDE_SEARCH_TOP_K = int(os.getenv("GUIDE_SEARCH_TOP_K", "10"))
+
+
+def build_guide_query(query: str, context: Optional[Dict[str, Any]] = None) -> str:
+    """검색 쿼리에 수신자 유형을 붙인 최종 쿼리 (두 백엔드 공통)"""
+    receiver_type = context.get('receiver_type', 'external') if context else 'external'
+    return f"이메일 {receiver_type} 전송 시 개인정보 마스킹 가이드라인: {query}"
+
+
+class _LocalIndex(NamedTuple):
+    """한 번에 교체되는 로컬 가이드 인덱스"""
+    guides: List[Dict[str, Any]]
+    corpus: List[str]
+    bm25: Any       # agent.sparse_bm25.SparseBM25
+    index: Any      # agent.guide_index.GuideIndex
+    version: Tuple
+
+
+class LocalGuideSearch:
+    """STAGING_DIR 가이드 JSONL 로컬 하이브리드 검색 (Vector 0.7 + BM25 0.3, 수신자 유형 일치 보너스)"""
+
+    def __init__(self, guide_store, build_text: Callable[[Dict], str]):
+        self.guide_store = guide_store
+        self.build_text = build_text
+        # 토큰·임베딩 저장 파일 이름 기준
+        self.store_path = str(guide_store.staging_dir / "vectordb_guides.jsonl")
+        self.state = _LocalIndex([], [], None, None, ())
+        self._lock = threading.Lock()
+
+    def _current(self) -> _LocalIndex:
+        version = self.guide_store.version()
+        if self.state.index is not None and self.state.version == version:
+            return self.state
+        with self._lock:
+            if self.state.index is None or self.state.version != version:
+                self.state = self._build(version)
+        return self.state
+
+    def _build(self, version: Tuple) -> _LocalIndex:
+        from agent.guide_embeddings import GuideEmbeddingStore
+        from agent.guide_index import GuideIndex
+        from agent.korean_tokenizer import TokenizedCorpusStore
+        from agent.model_registry import model_registry
+        from agent.retrievers import EMBEDDING_MODEL_NAME
+        from agent.sparse_bm25 import SparseBM25
+
+        guides = [guide for group in self.guide_store.grouped().values() for guide in group]
+        corpus = [self.build_text(guide) for guide in guides]
+        if not corpus:
+            return _LocalIndex([], [], None, None, version)
+
+        tokens = TokenizedCorpusStore(self.store_path, model_registry.tokenizer()).load(corpus)
+        store = GuideEmbeddingStore(
+            self.store_path, lambda: model_registry.embedding_model(EMBEDDING_MODEL_NAME), EMBEDDING_MODEL_NAME
+        )
+        index = GuideIndex(guides, store.load(corpus))
+        files = len({guide.get('_jsonl_file') for guide in guides})
+        print(f"[Guide Search] ✅ 로컬 가이드 인덱스 생성: {len(guides)}개 ({files}개 파일)")
+        return _LocalIndex(guides, corpus, SparseBM25.from_tokenized(tokens), index, version)
+
+    def search(self, query: str, context: Optional[Dict[str, Any]] = None,
+               top_k: int = GUIDE_SEARCH_TOP_K) -> List[Dict[str, Any]]:
+        """가이드라인 검색 (file_search 결과 형식). 같은 쿼리·인덱스 버전은 결과 캐시에서 반환"""
+        if not RAG_AVAILABLE:
+            raise RuntimeError("RAG 모듈을 사용할 수 없어 로컬 가이드 검색 불가")
+
+        state = self._current()
+        if not state.guides:
+            return []
+
+        text = normalize_query(build_guide_query(query, context))
+        receiver_type = context.get('receiver_type', 'external') if context else 'external'
+        key = ('local_guide_search', text, receiver_type, top_k, state.version, retrieval_cache.generation)
+        results = retrieval_cache.results.get(key)
+        if results is None:
+            results = self._search(state, text, receiver_type, top_k)
+            retrieval_cache.results.set(key, results)
+        return [dict(result) for result in results]
+
+    def _search(self, state: _LocalIndex, text: str, receiver_type: str, top_k: int) -> List[Dict[str, Any]]:
+        import numpy as np
+        from agent.guide_index import top_k_indices
+        from agent.model_registry import model_registry
+        from agent.retrievers import EMBEDDING_MODEL_NAME
+
+        # 가이드는 수백~수천 개라 후보를 좁히지 않고 전체 점수 계산 (행렬 × 벡터 한 번)
+        query_embedding = retrieval_cache.embed(
+            EMBEDDING_MODEL_NAME, text,
+            lambda value: model_registry.embedding_model(EMBEDDING_MODEL_NAME).encode(value, normalize_embeddings=True)
+        )
+        combined = 0.7 * state.index.score(query_embedding)
+        combined += 0.3 * state.bm25.get_scores(model_registry.tokenizer().morphs(text))
+        combined *= state.index.context_multiplier(np.arange(state.index.size), {'receiver_type': receiver_type})
+
+        results = []
+        for row in top_k_indices(combined, top_k):
+            guide = state.guides[row]
+            results.append({
+                'content': state.corpus[row],
+                'filename': guide.get('_jsonl_file', ''),
+                'score': float(combined[row]),
+                'guide_id': guide.get('guide_id', ''),
+                'source_document': guide.get('source_document', ''),
+            })
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        files = len({guide.get('_jsonl_file') for guide in state.guides})
+        return {"guides": len(state.guides), "files": files, "loaded": state.index is not None}
@@ -0,0 +1,569 @@
+"""
+/vectordb 가이드 저장소 (인메모리 색인 + 추가 전용 변경 로그)
+- 기준 스냅샷: STAGING_DIR의 *.jsonl (빌드 스크립트가 그대로 읽는 형식)
+- CRUD: 파일 전체를 다시 쓰지 않고 STAGING_DIR/.guide_changes.log에 변경 한 줄(upsert / delete)만 추가 → guide_id당 O(1)
+- 동시성: 쓰기·압축은 STAGING_DIR/.guides.lock 배타 잠금(fcntl.flock), 변경 확인은 공유 잠금
+  → 여러 워커 프로세스가 같은 STAGING_DIR를 고쳐도 변경이 유실되지 않음 (프로세스 안은 RLock)
+- 압축: 로그가 GUIDE_LOG_COMPACT_ENTRIES줄 이상이거나 가장 오래된 미반영 변경이 GUIDE_LOG_COMPACT_SECONDS초를
+  넘으면 변경된 JSONL 파일만 다시 쓰고 로그를 비움. 로그 재적용은 멱등이라 압축 도중 죽어도 다음 로드에서 복구됨
+  쓰기 후 GUIDE_LOG_COMPACT_DELAY_SECONDS초 동안 다른 쓰기가 없으면 배경 스레드가 압축 → JSONL을 직접 읽는
+  쪽(정책 스키마 목록, HybridRetriever의 application_guides.jsonl)도 다음 저장소 호출을 기다리지 않고 반영됨
+  빌드 스크립트 실행 전 즉시 반영: python -m app.vectordb.guide_store --staging-dir <경로> compact
+- 조회(get / by_source / grouped)는 디스크를 읽지 않음. GUIDE_STORE_CHECK_SECONDS마다 파일 (inode, mtime, 크기)와
+  로그 끝을 확인해 배경 작업·다른 프로세스의 변경을 반영
+- 변경 이벤트: subscribe(callback)으로 GuideChange를 받음 (증분 재색인·캐시 무효화용)
+  op: upsert / delete, 밖에서 JSONL 파일 내용이 바뀌면 reload (guide_id 없음, 전체 다시 읽기)
+
+조회 결과(가이드 dict·목록)는 저장소와 공유되므로 수정하지 말고, 고칠 때는 upsert / update / delete를 씁니다.
+같은 guide_id가 여러 파일에 있으면 파일 이름 순 첫 항목만 색인합니다.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 간 잠금 없이 프로세스 안 잠금만
+    fcntl = None
+
+# 파일 변경 확인 간격 (0이면 조회마다 확인)
+GUIDE_STORE_CHECK_SECONDS = int(os.getenv("GUIDE_STORE_CHECK_SECONDS", "5"))
+# 변경 로그 압축 기준 (줄 수 / 가장 오래된 미반영 변경의 나이)
+GUIDE_LOG_COMPACT_ENTRIES = int(os.getenv("GUIDE_LOG_COMPACT_ENTRIES", "200"))
+GUIDE_LOG_COMPACT_SECONDS = int(os.getenv("GUIDE_LOG_COMPACT_SECONDS", "60"))
+# 마지막 쓰기 후 배경 압축까지 기다리는 시간 (연속 편집을 한 번에 반영, 음수면 끔)
+GUIDE_LOG_COMPACT_DELAY_SECONDS = float(os.getenv("GUIDE_LOG_COMPACT_DELAY_SECONDS", "2"))
+
+LOG_FILENAME = ".guide_changes.log"
+LOCK_FILENAME = ".guides.lock"
+
+
+class GuideChange(NamedTuple):
+    """가이드 변경 한 건 (변경 로그 한 줄)"""
+    seq: int
+    op: str                          # upsert | delete | reload
+    guide_id: str
+    filename: str                    # 가이드가 속한 JSONL 파일
+    guide: Optional[Dict[str, Any]]  # upsert 후 가이드 (_jsonl_file 제외), delete면 None
+    at: float                        # time.time()
+
+
+class _GuideFile(NamedTuple):
+    """파싱된 JSONL 파일 하나"""
+    key: Tuple[int, int, int]  # (inode, mtime_ns, 크기)
+    guides: List[Dict[str, Any]]
+
+
+def _file_key(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _parse(path: Path) -> List[Dict[str, Any]]:
+    guides = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                guide = json.loads(line)
+                guide["_jsonl_file"] = path.name
+                guides.append(guide)
+    return guides
+
+
+def _record(guide: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in guide.items() if k != "_jsonl_file"}
+
+
+def _write_atomic(path: Path, lines: List[str]):
+    """임시 파일에 쓰고 fsync 후 교체"""
+    tmp_path = path.with_name(f".{path.name}.tmp.{os.getpid()}.{threading.get_ident()}")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+class GuideStore:
+    """STAGING_DIR 가이드 저장소 (스레드·프로세스 안전)"""
+
+    def __init__(self, staging_dir: Path, check_seconds: int = GUIDE_STORE_CHECK_SECONDS,
+                 compact_entries: int = GUIDE_LOG_COMPACT_ENTRIES, compact_seconds: int = GUIDE_LOG_COMPACT_SECONDS,
+                 compact_delay: float = GUIDE_LOG_COMPACT_DELAY_SECONDS):
+        self.staging_dir = Path(staging_dir)
+        self.log_path = self.staging_dir / LOG_FILENAME
+        self.lock_path = self.staging_dir / LOCK_FILENAME
+        self.check_seconds = check_seconds
+        self.compact_entries = compact_entries
+        self.compact_seconds = compact_seconds
+        self.compact_delay = compact_delay
+
+        self._files: Dict[str, _GuideFile] = {}       # 항상 통째로 교체
+        self._base: Dict[str, Dict[str, Any]] = {}    # guide_id → JSONL 파일의 가이드
+        self._guides: Dict[str, Dict[str, Any]] = {}  # guide_id → 현재 가이드 (로그 반영)
+        self._by_source: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._grouped: Optional[Dict[str, List[Dict[str, Any]]]] = None
+
+        # 아직 JSONL 파일에 반영되지 않은 변경 (guide_id → 마지막 변경)
+        self._pending: Dict[str, GuideChange] = {}
+        self._pending_since: Optional[float] = None
+        self._log_inode: Optional[int] = None
+        self._log_head = b""  # 로그 첫 줄 (압축으로 교체됐는지 확인용)
+        self._log_offset = 0
+        self._log_entries = 0
+        self.seq = 0
+
+        self._subscribers: List[Callable[[GuideChange], None]] = []
+        self._checked_at: Optional[float] = None
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._compact_timer: Optional[threading.Timer] = None
+        self.parses = 0
+        self.compactions = 0
+
+    # ------------------------------------------------------------------ 잠금·동기화
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """프로세스 간 잠금 (self._lock을 잡은 뒤에만, 중첩하지 않음)"""
+        if fcntl is None or not self.staging_dir.exists():
+            yield
+            return
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        파일·변경 로그 확인 (check_seconds 간격, force면 즉시). 바뀐 파일만 다시 파싱하고 로그는 읽은 위치부터.
+        변경이 있었으면 True
+        """
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.check_seconds:
+            return False
+
+        with self._lock:
+            self._checked_at = now
+            with self._file_lock(exclusive=False):
+                events, changed = self._sync()
+            if self._should_compact():
+                self.compact()
+        self._notify(events)
+        return changed
+
+    def _sync(self) -> Tuple[List[GuideChange], bool]:
+        """디스크 상태 반영 (두 잠금 안에서). (새 변경 이벤트, 색인이 바뀌었는지)"""
+        replaced = self._check_log()
+        files_changed = self._scan_files()
+        events = []
+        if files_changed or replaced:
+            previous = self._guides
+            self._rebuild()
+            if self._loaded and previous != self._guides:
+                events.append(GuideChange(self.seq, "reload", "", "", None, time.time()))
+        events.extend(self._read_log())
+        changed = bool(files_changed or replaced or events)
+        if not self._loaded:
+            self._loaded = True
+            events = []  # 첫 로드는 이벤트 없음
+        return events, changed
+
+    def _check_log(self) -> bool:
+        """로그가 압축으로 교체·삭제됐으면 읽은 위치·미반영 변경을 초기화하고 True"""
+        key = _file_key(self.log_path)
+        replaced = self._log_inode is not None and bool(
+            key is None or key[0] != self._log_inode or key[2] < self._log_offset
+            or (self._log_head and self._read_head() != self._log_head)
+        )
+        if replaced:
+            self._pending = {}
+            self._pending_since = None
+            self._log_offset = 0
+            self._log_entries = 0
+            self._log_head = b""
+        self._log_inode = key[0] if key else None
+        return replaced
+
+    def _read_head(self) -> bytes:
+        try:
+            with open(self.log_path, "rb") as f:
+                return f.readline()
+        except OSError:
+            return b""
+
+    def _scan_files(self) -> bool:
+        paths = sorted(self.staging_dir.glob("*.jsonl")) if self.staging_dir.exists() else []
+        files = {}
+        changed = set(self._files) - {path.name for path in paths}  # 삭제된 파일
+        for path in paths:
+            entry = self._load_file(path)
+            if entry is not None:
+                files[path.name] = entry
+            if entry is not self._files.get(path.name):
+                changed.add(path.name)
+        if changed:
+            self._files = files
+        return bool(changed)
+
+    def _load_file(self, path: Path) -> Optional[_GuideFile]:
+        """(inode, mtime, 크기)가 같으면 기존 항목, 다르면 다시 파싱 (실패하면 기존 항목 유지)"""
+        previous = self._files.get(path.name)
+        key = _file_key(path)  # 읽기 전에 stat: 읽는 중 바뀌면 다음 확인에서 다시 파싱됨
+        if key is None:
+            return None
+        if previous is not None and previous.key == key:
+            return previous
+        try:
+            guides = _parse(path)
+        except (OSError, ValueError) as e:
+            print(f"파일 로드 실패 {path.name}: {e}")
+            return previous
+        self.parses += 1
+        return _GuideFile(key, guides)
+
+    def _read_log(self) -> List[GuideChange]:
+        """로그에서 읽은 위치 이후의 완성된 줄만 적용 (쓰는 중인 마지막 줄은 다음에)"""
+        if self._log_inode is None:
+            return []
+        with open(self.log_path, "rb") as f:
+            if self._log_offset == 0:
+                self._log_head = f.readline()
+            f.seek(self._log_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        self._log_offset += end
+
+        changes = []
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                if entry["op"] == "checkpoint":
+                    self.seq = max(self.seq, entry["seq"])
+                    continue
+                change = GuideChange(entry["seq"], entry["op"], entry["guide_id"], entry["filename"],
+                                     entry.get("guide"), entry["at"])
+            except (ValueError, KeyError) as e:
+                print(f"[Guide Store] ⚠️ 변경 로그의 손상된 줄 무시: {e}")
+                continue
+            self._apply(change)
+            changes.append(change)
+        return changes
+
+    # ------------------------------------------------------------------ 색인
+
+    def _rebuild(self):
+        """JSONL 파일로 색인을 다시 만들고 미반영 변경을 순서대로 재적용"""
+        self._base = {}
+        self._guides = {}
+        self._by_source = {}
+        self._grouped = None
+        for entry in self._files.values():
+            for guide in entry.guides:
+                guide_id = guide.get("guide_id")
+                if guide_id not in self._base:  # 중복 ID는 파일 이름 순 첫 항목
+                    self._base[guide_id] = guide
+                    self._index_put(guide)
+        for change in sorted(self._pending.values(), key=lambda change: change.seq):
+            self._apply_to_index(change)
+
+    def _apply(self, change: GuideChange):
+        self.seq = max(self.seq, change.seq)
+        if not self._pending:
+            self._pending_since = change.at
+        self._pending[change.guide_id] = change
+        self._log_entries += 1
+        self._apply_to_index(change)
+
+    def _apply_to_index(self, change: GuideChange):
+        if change.op == "upsert":
+            self._index_put({**change.guide, "_jsonl_file": change.filename})
+        elif change.op == "delete":
+            self._index_remove(change.guide_id)
+
+    def _index_put(self, guide: Dict[str, Any]):
+        """가이드 추가·교체 (기존 가이드면 목록 위치 유지)"""
+        guide_id = guide.get("guide_id")
+        source = guide.get("source_document", "Unknown")
+        previous = self._guides.get(guide_id)
+        if previous is not None and previous.get("source_document", "Unknown") != source:
+            self._remove_from_source(previous)
+        self._guides[guide_id] = guide
+        self._by_source.setdefault(source, {})[guide_id] = guide
+        self._grouped = None
+
+    def _index_remove(self, guide_id: str):
+        guide = self._guides.pop(guide_id, None)
+        if guide is not None:
+            self._remove_from_source(guide)
+            self._grouped = None
+
+    def _remove_from_source(self, guide: Dict[str, Any]):
+        source = guide.get("source_document", "Unknown")
+        group = self._by_source.get(source, {})
+        group.pop(guide.get("guide_id"), None)
+        if not group:
+            self._by_source.pop(source, None)
+
+    # ------------------------------------------------------------------ 조회
+
+    def grouped(self) -> Dict[str, List[Dict[str, Any]]]:
+        """{source_document: [가이드...]} (가이드마다 _jsonl_file 포함)"""
+        self.refresh()
+        with self._lock:
+            if self._grouped is None:
+                self._grouped = {source: list(group.values()) for source, group in self._by_source.items()}
+            return self._grouped
+
+    def by_source(self, source_document: str) -> List[Dict[str, Any]]:
+        self.refresh()
+        with self._lock:
+            return list(self._by_source.get(source_document, {}).values())
+
+    def get(self, guide_id: str) -> Optional[Dict[str, Any]]:
+        self.refresh()
+        return self._guides.get(guide_id)
+
+    def version(self) -> Tuple:
+        """(파일별 (이름, (inode, mtime, 크기)), 변경 번호). 가이드가 바뀌면 달라짐"""
+        self.refresh()
+        with self._lock:
+            return tuple((name, entry.key) for name, entry in self._files.items()), self.seq
+
+    # ------------------------------------------------------------------ 쓰기
+
+    def upsert(self, guide: Dict[str, Any], filename: Optional[str] = None) -> GuideChange:
+        """가이드 추가·교체. 기존 가이드는 원래 파일에 남고, 새 가이드는 filename 파일에 추가"""
+        record = _record(guide)
+
+        def decide(current):
+            target = current.get("_jsonl_file") if current else filename
+            if not target:
+                raise ValueError("새 가이드를 저장할 JSONL 파일 이름이 필요합니다")
+            return "upsert", target, record
+
+        return self._commit(record.get("guide_id"), decide)
+
+    def update(self, guide_id: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """기존 가이드의 필드 일부 수정 (읽기-수정-쓰기를 잠금 안에서). 수정된 가이드 복사본, 없으면 None"""
+        def decide(current):
+            if current is None:
+                return None
+            record = {**_record(current), **changes, "guide_id": guide_id}
+            return "upsert", current["_jsonl_file"], record
+
+        change = self._commit(guide_id, decide)
+        return dict(change.guide) if change else None
+
+    def delete(self, guide_id: str) -> bool:
+        """가이드 삭제. 없으면 False"""
+        def decide(current):
+            return ("delete", current["_jsonl_file"], None) if current else None
+
+        return self._commit(guide_id, decide) is not None
+
+    def _commit(self, guide_id: str, decide: Callable) -> Optional[GuideChange]:
+        """배타 잠금 안에서 최신 상태를 반영한 뒤 decide(현재 가이드)의 (op, 파일, 가이드)를 로그에 추가"""
+        if not guide_id:
+            raise ValueError("guide_id가 필요합니다")
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            with self._file_lock(exclusive=True):
+                events, _ = self._sync()
+                decision = decide(self._guides.get(guide_id))
+                change = None
+                if decision is not None:
+                    op, filename, guide = decision
+                    change = GuideChange(self.seq + 1, op, guide_id, filename, guide, time.time())
+                    self._append(change)
+                    self._apply(change)
+                    events.append(change)
+                self._checked_at = time.monotonic()
+            if self._should_compact():
+                self.compact()
+            elif change is not None:
+                self._schedule_compact()
+        self._notify(events)
+        return change
+
+    def _append(self, change: GuideChange):
+        """로그 끝에 한 줄 추가 후 fsync. 이전 쓰기가 줄 중간에서 끊겼으면 줄을 바꿔서 씀"""
+        line = json.dumps(change._asdict(), ensure_ascii=False).encode("utf-8") + b"\n"
+        with open(self.log_path, "ab") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size > self._log_offset:
+                f.write(b"\n")
+            elif size == 0:
+                self._log_head = line
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+            self._log_inode = os.fstat(f.fileno()).st_ino
+            self._log_offset = f.tell()
+
+    # ------------------------------------------------------------------ 압축
+
+    def _should_compact(self) -> bool:
+        if not self._pending:
+            return False
+        if self.compact_entries > 0 and self._log_entries >= self.compact_entries:
+            return True
+        return self.compact_seconds > 0 and time.time() - self._pending_since >= self.compact_seconds
+
+    def _schedule_compact(self):
+        """배경 압축 예약 (self._lock 안에서). 이미 예약돼 있으면 마지막 쓰기 기준으로 다시 미룸"""
+        if self.compact_delay < 0:
+            return
+        if self._compact_timer is not None:
+            self._compact_timer.cancel()
+        self._compact_timer = threading.Timer(self.compact_delay, self._compact_in_background)
+        self._compact_timer.daemon = True
+        self._compact_timer.start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"[Guide Store] ⚠️ 배경 압축 실패 (다음 쓰기·조회 때 다시 시도): {e}")
+
+    def compact(self) -> int:
+        """미반영 변경을 JSONL 파일에 쓰고 로그를 비움. 다시 쓴 파일 수"""
+        with self._lock:
+            if self._compact_timer is not None:
+                self._compact_timer.cancel()
+                self._compact_timer = None
+            with self._file_lock(exclusive=True):
+                events, _ = self._sync()
+                written = self._compact_locked()
+        self._notify(events)
+        return written
+
+    def _compact_locked(self) -> int:
+        if not self._pending:
+            return 0
+        # 변경이 기록된 파일 + 변경된 가이드가 원래 있던 파일 (삭제 후 다른 파일에 다시 만든 경우)
+        filenames = {change.filename for change in self._pending.values()}
+        filenames.update(self._base[guide_id]["_jsonl_file"] for guide_id in self._pending if guide_id in self._base)
+        files = dict(self._files)
+        written = 0
+        for filename in sorted(filenames):
+            path = self.staging_dir / filename
+            guides = self._compacted_guides(filename)
+            if not guides and not path.exists():
+                continue
+            _write_atomic(path, [json.dumps(_record(guide), ensure_ascii=False) for guide in guides])
+            files[filename] = _GuideFile(_file_key(path), guides)
+            written += 1
+        self._files = dict(sorted(files.items()))
+
+        checkpoint = json.dumps({"op": "checkpoint", "seq": self.seq, "at": time.time()})
+        _write_atomic(self.log_path, [checkpoint])
+        key = _file_key(self.log_path)
+        self._log_inode, self._log_offset = key[0], key[2]
+        self._log_head = checkpoint.encode("utf-8") + b"\n"
+        changes = self._log_entries
+        self._pending = {}
+        self._pending_since = None
+        self._log_entries = 0
+        self._rebuild()
+        self.compactions += 1
+        print(f"[Guide Store] 🗜️ 변경 로그 압축: 변경 {changes}건 → JSONL {written}개 파일")
+        return written
+
+    def _compacted_guides(self, filename: str) -> List[Dict[str, Any]]:
+        """파일 하나의 현재 내용: 기존 순서대로 변경을 반영하고 새 가이드는 뒤에"""
+        entry = self._files.get(filename)
+        guides = []
+        seen = set()
+        for guide in entry.guides if entry else []:
+            guide_id = guide.get("guide_id")
+            if guide_id in self._pending and self._base.get(guide_id) is guide:
+                seen.add(guide_id)
+                current = self._guides.get(guide_id)
+                if current is not None and current.get("_jsonl_file") == filename:
+                    guides.append(current)
+            else:
+                guides.append(guide)
+        for guide_id, change in self._pending.items():
+            if guide_id not in seen and change.op == "upsert" and change.filename == filename:
+                guides.append(self._guides[guide_id])
+        return guides
+
+    # ------------------------------------------------------------------ 이벤트·내보내기
+
+    def subscribe(self, callback: Callable[[GuideChange], None]):
+        """변경 이벤트 구독 (이 프로세스의 쓰기와 다른 프로세스가 로그에 쓴 변경 모두, 잠금 밖에서 호출)"""
+        self._subscribers.append(callback)
+
+    def _notify(self, events: List[GuideChange]):
+        for change in events:
+            for callback in list(self._subscribers):
+                try:
+                    callback(change)
+                except Exception as e:
+                    print(f"[Guide Store] ⚠️ 변경 이벤트 처리 실패 ({change.op} {change.guide_id}): {e}")
+
+    def export_jsonl(self, path: str) -> int:
+        """현재 가이드 전체(로그 반영)를 JSONL 파일 하나로 저장. 저장한 가이드 수"""
+        self.refresh(force=True)
+        with self._lock:
+            guides = list(self._guides.values())
+        _write_atomic(Path(path), [json.dumps(_record(guide), ensure_ascii=False) for guide in guides])
+        return len(guides)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "guides": len(self._guides),
+                "source_documents": len(self._by_source),
+                "file_parses": self.parses,
+                "check_seconds": self.check_seconds,
+                "seq": self.seq,
+                "pending_changes": len(self._pending),
+                "log_entries": self._log_entries,
+                "compactions": self.compactions,
+                "compact_scheduled": self._compact_timer is not None,
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가이드 저장소 관리 (변경 로그 압축·JSONL 내보내기)")
+    parser.add_argument("--staging-dir", required=True, help="가이드 JSONL 디렉토리 (app/rag/data/staging)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("compact", help="미반영 변경을 JSONL 파일에 반영 (빌드 스크립트 실행 전)")
+    export = commands.add_parser("export", help="현재 가이드 전체를 JSONL 파일 하나로 저장")
+    export.add_argument("path")
+    commands.add_parser("stats", help="저장소 상태")
+    args = parser.parse_args()
+
+    store = GuideStore(Path(args.staging_dir))
+    store.refresh(force=True)
+    if args.command == "compact":
+        print(f"✅ JSONL {store.compact()}개 파일 갱신")
+    elif args.command == "export":
+        print(f"✅ 가이드 {store.export_jsonl(args.path)}개 → {args.path}")
+    else:
+        print(json.dumps(store.stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
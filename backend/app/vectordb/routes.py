@@ -16,13 +16,21 @@ from openai import OpenAI
 import os
 from dotenv import load_dotenv
 import hashlib
+import sys
 from pydantic import BaseModel
 
 from app.audit.logger import AuditLogger
 from app.auth.auth_utils import get_current_user
+from app.vectordb.guide_search import GUIDE_SEARCH_BACKEND, LocalGuideSearch, build_guide_query
+from app.vectordb.guide_store import GuideStore
 from app.vectordb.rag_masking import decide_all_pii_with_rag
 from app.utils.masking_rules import MaskingRules
 
+RAG_DIR = str(Path(__file__).resolve().parent.parent / "rag")
+if RAG_DIR not in sys.path:
+    sys.path.insert(0, RAG_DIR)
+from agent.retrieval_cache import normalize_query, retrieval_cache
+
 load_dotenv()
 
 router = APIRouter(prefix="/api/vectordb", tags=["VectorDB Management"])
@@ -34,6 +42,11 @@ STAGING_DIR = BASE_DIR / "app" / "rag" / "data" / "staging"
 # 디렉토리 생성
 STAGING_DIR.mkdir(parents=True, exist_ok=True)
 
+# 가이드 저장소 (인메모리 색인, CRUD는 추가 전용 변경 로그에 기록 후 주기적으로 JSONL에 압축)
+guide_store = GuideStore(STAGING_DIR)
+# 다른 워커가 쓴 변경도 이벤트로 들어오므로 검색 결과 캐시를 함께 비움
+guide_store.subscribe(lambda change: retrieval_cache.invalidate(f"가이드 {change.op}: {change.guide_id or '전체'}"))
+
 # OpenAI 클라이언트
 openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
@@ -101,63 +114,14 @@ def build_search_text(guide: Dict) -> str:
 
 def load_all_guides() -> Dict[str, List[Dict]]:
     """
-    모든 JSONL 파일을 로드하고 source_document로 그룹화
-    Returns: {source_document: [guides...]}
+    모든 JSONL 파일의 가이드를 source_document로 그룹화 (인메모리 저장소, 디스크를 다시 읽지 않음)
+    Returns: {source_document: [guides...]} - 저장소와 공유되므로 수정하지 말 것
     """
-    if not STAGING_DIR.exists():
-        return {}
-
-    grouped_guides = {}
-    jsonl_files = list(STAGING_DIR.glob("*.jsonl"))
-
-    for jsonl_file in jsonl_files:
-        try:
-            with open(jsonl_file, "r", encoding="utf-8") as f:
-                for line in f:
-                    if line.strip():
-                        guide = json.loads(line)
-                        source_doc = guide.get("source_document", "Unknown")
-
-                        if source_doc not in grouped_guides:
-                            grouped_guides[source_doc] = []
-
-                        guide["_jsonl_file"] = jsonl_file.name
-                        grouped_guides[source_doc].append(guide)
-        except Exception as e:
-            print(f"파일 로드 실패 {jsonl_file.name}: {e}")
+    return guide_store.grouped()
 
-    return grouped_guides
 
-
-def load_guides_from_file(filename: str) -> List[Dict]:
-    """특정 JSONL 파일에서 가이드 로드"""
-    file_path = STAGING_DIR / filename
-    if not file_path.exists():
-        return []
-
-    guides = []
-    with open(file_path, "r", encoding="utf-8") as f:
-        for line in f:
-            if line.strip():
-                guides.append(json.loads(line))
-
-    return guides
-
-
-def save_guides_to_file(filename: str, guides: List[Dict]) -> bool:
-    """가이드를 JSONL 파일에 저장"""
-    try:
-        file_path = STAGING_DIR / filename
-        with open(file_path, "w", encoding="utf-8") as f:
-            for guide in guides:
-                # _jsonl_file 필드 제거
-                guide_copy = guide.copy()
-                guide_copy.pop("_jsonl_file", None)
-                f.write(json.dumps(guide_copy, ensure_ascii=False) + "\n")
-        return True
-    except Exception as e:
-        print(f"파일 저장 실패: {e}")
-        return False
+# 로컬 가이드 검색 백엔드 (GUIDE_SEARCH_BACKEND=local)
+local_guide_search = LocalGuideSearch(guide_store, build_search_text)
 
 
 def search_openai_vector_store(query: str, top_k: int = 5) -> List[Dict]:
@@ -198,11 +162,18 @@ def search_openai_vector_store(query: str, top_k: int = 5) -> List[Dict]:
 async def search_with_assistant(query: str, context: Dict = None) -> List[Dict]:
     """
     OpenAI Assistants API의 File Search 도구를 사용하여 Vector Store 검색
+    - 같은 (쿼리, 수신자 유형) 결과는 캐시에서 반환 (가이드 파일 저장 시 무효화)
     """
+    receiver_type = context.get('receiver_type', 'external') if context else 'external'
+    cache_key = ('openai_file_search', VECTOR_STORE_ID, normalize_query(query), receiver_type,
+                 retrieval_cache.generation)
+    cached = retrieval_cache.results.get(cache_key)
+    if cached is not None:
+        return [dict(result) for result in cached]
+
     try:
         # 컨텍스트 정보를 쿼리에 추가
-        receiver_type = context.get('receiver_type', 'external') if context else 'external'
-        enhanced_query = f"이메일 {receiver_type} 전송 시 개인정보 마스킹 가이드라인: {query}"
+        enhanced_query = build_guide_query(query, context)
 
         # Responses API로 File Search 수행
         response = openai_client.responses.create(
@@ -252,6 +223,9 @@ async def search_with_assistant(query: str, context: Dict = None) -> List[Dict]:
             })
 
         print(f"✅ OpenAI Vector Store 검색 완료: {len(results)}개 결과")
+        if results:
+            retrieval_cache.results.set(cache_key, results)
+            return [dict(result) for result in results]
         return results
 
     except Exception as e:
@@ -261,6 +235,35 @@ async def search_with_assistant(query: str, context: Dict = None) -> List[Dict]:
         return []
 
 
+async def search_local_guides(query: str, context: Dict = None) -> List[Dict]:
+    """
+    로컬 가이드 인덱스 검색 (네트워크 호출 없음, 임베딩 계산은 스레드에서)
+    - search_with_assistant와 같은 결과 형식
+    """
+    results = await asyncio.to_thread(local_guide_search.search, query, context)
+    print(f"✅ 로컬 가이드 검색 완료: {len(results)}개 결과")
+    return results
+
+
+# 가이드라인 검색 백엔드 (GUIDE_SEARCH_BACKEND로 선택)
+GUIDE_SEARCH_BACKENDS = {
+    "openai": search_with_assistant,
+    "local": search_local_guides,
+}
+
+
+async def search_guides(query: str, context: Dict = None) -> List[Dict]:
+    """설정된 백엔드로 가이드라인 검색 (로컬 검색이 실패하면 OpenAI Vector Store로 폴백)"""
+    backend = GUIDE_SEARCH_BACKENDS.get(GUIDE_SEARCH_BACKEND, search_with_assistant)
+    if backend is search_with_assistant:
+        return await search_with_assistant(query, context)
+    try:
+        return await backend(query, context)
+    except Exception as e:
+        print(f"⚠️ {GUIDE_SEARCH_BACKEND} 가이드 검색 실패, OpenAI Vector Store로 전환: {e}")
+        return await search_with_assistant(query, context)
+
+
 @router.get("/guides/grouped")
 async def get_guides_grouped():
     """source_document로 그룹화된 모든 가이드 조회"""
@@ -298,8 +301,7 @@ async def get_guides_grouped():
 async def get_guides_by_source(source_document: str):
     """특정 source_document의 가이드 조회"""
     try:
-        grouped = load_all_guides()
-        guides = grouped.get(source_document, [])
+        guides = guide_store.by_source(source_document)
 
         return JSONResponse({
             "success": True,
@@ -318,17 +320,14 @@ async def get_guides_by_source(source_document: str):
 async def get_guide_by_id(guide_id: str):
     """특정 가이드 조회"""
     try:
-        grouped = load_all_guides()
-
-        for source_doc, guides in grouped.items():
-            for guide in guides:
-                if guide.get("guide_id") == guide_id:
-                    return JSONResponse({
-                        "success": True,
-                        "data": guide
-                    })
+        guide = guide_store.get(guide_id)
+        if guide is None:
+            raise HTTPException(status_code=404, detail="가이드를 찾을 수 없습니다")
 
-        raise HTTPException(status_code=404, detail="가이드를 찾을 수 없습니다")
+        return JSONResponse({
+            "success": True,
+            "data": guide
+        })
 
     except HTTPException:
         raise
@@ -345,8 +344,7 @@ async def create_guide(guide_data: PolicyGuideCreate):
         random_str = hashlib.md5(str(datetime.now().timestamp()).encode()).hexdigest()[:6]
 
         # 해당 source_document의 기존 가이드 개수 확인
-        grouped = load_all_guides()
-        existing_guides = grouped.get(guide_data.source_document, [])
+        existing_guides = guide_store.by_source(guide_data.source_document)
         guide_index = len(existing_guides)
 
         authority_code = "UNK"
@@ -376,13 +374,8 @@ async def create_guide(guide_data: PolicyGuideCreate):
         if not target_file:
             target_file = jsonl_filename
 
-        # 파일에서 기존 가이드 로드
-        all_guides = load_guides_from_file(target_file) if target_file else []
-        all_guides.append(new_guide)
-
-        # 파일 저장
-        if not save_guides_to_file(target_file, all_guides):
-            raise HTTPException(status_code=500, detail="파일 저장 실패")
+        # 변경 로그에 추가 (파일 전체를 다시 쓰지 않음)
+        guide_store.upsert(new_guide, target_file)
 
         return JSONResponse({
             "success": True,
@@ -401,38 +394,12 @@ async def create_guide(guide_data: PolicyGuideCreate):
 async def update_guide(guide_id: str, guide_data: PolicyGuideUpdate):
     """가이드 업데이트"""
     try:
-        grouped = load_all_guides()
-
-        target_file = None
-        updated_guide = None
-
-        # 가이드 찾기
-        for source_doc, guides in grouped.items():
-            for guide in guides:
-                if guide.get("guide_id") == guide_id:
-                    target_file = guide.get("_jsonl_file")
-                    break
-            if target_file:
-                break
+        # 잠금 안에서 최신 가이드를 읽어 수정 (동시 수정이 서로 덮어쓰지 않음)
+        updated_guide = guide_store.update(guide_id, guide_data.model_dump(exclude_unset=True))
 
-        if not target_file:
+        if updated_guide is None:
             raise HTTPException(status_code=404, detail="가이드를 찾을 수 없습니다")
 
-        # 파일에서 모든 가이드 로드
-        all_guides = load_guides_from_file(target_file)
-
-        # 업데이트된 가이드 찾아서 수정
-        for i, g in enumerate(all_guides):
-            if g.get("guide_id") == guide_id:
-                update_dict = guide_data.model_dump(exclude_unset=True)
-                all_guides[i].update(update_dict)
-                updated_guide = all_guides[i]
-                break
-
-        # 파일 저장
-        if not save_guides_to_file(target_file, all_guides):
-            raise HTTPException(status_code=500, detail="파일 저장 실패")
-
         return JSONResponse({
             "success": True,
             "message": "가이드가 성공적으로 업데이트되었습니다",
@@ -449,30 +416,9 @@ async def update_guide(guide_id: str, guide_data: PolicyGuideUpdate):
 async def delete_guide(guide_id: str):
     """가이드 삭제"""
     try:
-        grouped = load_all_guides()
-
-        target_file = None
-
-        # 가이드 찾기
-        for source_doc, guides in grouped.items():
-            for guide in guides:
-                if guide.get("guide_id") == guide_id:
-                    target_file = guide.get("_jsonl_file")
-                    break
-            if target_file:
-                break
-
-        if not target_file:
+        if not guide_store.delete(guide_id):
             raise HTTPException(status_code=404, detail="가이드를 찾을 수 없습니다")
 
-        # 파일에서 가이드 제거
-        all_guides = load_guides_from_file(target_file)
-        all_guides = [g for g in all_guides if g.get("guide_id") != guide_id]
-
-        # 파일 저장
-        if not save_guides_to_file(target_file, all_guides):
-            raise HTTPException(status_code=500, detail="파일 저장 실패")
-
         return JSONResponse({
             "success": True,
             "message": "가이드가 성공적으로 삭제되었습니다"
@@ -487,6 +433,8 @@ async def delete_guide(guide_id: str):
 @router.get("/stats")
 async def get_vectordb_stats():
     """VectorDB 통계"""
+    from app.utils.rag_integration import get_model_registry_snapshot
+
     try:
         grouped = load_all_guides()
 
@@ -520,7 +468,12 @@ async def get_vectordb_stats():
                 "vector_store_id": VECTOR_STORE_ID,
                 "vector_store_status": vector_store_status,
                 "vector_store_file_count": vector_store_file_count,
-                "sync_status": "openai_vector_store"
+                "sync_status": "openai_vector_store",
+                "guide_search_backend": GUIDE_SEARCH_BACKEND,
+                "local_guide_index": local_guide_search.stats(),
+                "guide_store": guide_store.stats(),
+                "embedding_models": get_model_registry_snapshot(),
+                "retrieval_cache": retrieval_cache.stats()
             }
         })
 
@@ -558,7 +511,7 @@ async def analyze_email_with_rag_stream(
             # Vector Store 검색
             search_query = f"{request.context.get('receiver_type', 'external')} 전송 개인정보 마스킹"
 
-            relevant_guides = await search_with_assistant(search_query, request.context)
+            relevant_guides = await search_guides(search_query, request.context)
 
             if not relevant_guides:
                 yield f"data: {json.dumps({'type': 'error', 'message': 'Vector Store 검색 결과 없음'})}\n\n"
@@ -668,7 +621,7 @@ async def analyze_email_with_rag(
 
         log_progress(f"📝 Vector Store 검색 쿼리: {search_query}")
 
-        relevant_guides = await search_with_assistant(search_query, request.context)
+        relevant_guides = await search_guides(search_query, request.context)
 
         if not relevant_guides:
             log_progress("⚠️ Vector Store 검색 결과 없음, fallback 사용")
@@ -733,6 +686,7 @@ async def analyze_email_with_rag(
                 "total_guides_found": len(relevant_guides),
                 "total_cited": len(cited_guide_texts),
                 "vector_store_id": VECTOR_STORE_ID,
+                "guide_search_backend": GUIDE_SEARCH_BACKEND,
                 "progress_logs": progress_logs  # 진행 상황 로그 추가
             }
         })
@@ -975,7 +929,8 @@ def generate_summary(context: Dict, decisions: Dict, guides: List[Dict]) -> str:
         summary += "마스킹이 필요한 개인정보가 없습니다. "
 
     if guides:
-        summary += f"\n\nOpenAI Vector Store에서 관련 규정 {len(guides)}개를 참고했습니다."
+        source = "로컬 가이드 인덱스" if GUIDE_SEARCH_BACKEND == "local" else "OpenAI Vector Store"
+        summary += f"\n\n{source}에서 관련 규정 {len(guides)}개를 참고했습니다."
 
     return summary
 
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+한글(HWP/HWPX) 텍스트 추출 벤치마크: 네이티브 추출 vs OCR 경로
+네이티브 추출(구역 단위 스트리밍)과 OCR 경로(페이지 렌더링 → Clova OCR)의 시간과 메모리를 비교합니다.
+
+OCR 경로는 한글 문서를 직접 렌더링할 수 없으므로 같은 문서를 PDF로 내보낸 파일(--pdf)을
+페이지 이미지로 렌더링해 측정합니다. 파일을 주지 않으면 같은 텍스트로 HWPX와 PDF를 만들어 비교합니다.
+Clova OCR 호출 시간까지 재려면 CLOVA_OCR_URL, CLOVA_OCR_SECRET을 설정하고 --ocr을 붙입니다.
+
+실행 방법 (backend 디렉토리에서):
+    python scripts/benchmark_hwp_extraction.py --pages 300
+    python scripts/benchmark_hwp_extraction.py --doc 보고서.hwp --pdf 보고서.pdf --ocr
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fitz  # PyMuPDF
+
+from app.utils.hwp_extractor import iter_hwp_chunks
+
+LINES_PER_PAGE = 30
+_HWPX_NS = ('xmlns:hp="http://www.hancom.co.kr/hwpml/2011/paragraph" '
+            'xmlns:hs="http://www.hancom.co.kr/hwpml/2011/section"')
+
+
+def sample_lines(pages: int):
+    for page in range(pages):
+        for line in range(LINES_PER_PAGE):
+            yield f"Page {page + 1} line {line + 1}: contact 010-{page % 10000:04d}-{line:04d}, lorem ipsum dolor sit amet"
+
+
+def make_sample_hwpx(path: str, pages: int, pages_per_section: int = 50):
+    """페이지 수만큼 문단을 넣은 HWPX (pages_per_section 페이지마다 구역을 나눔)"""
+    lines = list(sample_lines(pages))
+    per_section = pages_per_section * LINES_PER_PAGE
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("mimetype", "application/hwp+zip")
+        for section, start in enumerate(range(0, len(lines), per_section)):
+            paragraphs = "".join(
+                f"<hp:p><hp:run><hp:t>{escape(line)}</hp:t></hp:run></hp:p>"
+                for line in lines[start:start + per_section]
+            )
+            archive.writestr(f"Contents/section{section}.xml", f"<hs:sec {_HWPX_NS}>{paragraphs}</hs:sec>")
+
+
+def make_sample_pdf(path: str, pages: int):
+    """HWPX 샘플과 같은 텍스트의 PDF (OCR 경로용)"""
+    doc = fitz.open()
+    lines = sample_lines(pages)
+    for _ in range(pages):
+        page = doc.new_page()
+        y = 40
+        for _ in range(LINES_PER_PAGE):
+            page.insert_text((40, y), next(lines), fontname="helv", fontsize=9)
+            y += 24
+    doc.save(path)
+    doc.close()
+
+
+def measure(func):
+    """(결과, 경과 시간, 파이썬 최대 메모리 MB) - 시간은 tracemalloc 없이 따로 잼"""
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def native_extract(doc_path: str) -> int:
+    chars = 0
+    for chunk in iter_hwp_chunks(doc_path):
+        chars += len(chunk.text)
+    return chars
+
+
+def render_pages(pdf_path: str, dpi: int, out_dir: str) -> list:
+    """OCR 전 단계: PDF 페이지를 PNG로 렌더링"""
+    paths = []
+    with fitz.open(pdf_path) as doc:
+        for index, page in enumerate(doc):
+            path = os.path.join(out_dir, f"page_{index:05d}.png")
+            page.get_pixmap(dpi=dpi).save(path)
+            paths.append(path)
+    return paths
+
+
+def ocr_pages(image_paths: list) -> int:
+    from app.utils.ocr_extractor import ClovaOCR
+
+    ocr = ClovaOCR()
+    chars = 0
+    for path in image_paths:
+        chars += len(ocr.singleimage(path).full_text)
+    return chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HWP/HWPX 네이티브 추출 vs OCR 경로 벤치마크")
+    parser.add_argument("--doc", help="측정할 HWP/HWPX 파일 (없으면 샘플 HWPX 생성)")
+    parser.add_argument("--pdf", help="같은 문서를 PDF로 내보낸 파일 (OCR 경로용)")
+    parser.add_argument("--pages", type=int, default=300, help="샘플 문서 페이지 수")
+    parser.add_argument("--dpi", type=int, default=200, help="OCR용 렌더링 해상도")
+    parser.add_argument("--ocr", action="store_true", help="Clova OCR 호출까지 측정 (API 키 필요)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="hwp_bench_")
+    try:
+        doc_path = args.doc
+        pdf_path = args.pdf
+        if not doc_path:
+            doc_path = os.path.join(work_dir, "sample.hwpx")
+            print(f"\n📄 샘플 HWPX 생성: {args.pages}페이지 × {LINES_PER_PAGE}줄")
+            make_sample_hwpx(doc_path, args.pages)
+            if not pdf_path:
+                pdf_path = os.path.join(work_dir, "sample.pdf")
+                make_sample_pdf(pdf_path, args.pages)
+
+        rows = []
+
+        chars, elapsed, peak = measure(lambda: native_extract(doc_path))
+        rows.append(("네이티브 추출", elapsed, peak, f"{chars:,}자"))
+        print(f"  네이티브 추출: {elapsed:7.2f}s, 최대 메모리 {peak:7.1f}MB, {chars:,}자")
+
+        if pdf_path:
+            image_dir = os.path.join(work_dir, "pages")
+
+            def render():
+                shutil.rmtree(image_dir, ignore_errors=True)
+                os.makedirs(image_dir)
+                return render_pages(pdf_path, args.dpi, image_dir)
+
+            # 픽스맵은 MuPDF(C)에서 할당되어 tracemalloc에 잡히지 않으므로 시간만 잼
+            start = time.perf_counter()
+            image_paths = render()
+            elapsed = time.perf_counter() - start
+            rows.append((f"렌더링 ({args.dpi}dpi)", elapsed, None, f"{len(image_paths)}페이지"))
+            print(f"  페이지 렌더링: {elapsed:7.2f}s, {len(image_paths)}페이지")
+
+            if args.ocr:
+                if not os.getenv("CLOVA_OCR_URL") or not os.getenv("CLOVA_OCR_SECRET"):
+                    print("  ⚠️  CLOVA_OCR_URL/CLOVA_OCR_SECRET이 없어 OCR 호출은 건너뜁니다")
+                else:
+                    start = time.perf_counter()
+                    ocr_chars = ocr_pages(image_paths)
+                    elapsed = time.perf_counter() - start
+                    rows.append(("Clova OCR", elapsed, None, f"{ocr_chars:,}자"))
+                    print(f"  Clova OCR: {elapsed:7.2f}s, {ocr_chars:,}자")
+        else:
+            print("  ⚠️  --pdf가 없어 OCR 경로는 측정하지 않습니다")
+
+        baseline = rows[0][1]
+        ocr_total = sum(row[1] for row in rows[1:])
+        print("\n" + "=" * 64)
+        print(f"{'경로':<16} | {'시간(s)':>8} | {'메모리(MB)':>10} | 결과")
+        print("-" * 64)
+        for name, elapsed, peak, note in rows:
+            memory = f"{peak:>10.1f}" if peak is not None else f"{'-':>10}"
+            print(f"{name:<16} | {elapsed:>8.2f} | {memory} | {note}")
+        if ocr_total:
+            print("-" * 64)
+            print(f"OCR 경로 / 네이티브: {ocr_total / baseline:.1f}x")
+        print("=" * 64 + "\n")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
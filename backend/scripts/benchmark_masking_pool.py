@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+첨부파일 마스킹 프로세스 풀 벤치마크
+워커 수(1, 2, 4, ... CPU 코어 수)별로 여러 PDF를 동시에 마스킹하는 시간을 비교합니다.
+
+실행 방법 (backend 디렉토리에서):
+    python scripts/benchmark_masking_pool.py --files 16 --pages 50 --pii-per-page 4
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fitz  # PyMuPDF
+
+from app.utils.masking_pool import mask_files
+
+
+def make_sample_pdf(path: str, pages: int, pii_per_page: int) -> list:
+    """가짜 PII가 들어간 PDF를 만들고 마스킹 엔티티 목록을 반환"""
+    doc = fitz.open()
+    entities = []
+    for page_index in range(pages):
+        page = doc.new_page()
+        y = 72
+        for i in range(pii_per_page):
+            phone = f"010-{page_index % 10000:04d}-{i:04d}"
+            page.insert_text((72, y), f"Contact phone: {phone}", fontname="helv")
+            entities.append({"entity": "PHONE", "pageIndex": page_index, "text": phone})
+            y += 24
+        page.insert_text((72, y + 24), "Lorem ipsum dolor sit amet " * 4, fontname="helv")
+    doc.save(path)
+    doc.close()
+    return entities
+
+
+async def run_once(workers: int, jobs: dict) -> float:
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        start = time.perf_counter()
+        failures = 0
+        async for _, _, error in mask_files(jobs, executor=executor):
+            if error is not None:
+                failures += 1
+        elapsed = time.perf_counter() - start
+        if failures:
+            print(f"  ⚠️  실패 {failures}건")
+        return elapsed
+    finally:
+        executor.shutdown(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="마스킹 프로세스 풀 벤치마크")
+    parser.add_argument("--files", type=int, default=16, help="동시에 마스킹할 PDF 수")
+    parser.add_argument("--pages", type=int, default=50, help="PDF당 페이지 수")
+    parser.add_argument("--pii-per-page", type=int, default=4, help="페이지당 PII 수")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1, help="최대 워커 수")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="masking_bench_")
+    try:
+        print(f"\n📄 샘플 PDF 생성: {args.files}개 × {args.pages}페이지 × 페이지당 PII {args.pii_per_page}개")
+        jobs = {}
+        for index in range(args.files):
+            src = os.path.join(work_dir, f"sample_{index}.pdf")
+            entities = make_sample_pdf(src, args.pages, args.pii_per_page)
+            jobs[f"sample_{index}.pdf"] = (src, entities, os.path.join(work_dir, f"masked_sample_{index}.pdf"))
+
+        worker_counts = []
+        count = 1
+        while count < args.max_workers:
+            worker_counts.append(count)
+            count *= 2
+        worker_counts.append(args.max_workers)
+
+        results = []
+        for workers in worker_counts:
+            elapsed = asyncio.run(run_once(workers, jobs))
+            results.append((workers, elapsed))
+            print(f"  워커 {workers:>3}개: {elapsed:7.2f}s ({args.files / elapsed:6.2f} files/s)")
+
+        baseline = results[0][1]
+        print("\n" + "=" * 50)
+        print(f"{'워커':>6} | {'시간(s)':>8} | {'속도 향상':>8}")
+        print("-" * 50)
+        for workers, elapsed in results:
+            print(f"{workers:>6} | {elapsed:>8.2f} | {baseline / elapsed:>7.2f}x")
+        print("=" * 50 + "\n")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
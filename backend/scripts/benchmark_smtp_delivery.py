@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+발신 메일 전송 벤치마크 (로컬 SMTP 싱크)
+메일마다 연결·로그인하던 기존 방식과 연결 풀 + 전송 큐(app/smtp_server/delivery.py)의 초당 전송 수를 비교합니다.
+
+싱크는 받은 메일을 버리기만 하는 최소 SMTP 서버이며, 실제 서버의 TCP/TLS 핸드셰이크·로그인 비용은
+--handshake-ms, 명령마다의 왕복 지연은 --rtt-ms로 흉내 냅니다. MongoDB는 필요 없습니다.
+
+실행 방법 (backend 디렉토리에서):
+    python scripts/benchmark_smtp_delivery.py --messages 500 --concurrency 8 --handshake-ms 150 --rtt-ms 5
+"""
+import argparse
+import asyncio
+import sys
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.smtp_server.client import PreparedMessage
+from app.smtp_server.delivery import DeliveryJob, EmailDeliveryService
+from app.smtp_server.pool import SMTPConnectionPool, SMTPServerConfig, open_smtp_connection
+
+
+class SMTPSink:
+    """받은 메일 수만 세는 asyncio SMTP 서버"""
+
+    def __init__(self, handshake_ms: float, rtt_ms: float):
+        self.handshake = handshake_ms / 1000
+        self.rtt = rtt_ms / 1000
+        self.messages = 0
+        self.connections = 0
+        self.server = None
+
+    async def start(self, host: str = "127.0.0.1") -> int:
+        self.server = await asyncio.start_server(self._session, host, 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _reply(self, writer, data: bytes):
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+        writer.write(data)
+        await writer.drain()
+
+    async def _session(self, reader, writer):
+        self.connections += 1
+        try:
+            if self.handshake:
+                await asyncio.sleep(self.handshake)
+            writer.write(b"220 sink ESMTP\r\n")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line[:4].upper()
+                if command == b"EHLO":
+                    await self._reply(writer, b"250-sink\r\n250-8BITMIME\r\n250 SIZE 104857600\r\n")
+                elif command == b"DATA":
+                    await self._reply(writer, b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                    while (await reader.readline()) not in (b".\r\n", b""):
+                        pass
+                    self.messages += 1
+                    await self._reply(writer, b"250 OK: queued\r\n")
+                elif command == b"QUIT":
+                    await self._reply(writer, b"221 Bye\r\n")
+                    break
+                else:
+                    await self._reply(writer, b"250 OK\r\n")
+        finally:
+            writer.close()
+
+
+class _NullEmails:
+    """전송 상태를 기록하지 않는 emails 컬렉션 자리 (벤치마크 작업에는 email_id가 없음)"""
+
+    class _Result:
+        modified_count = 0
+
+    async def update_many(self, *args, **kwargs):
+        return self._Result()
+
+
+def make_message(index: int, body_bytes: int) -> PreparedMessage:
+    msg = MIMEMultipart()
+    msg["From"] = "bench@example.com"
+    msg["To"] = f"user{index}@example.com"
+    msg["Subject"] = f"benchmark #{index}"
+    msg.attach(MIMEText("x" * body_bytes, "plain", "utf-8"))
+    return PreparedMessage(msg, "bench@example.com", [f"user{index}@example.com"], [])
+
+
+async def run_per_message(config: SMTPServerConfig, messages: list, concurrency: int) -> float:
+    """기존 방식: 메일마다 연결 → (TLS·로그인) → 전송 → QUIT"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    def send(prepared: PreparedMessage):
+        server = open_smtp_connection(config)
+        try:
+            server.send_message(prepared.msg)
+        finally:
+            server.quit()
+
+    async def one(prepared: PreparedMessage):
+        async with semaphore:
+            await asyncio.to_thread(send, prepared)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(prepared) for prepared in messages))
+    return time.perf_counter() - start
+
+
+async def run_pooled(config: SMTPServerConfig, messages: list, concurrency: int, per_server: int) -> tuple:
+    """연결 풀 + 전송 큐"""
+    pool = SMTPConnectionPool(max_per_server=per_server)
+    service = EmailDeliveryService(concurrency=concurrency, maxsize=len(messages), pool=pool)
+    db = type("BenchDB", (), {"emails": _NullEmails()})()
+    await service.start(db=db)
+    start = time.perf_counter()
+    for prepared in messages:
+        service.enqueue(DeliveryJob(config=config, message=prepared))
+    await service._queue.join()
+    elapsed = time.perf_counter() - start
+    metrics = service.metrics_snapshot()
+    await service.stop()
+    return elapsed, metrics
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="SMTP 전송 연결 풀 벤치마크")
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8, help="동시 전송 수 (전송 워커 수)")
+    parser.add_argument("--per-server", type=int, default=4, help="풀의 서버당 최대 연결 수")
+    parser.add_argument("--body-bytes", type=int, default=4096)
+    parser.add_argument("--handshake-ms", type=float, default=100.0, help="연결·TLS·로그인 비용 흉내")
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="SMTP 명령 왕복 지연")
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.handshake_ms, args.rtt_ms)
+    port = await sink.start()
+    config = SMTPServerConfig("127.0.0.1", port, use_tls=False)
+    messages = [make_message(i, args.body_bytes) for i in range(args.messages)]
+
+    print(f"메일 {args.messages}개, 동시 {args.concurrency}, 핸드셰이크 {args.handshake_ms}ms, RTT {args.rtt_ms}ms")
+    print("-" * 72)
+
+    before = sink.connections
+    elapsed = await run_per_message(config, messages, args.concurrency)
+    print(f"{'메일마다 연결':<16} {elapsed:8.2f}s  {args.messages / elapsed:8.1f} msg/s  "
+          f"연결 {sink.connections - before}개")
+
+    before = sink.connections
+    elapsed, metrics = await run_pooled(config, messages, args.concurrency, args.per_server)
+    print(f"{'연결 풀 + 큐':<16} {elapsed:8.2f}s  {args.messages / elapsed:8.1f} msg/s  "
+          f"연결 {sink.connections - before}개 (재사용 {metrics['pool']['reuses']}회, "
+          f"p95 {metrics['send_latency_ms']['p95']}ms)")
+
+    print(f"\n싱크가 받은 메일: {sink.messages}개")
+    await sink.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
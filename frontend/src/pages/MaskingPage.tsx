@@ -127,7 +127,9 @@ export const MaskingPage: React.FC<MaskingPageProps> = ({
   const [isSending, setIsSending] = useState(false)
   const [isMasking, setIsMasking] = useState(false)
   const [maskedBody, setMaskedBody] = useState<string>('')
+  const [maskedBodyPatches, setMaskedBodyPatches] = useState<Array<[number, number, string]>>([])
   const [maskedAttachmentFilenames, setMaskedAttachmentFilenames] = useState<string[]>([])
+  const [maskedAttachmentFileIds, setMaskedAttachmentFileIds] = useState<Record<string, string>>({}) // 마스킹 파일명 → GridFS file_id
   const [showMaskedPreview, setShowMaskedPreview] = useState(false)
   const [maskedAttachmentUrls, setMaskedAttachmentUrls] = useState<Map<string, string>>(new Map())
 
@@ -863,34 +865,82 @@ export const MaskingPage: React.FC<MaskingPageProps> = ({
     try {
       // ==================== 1단계: 이메일 본문 마스킹 ====================
       // HTML을 텍스트로 변환 (줄바꿈 보존)
-      let tempMaskedBody = htmlToText(emailData.body)
+      const plainBody = htmlToText(emailData.body)
+      let tempMaskedBody = plainBody
+      let tempMaskedBodyPatches: Array<[number, number, string]> = []
+      const bodyPIIs = checkedPIIs.filter(pii => pii.source === 'regex' || pii.source === 'backend_body')
+
+      // 선택한 PII의 본문 내 모든 위치를 구간으로 만들어 서버에서 한 번에 마스킹
+      const bodySpans: Array<{ start: number; end: number; entity_type: string; value: string }> = []
+      const firstSpanStart = new Map<string, number>()
+      for (const pii of bodyPIIs) {
+        if (!pii.value) continue
+        let index = plainBody.indexOf(pii.value)
+        if (index !== -1) firstSpanStart.set(pii.id, index)
+        while (index !== -1) {
+          bodySpans.push({ start: index, end: index + pii.value.length, entity_type: pii.type, value: pii.value })
+          index = plainBody.indexOf(pii.value, index + pii.value.length)
+        }
+      }
+
+      let serverMasked = false
+      if (bodySpans.length > 0) {
+        try {
+          const maskTextResponse = await fetch(`${API_BASE_URL}/api/v1/process/masking/text`, {
+            method: 'POST',
+            headers: {
+              'Content-Type': 'application/json',
+              'Authorization': `Bearer ${localStorage.getItem('auth_token')}`,
+            },
+            body: JSON.stringify({ text: plainBody, spans: bodySpans })
+          })
+          if (maskTextResponse.ok) {
+            const maskTextResult = await maskTextResponse.json()
+            tempMaskedBody = maskTextResult.masked_text
+            tempMaskedBodyPatches = maskTextResult.patches
+            serverMasked = true
+          } else {
+            console.warn('⚠️ 서버 본문 마스킹 실패, 프론트엔드 규칙으로 마스킹:', maskTextResponse.status)
+          }
+        } catch (error) {
+          console.warn('⚠️ 서버 본문 마스킹 실패, 프론트엔드 규칙으로 마스킹:', error)
+        }
+      }
 
-      for (const pii of checkedPIIs) {
-        if (pii.source === 'regex' || pii.source === 'backend_body') {
+      for (const pii of bodyPIIs) {
+        let masked: string
+        if (serverMasked) {
+          // 첫 번째 위치의 패치로 실제 마스킹 값 확인 (겹친 구간과 합쳐졌으면 기존 값 유지)
+          const patch = tempMaskedBodyPatches.find(([start]) => start === firstSpanStart.get(pii.id))
+          if (!patch) continue
+          masked = patch[2]
+        } else {
           // 프론트엔드 마스킹 규칙 사용
-          const masked = maskValue(pii.value, pii.type)
+          masked = maskValue(pii.value, pii.type)
           tempMaskedBody = tempMaskedBody.replace(new RegExp(escapeRegex(pii.value), 'g'), masked)
+        }
 
-          // ✅ 실제 마스킹된 값을 decision에 저장
-          // pii.pii_id는 "pii_0", "pii_1" 같은 형식 (AI 분석 시 저장됨)
-          const piiId = (pii as any).pii_id
-          if (piiId && updatedDecisions[piiId]) {
-            const oldMaskedValue = updatedDecisions[piiId].masked_value
-            updatedDecisions[piiId].masked_value = masked
-            console.log(`[마스킹 업데이트] ${piiId} (${pii.type}): "${pii.value}" -> "${masked}" (기존: "${oldMaskedValue}")`)
-          } else {
-            console.warn(`[마스킹 실패] pii_id=${piiId}, id=${pii.id} - decision을 찾을 수 없음`)
-          }
+        // ✅ 실제 마스킹된 값을 decision에 저장
+        // pii.pii_id는 "pii_0", "pii_1" 같은 형식 (AI 분석 시 저장됨)
+        const piiId = (pii as any).pii_id
+        if (piiId && updatedDecisions[piiId]) {
+          const oldMaskedValue = updatedDecisions[piiId].masked_value
+          updatedDecisions[piiId].masked_value = masked
+          console.log(`[마스킹 업데이트] ${piiId} (${pii.type}): "${pii.value}" -> "${masked}" (기존: "${oldMaskedValue}")`)
+        } else {
+          console.warn(`[마스킹 실패] pii_id=${piiId}, id=${pii.id} - decision을 찾을 수 없음`)
         }
       }
 
       setMaskedBody(tempMaskedBody)
+      setMaskedBodyPatches(tempMaskedBodyPatches)
       setMaskingDecisions(updatedDecisions) // 업데이트된 decision 저장
 
       // ==================== 2단계: 첨부파일 마스킹 ====================
       const attachmentPIIs = checkedPIIs.filter(pii => pii.source === 'backend_attachment' && pii.filename)
 
       let tempMaskedAttachments: string[] = []
+      let tempMaskedFileIds: Record<string, string> = {}
 
       if (attachmentPIIs.length > 0) {
         console.log('📎 첨부파일 마스킹 시작:', attachmentPIIs.length, '개 PII')
@@ -1038,14 +1088,15 @@ export const MaskingPage: React.FC<MaskingPageProps> = ({
         const maskingResult = await maskingResponse.json()
         console.log('✅ 첨부파일 마스킹 완료:', maskingResult)
 
-        if (maskingResult.masked_files) {
-          tempMaskedAttachments = Object.entries(maskingResult.masked_files)
-            .filter(([_, path]) => typeof path === 'string' && path.startsWith('/uploads/masked_'))
-            .map(([_, path]) => (path as string).replace('/uploads/', ''))
+        if (maskingResult.masked_file_ids) {
+          const storedFiles = Object.values(maskingResult.masked_file_ids) as { filename: string, file_id: string }[]
+          tempMaskedAttachments = storedFiles.map((stored) => stored.filename)
+          tempMaskedFileIds = Object.fromEntries(storedFiles.map((stored) => [stored.filename, stored.file_id]))
         }
       }
 
       setMaskedAttachmentFilenames(tempMaskedAttachments)
+      setMaskedAttachmentFileIds(tempMaskedFileIds)
 
       // ==================== 마스킹된 첨부파일 Blob URL 생성 ====================
       // 이전 마스킹된 URL들만 해제 (원본 URL은 유지)
@@ -1054,7 +1105,9 @@ export const MaskingPage: React.FC<MaskingPageProps> = ({
       const maskedUrlMap = new Map<string, string>()
       for (const maskedFilename of tempMaskedAttachments) {
         try {
-          const response = await fetch(`${API_BASE_URL}/uploads/${maskedFilename}`)
+          const response = await fetch(`${API_BASE_URL}/api/v1/process/masking/masked-file/${tempMaskedFileIds[maskedFilename]}`, {
+            headers: { 'Authorization': `Bearer ${localStorage.getItem('auth_token')}` }
+          })
           if (response.ok) {
             const blob = await response.blob()
             const url = URL.createObjectURL(blob)
@@ -1097,7 +1150,9 @@ export const MaskingPage: React.FC<MaskingPageProps> = ({
               to_emails: emailData.to,
               subject: emailData.subject,
               masked_body: tempMaskedBody,
+              masked_body_patches: tempMaskedBodyPatches,
               masked_attachment_filenames: tempMaskedAttachments,
+              masked_attachment_file_ids: tempMaskedFileIds,
               original_attachment_filenames: originalAttachmentFilenames,  // 원본 첨부파일 추가
               masking_decisions: updatedDecisions, // ✅ 업데이트된 decision 사용
               pii_masked_count: checkedPIIs.length
@@ -1163,7 +1218,9 @@ export const MaskingPage: React.FC<MaskingPageProps> = ({
               to_emails: emailData.to,
               subject: emailData.subject,
               masked_body: maskedBody,
+              masked_body_patches: maskedBodyPatches,
               masked_attachment_filenames: maskedAttachmentFilenames,
+              masked_attachment_file_ids: maskedAttachmentFileIds,
               original_attachment_filenames: originalAttachmentFilenames,
               masking_decisions: maskingDecisions,
               pii_masked_count: allPIIList.filter(p => p.shouldMask).length
@@ -1211,6 +1268,7 @@ export const MaskingPage: React.FC<MaskingPageProps> = ({
         },
         body: JSON.stringify({
           masked_email_id: showMaskedPreview ? emailData.email_id : undefined,
+          source_email_id: emailData.email_id,
           from_email: emailData.from,
           to: emailData.to.join(','),
           subject: emailData.subject,
@@ -1228,9 +1286,10 @@ export const MaskingPage: React.FC<MaskingPageProps> = ({
       }
 
       const result = await smtpResponse.json()
-      console.log('✅ SMTP 전송 성공:', result)
+      console.log('✅ SMTP 전송 대기열 등록:', result)
 
-      toast.success('이메일 전송 완료!')
+      // 전송은 서버 대기열에서 처리되므로 여기서는 등록까지만 알림 (결과는 보낸 메일함에서 확인)
+      toast.success('이메일이 전송 대기열에 등록되었습니다. 전송 결과는 보낸 메일함에서 확인하세요.')
 
       if (onSendComplete) {
         onSendComplete()
@@ -81,6 +81,8 @@ interface AttachmentInfo {
   content_type: string
   size: number
   data?: string
+  file_id?: string
+  download_url?: string
 }
 
 interface MaskedEmailData {
@@ -370,7 +372,19 @@ export const SentEmailDetailPage: React.FC<SentEmailDetailPageProps> = ({
           if (maskedResult.data.masked_attachments && maskedResult.data.masked_attachments.length > 0) {
             const urlMap = new Map<string, string>()
             for (const attachment of maskedResult.data.masked_attachments) {
-              if (attachment.data) {
+              if (!attachment.data && attachment.download_url) {
+                // GridFS에 저장된 첨부파일은 스트리밍 다운로드
+                try {
+                  const fileResponse = await fetch(`${API_BASE_URL}${attachment.download_url}`, {
+                    headers: { 'Authorization': `Bearer ${token}` }
+                  })
+                  if (fileResponse.ok) {
+                    urlMap.set(attachment.filename, URL.createObjectURL(await fileResponse.blob()))
+                  }
+                } catch (error) {
+                  console.error(`마스킹 첨부파일 다운로드 실패: ${attachment.filename}`, error)
+                }
+              } else if (attachment.data) {
                 try {
                   const binaryString = atob(attachment.data)
                   const bytes = new Uint8Array(binaryString.length)
@@ -26,6 +26,8 @@ interface Email {
   to_email: string
   created_at: string
   attachments?: any[]
+  delivery_status?: string | null
+  delivery_error?: string | null
 }
 
 interface SentEmailsPageProps {
@@ -118,6 +120,23 @@ export function SentEmailsPage({ onNavigate, onBack }: SentEmailsPageProps) {
     })
   }
 
+  // SMTP 전송 상태 (전송은 대기열에서 처리되므로 보낸 직후에는 queued/sending)
+  const getDeliveryBadge = (email: Email) => {
+    const variants: Record<string, { label: string; variant: 'default' | 'secondary' | 'destructive' | 'outline' }> = {
+      queued: { label: '전송 대기', variant: 'outline' },
+      sending: { label: '전송 중', variant: 'outline' },
+      sent: { label: '전송 완료', variant: 'secondary' },
+      failed: { label: '전송 실패', variant: 'destructive' },
+    }
+    const config = email.delivery_status ? variants[email.delivery_status] : undefined
+    if (!config) return null
+    return (
+      <Badge variant={config.variant} className="text-xs flex-shrink-0" title={email.delivery_error || undefined}>
+        {config.label}
+      </Badge>
+    )
+  }
+
   // 필터링된 메일 목록
   const filteredEmails = emails.filter((email) => {
     const matchesSearch =
@@ -291,6 +310,7 @@ export function SentEmailsPage({ onNavigate, onBack }: SentEmailsPageProps) {
                         {email.attachments && email.attachments.length > 0 && (
                           <Paperclip className="h-3 w-3 text-muted-foreground flex-shrink-0" />
                         )}
+                        {getDeliveryBadge(email)}
                       </div>
                     </TableCell>
                     <TableCell>